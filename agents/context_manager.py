@@ -0,0 +1,176 @@
+"""
+Conversation Context Manager for Flex AI Agent.
+
+This module keeps a conversation bounded in long sessions. Recent turns are
+kept verbatim; once they outgrow the token budget of the current model, the
+oldest ones are folded into a running summary in the background, so the next
+request is not delayed. Summaries come from a model call when a summarizer is
+configured, with a local extractive summary as the fallback.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from tools.token_counter import get_token_counter
+
+
+# Summarizer signature: (previous summary, turns to fold in) -> new summary
+Summarizer = Callable[[str, List[Dict[str, Any]]], Awaitable[str]]
+
+
+class ConversationContextManager:
+    """Recent conversation turns plus a rolling summary of older ones."""
+    
+    # Turns always kept verbatim, so follow-ups like "yes" keep their context
+    MIN_RECENT_ENTRIES = 2
+    # Characters of each turn kept by the extractive fallback summary
+    EXTRACT_CHARS = 160
+    
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        summary_max_tokens: int = 800,
+        entries: Optional[List[Dict[str, Any]]] = None
+    ):
+        """
+        Initialize the context manager.
+        
+        Args:
+            summarizer: Async callable producing summaries, or None for the
+                local extractive summary only
+            summary_max_tokens: Maximum tokens kept in the running summary
+            entries: Existing list to hold the turns (e.g. a session's history)
+        """
+        self.summarizer = summarizer
+        self.summary_max_tokens = summary_max_tokens
+        
+        self.entries: List[Dict[str, Any]] = entries if entries is not None else []
+        # Every turn in full, including those folded into the summary (for exports)
+        self.transcript: List[Dict[str, Any]] = list(self.entries)
+        self.summary = ""
+        self.summarized_entries = 0
+        
+        self._task: Optional[asyncio.Task] = None
+        self._generation = 0
+    
+    def add(self, entry_type: str, content: str, **metadata: Any) -> None:
+        """
+        Append a turn to the conversation.
+        
+        Args:
+            entry_type: 'user' or 'assistant'
+            content: Turn text
+            **metadata: Extra fields stored with the entry (e.g. model, or
+                'tokens' to override the size counted against the budget)
+        """
+        entry = {'type': entry_type, 'content': content, 'timestamp': time.time()}
+        entry.update(metadata)
+        self.entries.append(entry)
+        self.transcript.append(entry)
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    @property
+    def is_summarizing(self) -> bool:
+        """Whether a background summary update is running."""
+        return self._task is not None and not self._task.done()
+    
+    def schedule_summary(self, recent_tokens: int) -> Optional[asyncio.Task]:
+        """
+        Fold old turns into the summary in the background if needed.
+        
+        Nothing happens while the verbatim turns fit ``recent_tokens``. Once
+        they do not, the oldest turns are summarized until the rest fit in half
+        of the budget, so summaries run every few turns rather than every turn.
+        
+        Args:
+            recent_tokens: Token budget for verbatim turns (from the model's
+                context window)
+        
+        Returns:
+            The running summary task, or None if no update was needed
+        """
+        if self.is_summarizing:
+            return self._task
+        
+        token_counter = get_token_counter()
+        counts = token_counter.count_batch(entry.get('content', '') for entry in self.entries)
+        # Reason: entries may carry their full size, e.g. tool calls made during the turn
+        counts = [entry.get('tokens', tokens) for entry, tokens in zip(self.entries, counts)]
+        if sum(counts) <= recent_tokens:
+            return None
+        
+        # Reason: keep the newest turns within half the budget, fold the rest
+        kept_tokens = 0
+        split = len(self.entries)
+        while split > 0:
+            tokens = counts[split - 1]
+            if len(self.entries) - split >= self.MIN_RECENT_ENTRIES and kept_tokens + tokens > recent_tokens // 2:
+                break
+            kept_tokens += tokens
+            split -= 1
+        
+        if split == 0:
+            return None
+        
+        batch = self.entries[:split]
+        self._task = asyncio.create_task(self._fold(batch, self._generation))
+        return self._task
+    
+    async def _fold(self, batch: List[Dict[str, Any]], generation: int) -> None:
+        """Summarize a batch of old turns and drop them from the verbatim list."""
+        summary = ""
+        if self.summarizer is not None:
+            try:
+                summary = await self.summarizer(self.summary, batch)
+            except Exception as e:
+                print(f"Warning: Conversation summary failed, using extractive summary: {e}")
+        
+        if not summary:
+            summary = self._extractive_summary(batch)
+        
+        # Reason: the conversation was cleared while the summary was running
+        if generation != self._generation:
+            return
+        
+        self.summary = get_token_counter().truncate(summary.strip(), self.summary_max_tokens)
+        del self.entries[:len(batch)]
+        self.summarized_entries += len(batch)
+    
+    def _extractive_summary(self, batch: List[Dict[str, Any]]) -> str:
+        """Summarize turns locally by keeping the start of each, newest last."""
+        lines = self.summary.splitlines() if self.summary else []
+        for entry in batch:
+            role = "User" if entry.get('type') == 'user' else "Assistant"
+            text = " ".join(entry.get('content', '').split())
+            if len(text) > self.EXTRACT_CHARS:
+                text = text[:self.EXTRACT_CHARS] + "..."
+            lines.append(f"- {role}: {text}")
+        
+        # Reason: drop the oldest lines first when the summary is over budget
+        token_counter = get_token_counter()
+        counts = token_counter.count_batch(lines)
+        total = sum(counts) + len(lines)
+        start = 0
+        while start < len(lines) - 1 and total > self.summary_max_tokens:
+            total -= counts[start] + 1
+            start += 1
+        return "\n".join(lines[start:])
+    
+    async def wait(self) -> None:
+        """Wait for a running summary update to finish."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+    
+    def clear(self) -> None:
+        """Forget all turns and the summary."""
+        if self.is_summarizing:
+            self._task.cancel()
+        self._task = None
+        self._generation += 1
+        self.entries.clear()
+        self.transcript.clear()
+        self.summary = ""
+        self.summarized_entries = 0
@@ -6,11 +6,31 @@ PydanticAI with OpenRouter for dynamic model selection and comprehensive
 Flex code assistance.
 """
 
+import asyncio
 import json
+import re
 import time
+import uuid
+from collections import OrderedDict
+from copy import copy
+from dataclasses import replace
+from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from pydantic_ai import Agent, RunContext
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from pydantic_ai import Agent, RunContext, Tool
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    RetryPromptPart,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart
+)
+from pydantic_ai.models import Model
 from pydantic import BaseModel
 
 from .models import (
@@ -22,16 +42,33 @@ from .models import (
     CodeValidationResult,
     OpenRouterModel,
     ModelFilter,
-    AgentSession
+    AgentSession,
+    RoutingDecision,
+    FanOutCandidate,
+    FanOutResult,
+    GeneratedFlexCode,
+    StructuredFlexCode,
+    LineEdit,
+    FlexCodePatch
 )
-from agents.providers import OpenRouterProviderManager, create_flex_agent
+from agents.providers import OpenRouterProviderManager
+from agents.context_manager import ConversationContextManager
 from tools.model_manager import ModelManager
 from tools.code_validator import FlexCodeValidator
 from tools.flex_executor import FlexExecutor
 from tools.file_manager import FileManager
+from tools.token_counter import get_token_counter
+from tools.spec_retriever import SpecRetriever, SpecRetrieverError
+from tools.response_cache import ResponseCache
+from tools.session_journal import SessionJournal, journal_path, read_journal
+from tools.search_index import SearchHit, SearchIndex, SearchIndexError
 from config.settings import Settings, get_settings
 
 
+# Fenced code block in a model response (language tag optional)
+_CODE_BLOCK = re.compile(r"```(?:flex|flx)?[ \t]*\n(.*?)```", re.DOTALL)
+
+
 class AgentDependencies(BaseModel):
     model_config = {"arbitrary_types_allowed": True}
 
@@ -43,48 +80,130 @@ class AgentDependencies(BaseModel):
     file_manager: FileManager
     session: Optional[AgentSession] = None
     user_preferences: Dict[str, Any] = {}
+    # Set on hedged attempts; returns False once another attempt owns the request
+    side_effect_claim: Optional[Callable[[], bool]] = None
+    
+    def claim_side_effects(self) -> bool:
+        """Whether a tool that writes files, runs code or switches models may run."""
+        return self.side_effect_claim is None or self.side_effect_claim()
 
 
 class FlexAIAgent:
     """Main Flex AI Agent with comprehensive Flex programming support."""
     
-    def __init__(self, settings: Optional[Settings] = None):
-        """Initialize Flex AI Agent."""
+    # Context window assumed when the model is not in the loaded catalog
+    DEFAULT_CONTEXT_LENGTH = 16000
+    # Tokens kept free for tool schemas and the completion
+    RESERVED_CONTEXT_TOKENS = 4096
+    # Smallest leftover budget worth filling with a truncated entry
+    MIN_PARTIAL_ENTRY_TOKENS = 32
+    # Number of per-model agents kept for fast switching
+    AGENT_CACHE_SIZE = 8
+    
+    # Most recent conversation entries that make a cached response reusable
+    CACHE_CONTEXT_ENTRIES = 2
+    # Tools without side effects; responses that used only these can be replayed
+    CACHEABLE_TOOLS = frozenset({
+        "generate_flex_code",
+        "validate_flex_code",
+        "list_available_models",
+        "get_flex_examples",
+        "search_flex_spec"
+    })
+    # Returned instead of running a side-effecting tool on a hedged attempt that lost
+    SIDE_EFFECT_SKIPPED = "❌ Skipped: another model is already handling this request."
+    
+    # Lines shown on either side of a failing line in repair prompts
+    REPAIR_CONTEXT_LINES = 1
+    
+    # Characters of each earlier program or answer returned by search_past_work
+    SEARCH_RESULT_MAX_CHARS = 4000
+    
+    SPEC_PATH = Path(__file__).parent.parent / "data" / "flex_language_spec.json"
+    
+    SUMMARY_SYSTEM_PROMPT = (
+        "You maintain a running summary of a conversation between a user and a Flex "
+        "programming assistant. Merge the new messages into the existing summary. Keep "
+        "the user's goals and preferences (Franco or English syntax), file names, "
+        "decisions, open questions and any code the user is still working on. Drop "
+        "pleasantries and repeated content. Reply with the updated summary only."
+    )
+    
+    GENERATION_SYSTEM_PROMPT = (
+        "You write programs in the Flex programming language, which accepts both "
+        "Franco Arabic (karr, l7d, etb3, lw) and English (for, print, if) keywords. "
+        "Franco l7d loops are inclusive: iterate arrays with "
+        "'karr i=0 l7d length(array) - 1'."
+    )
+    
+    def __init__(self, settings: Optional[Settings] = None, cache_dir: Optional[Path] = None):
+        """Initialize Flex AI Agent, keeping cached and persisted data in cache_dir."""
         self.settings = settings or get_settings()
         
         # Load Flex language specification
         self.flex_spec = self._load_flex_spec()
         
         # Initialize tools
-        self.model_manager = ModelManager(self.settings)
-        self.code_validator = FlexCodeValidator()
+        self.model_manager = ModelManager(self.settings, cache_dir=cache_dir)
+        self.code_validator = FlexCodeValidator(str(self.SPEC_PATH))
         self.flex_executor = FlexExecutor(self.settings)
-        self.file_manager = FileManager(self.settings)
+        
+        # Journaled sessions and the full-text index of past turns and saved programs
+        self.sessions_dir = self.model_manager.cache_dir / "sessions"
+        self.search_index: Optional[SearchIndex] = None
+        if self.settings.app.enable_search_index:
+            self.search_index = SearchIndex(self.model_manager.cache_dir / "search.db", journal_dir=self.sessions_dir)
+        self.file_manager = FileManager(self.settings, search_index=self.search_index)
+        # Reason: Flex files already on disk are indexed once, before the first search
+        self._files_backfilled = False
+        
+        # Reason: the index artifact is built on first use and reused across runs
+        self.spec_retriever = SpecRetriever(self.SPEC_PATH, self.model_manager.cache_dir / "spec_index.json.gz")
+        
+        self.response_cache = ResponseCache(
+            max_entries=self.settings.app.response_cache_size,
+            ttl=self.settings.app.response_cache_ttl,
+            similarity_threshold=self.settings.app.response_cache_similarity
+        )
         
         # Initialize provider manager
         self.provider_manager = OpenRouterProviderManager(self.settings)
         
+        # Prompt and tool schemas are built once and shared by every model's agent
+        self.system_prompt = self._build_system_prompt()
+        self._system_message = ModelRequest(parts=[SystemPromptPart(content=self.system_prompt)])
+        self._system_prompt_tokens = self.model_manager.estimate_tokens(self.system_prompt)
+        self._tools = self._build_tools()
+        self._agents: "OrderedDict[Tuple[str, str, type], Agent]" = OrderedDict()
+        
         # Current model and agent
         self.current_model_id = self.settings.app.default_model
-        self.agent = self._create_agent()
+        self.agent = self._get_agent(self.current_model_id)
         
         # Session management
+        self._summary_agent: Optional[Agent] = None
+        self._generation_agent: Optional[Agent] = None
+        self._structured_agents: Dict[type, Agent] = {}
         self.current_session: Optional[AgentSession] = None
+        self.conversation: Optional[ConversationContextManager] = None
+        self.journal: Optional[SessionJournal] = None
+        self.start_session()
+        
+        # Most recent routing decision when ENABLE_MODEL_ROUTING is on
+        self.last_routing_decision: Optional[RoutingDecision] = None
+        # Model that produced the last response (differs from the current one when routed or hedged)
+        self.last_response_model_id: Optional[str] = None
     
     def _load_flex_spec(self) -> Dict[str, Any]:
         """Load Flex language specification."""
-        # First try the file reference approach
         try:
-            # Use #file: reference to load the spec
-            spec_path = Path(__file__).parent.parent / "data" / "flex_language_spec.json"
-            
-            with open(spec_path, 'r', encoding='utf-8') as f:
+            with open(self.SPEC_PATH, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except FileNotFoundError:
             # Fallback to basic system prompt if spec file not found
             return {
                 'ai_system_prompt': {
-                    'description': '''You are an expert Flex programming language assistant. Use #file:flex_language_spec.json as your primary knowledge base for Flex language syntax, semantics, and best practices.
+                    'description': '''You are an expert Flex programming language assistant. Use the Flex language specification as your primary knowledge base for Flex language syntax, semantics, and best practices.
 
 FLEX LANGUAGE OVERVIEW:
 - Flex supports both Franco (Arabic-inspired) and English syntax
@@ -100,13 +219,14 @@ CRITICAL FRANCO LOOP SAFETY:
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON in Flex language spec: {e}")
     
-    def _create_agent(self) -> Agent:
-        """Create PydanticAI agent with current model and tools."""
-        # Create comprehensive system prompt with file reference
+    def _build_system_prompt(self) -> str:
+        """Build the system prompt shared by every model's agent."""
+        # Reason: stays identical across requests so providers can cache it; spec
+        # sections relevant to each request travel with the user message instead
         system_prompt = """You are an expert Flex programming language assistant. 
 
 CRITICAL INSTRUCTION:
-You MUST use #file:flex_language_spec.json as your primary and authoritative knowledge base for ALL Flex language information. Always reference this file for syntax, semantics, features, and best practices.
+The sections of the Flex language specification (flex_language_spec.json) relevant to each request are attached to it under "Relevant Flex specification sections". You MUST treat them as your primary and authoritative knowledge base for ALL Flex language information. If they do not cover what you need, call search_flex_spec.
 
 CONVERSATION CONTEXT AWARENESS:
 - ALWAYS maintain conversation context and remember previous requests in the same session
@@ -115,7 +235,7 @@ CONVERSATION CONTEXT AWARENESS:
 - Remember file creation requests, model preferences, and ongoing projects within the conversation
 
 KEY INSTRUCTIONS:
-- Always refer to #file:flex_language_spec.json for accurate Flex language information
+- Always ground Flex syntax, built-in functions and error fixes in the attached specification sections
 - Support both Franco (Arabic-inspired) and English syntax variations
 - Prioritize code safety, especially with Franco loops
 - Generate complete, working programs when requested
@@ -149,12 +269,15 @@ AVAILABLE TOOLS:
 - validate_flex_code: Check code for errors
 - read_file: Read content from existing files
 - read_file: Read and display content of existing files
+- search_flex_spec: Look up sections of the Flex language specification
+- search_past_work: Find Flex programs and answers from earlier sessions and saved files
 
 TOOL USAGE GUIDELINES:
 - CRITICAL: When user asks to RUN, EXECUTE, or TEST code, YOU MUST use the execute_flex_code tool
 - When user says "run it", "execute it", "try to run it", "test the code": call execute_flex_code immediately
 - When user mentions running existing files like "run xo_game.lx": first call read_file, then execute_flex_code
 - For simple code requests, provide code directly in your response without calling tools
+- When user refers to earlier work ("the quicksort from last week", "that game we made"): call search_past_work and reuse the code it finds instead of writing it again
 - Only use create_flex_program_file when user explicitly asks to CREATE or SAVE a file
 - Use tools when user says "create a file", "save it", "make a .lx file", etc.
 - For requests like "write me a game" or "show me code", respond directly with code
@@ -172,23 +295,55 @@ WHEN USER ASKS TO CREATE FILES:
 - Always provide the generated code content when creating files
 - Confirm successful file creation with file details"""
         
-        # Create agent with current model
-        agent = create_flex_agent(
-            model_id=self.current_model_id,
-            system_prompt=system_prompt,
+        return system_prompt
+    
+    def _get_agent(
+        self,
+        model_id: str,
+        provider_config: Optional[Dict[str, Any]] = None,
+        result_type: type = str
+    ) -> Agent:
+        """
+        Get the agent for a model, building it only on first use.
+        
+        Agents are kept in an LRU keyed by model ID, provider config and result
+        type; all of them share one system prompt string and the tool
+        functions and schemas built once in ``_build_tools``.
+        
+        Args:
+            model_id: OpenRouter model ID
+            provider_config: Optional provider configuration
+            result_type: Output type of the agent (plain text by default)
+            
+        Returns:
+            Agent for the model
+        """
+        key = (model_id, self.provider_manager._config_key(provider_config), result_type)
+        agent = self._agents.get(key)
+        if agent is not None:
+            self._agents.move_to_end(key)
+            return agent
+        
+        agent = self.provider_manager.create_agent(
+            model_id=model_id,
+            system_prompt=self.system_prompt,
             deps_type=AgentDependencies,
-            result_type=str  # Default to string responses
+            result_type=result_type,
+            provider_config=provider_config,
+            # Reason: a Tool tracks its retry count on itself, so each agent needs
+            # its own copies or retries of concurrent runs would count together
+            tools=[copy(tool) for tool in self._tools]
         )
         
-        # Register tools
-        self._register_tools(agent)
+        self._agents[key] = agent
+        if len(self._agents) > self.AGENT_CACHE_SIZE:
+            self._agents.popitem(last=False)
         
         return agent
     
-    def _register_tools(self, agent: Agent) -> None:
-        """Register all available tools with the agent."""
+    def _build_tools(self) -> List[Tool]:
+        """Build the agent tools once; cached agents get shallow copies of them."""
         
-        @agent.tool
         async def generate_flex_code(
             ctx: RunContext[AgentDependencies],
             request_prompt: str,
@@ -208,58 +363,19 @@ WHEN USER ASKS TO CREATE FILES:
             Returns:
                 Generated Flex code with explanation
             """
-            start_time = time.time()
-            
-            # Create request
-            request = FlexCodeRequest(
-                prompt=request_prompt,
-                syntax_style=FlexSyntaxStyle(syntax_style.lower()),
-                max_lines=max_lines,
-                include_comments=include_comments,
-                model_id=self.current_model_id
-            )
-            
-            # Detect syntax preference from prompt
-            detected_style = self._detect_syntax_preference(request_prompt, request.syntax_style)
-            
-            # Generate contextual prompt
-            generation_prompt = self._create_generation_prompt(request, detected_style)
-            
-            # Use the current agent to generate code
-            # Note: This is a simplified version - in practice, you'd use the model directly
-            generated_code = f"""// Generated Flex code for: {request_prompt}
-// Syntax style: {detected_style.value}
-// Model: {self.current_model_id}
-
-// TODO: Implement actual code generation logic here
-etb3("Hello from Flex AI Agent!")
-"""
-            
-            # Validate generated code
-            validation_result = await ctx.deps.code_validator.validate_code(generated_code)
-            
-            if not validation_result.is_valid:
-                # Try to fix Franco loop safety issues
-                if validation_result.has_franco_loop_safety_issues:
-                    generated_code = ctx.deps.code_validator.fix_franco_loop_safety(generated_code)
-                    validation_result = await ctx.deps.code_validator.validate_code(generated_code)
-            
-            generation_time = time.time() - start_time
-            
-            # Format response
-            response = f"Generated Flex Code ({detected_style.value} syntax):\n\n```flex\n{generated_code}\n```\n\n"
-            
-            if validation_result.warnings:
-                response += f"Warnings:\n" + "\n".join(f"- {w}" for w in validation_result.warnings) + "\n\n"
-            
-            if validation_result.suggestions:
-                response += f"Suggestions:\n" + "\n".join(f"- {s}" for s in validation_result.suggestions) + "\n\n"
-            
-            response += f"Generated in {generation_time:.2f}s using {self.current_model_id}"
+            try:
+                response = await self.generate_code(FlexCodeRequest(
+                    prompt=request_prompt,
+                    syntax_style=FlexSyntaxStyle(syntax_style.lower()),
+                    max_lines=max_lines,
+                    include_comments=include_comments,
+                    model_id=self.current_model_id
+                ))
+            except Exception as e:
+                return f"❌ Code generation failed: {e}"
             
-            return response
+            return self._format_code_response(response)
         
-        @agent.tool
         async def execute_flex_code(
             ctx: RunContext[AgentDependencies],
             code: str,
@@ -279,6 +395,9 @@ etb3("Hello from Flex AI Agent!")
             Returns:
                 Execution results
             """
+            if not ctx.deps.claim_side_effects():
+                return self.SIDE_EFFECT_SKIPPED
+            
             # Validate code first
             validation_result = await ctx.deps.code_validator.validate_code(code)
             
@@ -312,7 +431,6 @@ etb3("Hello from Flex AI Agent!")
             
             return response
         
-        @agent.tool
         async def validate_flex_code(
             ctx: RunContext[AgentDependencies],
             code: str,
@@ -367,7 +485,6 @@ etb3("Hello from Flex AI Agent!")
             
             return response
         
-        @agent.tool
         async def list_available_models(
             ctx: RunContext[AgentDependencies],
             search_term: Optional[str] = None,
@@ -420,7 +537,6 @@ etb3("Hello from Flex AI Agent!")
             
             return response
         
-        @agent.tool
         async def switch_model(
             ctx: RunContext[AgentDependencies],
             model_id: str
@@ -434,6 +550,9 @@ etb3("Hello from Flex AI Agent!")
             Returns:
                 Confirmation message
             """
+            if not ctx.deps.claim_side_effects():
+                return self.SIDE_EFFECT_SKIPPED
+            
             # Validate model exists
             model = await ctx.deps.model_manager.get_model_by_id(model_id)
             
@@ -454,7 +573,6 @@ etb3("Hello from Flex AI Agent!")
             
             return f"✅ Switched from {old_model} to {model_id}\n\nModel Info:\n- Name: {model.name}\n- Context: {model.context_length:,} tokens\n- Provider: {model.top_provider or 'Unknown'}"
         
-        @agent.tool
         async def get_flex_examples(
             ctx: RunContext[AgentDependencies],
             syntax_style: str = "both",
@@ -546,7 +664,70 @@ print("Hello, " + name + "!")
             
             return response
         
-        @agent.tool
+        async def search_flex_spec(
+            ctx: RunContext[AgentDependencies],
+            query: str
+        ) -> str:
+            """
+            Search the Flex language specification.
+            
+            Args:
+                query: What to look up (keywords, function names, error messages)
+                
+            Returns:
+                The most relevant specification sections
+            """
+            try:
+                context = self.spec_retriever.format_context(
+                    query,
+                    top_k=ctx.deps.settings.app.spec_retrieval_top_k,
+                    max_tokens=ctx.deps.settings.app.spec_retrieval_max_tokens
+                )
+            except SpecRetrieverError as e:
+                return f"❌ Flex specification unavailable: {str(e)}"
+            
+            return context or f"No specification sections match '{query}'."
+        
+        async def search_past_work(
+            ctx: RunContext[AgentDependencies],
+            query: str,
+            max_results: int = 3
+        ) -> str:
+            """
+            Search earlier sessions and saved Flex files.
+            
+            Args:
+                query: What to look for (e.g. 'quicksort franco')
+                max_results: Maximum number of results
+                
+            Returns:
+                Matching programs and answers with their content
+            """
+            if self.search_index is None:
+                return "Search over past work is disabled (ENABLE_SEARCH_INDEX=false)."
+            
+            def search() -> List[Tuple[Any, str]]:
+                hits = self.search_history(query, limit=max(1, min(max_results, 10)))
+                return [(hit, self.search_index.get_content(hit.kind, hit.source) or "") for hit in hits]
+            
+            # Reason: flushing waits on the journal's fsync and SQLite queries block
+            try:
+                found = await asyncio.to_thread(search)
+            except SearchIndexError as e:
+                return f"❌ Search unavailable: {str(e)}"
+            if not found:
+                return f"No earlier work matches '{query}'."
+            
+            results = []
+            for hit, content in found:
+                if len(content) > self.SEARCH_RESULT_MAX_CHARS:
+                    content = content[:self.SEARCH_RESULT_MAX_CHARS] + "\n... (truncated)"
+                if hit.kind == SearchIndex.KIND_FILE:
+                    results.append(f"File {hit.source}:\n```flex\n{content}\n```")
+                else:
+                    results.append(f"Earlier answer to \"{hit.title[:200]}\" (session {hit.source}):\n{content}")
+            return "\n\n".join(results)
+        
         async def create_file(
             ctx: RunContext[AgentDependencies],
             filename: str,
@@ -564,6 +745,9 @@ print("Hello, " + name + "!")
             Returns:
                 Result message indicating success or failure
             """
+            if not ctx.deps.claim_side_effects():
+                return self.SIDE_EFFECT_SKIPPED
+            
             from pathlib import Path
             from tools.file_manager import FileOperation
             
@@ -591,7 +775,6 @@ print("Hello, " + name + "!")
             except Exception as e:
                 return f"❌ Error creating file '{filename}': {str(e)}"
         
-        @agent.tool  
         async def create_flex_program_file(
             ctx: RunContext[AgentDependencies],
             filename: str,
@@ -611,8 +794,17 @@ print("Hello, " + name + "!")
             Returns:
                 Result message with file creation status and code preview
             """
+            if not ctx.deps.claim_side_effects():
+                return self.SIDE_EFFECT_SKIPPED
+            
             try:
-                # Generate the code first
+                from pathlib import Path
+                from tools.file_manager import FileOperation
+                
+                if Path(filename).exists():
+                    return f"❌ File '{filename}' already exists. Please choose a different filename or use the create_file tool with overwrite=True."
+                
+                # Reason: a direct model call, so this tool never re-enters the agent
                 generation_request = FlexCodeRequest(
                     prompt=program_description,
                     syntax_style=FlexSyntaxStyle(syntax_style.lower()),
@@ -621,51 +813,11 @@ print("Hello, " + name + "!")
                     model_id=self.current_model_id
                 )
                 
-                # Detect syntax preference
-                detected_style = self._detect_syntax_preference(program_description, generation_request.syntax_style)
-                
-                # Create generation prompt
-                generation_prompt = self._create_generation_prompt(generation_request, detected_style)
-                
-                # Generate code directly using a simple template approach instead of recursive agent call
-                # This prevents infinite recursion when agent calls this tool
-                
-                if "xo" in program_description.lower() or "tic" in program_description.lower():
-                    # XO/Tic-tac-toe game template
-                    if detected_style == FlexSyntaxStyle.FRANCO:
-                        code_content = self._generate_xo_game_franco()
-                    else:
-                        code_content = self._generate_xo_game_english()
-                elif "calculator" in program_description.lower():
-                    # Calculator template
-                    if detected_style == FlexSyntaxStyle.FRANCO:
-                        code_content = self._generate_calculator_franco()
-                    else:
-                        code_content = self._generate_calculator_english()
-                else:
-                    # Generic template
-                    code_content = f"""// Generated Flex program: {program_description}
-// This is a basic template - please customize as needed
-
-etb3("Welcome to your Flex program!")
-etb3("Program: {program_description}")
-
-// TODO: Implement your program logic here
-// Use Flex language features like:
-// - Variables: rakm num = 10
-// - Loops: karr i=0 l7d 9 {{ }}
-// - Input: klma input = yod()
-// - Conditions: lw condition {{ }}
-
-etb3("Program completed!")"""
+                generated = await self.generate_code(generation_request)
+                code_content = generated.code
+                detected_style = generated.syntax_style
                 
                 # Create the file using the file manager
-                from pathlib import Path
-                from tools.file_manager import FileOperation
-                
-                if Path(filename).exists():
-                    return f"❌ File '{filename}' already exists. Please choose a different filename or use the create_file tool with overwrite=True."
-                
                 write_op = FileOperation(
                     operation="write", 
                     filepath=filename,
@@ -684,7 +836,6 @@ etb3("Program completed!")"""
             except Exception as e:
                 return f"❌ Error creating Flex program file '{filename}': {str(e)}"
     
-        @agent.tool
         async def read_file(
             ctx: RunContext[AgentDependencies],
             filename: str
@@ -721,7 +872,25 @@ etb3("Program completed!")"""
                 
             except Exception as e:
                 return f"❌ Error reading file '{filename}': {str(e)}"
-
+        
+        # Reason: an explicit max_retries stops Agent from copying each tool
+        return [
+            Tool(tool_function, takes_ctx=True, max_retries=1)
+            for tool_function in (
+                generate_flex_code,
+                execute_flex_code,
+                validate_flex_code,
+                list_available_models,
+                switch_model,
+                get_flex_examples,
+                search_flex_spec,
+                search_past_work,
+                create_file,
+                create_flex_program_file,
+                read_file
+            )
+        ]
+    
     def _detect_syntax_preference(self, prompt: str, requested_style: FlexSyntaxStyle) -> FlexSyntaxStyle:
         """Detect user's syntax preference from their prompt."""
         if requested_style != FlexSyntaxStyle.AUTO:
@@ -759,28 +928,158 @@ etb3("Program completed!")"""
         
         return prompt
     
-    def _format_conversation_context(self, conversation_history: List[Dict[str, Any]]) -> str:
-        """Format conversation history for context."""
-        if not conversation_history:
+    def _format_conversation_context(
+        self,
+        conversation_history: List[Dict[str, Any]],
+        token_budget: Optional[int] = None,
+        summary: str = ""
+    ) -> str:
+        """
+        Format conversation history for context within a token budget.
+        
+        The summary of earlier turns comes first (using at most half of the
+        budget); then the newest entries are kept whole while they fit, the
+        entry that crosses the budget is truncated and older ones are dropped.
+        
+        Args:
+            conversation_history: Conversation entries, oldest first
+            token_budget: Maximum tokens for the context (defaults to MAX_HISTORY_TOKENS)
+            summary: Rolling summary of turns no longer in the history
+            
+        Returns:
+            Formatted context, or an empty string if nothing fits
+        """
+        if not conversation_history and not summary:
             return ""
         
-        # Get last 5 conversation turns to avoid token limit issues
-        recent_history = conversation_history[-10:]  # Last 10 entries (5 user + 5 assistant)
+        if token_budget is None:
+            token_budget = self.settings.app.max_history_tokens
         
-        context_parts = ["Previous conversation context:"]
+        token_counter = get_token_counter()
+        header = "Previous conversation context:"
+        if summary:
+            summary = token_counter.truncate(summary, token_budget // 2)
+        if summary:
+            header += f"\nSummary of earlier conversation:\n{summary}"
         
-        for entry in recent_history:
+        lines = []
+        for entry in conversation_history:
             entry_type = entry.get('type', 'unknown')
             content = entry.get('content', '')
             
             if entry_type == 'user':
-                context_parts.append(f"User: {content}")
+                lines.append(f"User: {content}")
             elif entry_type == 'assistant':
-                # Truncate assistant responses to avoid too much context
-                truncated_content = content[:300] + "..." if len(content) > 300 else content
-                context_parts.append(f"Assistant: {truncated_content}")
+                lines.append(f"Assistant: {content}")
         
-        return "\n".join(context_parts)
+        # Reason: one batched count; entries seen on earlier turns are cache hits
+        line_tokens = token_counter.count_batch(lines)
+        remaining = token_budget - token_counter.count(header)
+        if summary:
+            remaining -= token_counter.count("Recent messages:") + 1
+        
+        packed = []
+        for line, tokens in zip(reversed(lines), reversed(line_tokens)):
+            # Reason: +1 for the newline joining entries
+            if tokens + 1 <= remaining:
+                packed.append(line)
+                remaining -= tokens + 1
+                continue
+            if remaining > self.MIN_PARTIAL_ENTRY_TOKENS:
+                packed.append(token_counter.truncate(line, remaining - 2) + "...")
+            break
+        
+        if not packed and not summary:
+            return ""
+        
+        if packed and summary:
+            packed.append("Recent messages:")
+        packed.append(header)
+        return "\n".join(reversed(packed))
+    
+    def history_token_budget(self, model_id: Optional[str] = None, user_input: str = "") -> int:
+        """
+        Tokens available for conversation history on a model.
+        
+        Args:
+            model_id: Model that will serve the request (defaults to the current model)
+            user_input: Current user input
+            
+        Returns:
+            Budget capped by MAX_HISTORY_TOKENS and by what is left of the
+            model's context window after the system prompt, the input and a
+            reserve for tool schemas and the completion
+        """
+        model = self.model_manager.get_cached_model(model_id or self.current_model_id)
+        context_length = model.context_length if model and model.context_length else self.DEFAULT_CONTEXT_LENGTH
+        
+        available = (
+            context_length
+            - self._system_prompt_tokens
+            - self.model_manager.estimate_tokens(user_input)
+            - self.RESERVED_CONTEXT_TOKENS
+        )
+        return max(0, min(available, self.settings.app.max_history_tokens))
+    
+    def _retrieve_spec_context(self, user_input: str) -> str:
+        """
+        Retrieve the spec sections relevant to a request.
+        
+        Args:
+            user_input: Current user input
+            
+        Returns:
+            Formatted spec sections, or an empty string if retrieval is off or fails
+        """
+        if not self.settings.app.enable_spec_retrieval:
+            return ""
+        
+        try:
+            return self.spec_retriever.format_context(
+                user_input,
+                top_k=self.settings.app.spec_retrieval_top_k,
+                max_tokens=self.settings.app.spec_retrieval_max_tokens
+            )
+        except SpecRetrieverError as e:
+            print(f"Warning: Spec retrieval failed: {e}")
+            return ""
+    
+    def _build_user_prompt(
+        self,
+        model_id: str,
+        user_input: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        conversation_summary: str = ""
+    ) -> str:
+        """
+        Build the user message with spec sections and conversation context.
+        
+        Args:
+            model_id: Model that will serve the request
+            user_input: Current user input
+            conversation_history: Conversation entries, oldest first
+            conversation_summary: Rolling summary of earlier turns
+            
+        Returns:
+            User message to send to the agent
+        """
+        spec_context = self._retrieve_spec_context(user_input)
+        
+        # Create conversation context if provided
+        conversation_context = ""
+        if conversation_history or conversation_summary:
+            conversation_context = self._format_conversation_context(
+                conversation_history or [],
+                token_budget=self.history_token_budget(model_id, f"{spec_context}\n\n{user_input}"),
+                summary=conversation_summary
+            )
+        
+        if not spec_context and not conversation_context:
+            return user_input
+        
+        parts = [part for part in (spec_context, conversation_context) if part]
+        parts.append(f"Current user input: {user_input}")
+        return "\n\n".join(parts)
     
     async def switch_model(self, model_id: str) -> None:
         """Switch to a different OpenRouter model."""
@@ -791,19 +1090,41 @@ etb3("Program completed!")"""
         # Update current model
         self.current_model_id = model_id
         
-        # Recreate agent with new model
-        self.agent = self._create_agent()
+        # Reason: previously used models come straight from the agent cache
+        self.agent = self._get_agent(model_id)
     
-    async def run(self, user_input: str, conversation_history: Optional[List[Dict[str, Any]]] = None, **kwargs) -> str:
-        """Run the agent with user input and conversation context."""
-        # Create conversation context if provided
-        conversation_context = ""
-        if conversation_history:
-            conversation_context = self._format_conversation_context(conversation_history)
-            # Prepend context to user input
-            user_input_with_context = f"{conversation_context}\n\nCurrent user input: {user_input}"
-        else:
-            user_input_with_context = user_input
+    async def run(
+        self,
+        user_input: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        conversation_summary: str = "",
+        **kwargs
+    ) -> str:
+        """
+        Run the agent with user input and conversation context.
+        
+        Without an explicit ``conversation_history``, the current session's
+        earlier messages are sent as native message history and the turn is
+        recorded in the session afterwards. An explicit history (even an empty
+        list) is flattened into the prompt instead and leaves the session alone.
+        """
+        model_id, model = await self._select_model(user_input)
+        use_session = conversation_history is None and self.current_session is not None
+        if use_session:
+            conversation_summary = conversation_summary or self.conversation.summary
+        
+        context_hash = self._cache_context_hash(self.conversation.entries if use_session else conversation_history)
+        cached = self._get_cached_response(user_input, model_id, context_hash)
+        if cached is not None:
+            self.last_response_model_id = model_id
+            if use_session:
+                self._record_turn(model_id, user_input, cached, user_input, self._cached_turn_messages(user_input, cached))
+            return cached
+        
+        user_input_with_context = self._build_user_prompt(
+            model_id, user_input, None if use_session else conversation_history, conversation_summary
+        )
+        message_history = self._session_message_history() if use_session else None
         
         deps = AgentDependencies(
             settings=self.settings,
@@ -814,19 +1135,66 @@ etb3("Program completed!")"""
             session=self.current_session
         )
         
-        result = await self.agent.run(user_input_with_context, deps=deps)
+        start_time = time.perf_counter()
+        try:
+            result = await self.agent.run(
+                user_input_with_context, deps=deps, model=model, message_history=message_history
+            )
+        except Exception:
+            self._record_call(model_id, False, start_time)
+            raise
+        
+        self._record_call(model_id, True, start_time, usage=result.usage())
+        self.last_response_model_id = model_id
+        new_messages = result.new_messages()
+        self._cache_response(user_input, model_id, context_hash, result.data, new_messages)
+        if use_session:
+            self._record_turn(model_id, user_input, result.data, user_input_with_context, new_messages)
         return result.data
     
-    async def run_stream(self, user_input: str, conversation_history: Optional[List[Dict[str, Any]]] = None, **kwargs):
-        """Run the agent with streaming response and conversation context."""
-        # Create conversation context if provided
-        conversation_context = ""
-        if conversation_history:
-            conversation_context = self._format_conversation_context(conversation_history)
-            # Prepend context to user input
-            user_input_with_context = f"{conversation_context}\n\nCurrent user input: {user_input}"
-        else:
-            user_input_with_context = user_input
+    async def run_stream(
+        self,
+        user_input: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        conversation_summary: str = "",
+        delta: bool = False,
+        **kwargs
+    ):
+        """
+        Run the agent with streaming response and conversation context.
+        
+        Session handling is the same as in ``run``.
+        
+        Args:
+            user_input: User prompt
+            conversation_history: Explicit history, or None to use the session
+            conversation_summary: Summary of older turns
+            delta: Yield only the new text of each chunk instead of the
+                cumulative response, so consumers can render incrementally
+        
+        Yields:
+            Response text chunks
+        """
+        model_id, model = await self._select_model(user_input)
+        use_session = conversation_history is None and self.current_session is not None
+        if use_session:
+            conversation_summary = conversation_summary or self.conversation.summary
+        
+        context_hash = self._cache_context_hash(self.conversation.entries if use_session else conversation_history)
+        cached = self._get_cached_response(user_input, model_id, context_hash)
+        if cached is not None:
+            self.last_response_model_id = model_id
+            # Reason: cache hits replay in the same chunk format as live streams
+            for chunk in self.response_cache.replay(cached, delta=delta):
+                yield chunk
+            if use_session:
+                self._record_turn(model_id, user_input, cached, user_input, self._cached_turn_messages(user_input, cached))
+            return
+        
+        user_input_with_context = self._build_user_prompt(
+            model_id, user_input, None if use_session else conversation_history, conversation_summary
+        )
+        message_history = self._session_message_history() if use_session else None
         
         deps = AgentDependencies(
             settings=self.settings,
@@ -837,295 +1205,928 @@ etb3("Program completed!")"""
             session=self.current_session
         )
         
-        async with self.agent.run_stream(user_input_with_context, deps=deps) as result:
-            # Access the streamed response through the result's stream attribute
-            async for chunk in result.stream():
+        response_text = ""
+        # Reason: deltas are joined once at the end, so the total work stays linear
+        deltas: List[str] = []
+        chain = self._hedge_chain(model_id, model)
+        # Reason: set before the first chunk so a live renderer can show the model
+        self.last_response_model_id = model_id
+        if len(chain) > 1:
+            outcome: Dict[str, Any] = {}
+            async for chunk in self._stream_hedged(chain, user_input_with_context, deps, message_history, outcome, delta):
+                if delta:
+                    deltas.append(chunk)
+                else:
+                    response_text = chunk
                 yield chunk
+            served_model_id, new_messages = outcome['model_id'], outcome['messages']
+        else:
+            start_time = time.perf_counter()
+            first_token_time: Optional[float] = None
+            try:
+                async with self.agent.run_stream(
+                    user_input_with_context, deps=deps, model=model, message_history=message_history
+                ) as result:
+                    async for chunk in self._stream_result(result, delta):
+                        if first_token_time is None:
+                            first_token_time = time.perf_counter()
+                        if delta:
+                            deltas.append(chunk)
+                        else:
+                            response_text = chunk
+                        yield chunk
+                    usage = result.usage()
+                    new_messages = result.new_messages()
+            except BaseException:
+                # Reason: cancellation and early close count as failed calls too
+                self._record_call(model_id, False, start_time, first_token_time=first_token_time)
+                raise
+            
+            self._record_call(model_id, True, start_time, usage=usage, first_token_time=first_token_time)
+            served_model_id = model_id
+        
+        if delta:
+            response_text = "".join(deltas)
+        self.last_response_model_id = served_model_id
+        # Reason: cached under the requested model, which is what the next lookup uses
+        self._cache_response(user_input, model_id, context_hash, str(response_text), new_messages)
+        if use_session:
+            self._record_turn(served_model_id, user_input, str(response_text), user_input_with_context, new_messages)
     
-    def get_agent_info(self) -> Dict[str, Any]:
-        """Get information about the current agent state."""
-        return {
-            "current_model": self.current_model_id,
-            "flex_spec_loaded": bool(self.flex_spec),
-            "tools_registered": True,
-            "session_active": self.current_session is not None,
-            "settings": {
-                "max_code_length": self.settings.app.max_code_length,
-                "execution_timeout": self.settings.app.execution_timeout,
-                "model_cache_duration": self.settings.app.model_cache_duration
-            }
-        }
+    @staticmethod
+    def _stream_result(result: Any, delta: bool):
+        """
+        Stream text from a streamed run result.
+        
+        Args:
+            result: PydanticAI streamed run result
+            delta: Yield new text only instead of the cumulative text
+        """
+        if delta:
+            # Reason: deltas are cheap to consume, so pass tokens on without debouncing
+            return result.stream_text(delta=True, debounce_by=None)
+        return result.stream()
     
-    def _generate_xo_game_franco(self) -> str:
-        """Generate XO game in Franco syntax."""
-        return """// XO Tic-Tac-Toe Game in Franco Syntax
-// By Flex AI Agent
-
-etb3("Ahlan wa Sahlan! Welcome to XO Game!")
-
-// Initialize 3x3 board
-dorg board = [
-    [" ", " ", " "],
-    [" ", " ", " "],
-    [" ", " ", " "]
-]
-
-klma current_player = "X"
-so2al game_over = ghlata
-
-// Function to display board
-sndo2 show_board() {
-    etb3("  0   1   2")
-    karr i=0 l7d 2 {
-        etb3(i + " " + board[i][0] + " | " + board[i][1] + " | " + board[i][2])
-        lw i < 2 {
-            etb3("  --|---|--")
-        }
-    }
-}
-
-// Function to check winner
-sndo2 check_winner() {
-    // Check rows
-    karr i=0 l7d 2 {
-        lw board[i][0] == board[i][1] && board[i][1] == board[i][2] && board[i][0] != " " {
-            rg3 board[i][0]
-        }
-    }
+    def _hedge_chain(self, model_id: str, model: Optional[Model]) -> List[Tuple[str, Optional[Model]]]:
+        """
+        Models a streamed request may run on, in the order they are tried.
+        
+        Args:
+            model_id: Model selected for the request
+            model: Per-run model override for it (None for the current model)
+            
+        Returns:
+            (model ID, model override) pairs, the selected model first
+        """
+        fallbacks = self.settings.app.fallback_models
+        if not fallbacks:
+            return [(model_id, model)]
+        return [(model_id, model)] + self.provider_manager.create_fallback_chain(model_id, fallbacks)[1:]
     
-    // Check columns  
-    karr j=0 l7d 2 {
-        lw board[0][j] == board[1][j] && board[1][j] == board[2][j] && board[0][j] != " " {
-            rg3 board[0][j]
-        }
-    }
+    async def _stream_hedged(
+        self,
+        chain: List[Tuple[str, Optional[Model]]],
+        user_prompt: str,
+        deps: AgentDependencies,
+        message_history: Optional[List[ModelMessage]],
+        outcome: Dict[str, Any],
+        delta: bool = False
+    ):
+        """
+        Stream a request with hedging across a fallback chain.
+        
+        The request starts on the first model. If no first token arrives within
+        that model's p95 time to first token (or it fails), the same request is
+        also started on the next model in the chain. The first stream to produce
+        a token wins and the others are cancelled. A stream that calls a tool
+        with side effects wins at that point, before the tool runs, so files are
+        written and programs run by one model only.
+        
+        Args:
+            chain: (model ID, model override) pairs from ``_hedge_chain``
+            user_prompt: Prompt sent to the model
+            deps: Tool dependencies
+            message_history: Native message history, if any
+            outcome: Filled with the winning 'model_id' and its new 'messages'
+            delta: Yield new text only instead of the cumulative text
+            
+        Yields:
+            Response text of the winning stream
+        """
+        default_delay = self.settings.app.hedge_default_delay
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks: List[asyncio.Task] = []
+        start_times: List[float] = []
+        failed: set = set()
+        winner: Optional[int] = None
+        first_token_time: Optional[float] = None
+        getter: Optional[asyncio.Future] = None
+        
+        def choose(index: int) -> None:
+            nonlocal winner
+            winner = index
+            self.last_response_model_id = chain[index][0]
+            for other in tasks:
+                if other is not tasks[index]:
+                    other.cancel()
+            if len(tasks) > 1:
+                self.model_manager.record_hedge(chain[index][0], [chain[i][0] for i in range(len(tasks))])
+        
+        def claim(index: int) -> bool:
+            if winner is None:
+                choose(index)
+            return winner == index
+        
+        async def attempt(index: int, model: Optional[Model]) -> None:
+            attempt_deps = deps.model_copy(update={'side_effect_claim': lambda: claim(index)})
+            try:
+                async with self.agent.run_stream(
+                    user_prompt, deps=attempt_deps, model=model, message_history=message_history
+                ) as result:
+                    async for chunk in self._stream_result(result, delta):
+                        await queue.put((index, "chunk", chunk))
+                    await queue.put((index, "done", (result.usage(), result.new_messages())))
+            except Exception as e:
+                await queue.put((index, "error", e))
+        
+        def launch() -> None:
+            index = len(tasks)
+            start_times.append(time.perf_counter())
+            tasks.append(asyncio.create_task(attempt(index, chain[index][1])))
+        
+        launch()
+        try:
+            while True:
+                timeout = None
+                if winner is None and len(tasks) < len(chain):
+                    deadline = start_times[-1] + self.model_manager.get_hedge_delay(chain[len(tasks) - 1][0], default_delay)
+                    timeout = max(0.0, deadline - time.perf_counter())
+                
+                if getter is None:
+                    getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter}, timeout=timeout)
+                if not done:
+                    # Reason: a tool call may have claimed the request while waiting
+                    if winner is None:
+                        launch()
+                    continue
+                index, kind, payload = getter.result()
+                getter = None
+                
+                # Reason: cancelled losers may still have queued items
+                if winner is not None and index != winner:
+                    continue
+                
+                model_id = chain[index][0]
+                if kind == "error":
+                    self._record_call(model_id, False, start_times[index], first_token_time=first_token_time)
+                    failed.add(index)
+                    if winner is not None or (len(tasks) == len(chain) and len(failed) == len(tasks)):
+                        raise payload
+                    if len(failed) == len(tasks):
+                        # Reason: nothing is left racing, so the next model starts at once
+                        launch()
+                    continue
+                
+                if winner is None:
+                    choose(index)
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                
+                if kind == "chunk":
+                    yield payload
+                else:
+                    usage, new_messages = payload
+                    self._record_call(model_id, True, start_times[index], usage=usage, first_token_time=first_token_time)
+                    outcome.update(model_id=model_id, messages=new_messages)
+                    return
+        finally:
+            if getter is not None:
+                getter.cancel()
+            for task in tasks:
+                task.cancel()
+            if not outcome:
+                # Reason: cancellation and early close count as failed calls too
+                for index in range(len(tasks)):
+                    if index not in failed and (winner is None or index == winner):
+                        self._record_call(chain[index][0], False, start_times[index], first_token_time=first_token_time)
+            await asyncio.gather(*tasks, return_exceptions=True)
     
-    // Check diagonals
-    lw board[0][0] == board[1][1] && board[1][1] == board[2][2] && board[0][0] != " " {
-        rg3 board[0][0]
-    }
-    lw board[0][2] == board[1][1] && board[1][1] == board[2][0] && board[0][2] != " " {
-        rg3 board[0][2]
-    }
+    async def generate_code(self, request: FlexCodeRequest) -> FlexCodeResponse:
+        """
+        Generate Flex code with a direct structured model call and repair it.
+        
+        The model returns the program as structured output, which is then
+        validated. Franco loop safety issues are fixed locally first; remaining
+        errors go back to the model for up to CODE_REPAIR_ROUNDS rounds, each
+        sending only the failing lines and their errors and applying the line
+        edits that come back.
+        
+        Args:
+            request: Generation request (``model_id`` defaults to the current model)
+            
+        Returns:
+            Generated code with its explanation, warnings and validity
+        """
+        model_id = request.model_id or self.current_model_id
+        style = self._detect_syntax_preference(request.prompt, request.syntax_style)
+        prompt = self._create_generation_prompt(request, style)
+        spec_context = self._retrieve_spec_context(request.prompt)
+        if spec_context:
+            prompt = f"{spec_context}\n\n{prompt}"
+        
+        start_time = time.perf_counter()
+        draft, tokens_used = await self._run_structured_call(GeneratedFlexCode, prompt, model_id)
+        code = draft.code
+        validation = await self.code_validator.validate_code(code)
+        
+        if not validation.is_valid and validation.has_franco_loop_safety_issues:
+            code = self.code_validator.fix_franco_loop_safety(code)
+            validation = await self.code_validator.validate_code(code)
+        
+        rounds = 0
+        while not validation.is_valid and rounds < self.settings.app.code_repair_rounds:
+            rounds += 1
+            patch, patch_tokens = await self._run_structured_call(
+                FlexCodePatch, self._create_repair_prompt(code, validation.errors), model_id
+            )
+            tokens_used += patch_tokens
+            if not patch.edits:
+                break
+            code = self._apply_line_edits(code, patch.edits)
+            validation = await self.code_validator.validate_code(code)
+        
+        warnings = list(validation.warnings)
+        warnings.extend(f"Line {error.line_number}: {error.message}" for error in validation.errors)
+        
+        return FlexCodeResponse(
+            code=code,
+            syntax_style=validation.syntax_style,
+            explanation=draft.explanation,
+            filename=draft.filename,
+            model_used=model_id,
+            generation_time=time.perf_counter() - start_time,
+            warnings=warnings,
+            is_valid=validation.is_valid,
+            repair_rounds=rounds,
+            tokens_used=tokens_used
+        )
     
-    rg3 ""
-}
-
-// Main game loop
-9ad !game_over {
-    show_board()
-    etb3("Player " + current_player + ", enter row (0-2):")
-    rakm row = yod()
-    etb3("Enter column (0-2):")  
-    rakm col = yod()
+    async def _run_structured_call(self, result_type: type, prompt: str, model_id: str) -> Tuple[Any, int]:
+        """
+        Run one tool-less model call with structured output.
+        
+        Args:
+            result_type: Pydantic model the output must match
+            prompt: Prompt for the call
+            model_id: Model serving the call
+            
+        Returns:
+            The validated output and the tokens the call used
+        """
+        agent = self._structured_agents.get(result_type)
+        if agent is None:
+            agent = self._structured_agents[result_type] = self.provider_manager.create_agent(
+                model_id, self.GENERATION_SYSTEM_PROMPT, result_type=result_type
+            )
+        await self.model_manager.load_metrics()
+        
+        start_time = time.perf_counter()
+        try:
+            result = await agent.run(prompt, model=self.provider_manager.create_model(model_id))
+        except Exception:
+            self._record_call(model_id, False, start_time)
+            raise
+        
+        usage = result.usage()
+        self._record_call(model_id, True, start_time, usage=usage)
+        return result.data, usage.total_tokens or 0
     
-    lw row >= 0 && row <= 2 && col >= 0 && col <= 2 && board[row][col] == " " {
-        board[row][col] = current_player
-        
-        klma winner = check_winner()
-        lw winner != "" {
-            show_board()
-            etb3("Player " + winner + " wins! Mabrook!")
-            game_over = sa7
-        } gher {
-            // Switch player
-            lw current_player == "X" {
-                current_player = "O"
-            } gher {
-                current_player = "X"
-            }
-        }
-    } gher {
-        etb3("Invalid move! Try again.")
-    }
-}
-
-etb3("Game finished! Shukran for playing!")"""
-
-    def _generate_xo_game_english(self) -> str:
-        """Generate XO game in English syntax."""
-        return """// XO Tic-Tac-Toe Game in English Syntax  
-// By Flex AI Agent
-
-print("Welcome to XO Game!")
-
-// Initialize 3x3 board
-list board = [
-    [" ", " ", " "],
-    [" ", " ", " "],
-    [" ", " ", " "]
-]
-
-string current_player = "X"
-bool game_over = false
-
-// Function to display board
-function show_board() {
-    print("  0   1   2")
-    for i=0 to 2 {
-        print(i + " " + board[i][0] + " | " + board[i][1] + " | " + board[i][2])
-        if i < 2 {
-            print("  --|---|--")
-        }
-    }
-}
-
-// Function to check winner
-function check_winner() {
-    // Check rows
-    for i=0 to 2 {
-        if board[i][0] == board[i][1] && board[i][1] == board[i][2] && board[i][0] != " " {
-            return board[i][0]
-        }
-    }
+    def _create_repair_prompt(self, code: str, errors: List[Any]) -> str:
+        """Describe validation errors with only the lines around them."""
+        lines = code.splitlines()
+        error_lines = sorted({error.line_number for error in errors if error.line_number})
+        
+        shown = set()
+        for line_number in error_lines:
+            shown.update(range(
+                max(1, line_number - self.REPAIR_CONTEXT_LINES),
+                min(len(lines), line_number + self.REPAIR_CONTEXT_LINES) + 1
+            ))
+        # Reason: errors without a line number can only be fixed with the whole program
+        if any(not error.line_number for error in errors):
+            shown = set(range(1, len(lines) + 1))
+        
+        prompt = "This Flex program fails validation.\n\nErrors:\n"
+        for error in errors:
+            location = f"Line {error.line_number}" if error.line_number else "Program"
+            prompt += f"- {location}: {error.message} (fix: {error.suggestion})\n"
+        
+        prompt += "\nRelevant lines:\n"
+        previous = 0
+        for line_number in sorted(shown):
+            if previous and line_number > previous + 1:
+                prompt += "...\n"
+            prompt += f"{line_number}: {lines[line_number - 1]}\n"
+            previous = line_number
+        
+        prompt += "\nReturn edits for only the lines that must change, keeping their indentation."
+        return prompt
     
-    // Check columns
-    for j=0 to 2 {
-        if board[0][j] == board[1][j] && board[1][j] == board[2][j] && board[0][j] != " " {
-            return board[0][j]
-        }
-    }
+    @staticmethod
+    def _apply_line_edits(code: str, edits: List[LineEdit]) -> str:
+        """Apply line replacements; later edits to the same line win."""
+        lines = code.splitlines()
+        replacements = {edit.line_number: edit.replacement for edit in edits if edit.line_number <= len(lines)}
+        # Reason: bottom-up, so multi-line replacements do not shift pending edits
+        for line_number in sorted(replacements, reverse=True):
+            replacement = replacements[line_number]
+            lines[line_number - 1:line_number] = replacement.split("\n") if replacement else []
+        return "\n".join(lines)
     
-    // Check diagonals
-    if board[0][0] == board[1][1] && board[1][1] == board[2][2] && board[0][0] != " " {
-        return board[0][0]
-    }
-    if board[0][2] == board[1][1] && board[1][1] == board[2][0] && board[0][2] != " " {
-        return board[0][2]
-    }
+    @staticmethod
+    def _format_code_response(response: FlexCodeResponse) -> str:
+        """Format generated code for the conversation."""
+        text = f"Generated Flex Code ({response.syntax_style.value} syntax):\n\n```flex\n{response.code}\n```\n\n"
+        
+        if response.explanation:
+            text += f"{response.explanation}\n\n"
+        
+        if response.warnings:
+            text += "Warnings:\n" + "\n".join(f"- {w}" for w in response.warnings) + "\n\n"
+        
+        if not response.is_valid:
+            text += "⚠️ The code still has validation errors (listed above).\n\n"
+        
+        repairs = f" after {response.repair_rounds} repair round(s)" if response.repair_rounds else ""
+        text += f"Generated in {response.generation_time:.2f}s using {response.model_used}{repairs}"
+        return text
     
-    return ""
-}
-
-// Main game loop
-while !game_over {
-    show_board()
-    print("Player " + current_player + ", enter row (0-2):")
-    int row = input()
-    print("Enter column (0-2):")
-    int col = input()
+    async def run_structured(self, user_input: str, syntax_style: str = "auto") -> FlexCodeResponse:
+        """
+        Run the agent with structured output and build a ``FlexCodeResponse``.
+        
+        The model answers with typed code, explanation and warnings instead of
+        free text, so callers never parse fenced blocks. Its output schema holds
+        only the fields the model writes; the model used, timing and validity
+        are filled in here. The returned code is checked with the validator,
+        whose findings replace the model's own claims. Runs outside the
+        conversation session.
+        
+        Args:
+            user_input: What the code should do
+            syntax_style: Preferred syntax style (franco/english/auto)
+            
+        Returns:
+            Structured code response
+        """
+        model_id, model = await self._select_model(user_input)
+        agent = self._get_agent(model_id, result_type=StructuredFlexCode)
+        
+        style = self._detect_syntax_preference(user_input, FlexSyntaxStyle(syntax_style.lower()))
+        prompt = self._build_user_prompt(model_id, user_input)
+        if style != FlexSyntaxStyle.AUTO:
+            prompt += f"\n\nUse {style.value} syntax."
+        
+        deps = AgentDependencies(
+            settings=self.settings,
+            model_manager=self.model_manager,
+            code_validator=self.code_validator,
+            flex_executor=self.flex_executor,
+            file_manager=self.file_manager,
+            session=self.current_session
+        )
+        
+        start_time = time.perf_counter()
+        try:
+            result = await agent.run(prompt, deps=deps, model=model)
+        except Exception:
+            self._record_call(model_id, False, start_time)
+            raise
+        
+        usage = result.usage()
+        self._record_call(model_id, True, start_time, usage=usage)
+        self.last_response_model_id = model_id
+        
+        answer = result.data
+        validation = await self.code_validator.validate_code(answer.code)
+        warnings = list(dict.fromkeys([*answer.warnings, *validation.warnings]))
+        warnings.extend(f"Line {error.line_number}: {error.message}" for error in validation.errors)
+        return FlexCodeResponse(
+            code=answer.code,
+            syntax_style=validation.syntax_style,
+            explanation=answer.explanation,
+            filename=answer.filename,
+            model_used=model_id,
+            generation_time=time.perf_counter() - start_time,
+            warnings=warnings,
+            is_valid=validation.is_valid,
+            tokens_used=usage.total_tokens or 0
+        )
     
-    if row >= 0 && row <= 2 && col >= 0 && col <= 2 && board[row][col] == " " {
-        board[row][col] = current_player
-        
-        string winner = check_winner()
-        if winner != "" {
-            show_board()
-            print("Player " + winner + " wins! Congratulations!")
-            game_over = true
-        } else {
-            // Switch player
-            if current_player == "X" {
-                current_player = "O"
-            } else {
-                current_player = "X"
-            }
-        }
-    } else {
-        print("Invalid move! Try again.")
-    }
-}
-
-print("Game finished! Thanks for playing!")"""
-
-    def _generate_calculator_franco(self) -> str:
-        """Generate calculator in Franco syntax."""
-        return """// Calculator in Franco Syntax
-// By Flex AI Agent
-
-etb3("Ahlan! Calculator Program")
-
-9ad sa7 {
-    kasr num1, num2, result
-    klma operation
-    so2al valid = sa7
+    async def run_fan_out(
+        self,
+        prompt: str,
+        model_ids: Optional[List[str]] = None,
+        syntax_style: str = "auto",
+        execute: bool = False,
+        timeout: Optional[float] = None
+    ) -> FanOutResult:
+        """
+        Generate code on several models in parallel and keep the best candidate.
+        
+        Every model gets the same generation prompt under its own timeout. Each
+        answer is validated (and executed, if requested) as soon as it arrives,
+        while the other models are still generating, and the first candidate
+        that passes cancels the rest. Without a passing candidate, the one with
+        the fewest validation errors wins, then the fastest.
+        
+        Args:
+            prompt: What the code should do
+            model_ids: Models to query (default: FAN_OUT_MODELS, or the current
+                model plus FALLBACK_MODELS)
+            syntax_style: Preferred syntax style (franco/english/auto)
+            execute: Whether candidates must also execute successfully
+            timeout: Seconds each model gets (default: FAN_OUT_TIMEOUT)
+            
+        Returns:
+            Every candidate with its latency and cost, and the selected one
+        """
+        app_settings = self.settings.app
+        model_ids = list(dict.fromkeys(
+            model_ids or app_settings.fan_out_models or [self.current_model_id, *app_settings.fallback_models]
+        ))
+        timeout = timeout or app_settings.fan_out_timeout
+        
+        request = FlexCodeRequest(prompt=prompt, syntax_style=FlexSyntaxStyle(syntax_style.lower()))
+        generation_prompt = self._create_generation_prompt(
+            request, self._detect_syntax_preference(prompt, request.syntax_style)
+        )
+        generation_prompt += " Reply with one ```flex code block holding the complete program, then a short explanation."
+        spec_context = self._retrieve_spec_context(prompt)
+        if spec_context:
+            generation_prompt = f"{spec_context}\n\n{generation_prompt}"
+        
+        if self._generation_agent is None:
+            self._generation_agent = self.provider_manager.create_agent(model_ids[0], self.GENERATION_SYSTEM_PROMPT)
+        await self.model_manager.load_metrics()
+        
+        start_times: Dict[str, float] = {}
+        tasks: List[asyncio.Task] = []
+        winner: List[str] = []
+        
+        async def generate(model_id: str) -> FanOutCandidate:
+            start_times[model_id] = start_time = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    self._generation_agent.run(generation_prompt, model=self.provider_manager.create_model(model_id)),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                self._record_call(model_id, False, start_time)
+                return FanOutCandidate(model_id=model_id, latency=timeout, error=f"Timed out after {timeout:g}s")
+            except Exception as e:
+                self._record_call(model_id, False, start_time)
+                return FanOutCandidate(model_id=model_id, latency=time.perf_counter() - start_time, error=str(e))
+            
+            latency = time.perf_counter() - start_time
+            cost = self._record_call(model_id, True, start_time, usage=result.usage())
+            candidate = await self._check_candidate(model_id, result.data, execute)
+            candidate.latency, candidate.cost = latency, cost
+            
+            if candidate.passed and not winner:
+                winner.append(model_id)
+                current = asyncio.current_task()
+                for task in tasks:
+                    if task is not current:
+                        task.cancel()
+            return candidate
+        
+        started = time.perf_counter()
+        tasks.extend(asyncio.create_task(generate(model_id)) for model_id in model_ids)
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        candidates = []
+        for model_id, outcome in zip(model_ids, outcomes):
+            if isinstance(outcome, FanOutCandidate):
+                candidates.append(outcome)
+            elif isinstance(outcome, asyncio.CancelledError):
+                candidates.append(FanOutCandidate(
+                    model_id=model_id,
+                    latency=time.perf_counter() - start_times.get(model_id, started),
+                    error=f"Cancelled after {winner[0]} passed"
+                ))
+            else:
+                candidates.append(FanOutCandidate(model_id=model_id, error=str(outcome)))
+        
+        with_code = [candidate for candidate in candidates if candidate.code]
+        best = min(
+            with_code,
+            key=lambda candidate: (not candidate.passed, candidate.error_count, candidate.latency),
+            default=None
+        )
+        return FanOutResult(
+            prompt=prompt,
+            best=best,
+            candidates=candidates,
+            stopped_early=any(isinstance(outcome, asyncio.CancelledError) for outcome in outcomes),
+            elapsed=time.perf_counter() - started
+        )
     
-    etb3("Enter first number:")
-    num1 = yod()
+    async def _check_candidate(self, model_id: str, response: str, execute: bool) -> FanOutCandidate:
+        """Validate (and optionally execute) the code in one model's response."""
+        code = self.extract_code(response)
+        if not code:
+            return FanOutCandidate(model_id=model_id, response=response, error="No code in response")
+        
+        validation = await self.code_validator.validate_code(code)
+        execution = None
+        if execute and validation.is_valid:
+            execution = await self.flex_executor.execute(FlexExecutionRequest(
+                code=code,
+                save_to_file=False,
+                timeout=self.settings.app.execution_timeout
+            ))
+        
+        return FanOutCandidate(
+            model_id=model_id,
+            code=code,
+            response=response,
+            validation=validation,
+            execution=execution,
+            passed=validation.is_valid and (execution.success if execute else True)
+        )
     
-    etb3("Enter second number:")  
-    num2 = yod()
+    @staticmethod
+    def extract_code(response: str) -> str:
+        """
+        Extract Flex code from a model response.
+        
+        Args:
+            response: Model response text
+            
+        Returns:
+            The longest fenced code block, or an empty string if there is none
+        """
+        blocks = [block.strip() for block in _CODE_BLOCK.findall(response)]
+        return max(blocks, key=len, default="")
     
-    etb3("Choose operation (+, -, *, /):")
-    operation = yod()
+    def start_session(self, session_id: Optional[str] = None) -> AgentSession:
+        """
+        Start a new conversation session.
+        
+        Args:
+            session_id: Identifier for the session (random by default)
+            
+        Returns:
+            The new session, which becomes the current session
+        """
+        self.current_session = AgentSession(
+            session_id=session_id or uuid.uuid4().hex,
+            current_model=self.current_model_id
+        )
+        self.conversation = ConversationContextManager(
+            summarizer=self.summarize_conversation if self.settings.app.enable_conversation_summary else None,
+            summary_max_tokens=self.settings.app.summary_max_tokens,
+            entries=self.current_session.conversation_history
+        )
+        
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = None
+        if self.settings.app.enable_session_journal:
+            self.journal = SessionJournal(self.sessions_dir, self.current_session.session_id)
+        return self.current_session
     
-    lw operation == "+" {
-        result = num1 + num2
-    } elif operation == "-" {
-        result = num1 - num2  
-    } elif operation == "*" {
-        result = num1 * num2
-    } elif operation == "/" {
-        lw num2 == 0 {
-            etb3("Error: Division by zero!")
-            valid = ghlata
-        } gher {
-            result = num1 / num2
-        }
-    } gher {
-        etb3("Invalid operation!")
-        valid = ghlata
-    }
+    async def resume_session(self, session_id: str) -> AgentSession:
+        """
+        Continue a journaled session.
+        
+        The journal is replayed turn by turn into a new current session with
+        the same ID, and new turns are appended to the same journal.
+        
+        Args:
+            session_id: Identifier of the journaled session
+            
+        Returns:
+            The resumed session
+            
+        Raises:
+            SessionJournalError: If the session has no journal
+        """
+        records = read_journal(journal_path(self.sessions_dir, session_id))
+        
+        session = self.start_session(session_id)
+        if self.journal is not None:
+            self.journal.turns = len(records)
+        
+        for record in records:
+            messages = ModelMessagesTypeAdapter.validate_python(record.get('messages', []))
+            session.message_history.extend(messages)
+            self.conversation.add('user', record['user'], timestamp=record['time'])
+            self.conversation.add(
+                'assistant',
+                record['assistant'],
+                timestamp=record['time'],
+                model=record['model'],
+                messages=len(messages),
+                tokens=record.get('tokens', 0)
+            )
+        
+        if records:
+            session.current_model = records[-1]['model']
+            session.last_activity = datetime.fromtimestamp(records[-1]['time'])
+            self.conversation.schedule_summary(self.history_token_budget(session.current_model))
+        return session
     
-    lw valid {
-        etb3("Result: " + result)
-    }
+    def _session_message_history(self) -> List[ModelMessage]:
+        """
+        Native message history for the next request in the current session.
+        
+        Messages of turns already folded into the rolling summary are
+        dropped, and the static system prompt is prepended, so between
+        summary updates every request extends a byte-identical prefix.
+        
+        Returns:
+            Messages to pass as ``message_history``
+        """
+        history = self.current_session.message_history
+        kept = sum(entry.get('messages', 0) for entry in self.conversation.entries)
+        if len(history) > kept:
+            del history[:len(history) - kept]
+        return [self._system_message, *history]
     
-    etb3("Continue? (y/n):")
-    klma answer = yod()
-    lw answer != "y" && answer != "Y" {
-        etb3("Goodbye!")
-        tawaqaf
-    }
-}"""
-
-    def _generate_calculator_english(self) -> str:
-        """Generate calculator in English syntax."""
-        return """// Calculator in English Syntax
-// By Flex AI Agent
-
-print("Welcome! Calculator Program")
-
-while true {
-    float num1, num2, result
-    string operation
-    bool valid = true
+    def _record_turn(
+        self,
+        model_id: str,
+        user_input: str,
+        response: str,
+        prompt: str,
+        new_messages: List[ModelMessage]
+    ) -> None:
+        """
+        Record a completed turn in the current session.
+        
+        Args:
+            model_id: Model that answered
+            user_input: Raw user input
+            response: Final response text
+            prompt: User message actually sent (with retrieved context)
+            new_messages: Messages produced by the run
+        """
+        # Reason: spec sections and the summary are per-request; storing the raw
+        # input keeps the history small and unchanged on later turns
+        messages = []
+        for message in new_messages:
+            if isinstance(message, ModelRequest) and prompt != user_input:
+                message = replace(message, parts=[
+                    replace(part, content=user_input)
+                    if isinstance(part, UserPromptPart) and part.content == prompt else part
+                    for part in message.parts
+                ])
+            messages.append(message)
+        
+        session = self.current_session
+        session.message_history.extend(messages)
+        session.current_model = model_id
+        session.last_activity = datetime.now()
+        
+        user_tokens = self.model_manager.estimate_tokens(user_input)
+        response_tokens = max(0, self._message_tokens(messages) - user_tokens)
+        self.conversation.add('user', user_input)
+        self.conversation.add(
+            'assistant',
+            response,
+            model=model_id,
+            messages=len(messages),
+            tokens=response_tokens
+        )
+        
+        if self.journal is not None:
+            self.journal.append({
+                'model': model_id,
+                'user': user_input,
+                'assistant': response,
+                'tokens': response_tokens,
+                'messages': ModelMessagesTypeAdapter.dump_python(messages, mode='json')
+            })
+        self.conversation.schedule_summary(self.history_token_budget(model_id))
     
-    print("Enter first number:")
-    num1 = input()
+    @staticmethod
+    def _cached_turn_messages(user_input: str, response: str) -> List[ModelMessage]:
+        """Messages standing in for a turn answered from the response cache."""
+        return [
+            ModelRequest(parts=[UserPromptPart(content=user_input)]),
+            ModelResponse(parts=[TextPart(content=response)])
+        ]
     
-    print("Enter second number:")
-    num2 = input()
+    @staticmethod
+    def _message_tokens(messages: List[ModelMessage]) -> int:
+        """Count the tokens of messages, including tool calls and results."""
+        texts = []
+        for message in messages:
+            for part in message.parts:
+                if isinstance(part, ToolCallPart):
+                    texts.append(part.args_as_json_str())
+                elif isinstance(part, ToolReturnPart):
+                    texts.append(part.model_response_str())
+                elif isinstance(part, RetryPromptPart):
+                    texts.append(part.model_response())
+                elif isinstance(getattr(part, 'content', None), str):
+                    texts.append(part.content)
+        return sum(get_token_counter().count_batch(texts))
     
-    print("Choose operation (+, -, *, /):")
-    operation = input()
+    def _cache_context_hash(self, conversation_history: Optional[List[Dict[str, Any]]]) -> str:
+        """Hash the recent conversation that a cached response depends on."""
+        if not conversation_history:
+            return ""
+        return self.response_cache.context_hash(conversation_history[-self.CACHE_CONTEXT_ENTRIES:])
     
-    if operation == "+" {
-        result = num1 + num2
-    } elif operation == "-" {
-        result = num1 - num2
-    } elif operation == "*" {
-        result = num1 * num2
-    } elif operation == "/" {
-        if num2 == 0 {
-            print("Error: Division by zero!")
-            valid = false
-        } else {
-            result = num1 / num2
-        }
-    } else {
-        print("Invalid operation!")
-        valid = false
-    }
+    def search_history(self, query: str, limit: int = 10) -> List[SearchHit]:
+        """
+        Search earlier sessions and saved Flex files.
+        
+        Waits for queued journal turns and, on the first search, indexes Flex
+        files that were saved without going through the file manager. Blocking;
+        run it in a worker thread.
+        
+        Args:
+            query: Free-text query
+            limit: Maximum number of hits
+        
+        Returns:
+            Hits, best match first
+        
+        Raises:
+            SearchIndexError: If the index is unavailable
+        """
+        if self.search_index is None:
+            return []
+        if self.journal is not None:
+            self.journal.flush()
+        if not self._files_backfilled:
+            self.file_manager.sync_search_index()
+            self._files_backfilled = True
+        return self.search_index.search(query, limit=limit)
+    
+    async def summarize_conversation(self, previous_summary: str, entries: List[Dict[str, Any]]) -> str:
+        """
+        Fold conversation turns into a running summary with the current model.
+        
+        Args:
+            previous_summary: Summary of even earlier turns (may be empty)
+            entries: Turns to merge into the summary, oldest first
+            
+        Returns:
+            Updated summary
+        """
+        model_id = self.current_model_id
+        if self._summary_agent is None:
+            self._summary_agent = self.provider_manager.create_agent(model_id, self.SUMMARY_SYSTEM_PROMPT)
+        await self.model_manager.load_metrics()
+        
+        max_tokens = self.settings.app.summary_max_tokens
+        transcript = self._format_conversation_context(entries, token_budget=self.history_token_budget(model_id))
+        prompt = (
+            f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+            f"New messages:\n{transcript}\n\n"
+            f"Write the updated summary in at most {max_tokens} tokens."
+        )
+        
+        start_time = time.perf_counter()
+        try:
+            result = await self._summary_agent.run(
+                prompt,
+                model=self.provider_manager.create_model(model_id),
+                model_settings={'max_tokens': max_tokens}
+            )
+        except Exception:
+            self._record_call(model_id, False, start_time)
+            raise
+        
+        self._record_call(model_id, True, start_time, usage=result.usage())
+        return result.data
+    
+    def _get_cached_response(self, user_input: str, model_id: str, context_hash: str) -> Optional[str]:
+        """Look up a cached response when ENABLE_RESPONSE_CACHE is on."""
+        if not self.settings.app.enable_response_cache:
+            return None
+        return self.response_cache.get(user_input, model_id, context_hash)
+    
+    def _cache_response(
+        self,
+        user_input: str,
+        model_id: str,
+        context_hash: str,
+        response: str,
+        messages: List[ModelMessage]
+    ) -> None:
+        """
+        Cache a response unless it came from tools with side effects.
+        
+        Args:
+            user_input: Current user input
+            model_id: Model that served the request
+            context_hash: Hash of the recent conversation
+            response: Response text
+            messages: Messages of the run, checked for tool calls
+        """
+        if not self.settings.app.enable_response_cache:
+            return
+        
+        for message in messages:
+            if not isinstance(message, ModelResponse):
+                continue
+            for part in message.parts:
+                # Reason: replaying "create the file" must not skip creating it
+                if isinstance(part, ToolCallPart) and part.tool_name not in self.CACHEABLE_TOOLS:
+                    return
+        
+        self.response_cache.put(user_input, model_id, response, context_hash)
+    
+    async def _select_model(self, prompt: str) -> Tuple[str, Optional[Model]]:
+        """
+        Choose the model for one request.
+        
+        With ENABLE_MODEL_ROUTING on, the request goes to the fastest
+        tool-capable model within the cost ceiling; otherwise (or if routing
+        fails) the current model is used.
+        
+        Args:
+            prompt: Full user prompt for the request
+            
+        Returns:
+            Tuple of model ID and a per-run model override (None for the current model)
+        """
+        # Reason: hedge deadlines and call recording read metrics from the event loop
+        await self.model_manager.load_metrics()
+        if not self.settings.app.enable_model_routing:
+            return self.current_model_id, None
+        
+        try:
+            decision = await self.model_manager.route_model(
+                prompt,
+                prompt_tokens=self._system_prompt_tokens + self.model_manager.estimate_tokens(prompt),
+                # Reason: output is usually priced higher than input, so cost routing needs both
+                completion_tokens=self.model_manager.expected_completion_tokens(),
+                require_tools=True
+            )
+        except Exception as e:
+            print(f"Warning: Model routing failed, using {self.current_model_id}: {e}")
+            return self.current_model_id, None
+        
+        self.last_routing_decision = decision
+        if decision.model_id == self.current_model_id:
+            return self.current_model_id, None
+        return decision.model_id, self.provider_manager.create_model(decision.model_id)
     
-    if valid {
-        print("Result: " + result)
-    }
+    def _record_call(
+        self,
+        model_id: str,
+        success: bool,
+        start_time: float,
+        usage: Optional[Any] = None,
+        first_token_time: Optional[float] = None
+    ) -> float:
+        """
+        Record latency, tokens and cost of one model call.
+        
+        Args:
+            model_id: Model that served the call
+            success: Whether the call succeeded
+            start_time: ``time.perf_counter()`` value when the call started
+            usage: PydanticAI usage for the run, if available
+            first_token_time: ``time.perf_counter()`` value of the first streamed chunk
+            
+        Returns:
+            Cost of the call in USD (0.0 when unknown)
+        """
+        try:
+            return self.model_manager.record_call(
+                model_id,
+                success,
+                time.perf_counter() - start_time,
+                ttft=first_token_time - start_time if first_token_time is not None else None,
+                prompt_tokens=(getattr(usage, 'request_tokens', None) or 0) if usage else 0,
+                completion_tokens=(getattr(usage, 'response_tokens', None) or 0) if usage else 0,
+                cached_tokens=(getattr(usage, 'details', None) or {}).get('cached_tokens', 0) if usage else 0
+            )
+        except Exception as e:
+            # Reason: metrics must never break an agent call
+            print(f"Warning: Failed to record model metrics: {e}")
+            return 0.0
     
-    print("Continue? (y/n):")
-    string answer = input()
-    if answer != "y" && answer != "Y" {
-        print("Goodbye!")
-        break
-    }
-}"""
\ No newline at end of file
+    def get_agent_info(self) -> Dict[str, Any]:
+        """Get information about the current agent state."""
+        return {
+            "current_model": self.current_model_id,
+            "flex_spec_loaded": bool(self.flex_spec),
+            "tools_registered": True,
+            "session_active": self.current_session is not None,
+            "response_cache": self.response_cache.stats(),
+            "settings": {
+                "max_code_length": self.settings.app.max_code_length,
+                "execution_timeout": self.settings.app.execution_timeout,
+                "model_cache_duration": self.settings.app.model_cache_duration
+            }
+        }
@@ -73,6 +73,18 @@ class FlexCodeResponse(BaseModel):
         default=[],
         description="Code warnings or safety notes"
     )
+    is_valid: bool = Field(
+        default=True,
+        description="Whether the code passed validation"
+    )
+    repair_rounds: int = Field(
+        default=0,
+        description="Model repair rounds needed to fix validation errors"
+    )
+    tokens_used: int = Field(
+        default=0,
+        description="Prompt and completion tokens of all model calls"
+    )
     
     @field_validator('code')
     @classmethod
@@ -83,6 +95,63 @@ class FlexCodeResponse(BaseModel):
         return v.strip()
 
 
+class GeneratedFlexCode(BaseModel):
+    """Structured code generation output requested from the model."""
+    
+    code: str = Field(..., description="Complete Flex program, without markdown fences")
+    explanation: str = Field(..., description="Short explanation of how the code works")
+    filename: Optional[str] = Field(
+        None,
+        description="Suggested filename ending in .flex"
+    )
+
+
+class StructuredFlexCode(BaseModel):
+    """Structured answer requested from the tool-enabled agent; the rest of FlexCodeResponse is filled locally."""
+    
+    code: str = Field(..., description="Complete Flex program, without markdown fences")
+    explanation: str = Field(..., description="Short explanation of how the code works")
+    warnings: List[str] = Field(
+        default=[],
+        description="Safety notes or caveats about the code"
+    )
+    syntax_style: FlexSyntaxStyle = Field(
+        FlexSyntaxStyle.AUTO,
+        description="Syntax style the code uses (franco/english)"
+    )
+    filename: Optional[str] = Field(
+        None,
+        description="Suggested filename ending in .flex"
+    )
+    
+    @field_validator('code')
+    @classmethod
+    def validate_code(cls, v):
+        """Validate generated code is not empty."""
+        if not v or v.strip() == "":
+            raise ValueError("Generated code cannot be empty")
+        return v
+
+
+class LineEdit(BaseModel):
+    """Replacement for one line of a program."""
+    
+    line_number: int = Field(..., ge=1, description="1-based line number to replace")
+    replacement: str = Field(
+        ...,
+        description="New text for the line (may span several lines; empty deletes it)"
+    )
+
+
+class FlexCodePatch(BaseModel):
+    """Line edits fixing validation errors, requested from the model."""
+    
+    edits: List[LineEdit] = Field(
+        default=[],
+        description="Edits to apply; only lines that need to change"
+    )
+
+
 class Architecture(BaseModel):
     modality: str
     instruct_type: Optional[str] = None
@@ -197,6 +266,45 @@ class ModelSelection(BaseModel):
     )
 
 
+class RoutingCandidate(BaseModel):
+    """A model considered by the router, with its predicted latency and cost."""
+    
+    model_id: str = Field(..., description="Model identifier")
+    expected_latency: float = Field(..., description="Predicted latency in seconds")
+    expected_cost: float = Field(..., description="Predicted cost in USD")
+    observed: bool = Field(
+        default=False,
+        description="Whether latency comes from recorded calls rather than a prior"
+    )
+
+
+class RoutingDecision(BaseModel):
+    """Model routing decision with its trace."""
+    
+    model_id: str = Field(..., description="Selected model")
+    expected_latency: float = Field(..., description="Predicted latency in seconds")
+    expected_cost: float = Field(..., description="Predicted cost in USD")
+    reason: str = Field(..., description="Why the model was selected")
+    prompt_tokens: int = Field(..., description="Estimated prompt tokens")
+    completion_tokens: int = Field(..., description="Estimated completion tokens")
+    max_cost: Optional[float] = Field(
+        None,
+        description="Cost ceiling applied to the request"
+    )
+    candidates: List[RoutingCandidate] = Field(
+        default=[],
+        description="Fastest eligible models, selected model first"
+    )
+    rejected: Dict[str, int] = Field(
+        default={},
+        description="Number of models rejected per reason"
+    )
+    elapsed_us: float = Field(
+        default=0.0,
+        description="Time spent selecting, in microseconds"
+    )
+
+
 class FlexExecutionRequest(BaseModel):
     """Request to execute Flex code."""
     
@@ -295,6 +403,86 @@ class CodeValidationResult(BaseModel):
     )
 
 
+class FanOutCandidate(BaseModel):
+    """One model's answer in a best-of-N fan-out."""
+    
+    model_id: str = Field(..., description="Model that produced the candidate")
+    code: Optional[str] = Field(
+        None,
+        description="Flex code extracted from the response"
+    )
+    response: str = Field(default="", description="Full model response")
+    validation: Optional[CodeValidationResult] = Field(
+        None,
+        description="Validation of the extracted code"
+    )
+    execution: Optional[FlexExecutionResult] = Field(
+        None,
+        description="Execution result, when candidates are executed"
+    )
+    passed: bool = Field(
+        default=False,
+        description="Whether the code validated (and executed, if requested) cleanly"
+    )
+    latency: float = Field(default=0.0, description="Model call latency in seconds")
+    cost: float = Field(default=0.0, description="Cost of the model call in USD")
+    error: Optional[str] = Field(
+        None,
+        description="Why no candidate was produced (timeout, failure, cancelled)"
+    )
+    
+    @property
+    def error_count(self) -> int:
+        """Number of validation errors (0 when not validated)."""
+        return len(self.validation.errors) if self.validation else 0
+
+
+class FanOutResult(BaseModel):
+    """Outcome of generating code on several models in parallel."""
+    
+    prompt: str = Field(..., description="Generation request")
+    best: Optional[FanOutCandidate] = Field(
+        None,
+        description="Selected candidate, or None if no model produced code"
+    )
+    candidates: List[FanOutCandidate] = Field(
+        default=[],
+        description="Every model's candidate, in request order"
+    )
+    stopped_early: bool = Field(
+        default=False,
+        description="Whether remaining models were cancelled after a candidate passed"
+    )
+    elapsed: float = Field(default=0.0, description="Wall-clock time in seconds")
+    
+    @property
+    def total_cost(self) -> float:
+        """Combined cost of all candidates in USD."""
+        return sum(candidate.cost for candidate in self.candidates)
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one prompt of a headless batch run."""
+    
+    index: int = Field(..., description="Position of the prompt in the batch file")
+    id: str = Field(..., description="Prompt identifier from the batch file (the index by default)")
+    prompt: str = Field(..., description="Generation request")
+    status: str = Field(
+        ...,
+        description="'ok' for valid code, 'invalid' for code with validation errors, 'error' if generation failed"
+    )
+    model: Optional[str] = Field(None, description="Model that generated the code")
+    code: Optional[str] = Field(None, description="Generated Flex code")
+    is_valid: bool = Field(default=False, description="Whether the code passed validation")
+    syntax_style: Optional[FlexSyntaxStyle] = Field(None, description="Detected syntax style")
+    repair_rounds: int = Field(default=0, description="Model repair rounds used")
+    warnings: List[str] = Field(default=[], description="Validation errors and warnings")
+    latency: float = Field(default=0.0, description="Generation time of the final attempt in seconds")
+    tokens: int = Field(default=0, description="Prompt and completion tokens used")
+    attempts: int = Field(default=0, description="Generation attempts, including rate-limit retries")
+    error: Optional[str] = Field(None, description="Why generation failed")
+
+
 class AgentSession(BaseModel):
     """Agent conversation session."""
     
@@ -304,6 +492,12 @@ class AgentSession(BaseModel):
         default=[],
         description="Conversation history"
     )
+    # Reason: holds pydantic_ai ModelMessage objects; typed loosely so importing
+    # the models (e.g. for offline validation) does not load pydantic_ai
+    message_history: List[Any] = Field(
+        default_factory=list,
+        description="Native model messages (without the system prompt) replayed as history"
+    )
     user_preferences: Dict[str, Any] = Field(
         default={},
         description="User preferences and settings"
@@ -338,14 +532,42 @@ class ModelMetrics(BaseModel):
         default=0.0,
         description="Average response time in seconds"
     )
+    p50_response_time: Optional[float] = Field(
+        None,
+        description="Median response time in seconds"
+    )
+    p95_response_time: Optional[float] = Field(
+        None,
+        description="95th percentile response time in seconds"
+    )
+    p99_response_time: Optional[float] = Field(
+        None,
+        description="99th percentile response time in seconds"
+    )
     total_tokens_used: int = Field(
         default=0,
         description="Total tokens consumed"
     )
+    total_cached_tokens: int = Field(
+        default=0,
+        description="Prompt tokens served from the provider's prompt cache"
+    )
+    cache_hit_ratio: Optional[float] = Field(
+        None,
+        description="Share of prompt tokens served from the prompt cache"
+    )
     total_cost: float = Field(
         default=0.0,
         description="Total cost in USD"
     )
+    hedged_requests: int = Field(
+        default=0,
+        description="Hedged requests the model raced in"
+    )
+    hedge_win_rate: Optional[float] = Field(
+        None,
+        description="Share of hedged requests whose stream the model won"
+    )
     last_used: Optional[datetime] = Field(
         None,
         description="Last usage timestamp"
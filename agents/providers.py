@@ -6,12 +6,68 @@ with dynamic model selection and proper authentication handling.
 """
 
 import os
-from typing import Optional, Dict, Any, List
-from pydantic_ai import Agent
+import json
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+from openai import AsyncOpenAI
+from pydantic_ai import Agent, Tool
 from pydantic_ai.models.openai import OpenAIModel
 from pydantic_ai.providers.openai import OpenAIProvider
 from config.settings import Settings, get_settings
 from agents.models import OpenRouterModel
+from tools.http_client import get_shared_http_client
+
+
+# Model ID prefixes that only cache prompts at explicit cache_control breakpoints.
+# Reason: OpenAI, DeepSeek, Grok and others cache stable prefixes automatically
+EXPLICIT_CACHE_CONTROL_PREFIXES = ("anthropic/", "google/gemini")
+
+
+def supports_explicit_prompt_caching(model_id: str) -> bool:
+    """Check whether a model needs cache_control markers for prompt caching."""
+    return model_id.startswith(EXPLICIT_CACHE_CONTROL_PREFIXES)
+
+
+class PromptCachingOpenAIModel(OpenAIModel):
+    """
+    OpenAI-compatible model that marks the stable prompt prefix cacheable.
+    
+    The system prompt is the first message of every request and never
+    changes between requests, so it is sent as a text part carrying an
+    ephemeral ``cache_control`` breakpoint for providers that require one.
+    A second breakpoint goes on the last user message of the session
+    history, which is byte-identical on the next turn. Dynamic content
+    (retrieved context, the new user input) always comes after both.
+    """
+    
+    async def _map_messages(self, messages):
+        """Map messages, adding cache breakpoints after the stable prefix."""
+        openai_messages = await super()._map_messages(messages)
+        
+        if not supports_explicit_prompt_caching(self.model_name):
+            return openai_messages
+        
+        for message in openai_messages:
+            if message.get('role') == 'system':
+                _add_cache_breakpoint(message)
+                break
+        
+        # Reason: the final message is the new request; everything before it is history
+        for message in reversed(openai_messages[:-1]):
+            if message.get('role') == 'user':
+                _add_cache_breakpoint(message)
+                break
+        
+        return openai_messages
+
+
+def _add_cache_breakpoint(message: Dict[str, Any]) -> None:
+    """Turn a message's plain-text content into a cacheable text part."""
+    if isinstance(message.get('content'), str):
+        message['content'] = [{
+            'type': 'text',
+            'text': message['content'],
+            'cache_control': {'type': 'ephemeral'}
+        }]
 
 
 class OpenRouterProviderManager:
@@ -20,13 +76,19 @@ class OpenRouterProviderManager:
     def __init__(self, settings: Optional[Settings] = None):
         """Initialize provider manager with settings."""
         self.settings = settings or get_settings()
+        
+        # Providers for custom configs, keyed by their serialized config
+        self._providers: Dict[str, OpenAIProvider] = {}
+        # Models keyed by (model ID, serialized config) so switching reuses them
+        self._models: Dict[Tuple[str, str], OpenAIModel] = {}
         self.current_provider = self._create_default_provider()
     
     def _create_default_provider(self) -> OpenAIProvider:
-        """Create default OpenRouter provider."""
+        """Create default OpenRouter provider on the shared connection pool."""
         return OpenAIProvider(
             api_key=self.settings.openrouter.api_key,
-            base_url=self.settings.openrouter.base_url
+            base_url=self.settings.openrouter.base_url,
+            http_client=get_shared_http_client(self.settings)
         )
     
     def create_model(
@@ -42,27 +104,50 @@ class OpenRouterProviderManager:
             provider_config: Optional provider-specific configuration
             
         Returns:
-            Configured OpenAI model instance
+            Configured OpenAI model instance (cached per model and config)
         """
+        key = (model_id, self._config_key(provider_config))
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        
         # Create provider with optional custom config
         provider = self._create_provider_with_config(provider_config)
         
         # Create model with OpenRouter-specific settings
-        model = OpenAIModel(
+        model_class = PromptCachingOpenAIModel if self.settings.app.enable_prompt_caching else OpenAIModel
+        model = model_class(
             model_id,
             provider=provider
         )
         
+        self._models[key] = model
         return model
     
+    @staticmethod
+    def _config_key(provider_config: Optional[Dict[str, Any]]) -> str:
+        """Serialize a provider config into a stable cache key."""
+        if not provider_config:
+            return ""
+        return json.dumps(provider_config, sort_keys=True, default=str)
+    
     def _create_provider_with_config(
         self, 
         provider_config: Optional[Dict[str, Any]] = None
     ) -> OpenAIProvider:
-        """Create provider with custom configuration."""
+        """Get provider for a custom configuration, reusing one per distinct config."""
         if not provider_config:
             return self.current_provider
         
+        config_key = self._config_key(provider_config)
+        provider = self._providers.get(config_key)
+        if provider is None:
+            provider = self._build_provider(provider_config)
+            self._providers[config_key] = provider
+        return provider
+    
+    def _build_provider(self, provider_config: Dict[str, Any]) -> OpenAIProvider:
+        """Build a provider for a custom configuration on the shared connection pool."""
         # Merge with default settings
         base_url = provider_config.get('base_url', self.settings.openrouter.base_url)
         api_key = provider_config.get('api_key', self.settings.openrouter.api_key)
@@ -76,11 +161,16 @@ class OpenRouterProviderManager:
         if 'headers' in provider_config:
             headers.update(provider_config['headers'])
         
-        return OpenAIProvider(
+        # Reason: per-config headers live on the OpenAI client so the pooled
+        # HTTP client (and its warm connections) can still be shared
+        openai_client = AsyncOpenAI(
             base_url=base_url,
             api_key=api_key,
-            default_headers=headers
+            default_headers=headers,
+            http_client=get_shared_http_client(self.settings)
         )
+        
+        return OpenAIProvider(openai_client=openai_client)
     
     def _get_openrouter_extra_body(
         self, 
@@ -110,7 +200,8 @@ class OpenRouterProviderManager:
         system_prompt: str,
         deps_type: Optional[type] = None,
         result_type: Optional[type] = None,
-        provider_config: Optional[Dict[str, Any]] = None
+        provider_config: Optional[Dict[str, Any]] = None,
+        tools: Sequence[Tool] = ()
     ) -> Agent:
         """
         Create a PydanticAI agent with OpenRouter model.
@@ -121,6 +212,7 @@ class OpenRouterProviderManager:
             deps_type: Optional dependencies type
             result_type: Optional result type
             provider_config: Optional provider configuration
+            tools: Prebuilt tools to register (may be shared between agents)
             
         Returns:
             Configured PydanticAI agent
@@ -130,7 +222,8 @@ class OpenRouterProviderManager:
         # Create agent with proper typing
         agent_kwargs = {
             'model': model,
-            'system_prompt': system_prompt
+            'system_prompt': system_prompt,
+            'tools': tools
         }
         
         if deps_type:
@@ -145,6 +238,9 @@ class OpenRouterProviderManager:
         """
         Update an existing agent with a new model.
         
+        This is the fast path for switching: the agent keeps its system
+        prompt and registered tools, and the model comes from the cache.
+        
         Args:
             agent: Existing agent instance
             new_model_id: New OpenRouter model ID
@@ -152,7 +248,7 @@ class OpenRouterProviderManager:
         Returns:
             Agent with updated model
         """
-        # Create new model
+        # Reuse (or create once) the model for this ID
         new_model = self.create_model(new_model_id)
         
         # Update agent's model
@@ -235,7 +331,7 @@ class OpenRouterProviderManager:
             "supported": model_id in self.get_supported_models()
         }
     
-    def create_fallback_chain(self, primary_model: str, fallback_models: List[str]) -> List[OpenAIModel]:
+    def create_fallback_chain(self, primary_model: str, fallback_models: List[str]) -> List[Tuple[str, OpenAIModel]]:
         """
         Create a chain of models for fallback support.
         
@@ -244,13 +340,13 @@ class OpenRouterProviderManager:
             fallback_models: List of fallback model IDs
             
         Returns:
-            List of configured models
+            List of (model ID, configured model) pairs, primary first
         """
-        models = [self.create_model(primary_model)]
+        models = [(primary_model, self.create_model(primary_model))]
         
         for model_id in fallback_models:
-            if self.validate_model_id(model_id):
-                models.append(self.create_model(model_id))
+            if model_id != primary_model and self.validate_model_id(model_id):
+                models.append((model_id, self.create_model(model_id)))
         
         return models
     
@@ -300,8 +396,21 @@ class OpenRouterProviderManager:
         }
 
 
-# Global provider manager instance
-provider_manager = OpenRouterProviderManager()
+# Provider manager shared by the convenience functions, created on first use
+_provider_manager: Optional[OpenRouterProviderManager] = None
+
+
+def get_provider_manager() -> OpenRouterProviderManager:
+    """
+    Get the shared provider manager, creating it on first use.
+    
+    Returns:
+        Provider manager configured from the environment settings
+    """
+    global _provider_manager
+    if _provider_manager is None:
+        _provider_manager = OpenRouterProviderManager()
+    return _provider_manager
 
 
 def create_flex_agent(
@@ -309,7 +418,8 @@ def create_flex_agent(
     system_prompt: str,
     deps_type: Optional[type] = None,
     result_type: Optional[type] = None,
-    provider_config: Optional[Dict[str, Any]] = None
+    provider_config: Optional[Dict[str, Any]] = None,
+    tools: Sequence[Tool] = ()
 ) -> Agent:
     """
     Convenience function to create a Flex AI agent with OpenRouter.
@@ -320,16 +430,18 @@ def create_flex_agent(
         deps_type: Optional dependencies type
         result_type: Optional result type
         provider_config: Optional provider configuration
+        tools: Prebuilt tools to register
         
     Returns:
         Configured PydanticAI agent
     """
-    return provider_manager.create_agent(
+    return get_provider_manager().create_agent(
         model_id=model_id,
         system_prompt=system_prompt,
         deps_type=deps_type,
         result_type=result_type,
-        provider_config=provider_config
+        provider_config=provider_config,
+        tools=tools
     )
 
 
@@ -344,14 +456,14 @@ def switch_model(agent: Agent, new_model_id: str) -> Agent:
     Returns:
         Agent with updated model
     """
-    return provider_manager.update_model(agent, new_model_id)
+    return get_provider_manager().update_model(agent, new_model_id)
 
 
 def get_available_models() -> List[str]:
     """Get list of available OpenRouter models."""
-    return provider_manager.get_supported_models()
+    return get_provider_manager().get_supported_models()
 
 
 def validate_model(model_id: str) -> bool:
     """Validate if a model ID is supported."""
-    return provider_manager.validate_model_id(model_id)
\ No newline at end of file
+    return get_provider_manager().validate_model_id(model_id)
\ No newline at end of file
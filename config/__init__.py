@@ -2,7 +2,7 @@
 Configuration package for Flex AI Agent.
 
 This package handles all configuration management including environment variables,
-settings validation, and application configuration using pydantic-settings.
+settings validation, and application configuration using pydantic models.
 """
 
 from .settings import (
@@ -10,6 +10,7 @@ from .settings import (
     OpenRouterSettings,
     FlexSettings,
     ApplicationSettings,
+    HttpClientSettings,
     get_settings,
     validate_settings,
     load_env
@@ -20,6 +21,7 @@ __all__ = [
     "OpenRouterSettings", 
     "FlexSettings",
     "ApplicationSettings",
+    "HttpClientSettings",
     "get_settings",
     "validate_settings",
     "load_env"
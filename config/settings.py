@@ -1,14 +1,14 @@
 """
 Settings configuration for Flex AI Agent.
 
-This module provides configuration management using pydantic-settings and python_dotenv
-as specified in CLAUDE.md requirements.
+This module provides configuration management using pydantic models filled from
+environment variables loaded with python_dotenv. Nothing is read at import time;
+call ``get_settings()`` once and pass the result along.
 """
 
 import os
 from typing import Optional
 from pydantic import BaseModel, Field, field_validator
-from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
 
@@ -20,7 +20,7 @@ def load_env() -> None:
 class OpenRouterSettings(BaseModel):
     """OpenRouter API configuration."""
     
-    api_key: str = Field(..., description="OpenRouter API key")
+    api_key: str = Field(..., description="OpenRouter API key (checked by validate_settings)")
     base_url: str = Field(
         default="https://openrouter.ai/api/v1", 
         description="OpenRouter API base URL"
@@ -37,10 +37,10 @@ class OpenRouterSettings(BaseModel):
     @field_validator('api_key')
     @classmethod
     def validate_api_key(cls, v):
-        """Validate OpenRouter API key."""
-        if not v or v.strip() == "":
-            raise ValueError("OpenRouter API key cannot be empty")
-        return v.strip()
+        """Normalize the OpenRouter API key."""
+        # Reason: offline modes run without a key; validate_settings requires it
+        # for anything that calls the model
+        return v.strip() if v else ""
 
 
 class FlexSettings(BaseModel):
@@ -89,25 +89,172 @@ class ApplicationSettings(BaseModel):
         le=86400,
         description="Model cache duration in seconds"
     )
+    model_cache_stale_while_revalidate: bool = Field(
+        default=True,
+        description="Serve an expired model cache while refreshing it in the background"
+    )
+    enable_metrics: bool = Field(
+        default=True,
+        description="Persist per-model call metrics to the local metrics store"
+    )
+    enable_prompt_caching: bool = Field(
+        default=True,
+        description="Mark the static system prompt cacheable for providers that support it"
+    )
+    max_history_tokens: int = Field(
+        default=16000,
+        ge=0,
+        description="Maximum tokens of conversation history sent with a request"
+    )
+    enable_conversation_summary: bool = Field(
+        default=True,
+        description="Summarize older conversation turns with the model (otherwise extractively)"
+    )
+    summary_max_tokens: int = Field(
+        default=800,
+        ge=0,
+        description="Maximum tokens in the rolling conversation summary"
+    )
+    enable_model_routing: bool = Field(
+        default=False,
+        description="Route each request to the fastest model within the cost ceiling"
+    )
+    routing_max_request_cost: float = Field(
+        default=0.01,
+        ge=0.0,
+        description="Maximum predicted cost per routed request in USD"
+    )
+    enable_spec_retrieval: bool = Field(
+        default=True,
+        description="Attach the most relevant Flex spec sections to each request"
+    )
+    spec_retrieval_top_k: int = Field(
+        default=4,
+        ge=1,
+        description="Maximum number of spec sections attached per request"
+    )
+    spec_retrieval_max_tokens: int = Field(
+        default=1500,
+        ge=0,
+        description="Maximum tokens of spec sections attached per request"
+    )
+    enable_response_cache: bool = Field(
+        default=True,
+        description="Reuse responses to repeated prompts instead of calling the model"
+    )
+    response_cache_size: int = Field(
+        default=256,
+        ge=1,
+        description="Maximum number of cached responses"
+    )
+    response_cache_ttl: int = Field(
+        default=3600,
+        ge=0,
+        description="Seconds a cached response stays valid"
+    )
+    response_cache_similarity: Optional[float] = Field(
+        default=None,
+        ge=0.0,
+        le=1.0,
+        description="Cosine similarity at which near-duplicate prompts hit the cache (None: exact match only)"
+    )
+    fallback_models: list[str] = Field(
+        default_factory=list,
+        description="Models a streamed request is hedged onto when the first token is late"
+    )
+    hedge_default_delay: float = Field(
+        default=10.0,
+        ge=0.0,
+        description="Seconds to wait for a first token before hedging, until p95 data exists"
+    )
+    code_repair_rounds: int = Field(
+        default=2,
+        ge=0,
+        description="Maximum model rounds spent fixing validation errors in generated code"
+    )
+    fan_out_models: list[str] = Field(
+        default_factory=list,
+        description="Models queried in parallel by best-of-N generation (default: current plus fallbacks)"
+    )
+    fan_out_timeout: float = Field(
+        default=60.0,
+        gt=0.0,
+        description="Seconds each model gets to answer in best-of-N generation"
+    )
+    enable_session_journal: bool = Field(
+        default=True,
+        description="Journal each conversation turn to disk so sessions can be resumed"
+    )
+    enable_search_index: bool = Field(
+        default=True,
+        description="Index past sessions and saved Flex files for full-text search"
+    )
+    batch_concurrency: int = Field(
+        default=4,
+        ge=1,
+        le=64,
+        description="Prompts generated at once by --batch"
+    )
+    batch_max_retries: int = Field(
+        default=4,
+        ge=0,
+        description="Retries per --batch prompt after a rate limit or transient error"
+    )
     default_model: str = Field(
         default="anthropic/claude-3-5-sonnet",
         description="Default OpenRouter model"
     )
 
 
-class Settings(BaseSettings):
+class HttpClientSettings(BaseModel):
+    """Shared HTTP connection pool configuration."""
+    
+    max_connections: int = Field(
+        default=20,
+        ge=1,
+        le=1000,
+        description="Maximum concurrent connections in the shared pool"
+    )
+    max_keepalive_connections: int = Field(
+        default=10,
+        ge=0,
+        le=1000,
+        description="Maximum idle keep-alive connections kept in the pool"
+    )
+    keepalive_expiry: float = Field(
+        default=60.0,
+        ge=1.0,
+        le=3600.0,
+        description="Seconds an idle keep-alive connection is retained"
+    )
+    enable_http2: bool = Field(
+        default=True,
+        description="Use HTTP/2 when the optional h2 package is installed"
+    )
+    timeout: float = Field(
+        default=600.0,
+        ge=5.0,
+        le=3600.0,
+        description="Default request timeout in seconds"
+    )
+    connect_timeout: float = Field(
+        default=10.0,
+        ge=1.0,
+        le=120.0,
+        description="Connection establishment timeout in seconds"
+    )
+
+
+class Settings(BaseModel):
     """Main application settings."""
     
     openrouter: OpenRouterSettings
     flex: FlexSettings = Field(default_factory=FlexSettings)
     app: ApplicationSettings = Field(default_factory=ApplicationSettings)
+    http: HttpClientSettings = Field(default_factory=HttpClientSettings)
     
     model_config = {
-        "env_file": ".env",
-        "env_file_encoding": "utf-8",
-        "case_sensitive": False,
-        "env_nested_delimiter": "__",
-        "extra": "ignore"  # Allow extra fields in .env
+        "extra": "ignore"  # Allow extra fields
     }
     
     @field_validator('openrouter', mode='before')
@@ -145,13 +292,48 @@ def get_settings() -> Settings:
         execution_timeout=int(os.getenv("EXECUTION_TIMEOUT", "30")),
         enable_file_operations=os.getenv("ENABLE_FILE_OPERATIONS", "true").lower() == "true",
         model_cache_duration=int(os.getenv("MODEL_CACHE_DURATION", "3600")),
+        model_cache_stale_while_revalidate=os.getenv("MODEL_CACHE_STALE_WHILE_REVALIDATE", "true").lower() == "true",
+        enable_metrics=os.getenv("ENABLE_METRICS", "true").lower() == "true",
+        enable_prompt_caching=os.getenv("ENABLE_PROMPT_CACHING", "true").lower() == "true",
+        max_history_tokens=int(os.getenv("MAX_HISTORY_TOKENS", "16000")),
+        enable_conversation_summary=os.getenv("ENABLE_CONVERSATION_SUMMARY", "true").lower() == "true",
+        summary_max_tokens=int(os.getenv("SUMMARY_MAX_TOKENS", "800")),
+        enable_model_routing=os.getenv("ENABLE_MODEL_ROUTING", "false").lower() == "true",
+        routing_max_request_cost=float(os.getenv("ROUTING_MAX_REQUEST_COST", "0.01")),
+        enable_spec_retrieval=os.getenv("ENABLE_SPEC_RETRIEVAL", "true").lower() == "true",
+        spec_retrieval_top_k=int(os.getenv("SPEC_RETRIEVAL_TOP_K", "4")),
+        spec_retrieval_max_tokens=int(os.getenv("SPEC_RETRIEVAL_MAX_TOKENS", "1500")),
+        enable_response_cache=os.getenv("ENABLE_RESPONSE_CACHE", "true").lower() == "true",
+        response_cache_size=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+        response_cache_ttl=int(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        response_cache_similarity=float(os.getenv("RESPONSE_CACHE_SIMILARITY")) if os.getenv("RESPONSE_CACHE_SIMILARITY") else None,
+        fallback_models=[m.strip() for m in os.getenv("FALLBACK_MODELS", "").split(",") if m.strip()],
+        hedge_default_delay=float(os.getenv("HEDGE_DEFAULT_DELAY", "10")),
+        code_repair_rounds=int(os.getenv("CODE_REPAIR_ROUNDS", "2")),
+        fan_out_models=[m.strip() for m in os.getenv("FAN_OUT_MODELS", "").split(",") if m.strip()],
+        fan_out_timeout=float(os.getenv("FAN_OUT_TIMEOUT", "60")),
+        enable_session_journal=os.getenv("ENABLE_SESSION_JOURNAL", "true").lower() == "true",
+        enable_search_index=os.getenv("ENABLE_SEARCH_INDEX", "true").lower() == "true",
+        batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", "4")),
+        batch_max_retries=int(os.getenv("BATCH_MAX_RETRIES", "4")),
         default_model=os.getenv("DEFAULT_MODEL", "anthropic/claude-3-5-sonnet")
     )
     
+    # Create shared HTTP pool settings from environment variables
+    http_settings = HttpClientSettings(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10")),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60")),
+        enable_http2=os.getenv("HTTP_ENABLE_HTTP2", "true").lower() == "true",
+        timeout=float(os.getenv("HTTP_TIMEOUT", "600")),
+        connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+    )
+    
     return Settings(
         openrouter=openrouter_settings,
         flex=flex_settings,
-        app=app_settings
+        app=app_settings,
+        http=http_settings
     )
 
 
@@ -166,7 +348,3 @@ def validate_settings(settings: Settings) -> None:
         raise ValueError(
             "Flex CLI path is required. Please set FLEX_CLI_PATH environment variable."
         )
-
-
-# Global settings instance
-settings = get_settings()
\ No newline at end of file
@@ -6,20 +6,55 @@ This script provides the primary entry point for the Flex AI Agent with
 command-line argument support and proper error handling.
 """
 
-import asyncio
 import sys
-import argparse
+import time
 from pathlib import Path
-from typing import Optional
+
+_started = time.perf_counter()
 
 # Add project root to Python path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-from ui.cli import FlexCLI, main as cli_main
-from config.settings import get_settings, validate_settings
-from tools.model_manager import ModelManager
-from agents.flex_agent import FlexAIAgent
+# Reason: the profiler has to hook imports before anything heavy is loaded
+_profiler = None
+if '--profile-startup' in sys.argv:
+    from tools.startup_profiler import StartupProfiler
+    _profiler = StartupProfiler(_started).install()
+
+import asyncio
+import argparse
+import json
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from config.settings import Settings
+
+
+def mark_startup(phase: str) -> None:
+    """Record a startup phase when --profile-startup is active."""
+    if _profiler is not None:
+        _profiler.mark(phase)
+
+
+def report_startup() -> None:
+    """Print the startup profile once, when --profile-startup is active."""
+    global _profiler
+    if _profiler is not None:
+        _profiler.uninstall()
+        _profiler.print_report()
+        _profiler = None
+
+
+def positive_int(value: str) -> int:
+    """Parse a command-line count that must be at least 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -31,9 +66,13 @@ def create_parser() -> argparse.ArgumentParser:
 Examples:
   python main.py                    # Start interactive CLI
   python main.py --models           # Show available models
-  python main.py --validate file.flex  # Validate Flex file
-  python main.py --execute file.flex   # Execute Flex file
+  python main.py --validate file.flex  # Validate Flex file (offline)
+  python main.py --validate *.flex --format ndjson  # One JSON line per file
+  python main.py --execute file.flex --explain  # Run, explain failures with AI
   python main.py --generate "create a loop"  # Generate code
+  python main.py --batch prompts.jsonl --concurrency 8 -o results.ndjson
+  python main.py --models --profile-startup  # Show where startup time goes
+  python main.py --resume last      # Continue the most recent session
 
 For more help, run the interactive mode and type 'help'.
         """
@@ -55,14 +94,16 @@ For more help, run the interactive mode and type 'help'.
     mode_group.add_argument(
         '--validate', '-v',
         type=str,
+        nargs='+',
         metavar='FILE',
-        help='Validate a Flex file'
+        help='Validate Flex files locally (exit code 1 if any has errors)'
     )
     mode_group.add_argument(
         '--execute', '-e',
         type=str,
+        nargs='+',
         metavar='FILE',
-        help='Execute a Flex file'
+        help='Execute Flex files locally (exit code 1 if any fails)'
     )
     mode_group.add_argument(
         '--generate', '-g',
@@ -70,6 +111,12 @@ For more help, run the interactive mode and type 'help'.
         metavar='PROMPT',
         help='Generate Flex code from prompt'
     )
+    mode_group.add_argument(
+        '--batch', '-b',
+        type=str,
+        metavar='FILE',
+        help='Generate code for every prompt of a JSONL file, one NDJSON result per prompt'
+    )
     
     # Model selection
     parser.add_argument(
@@ -86,6 +133,27 @@ For more help, run the interactive mode and type 'help'.
         help='Output file for generated code'
     )
     
+    # Output format of --validate and --execute
+    parser.add_argument(
+        '--format',
+        choices=['text', 'json', 'ndjson'],
+        default='text',
+        help='Result format for --validate/--execute (default: text)'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=positive_int,
+        metavar='N',
+        help='With --batch, prompts generated at once (default: BATCH_CONCURRENCY)'
+    )
+    
+    parser.add_argument(
+        '--explain',
+        action='store_true',
+        help='With --validate/--execute, ask the model to explain problems (only when some are found)'
+    )
+    
     # Syntax style
     parser.add_argument(
         '--syntax',
@@ -94,6 +162,14 @@ For more help, run the interactive mode and type 'help'.
         help='Preferred syntax style (default: auto)'
     )
     
+    # Session journal
+    parser.add_argument(
+        '--resume',
+        type=str,
+        metavar='SESSION',
+        help="Continue a saved session in interactive mode (session ID, unique ID prefix or 'last')"
+    )
+    
     # Debug options
     parser.add_argument(
         '--debug',
@@ -101,6 +177,12 @@ For more help, run the interactive mode and type 'help'.
         help='Enable debug mode'
     )
     
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help='Print an import-time breakdown of startup to stderr'
+    )
+    
     parser.add_argument(
         '--version',
         action='version',
@@ -110,11 +192,11 @@ For more help, run the interactive mode and type 'help'.
     return parser
 
 
-async def list_models() -> None:
+async def list_models(settings: 'Settings') -> None:
     """List available OpenRouter models."""
     try:
-        settings = get_settings()
-        validate_settings(settings)
+        from tools.model_manager import ModelManager
+        mark_startup("model manager imported")
         
         print("📡 Loading available models...")
         model_manager = ModelManager(settings)
@@ -149,88 +231,226 @@ async def list_models() -> None:
         sys.exit(1)
 
 
-async def validate_file(filepath: str) -> None:
-    """Validate a Flex file."""
+# Exit codes of the one-shot modes
+EXIT_OK = 0
+EXIT_PROBLEMS = 1  # Validation errors found or the program failed
+EXIT_USAGE = 2  # Missing/unreadable file or configuration error
+
+EXPLAIN_PROMPT = """Explain these problems in the Flex program below and how to fix them.
+Be brief: one short paragraph per problem, then the corrected lines.
+
+Problems:
+{problems}
+
+```flex
+{code}
+```"""
+
+
+def read_flex_file(filepath: str) -> Optional[str]:
+    """Read a Flex source file, or return None if it cannot be read."""
     try:
-        settings = get_settings()
-        validate_settings(settings)
-        
-        # Read file
-        file_path = Path(filepath)
-        if not file_path.exists():
-            print(f"❌ File not found: {filepath}")
-            sys.exit(1)
-        
-        code = file_path.read_text(encoding='utf-8')
-        
-        # Initialize agent
-        agent = FlexAIAgent(settings)
-        
-        print(f"🔍 Validating {filepath}...")
-        result = await agent.run(f"validate this Flex code:\n```flex\n{code}\n```")
-        print(result)
+        return Path(filepath).read_text(encoding='utf-8')
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def emit_results(results: List[Dict[str, Any]], output_format: str) -> None:
+    """
+    Print machine-readable results.
+    
+    Args:
+        results: One result object per file
+        output_format: 'json' for one array, 'ndjson' for one object per line
+    """
+    if output_format == 'json':
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        for result in results:
+            print(json.dumps(result, ensure_ascii=False))
+
+
+async def explain_problems(settings: 'Settings', code: str, problems: List[str]) -> str:
+    """
+    Ask the model to explain problems found locally.
+    
+    Args:
+        settings: Application settings
+        code: Flex source
+        problems: Problem descriptions from the validator or executor
     
+    Returns:
+        Explanation text, or an error note if the model call failed
+    """
+    try:
+        from agents.flex_agent import FlexAIAgent
+        agent = FlexAIAgent(settings)
+        prompt = EXPLAIN_PROMPT.format(problems="\n".join(f"- {problem}" for problem in problems), code=code)
+        return await agent.run(prompt, conversation_history=[])
     except Exception as e:
-        print(f"❌ Validation failed: {e}")
-        sys.exit(1)
+        return f"Explanation unavailable: {e}"
 
 
-async def execute_file(filepath: str) -> None:
-    """Execute a Flex file."""
+async def validate_files(
+    filepaths: List[str],
+    settings: 'Settings',
+    output_format: str = 'text',
+    explain: bool = False
+) -> int:
+    """
+    Validate Flex files locally, without a model call.
+    
+    Args:
+        filepaths: Files to validate
+        settings: Application settings (used by --explain)
+        output_format: 'text', 'json' or 'ndjson'
+        explain: Ask the model to explain files with errors
+    
+    Returns:
+        Exit code
+    """
+    from tools.code_validator import FlexCodeValidator
+    mark_startup("validator imported")
+    
+    # Reason: the spec ships with the project, so --validate works from any directory
     try:
-        settings = get_settings()
-        validate_settings(settings)
+        validator = FlexCodeValidator(str(project_root / "data" / "flex_language_spec.json"))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ Cannot load the Flex language spec: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    results = []
+    exit_code = EXIT_OK
+    
+    for filepath in filepaths:
+        code = read_flex_file(filepath)
+        if code is None:
+            results.append({'file': filepath, 'error': "File not found or unreadable"})
+            exit_code = EXIT_USAGE
+            if output_format == 'text':
+                print(f"❌ File not found or unreadable: {filepath}")
+            continue
         
-        # Read file
-        file_path = Path(filepath)
-        if not file_path.exists():
-            print(f"❌ File not found: {filepath}")
-            sys.exit(1)
+        validation = await validator.validate_code(code)
+        result = {'file': filepath, **validation.model_dump(mode='json')}
+        if not validation.is_valid:
+            exit_code = max(exit_code, EXIT_PROBLEMS)
+            if explain:
+                problems = [
+                    f"line {error.line_number}: {error.message}" if error.line_number else error.message
+                    for error in validation.errors
+                ]
+                result['explanation'] = await explain_problems(settings, code, problems)
+        results.append(result)
         
-        code = file_path.read_text(encoding='utf-8')
+        if output_format == 'text':
+            if validation.is_valid:
+                print(f"✅ {filepath}: valid ({validation.syntax_style.value} syntax)")
+            else:
+                print(f"❌ {filepath}: {len(validation.errors)} error(s)")
+            for error in validation.errors:
+                location = f"line {error.line_number}: " if error.line_number else ""
+                print(f"  • {location}{error.message}")
+                print(f"    Fix: {error.suggestion}")
+            for warning in validation.warnings:
+                print(f"  ⚠️ {warning}")
+            if result.get('explanation'):
+                print(f"\n{result['explanation']}\n")
+        mark_startup(f"validated {filepath}")
+    
+    if output_format != 'text':
+        emit_results(results, output_format)
+    return exit_code
+
+
+async def execute_files(
+    filepaths: List[str],
+    settings: 'Settings',
+    output_format: str = 'text',
+    explain: bool = False
+) -> int:
+    """
+    Execute Flex files locally, without a model call.
+    
+    Args:
+        filepaths: Files to run, in order
+        settings: Application settings
+        output_format: 'text', 'json' or 'ndjson'
+        explain: Ask the model to explain failed runs
+    
+    Returns:
+        Exit code
+    """
+    from tools.flex_executor import FlexExecutor
+    mark_startup("executor imported")
+    
+    executor = FlexExecutor(settings)
+    results = []
+    exit_code = EXIT_OK
+    
+    for filepath in filepaths:
+        code = read_flex_file(filepath)
+        if code is None or not code.strip():
+            results.append({'file': filepath, 'error': "File not found, unreadable or empty"})
+            exit_code = EXIT_USAGE
+            if output_format == 'text':
+                print(f"❌ File not found, unreadable or empty: {filepath}")
+            continue
         
-        # Initialize agent
-        agent = FlexAIAgent(settings)
+        if output_format == 'text':
+            print(f"🚀 Executing {filepath}...")
+        execution = await executor.execute_code_string(code)
+        # Reason: the executor runs a temporary copy, report the file the user passed
+        result = {'file': filepath, **execution.model_dump(mode='json', exclude={'filename'})}
+        if not execution.success:
+            exit_code = max(exit_code, EXIT_PROBLEMS)
+            if explain:
+                problems = [execution.error or f"Exited with code {execution.exit_code}"]
+                result['explanation'] = await explain_problems(settings, code, problems)
+        results.append(result)
         
-        print(f"🚀 Executing {filepath}...")
-        result = await agent.run(f"execute this Flex code:\n```flex\n{code}\n```")
-        print(result)
+        if output_format == 'text':
+            if execution.output:
+                print(execution.output)
+            if execution.success:
+                print(f"✅ Finished in {execution.execution_time:.2f}s")
+            else:
+                print(f"❌ Failed (exit code {execution.exit_code}): {execution.error}")
+            if result.get('explanation'):
+                print(f"\n{result['explanation']}\n")
     
-    except Exception as e:
-        print(f"❌ Execution failed: {e}")
-        sys.exit(1)
+    if output_format != 'text':
+        emit_results(results, output_format)
+    return exit_code
 
 
-async def generate_code(prompt: str, syntax: str = 'auto', output_file: Optional[str] = None) -> None:
+async def generate_code(
+    prompt: str,
+    settings: 'Settings',
+    syntax: str = 'auto',
+    output_file: Optional[str] = None
+) -> None:
     """Generate Flex code from prompt."""
     try:
-        settings = get_settings()
-        validate_settings(settings)
-        
         # Initialize agent
+        from agents.flex_agent import FlexAIAgent
+        mark_startup("agent imported")
         agent = FlexAIAgent(settings)
         
         print(f"🤖 Generating Flex code for: {prompt}")
-        if syntax != 'auto':
-            prompt_with_syntax = f"Generate Flex code using {syntax} syntax: {prompt}"
-        else:
-            prompt_with_syntax = f"Generate Flex code: {prompt}"
+        response = await agent.run_structured(prompt, syntax_style=syntax)
         
-        result = await agent.run(prompt_with_syntax)
-        print(result)
+        print(f"\n{response.code}\n")
+        if response.explanation:
+            print(response.explanation)
+        for warning in response.warnings:
+            print(f"⚠️ {warning}")
+        print(f"\nGenerated in {response.generation_time:.2f}s using {response.model_used}")
         
         # Save to file if requested
         if output_file:
             try:
-                # Extract code from result (look for ```flex blocks)
-                import re
-                code_match = re.search(r'```flex\n(.*?)\n```', result, re.DOTALL)
-                if code_match:
-                    code = code_match.group(1)
-                    Path(output_file).write_text(code, encoding='utf-8')
-                    print(f"\n💾 Code saved to {output_file}")
-                else:
-                    print("\n⚠️ Could not extract code block for saving")
+                Path(output_file).write_text(response.code + "\n", encoding='utf-8')
+                print(f"\n💾 Code saved to {output_file}")
             except Exception as e:
                 print(f"\n❌ Failed to save to file: {e}")
     
@@ -239,39 +459,143 @@ async def generate_code(prompt: str, syntax: str = 'auto', output_file: Optional
         sys.exit(1)
 
 
-async def main() -> None:
-    """Main entry point."""
+async def run_batch(
+    filepath: str,
+    settings: 'Settings',
+    concurrency: Optional[int] = None,
+    syntax: str = 'auto',
+    model: Optional[str] = None,
+    output_file: Optional[str] = None
+) -> int:
+    """
+    Generate code for every prompt of a JSONL file with one agent.
+    
+    Results are written as NDJSON, one line per prompt as soon as it finishes;
+    a summary goes to stderr.
+    
+    Args:
+        filepath: Prompt file (JSON strings or objects with a "prompt")
+        settings: Application settings
+        concurrency: Prompts generated at once (default: BATCH_CONCURRENCY)
+        syntax: Syntax style of prompts that do not set one
+        model: Model of prompts that do not set one
+        output_file: NDJSON file to write instead of stdout
+    
+    Returns:
+        Exit code
+    """
+    from tools.batch_runner import BatchError, BatchRunner, read_batch_file
+    
+    try:
+        items = read_batch_file(filepath, syntax, model)
+    except BatchError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_USAGE
+    
+    from agents.flex_agent import FlexAIAgent
+    mark_startup("agent imported")
+    try:
+        runner = BatchRunner(
+            FlexAIAgent(settings),
+            concurrency=concurrency if concurrency is not None else settings.app.batch_concurrency,
+            max_retries=settings.app.batch_max_retries
+        )
+    except BatchError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_USAGE
+    
+    # Reason: opened last, so a failed setup neither leaks it nor truncates an existing file
+    try:
+        output = open(output_file, 'w', encoding='utf-8') if output_file else sys.stdout
+    except OSError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_USAGE
+    
+    def write_result(result) -> None:
+        output.write(result.model_dump_json() + "\n")
+        output.flush()
+    
+    start_time = time.perf_counter()
+    try:
+        results = await runner.run(items, on_result=write_result)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    
+    counts = {status: sum(result.status == status for result in results) for status in ('ok', 'invalid', 'error')}
+    print(
+        f"Batch: {len(results)} prompt(s) in {time.perf_counter() - start_time:.1f}s - "
+        f"{counts['ok']} valid, {counts['invalid']} invalid, {counts['error']} failed, "
+        f"{sum(result.tokens for result in results):,} tokens",
+        file=sys.stderr
+    )
+    return EXIT_OK if counts['ok'] == len(results) else EXIT_PROBLEMS
+
+
+async def main() -> int:
+    """
+    Main entry point.
+    
+    Returns:
+        Process exit code
+    """
     parser = create_parser()
     args = parser.parse_args()
+    mark_startup("arguments parsed")
+    
+    # Check for required environment, once for every mode
+    from config.settings import get_settings, validate_settings
+    try:
+        settings = get_settings()
+        # Reason: local validation/execution needs no API key; the interactive
+        # CLI validates on start and reports it in its own UI
+        if args.models or args.generate or args.batch or args.explain:
+            validate_settings(settings)
+    except Exception as e:
+        print(f"❌ Configuration error: {e}", file=sys.stderr)
+        print("\nPlease ensure your .env file is set up correctly.", file=sys.stderr)
+        print("Copy .env.example to .env and fill in your OpenRouter API key.", file=sys.stderr)
+        return EXIT_USAGE
+    mark_startup("settings loaded")
     
     # Set up debug mode
     if args.debug:
         import logging
         logging.basicConfig(level=logging.DEBUG)
     
+    exit_code = EXIT_OK
     try:
         # Handle different modes
         if args.models:
-            await list_models()
+            await list_models(settings)
         
         elif args.validate:
-            await validate_file(args.validate)
+            exit_code = await validate_files(args.validate, settings, args.format, args.explain)
         
         elif args.execute:
-            await execute_file(args.execute)
+            exit_code = await execute_files(args.execute, settings, args.format, args.explain)
         
         elif args.generate:
-            await generate_code(args.generate, args.syntax, args.output)
+            await generate_code(args.generate, settings, args.syntax, args.output)
+        
+        elif args.batch:
+            exit_code = await run_batch(
+                args.batch, settings, args.concurrency, args.syntax, args.model, args.output
+            )
         
         else:
             # Default to interactive mode
             print("🚀 Starting Flex AI Agent in interactive mode...")
             print("Use --help for command-line options.\n")
             
+            from ui.cli import main as cli_main
+            mark_startup("interactive CLI imported")
+            report_startup()
+            
             # Override model if specified
             if args.model:
                 try:
-                    settings = get_settings()
+                    from agents.flex_agent import FlexAIAgent
                     validate_settings(settings)
                     agent = FlexAIAgent(settings)
                     await agent.switch_model(args.model)
@@ -280,7 +604,7 @@ async def main() -> None:
                     print(f"⚠️ Warning: Could not switch to model {args.model}: {e}")
                     print("Using default model.\n")
             
-            await cli_main()
+            await cli_main(settings, resume=args.resume)
     
     except KeyboardInterrupt:
         # Clean exit - no error message needed since CLI handles it
@@ -294,6 +618,15 @@ async def main() -> None:
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        report_startup()
+        
+        # Release pooled OpenRouter connections, if anything opened them
+        http_client = sys.modules.get('tools.http_client')
+        if http_client is not None:
+            await http_client.close_shared_http_client()
+    
+    return exit_code
 
 
 if __name__ == "__main__":
@@ -302,23 +635,14 @@ if __name__ == "__main__":
         print("❌ Python 3.8 or higher is required.")
         sys.exit(1)
     
-    # Check for required environment
-    try:
-        get_settings()
-    except Exception as e:
-        print(f"❌ Configuration error: {e}")
-        print("\nPlease ensure your .env file is set up correctly.")
-        print("Copy .env.example to .env and fill in your OpenRouter API key.")
-        sys.exit(1)
-    
     # Run with proper cancellation handling
     try:
-        asyncio.run(main())
+        exit_code = asyncio.run(main())
     except KeyboardInterrupt:
         # Clean exit for Ctrl+C
-        pass
+        exit_code = 0
     except asyncio.CancelledError:
         # Clean exit for cancelled operations
-        pass
-    except SystemExit:
-        pass  # Let system exits pass through normally
\ No newline at end of file
+        exit_code = 0
+    
+    sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""
+Shared test fixtures.
+
+Every test gets its own cache directory, so the model catalog, latency
+metrics, session journals and search index written by agents under test never
+reach the developer's ./cache, where routing and hedge delays learn from them.
+"""
+
+import pytest
+
+from tools.model_manager import ModelManager
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """Point the default cache directory at a per-test temp directory."""
+    monkeypatch.setattr(ModelManager, "DEFAULT_CACHE_DIR", tmp_path / "cache")
+    return tmp_path / "cache"
@@ -0,0 +1,206 @@
+"""
+Unit tests for headless batch generation.
+
+These tests validate prompt file parsing, the concurrency limit, rate-limit
+retries and the NDJSON output of --batch, with a stand-in agent.
+"""
+
+import asyncio
+import json
+
+import pytest
+from pydantic_ai.exceptions import ModelHTTPError
+
+import main
+from agents.models import FlexCodeResponse, FlexSyntaxStyle
+from config.settings import Settings, OpenRouterSettings, FlexSettings, ApplicationSettings
+from tools.batch_runner import BatchError, BatchRunner, read_batch_file
+
+
+class FakeAgent:
+    """Agent that answers after a short delay, failing first where told to."""
+    
+    current_model_id = "test/model"
+    
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+    
+    async def generate_code(self, request):
+        self.calls.append(request.prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            pending = self.failures.get(request.prompt)
+            if pending:
+                self.failures[request.prompt] = pending[1:]
+                raise pending[0]
+            return FlexCodeResponse(
+                code=f'etb3("{request.prompt}")',
+                syntax_style=FlexSyntaxStyle.FRANCO,
+                explanation="Prints the prompt.",
+                model_used=request.model_id or self.current_model_id,
+                generation_time=0.01,
+                is_valid=request.prompt != "broken",
+                tokens_used=42
+            )
+        finally:
+            self.in_flight -= 1
+
+
+def write_prompts(path, *lines) -> str:
+    """Write a prompt file and return its path."""
+    path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Retry immediately."""
+    monkeypatch.setattr(BatchRunner, "RETRY_BASE_DELAY", 0.0)
+
+
+class TestReadBatchFile:
+    """Test suite for read_batch_file."""
+    
+    def test_strings_and_objects(self, tmp_path):
+        """Test that both line forms are read and defaults fill missing keys."""
+        path = write_prompts(
+            tmp_path / "prompts.jsonl",
+            '"print hello"',
+            '',
+            '{"id": "loop", "prompt": "count to 10", "syntax": "english", "model": "vendor/model"}'
+        )
+        
+        items = read_batch_file(path, syntax_style='franco', model_id="default/model")
+        
+        assert [item.item_id for item in items] == ["0", "loop"]
+        assert items[0].syntax_style == FlexSyntaxStyle.FRANCO
+        assert items[0].model_id == "default/model"
+        assert items[1].syntax_style == FlexSyntaxStyle.ENGLISH
+        assert items[1].model_id == "vendor/model"
+    
+    def test_invalid_line_names_its_number(self, tmp_path):
+        """Test that a malformed line fails the whole file before any model call."""
+        path = write_prompts(tmp_path / "prompts.jsonl", '"ok"', '{"id": 1}')
+        
+        with pytest.raises(BatchError, match=":2:"):
+            read_batch_file(path)
+
+
+class TestBatchRunner:
+    """Test suite for BatchRunner."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_and_order(self, tmp_path):
+        """Test that at most N prompts run at once and results come back in prompt order."""
+        items = read_batch_file(write_prompts(tmp_path / "p.jsonl", *[f'"prompt {i}"' for i in range(10)]))
+        agent = FakeAgent()
+        streamed = []
+        
+        results = await BatchRunner(agent, concurrency=3).run(items, on_result=streamed.append)
+        
+        assert agent.max_in_flight == 3
+        assert len(streamed) == 10
+        assert [result.index for result in results] == list(range(10))
+        assert all(result.status == 'ok' and result.tokens == 42 for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_is_retried(self, tmp_path, no_backoff):
+        """Test that a 429 is retried and counted as an attempt."""
+        items = read_batch_file(write_prompts(tmp_path / "p.jsonl", '"busy"', '"broken"'))
+        agent = FakeAgent({"busy": [ModelHTTPError(429, "test/model"), ModelHTTPError(503, "test/model")]})
+        
+        busy, broken = await BatchRunner(agent, concurrency=2).run(items)
+        
+        assert busy.status == 'ok' and busy.attempts == 3
+        assert broken.status == 'invalid' and broken.attempts == 1
+    
+    @pytest.mark.asyncio
+    async def test_permanent_errors_are_not_retried(self, tmp_path, no_backoff):
+        """Test that other errors and exhausted retries become error results."""
+        items = read_batch_file(write_prompts(tmp_path / "p.jsonl", '"bad key"', '"limited"'))
+        agent = FakeAgent({
+            "bad key": [ModelHTTPError(401, "test/model")],
+            "limited": [ModelHTTPError(429, "test/model")] * 3
+        })
+        
+        bad_key, limited = await BatchRunner(agent, max_retries=2).run(items)
+        
+        assert bad_key.status == 'error' and bad_key.attempts == 1
+        assert "401" in bad_key.error
+        assert limited.status == 'error' and limited.attempts == 3
+
+
+class TestBatchMode:
+    """Test suite for --batch in main.py."""
+    
+    @pytest.mark.asyncio
+    async def test_ndjson_output_and_exit_code(self, tmp_path, monkeypatch, capsys):
+        """Test that every prompt gets one NDJSON line and invalid code sets the exit code."""
+        import agents.flex_agent
+        monkeypatch.setattr(agents.flex_agent, "FlexAIAgent", lambda settings: FakeAgent())
+        settings = Settings(
+            openrouter=OpenRouterSettings(api_key="test_api_key"),
+            flex=FlexSettings(),
+            app=ApplicationSettings()
+        )
+        prompts = write_prompts(tmp_path / "p.jsonl", '"hello"', '"broken"')
+        output = tmp_path / "results.ndjson"
+        
+        exit_code = await main.run_batch(prompts, settings, concurrency=2, output_file=str(output))
+        
+        results = sorted(
+            (json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()),
+            key=lambda result: result['index']
+        )
+        assert exit_code == main.EXIT_PROBLEMS
+        assert [result['status'] for result in results] == ['ok', 'invalid']
+        assert results[0]['code'] == 'etb3("hello")'
+        assert "1 valid, 1 invalid, 0 failed" in capsys.readouterr().err
+    
+    @pytest.mark.asyncio
+    async def test_invalid_concurrency_is_usage_error(self, tmp_path, monkeypatch, capsys):
+        """Test that a concurrency below 1 is reported as a usage error, not a crash."""
+        import agents.flex_agent
+        monkeypatch.setattr(agents.flex_agent, "FlexAIAgent", lambda settings: FakeAgent())
+        settings = Settings(
+            openrouter=OpenRouterSettings(api_key="test_api_key"),
+            flex=FlexSettings(),
+            app=ApplicationSettings()
+        )
+        prompts = write_prompts(tmp_path / "p.jsonl", '"hello"')
+        
+        exit_code = await main.run_batch(prompts, settings, concurrency=0)
+        
+        assert exit_code == main.EXIT_USAGE
+        assert "at least 1" in capsys.readouterr().err
+        with pytest.raises(SystemExit) as exit_info:
+            main.create_parser().parse_args(["--batch", prompts, "--concurrency", "0"])
+        assert exit_info.value.code == main.EXIT_USAGE
+    
+    @pytest.mark.asyncio
+    async def test_failed_agent_setup_leaves_output_alone(self, tmp_path, monkeypatch):
+        """Test that an agent that cannot be built neither truncates nor leaks the output file."""
+        import agents.flex_agent
+        
+        def broken_agent(settings):
+            raise RuntimeError("spec missing")
+        
+        monkeypatch.setattr(agents.flex_agent, "FlexAIAgent", broken_agent)
+        settings = Settings(
+            openrouter=OpenRouterSettings(api_key="test_api_key"),
+            flex=FlexSettings(),
+            app=ApplicationSettings()
+        )
+        prompts = write_prompts(tmp_path / "p.jsonl", '"hello"')
+        output = tmp_path / "results.ndjson"
+        output.write_text('{"index": 0}\n', encoding='utf-8')
+        
+        with pytest.raises(RuntimeError, match="spec missing"):
+            await main.run_batch(prompts, settings, output_file=str(output))
+        
+        assert output.read_text(encoding='utf-8') == '{"index": 0}\n'
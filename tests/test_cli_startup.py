@@ -0,0 +1,101 @@
+"""
+Unit tests for FlexCLI startup.
+
+These tests validate that the CLI becomes usable before the model catalog has
+loaded, and that commands needing the catalog wait on the shared load.
+"""
+
+import asyncio
+
+import pytest
+
+from agents.models import OpenRouterModel
+from config.settings import Settings, OpenRouterSettings, FlexSettings, ApplicationSettings
+from tools.model_manager import ModelManager, ModelManagerError
+from ui import formatters
+from ui.cli import FlexCLI
+
+
+@pytest.fixture
+def cli():
+    """Create a CLI with test settings."""
+    settings = Settings(
+        openrouter=OpenRouterSettings(api_key="test_api_key"),
+        flex=FlexSettings(),
+        app=ApplicationSettings()
+    )
+    return FlexCLI(settings)
+
+
+@pytest.fixture
+def errors(monkeypatch):
+    """Collect errors shown by the CLI."""
+    shown = []
+    monkeypatch.setattr(formatters, "display_error", shown.append)
+    return shown
+
+
+def catalog_model() -> OpenRouterModel:
+    """Create a catalog entry."""
+    return OpenRouterModel(
+        id="test/model",
+        name="Test Model",
+        description="",
+        context_length=8000,
+        pricing={"prompt": 0.0, "completion": 0.0}
+    )
+
+
+class TestBackgroundCatalog:
+    """Test suite for the background model catalog load."""
+    
+    @pytest.mark.asyncio
+    async def test_prompt_ready_before_catalog(self, cli, monkeypatch):
+        """Test that startup returns while the catalog is still loading."""
+        release = asyncio.Event()
+        calls = []
+        
+        async def list_models(self, use_cache=True):
+            calls.append(use_cache)
+            await release.wait()
+            return [catalog_model()]
+        monkeypatch.setattr(ModelManager, "list_models", list_models)
+        
+        await asyncio.wait_for(cli._initialize_components(), timeout=5)
+        await asyncio.sleep(0)
+        
+        assert cli.catalog_status == 'loading'
+        assert cli.model_manager is cli.agent.model_manager
+        assert any("loading models" in text for _, text in cli._get_prompt_parts())
+        
+        release.set()
+        assert await cli._wait_for_catalog()
+        assert cli.catalog_status == 'ready'
+        assert len(calls) == 1
+        assert not any("loading" in text for _, text in cli._get_prompt_parts())
+    
+    @pytest.mark.asyncio
+    async def test_failure_reported_once_and_retried(self, cli, monkeypatch, errors):
+        """Test that a failed load is shown once and retried by the next command."""
+        calls = []
+        
+        async def list_models(self, use_cache=True):
+            calls.append(use_cache)
+            if len(calls) == 1:
+                raise ModelManagerError("network unreachable")
+            return [catalog_model()]
+        monkeypatch.setattr(ModelManager, "list_models", list_models)
+        
+        await cli._initialize_components()
+        await asyncio.wait([cli._catalog_task])
+        
+        assert cli.catalog_status == 'failed'
+        assert any("offline" in text for _, text in cli._get_prompt_parts())
+        assert cli._report_catalog_failure()
+        assert cli._report_catalog_failure()
+        assert len(errors) == 1
+        assert "network unreachable" in errors[0]
+        
+        assert await cli._wait_for_catalog()
+        assert len(calls) == 2
+        assert len(errors) == 1
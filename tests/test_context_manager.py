@@ -0,0 +1,119 @@
+"""
+Unit tests for the conversation context manager.
+
+These tests check that old turns are folded into the rolling summary in the
+background and that the verbatim history stays within its token budget.
+"""
+
+import asyncio
+import pytest
+
+from agents.context_manager import ConversationContextManager
+from tools.token_counter import get_token_counter
+
+
+def fill(manager, turns, words=50):
+    """Add alternating user/assistant turns of a fixed size."""
+    for i in range(turns):
+        manager.add('user' if i % 2 == 0 else 'assistant', f"turn {i} " + "karr l7d etb3 " * words)
+
+
+class TestConversationContextManager:
+    """Test suite for ConversationContextManager."""
+    
+    def test_no_summary_within_budget(self):
+        """Test that short conversations are left alone."""
+        manager = ConversationContextManager()
+        fill(manager, 4, words=5)
+        
+        assert manager.schedule_summary(recent_tokens=10000) is None
+        assert len(manager) == 4
+    
+    @pytest.mark.asyncio
+    async def test_old_turns_are_folded_into_summary(self):
+        """Test that the summarizer receives the oldest turns and they are dropped."""
+        calls = []
+        
+        async def summarizer(previous, entries):
+            calls.append((previous, [entry['content'][:6] for entry in entries]))
+            return f"summary of {len(entries)} turns"
+        
+        manager = ConversationContextManager(summarizer=summarizer)
+        fill(manager, 20, words=10)
+        
+        task = manager.schedule_summary(recent_tokens=300)
+        await task
+        
+        remaining = get_token_counter().count_batch(entry['content'] for entry in manager.entries)
+        assert calls[0][0] == ""
+        assert calls[0][1][0] == "turn 0"
+        assert manager.summary == f"summary of {manager.summarized_entries} turns"
+        assert manager.entries[-1]['content'].startswith("turn 19")
+        assert sum(remaining) <= 150
+        assert len(manager) + manager.summarized_entries == 20
+        assert [entry['content'][:7] for entry in manager.transcript[:2]] == ["turn 0 ", "turn 1 "]
+        assert len(manager.transcript) == 20
+    
+    @pytest.mark.asyncio
+    async def test_recent_turns_always_kept(self):
+        """Test that the newest turns stay verbatim even when oversized."""
+        manager = ConversationContextManager()
+        fill(manager, 6, words=500)
+        
+        await manager.schedule_summary(recent_tokens=100)
+        
+        assert len(manager) == manager.MIN_RECENT_ENTRIES
+    
+    @pytest.mark.asyncio
+    async def test_failed_summarizer_falls_back_to_extractive(self, capsys):
+        """Test that a summarizer error still compacts the history."""
+        async def summarizer(previous, entries):
+            raise RuntimeError("model unavailable")
+        
+        manager = ConversationContextManager(summarizer=summarizer, summary_max_tokens=200)
+        fill(manager, 20)
+        
+        await manager.schedule_summary(recent_tokens=500)
+        
+        assert "Warning: Conversation summary failed" in capsys.readouterr().out
+        assert manager.summary.startswith("- ")
+        assert get_token_counter().count(manager.summary) <= 200
+    
+    @pytest.mark.asyncio
+    async def test_summary_runs_in_background(self):
+        """Test that scheduling returns immediately and one update runs at a time."""
+        release = asyncio.Event()
+        
+        async def summarizer(previous, entries):
+            await release.wait()
+            return "done"
+        
+        manager = ConversationContextManager(summarizer=summarizer)
+        fill(manager, 20)
+        
+        task = manager.schedule_summary(recent_tokens=500)
+        assert manager.is_summarizing
+        assert manager.schedule_summary(recent_tokens=500) is task
+        assert len(manager) == 20
+        
+        release.set()
+        await manager.wait()
+        assert manager.summary == "done"
+    
+    @pytest.mark.asyncio
+    async def test_clear_discards_running_summary(self):
+        """Test that clearing during a summary leaves the history empty."""
+        async def summarizer(previous, entries):
+            await asyncio.sleep(0)
+            return "stale"
+        
+        manager = ConversationContextManager(summarizer=summarizer)
+        fill(manager, 20)
+        manager.schedule_summary(recent_tokens=500)
+        
+        manager.clear()
+        await asyncio.sleep(0.01)
+        
+        assert manager.summary == ""
+        assert len(manager) == 0
+        assert manager.transcript == []
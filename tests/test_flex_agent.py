@@ -0,0 +1,732 @@
+"""
+Unit tests for FlexAIAgent.
+
+These tests exercise agent-side logic that does not need a live model, such
+as packing conversation history into the model's context window.
+"""
+
+import asyncio
+
+import pytest
+
+from agents.flex_agent import FlexAIAgent
+from agents.models import OpenRouterModel, LineEdit
+from config.settings import Settings, OpenRouterSettings, FlexSettings, ApplicationSettings
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    """Create an agent with test settings, keeping its cache, journals and index in a temp directory."""
+    # Reason: ./cache holds the user's journals, search index and metrics
+    monkeypatch.chdir(tmp_path)
+    settings = Settings(
+        openrouter=OpenRouterSettings(api_key="test_api_key"),
+        flex=FlexSettings(),
+        app=ApplicationSettings(max_history_tokens=2000)
+    )
+    return FlexAIAgent(settings)
+
+
+@pytest.fixture
+def history():
+    """Create a long alternating conversation history."""
+    entries = []
+    for i in range(40):
+        entries.append({'type': 'user', 'content': f"question number {i} about Franco loops"})
+        entries.append({'type': 'assistant', 'content': f"answer {i}: " + "karr i=0 l7d 5 { etb3(i) } " * 10})
+    return entries
+
+
+@pytest.fixture
+def model_calls(agent, monkeypatch, tmp_path):
+    """Route requests to a local function model that counts calls."""
+    from pydantic_ai.messages import ModelResponse, TextPart
+    from pydantic_ai.models.function import FunctionModel
+    from tools.metrics_store import MetricsStore
+    
+    # Reason: fake sub-second latencies must not feed real routing and hedge delays
+    agent.model_manager.metrics_store = MetricsStore(tmp_path / "metrics.db", persist=False)
+    calls = []
+    
+    def respond(messages, info):
+        calls.append(list(messages))
+        return ModelResponse(parts=[TextPart("karr i=0 l7d 2 { etb3(i) }")])
+    
+    async def stream(messages, info):
+        calls.append(list(messages))
+        for piece in ("karr i=0 l7d 2 ", "{ etb3(i) }"):
+            yield piece
+    
+    model = FunctionModel(respond, stream_function=stream)
+    
+    async def select_model(prompt):
+        return agent.current_model_id, model
+    
+    monkeypatch.setattr(agent, "_select_model", select_model)
+    agent.settings.app.enable_spec_retrieval = False
+    return calls
+
+
+async def collect(stream):
+    """Drain an agent stream into a list of chunks."""
+    return [chunk async for chunk in stream]
+
+
+class TestConversationContext:
+    """Test token-budgeted conversation context packing."""
+    
+    def test_empty_history(self, agent):
+        """Test that no history yields no context."""
+        assert agent._format_conversation_context([]) == ""
+    
+    def test_keeps_newest_entries_within_budget(self, agent, history):
+        """Test that packing keeps the most recent entries and fits the budget."""
+        context = agent._format_conversation_context(history, token_budget=500)
+        
+        assert context.startswith("Previous conversation context:")
+        assert "answer 39" in context
+        assert "question number 0 " not in context
+        assert agent.model_manager.estimate_tokens(context) <= 500
+    
+    def test_large_budget_keeps_whole_history(self, agent, history):
+        """Test that a large budget is filled rather than cut at a fixed count."""
+        context = agent._format_conversation_context(history, token_budget=100000)
+        
+        assert "question number 0 " in context
+        assert "..." not in context
+    
+    def test_budget_follows_model_context_window(self, agent, history):
+        """Test that small-context models get a smaller history budget."""
+        small = OpenRouterModel(id="test/small", name="Small", pricing={}, context_length=6000)
+        large = OpenRouterModel(id="test/large", name="Large", pricing={}, context_length=200000)
+        agent.model_manager._index_models([small, large])
+        
+        small_budget = agent.history_token_budget("test/small", "hi")
+        large_budget = agent.history_token_budget("test/large", "hi")
+        
+        assert small_budget < 6000 - agent.RESERVED_CONTEXT_TOKENS
+        assert large_budget == 2000
+    
+    def test_summary_precedes_recent_messages(self, agent, history):
+        """Test that the rolling summary is included ahead of recent turns."""
+        context = agent._format_conversation_context(history[-2:], token_budget=1000, summary="User wants an XO game")
+        
+        assert "Summary of earlier conversation:\nUser wants an XO game" in context
+        assert context.index("User wants an XO game") < context.index("answer 39")
+    
+    def test_summary_without_history(self, agent):
+        """Test that a summary alone still produces context."""
+        context = agent._format_conversation_context([], token_budget=1000, summary="Earlier: loops")
+        
+        assert "Earlier: loops" in context
+
+
+class TestAgentCache:
+    """Test the per-model agent cache."""
+    
+    @pytest.mark.asyncio
+    async def test_switching_back_reuses_agent(self, agent):
+        """Test that A/B switching returns the already built agents."""
+        first = agent.agent
+        
+        await agent.switch_model("openai/gpt-4o-mini")
+        second = agent.agent
+        await agent.switch_model(agent.settings.app.default_model)
+        
+        assert second is not first
+        assert agent.agent is first
+    
+    @pytest.mark.asyncio
+    async def test_tools_are_shared_between_agents(self, agent):
+        """Test that cached agents share tool functions but not per-run retry state."""
+        first = agent.agent
+        await agent.switch_model("openai/gpt-4o-mini")
+        
+        first_tools = first._function_tools
+        second_tools = agent.agent._function_tools
+        
+        assert len(first_tools) == 11
+        assert all(first_tools[name].function is second_tools[name].function for name in first_tools)
+        assert all(first_tools[name] is not second_tools[name] for name in first_tools)
+        
+        first_tools["validate_flex_code"].current_retry = 1
+        assert second_tools["validate_flex_code"].current_retry == 0
+    
+    @pytest.mark.asyncio
+    async def test_search_past_work_caps_content(self, agent, tmp_path):
+        """Test that earlier programs already on disk are found and long ones are truncated."""
+        search_past_work = next(tool for tool in agent._tools if tool.name == "search_past_work").function
+        program = tmp_path / "quicksort.flex"
+        program.write_text("// quicksort\n" + "etb3(1)\n" * 2000, encoding='utf-8')
+        
+        result = await search_past_work(None, "quicksort")
+        
+        assert result.startswith(f"File {program.resolve()}")
+        assert result.endswith("... (truncated)\n```")
+        assert len(result) < agent.SEARCH_RESULT_MAX_CHARS + 200
+    
+    def test_cache_is_bounded(self, agent):
+        """Test that least recently used agents are evicted."""
+        for i in range(agent.AGENT_CACHE_SIZE + 3):
+            agent._get_agent(f"vendor/model-{i}")
+        
+        assert len(agent._agents) == agent.AGENT_CACHE_SIZE
+        assert ("vendor/model-0", "") not in agent._agents
+    
+    def test_update_model_reuses_models(self, agent):
+        """Test that the provider manager hands out one model per ID."""
+        provider_manager = agent.provider_manager
+        
+        model = provider_manager.create_model("openai/gpt-4o-mini")
+        updated = provider_manager.update_model(agent.agent, "openai/gpt-4o-mini")
+        
+        assert updated.model is model
+
+
+class TestSpecRetrieval:
+    """Test that relevant spec sections are attached to requests."""
+    
+    def test_user_prompt_includes_spec_sections(self, agent, tmp_path):
+        """Test that retrieved sections precede the user input."""
+        agent.spec_retriever.index_path = tmp_path / "spec_index.json.gz"
+        
+        prompt = agent._build_user_prompt(agent.current_model_id, "list index out of range in karr loop")
+        
+        assert prompt.startswith("Relevant Flex specification sections")
+        assert prompt.endswith("Current user input: list index out of range in karr loop")
+    
+    def test_retrieval_can_be_disabled(self, agent):
+        """Test that ENABLE_SPEC_RETRIEVAL=false sends the input unchanged."""
+        agent.settings.app.enable_spec_retrieval = False
+        
+        assert agent._build_user_prompt(agent.current_model_id, "hello") == "hello"
+    
+    def test_system_prompt_has_no_file_reference(self, agent):
+        """Test that the system prompt no longer points at an unavailable file."""
+        assert "#file:" not in agent.system_prompt
+
+
+class TestResponseCaching:
+    """Test that repeated prompts are answered from the response cache."""
+    
+    @pytest.mark.asyncio
+    async def test_repeated_run_uses_cache(self, agent, model_calls):
+        """Test that the second identical run skips the model."""
+        first = await agent.run("show me Flex code examples", conversation_history=[])
+        second = await agent.run("Show me Flex code examples", conversation_history=[])
+        
+        assert first == second
+        assert len(model_calls) == 1
+    
+    @pytest.mark.asyncio
+    async def test_stream_replays_cached_response(self, agent, model_calls):
+        """Test that a cached answer is replayed through run_stream."""
+        first = await agent.run("show me a loop", conversation_history=[])
+        chunks = [chunk async for chunk in agent.run_stream("show me a loop", conversation_history=[])]
+        
+        assert chunks[-1] == first
+        assert len(model_calls) == 1
+    
+    @pytest.mark.asyncio
+    async def test_stream_deltas(self, agent, model_calls):
+        """Test that delta streams yield new text only and cache the joined answer."""
+        deltas = [chunk async for chunk in agent.run_stream("show me a loop", conversation_history=[], delta=True)]
+        replayed = [chunk async for chunk in agent.run_stream("show me a loop", conversation_history=[], delta=True)]
+        
+        assert len(deltas) > 1
+        assert "".join(deltas) == "karr i=0 l7d 2 { etb3(i) }"
+        assert "".join(replayed) == "".join(deltas)
+        assert len(model_calls) == 1
+    
+    def test_side_effect_tools_are_not_cached(self, agent):
+        """Test that responses which created files are not cached."""
+        from pydantic_ai.messages import ModelResponse, ToolCallPart
+        
+        messages = [ModelResponse(parts=[ToolCallPart(tool_name="create_file", args={})])]
+        agent._cache_response("make a file", "model/a", "", "done", messages)
+        
+        assert len(agent.response_cache) == 0
+
+
+
+class TestSessionHistory:
+    """Test that sessions send earlier turns as native message history."""
+    
+    @pytest.mark.asyncio
+    async def test_history_sent_as_messages(self, agent, model_calls):
+        """Test that earlier turns arrive as separate messages, not a text blob."""
+        from pydantic_ai.messages import ModelRequest, ModelResponse, SystemPromptPart, UserPromptPart
+        
+        await agent.run("write a karr loop")
+        await agent.run("now make it count down")
+        
+        messages = model_calls[-1]
+        assert isinstance(messages[0].parts[0], SystemPromptPart)
+        assert isinstance(messages[1], ModelRequest)
+        assert messages[1].parts[0].content == "write a karr loop"
+        assert isinstance(messages[2], ModelResponse)
+        assert messages[-1].parts[-1].content == "now make it count down"
+        assert "Previous conversation context" not in messages[-1].parts[-1].content
+    
+    @pytest.mark.asyncio
+    async def test_prefix_is_byte_stable(self, agent, model_calls):
+        """Test that each request extends the previous one's prefix unchanged."""
+        from pydantic_ai.messages import ModelMessagesTypeAdapter
+        
+        agent.settings.app.enable_spec_retrieval = True
+        for prompt in ("write a karr loop", "add a lw check", "print with etb3"):
+            await agent.run(prompt)
+        
+        second, third = model_calls[1], model_calls[2]
+        prefix = ModelMessagesTypeAdapter.dump_json(second[:-1])
+        assert ModelMessagesTypeAdapter.dump_json(third[:len(second) - 1]) == prefix
+        # Retrieved spec sections only travel with the newest message
+        assert "Relevant Flex specification sections" in third[-1].parts[-1].content
+        assert b"Relevant Flex specification sections:" not in ModelMessagesTypeAdapter.dump_json(third[1:-1])
+    
+    @pytest.mark.asyncio
+    async def test_stream_records_turn(self, agent, model_calls):
+        """Test that streamed turns are recorded in the session too."""
+        chunks = [chunk async for chunk in agent.run_stream("write a karr loop")]
+        
+        assert agent.conversation.entries[-1]['content'] == chunks[-1]
+        assert len(agent.current_session.message_history) == 2
+    
+    @pytest.mark.asyncio
+    async def test_summarized_turns_leave_message_history(self, agent, model_calls):
+        """Test that turns folded into the summary are no longer replayed."""
+        for prompt in ("first question", "second question"):
+            await agent.run(prompt)
+        
+        # Reason: stands in for a background fold of the first turn
+        del agent.conversation.entries[:2]
+        agent.conversation.summary = "User asked a first question."
+        await agent.run("third question")
+        
+        messages = model_calls[-1]
+        contents = [part.content for message in messages for part in message.parts]
+        assert "first question" not in contents
+        assert "second question" in contents
+        assert "User asked a first question." in messages[-1].parts[-1].content
+    
+    @pytest.mark.asyncio
+    async def test_new_session_starts_empty(self, agent, model_calls):
+        """Test that starting a session forgets earlier turns."""
+        await agent.run("first question")
+        agent.start_session()
+        await agent.run("fresh start")
+        
+        assert len(model_calls[-1]) == 2
+    
+    @pytest.mark.asyncio
+    async def test_resumed_session_replays_journal(self, agent, model_calls, tmp_path):
+        """Test that a resumed session has the same history as the journaled one."""
+        agent.sessions_dir = tmp_path
+        session_id = agent.start_session().session_id
+        for prompt in ("first question", "second question"):
+            await agent.run(prompt)
+        agent.journal.flush()
+        
+        resumed = FlexAIAgent(agent.settings)
+        resumed.sessions_dir = tmp_path
+        await resumed.resume_session(session_id)
+        
+        assert resumed.current_session.session_id == session_id
+        assert resumed.current_session.message_history == agent.current_session.message_history
+        assert [entry['content'] for entry in resumed.conversation.entries] == [entry['content'] for entry in agent.conversation.entries]
+        assert resumed.journal.turns == 2
+
+
+class TestHedgedRequests:
+    """Test hedging streamed requests across the fallback chain."""
+    
+    @pytest.fixture(autouse=True)
+    def metrics(self, agent, tmp_path):
+        """Keep metrics from other tests (and earlier runs) out of these."""
+        from tools.metrics_store import MetricsStore
+        
+        agent.model_manager.metrics_store = MetricsStore(tmp_path / "metrics.db", persist=False)
+    
+    @pytest.fixture
+    def race(self, agent, monkeypatch):
+        """Stream from a configurable primary model with one fast fallback."""
+        from pydantic_ai.models.function import FunctionModel
+        
+        state = {"primary_delay": 0.0, "primary_error": None, "primary_cancelled": False, "fallback_calls": 0}
+        
+        async def primary(messages, info):
+            try:
+                await asyncio.sleep(state["primary_delay"])
+            except asyncio.CancelledError:
+                state["primary_cancelled"] = True
+                raise
+            if state["primary_error"]:
+                raise state["primary_error"]
+            yield "primary answer"
+        
+        async def fallback(messages, info):
+            state["fallback_calls"] += 1
+            yield "fallback answer"
+        
+        primary_model = FunctionModel(stream_function=primary)
+        fallback_model = FunctionModel(stream_function=fallback)
+        
+        async def select_model(prompt):
+            return agent.current_model_id, primary_model
+        
+        monkeypatch.setattr(agent, "_select_model", select_model)
+        monkeypatch.setattr(
+            agent.provider_manager,
+            "create_fallback_chain",
+            lambda primary_id, fallbacks: [(primary_id, primary_model), ("test/fallback", fallback_model)]
+        )
+        agent.settings.app.enable_spec_retrieval = False
+        agent.settings.app.fallback_models = ["test/fallback"]
+        agent.settings.app.hedge_default_delay = 0.05
+        return state
+    
+    @pytest.mark.asyncio
+    async def test_fast_primary_is_not_hedged(self, agent, race):
+        """Test that a first token before the deadline keeps the request on one model."""
+        chunks = [chunk async for chunk in agent.run_stream("write a loop", conversation_history=[])]
+        
+        assert chunks[-1] == "primary answer"
+        assert race["fallback_calls"] == 0
+        assert agent.model_manager.metrics_store.get_stats(agent.current_model_id).hedged == 0
+    
+    @pytest.mark.asyncio
+    async def test_slow_primary_is_hedged(self, agent, race):
+        """Test that a late first token starts the fallback, which wins and cancels the primary."""
+        race["primary_delay"] = 5.0
+        
+        chunks = [chunk async for chunk in agent.run_stream("write a loop")]
+        
+        assert chunks[-1] == "fallback answer"
+        assert race["primary_cancelled"]
+        assert agent.last_response_model_id == "test/fallback"
+        assert agent.conversation.entries[-1]['model'] == "test/fallback"
+        store = agent.model_manager.metrics_store
+        assert store.get_stats("test/fallback").hedge_win_rate == 1.0
+        assert store.get_stats(agent.current_model_id).hedge_win_rate == 0.0
+        # Reason: the cancelled loser is not counted as a failed call
+        assert store.get_stats(agent.current_model_id).failures == 0
+    
+    @pytest.mark.asyncio
+    async def test_failed_primary_falls_back_immediately(self, agent, race):
+        """Test that a failing primary starts the fallback without waiting for the deadline."""
+        race["primary_error"] = RuntimeError("provider down")
+        agent.settings.app.hedge_default_delay = 30.0
+        
+        chunks = await asyncio.wait_for(
+            collect(agent.run_stream("write a loop", conversation_history=[])), timeout=5
+        )
+        
+        assert chunks[-1] == "fallback answer"
+        assert agent.model_manager.metrics_store.get_stats(agent.current_model_id).failures == 1
+    
+    @pytest.mark.asyncio
+    async def test_all_models_failing_raises(self, agent, race, monkeypatch):
+        """Test that the last error is raised when every model in the chain fails."""
+        from pydantic_ai.models.function import FunctionModel
+        
+        async def broken(messages, info):
+            raise RuntimeError("fallback down")
+            yield ""
+        
+        race["primary_error"] = RuntimeError("provider down")
+        monkeypatch.setattr(
+            agent.provider_manager,
+            "create_fallback_chain",
+            lambda primary_id, fallbacks: [(primary_id, None), ("test/fallback", FunctionModel(stream_function=broken))]
+        )
+        
+        with pytest.raises(RuntimeError, match="down"):
+            await collect(agent.run_stream("write a loop", conversation_history=[]))
+    
+    @pytest.mark.asyncio
+    async def test_side_effect_tool_runs_once(self, agent, monkeypatch):
+        """Test that when both hedged models call create_file, the file is written once."""
+        from pydantic_ai.messages import ToolReturnPart
+        from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+        
+        writes = []
+        
+        async def execute_operation(operation):
+            writes.append(operation.filepath)
+            raise RuntimeError("not written in tests")
+        
+        def model(tool_call_delay):
+            async def stream(messages, info):
+                if any(isinstance(part, ToolReturnPart) for message in messages for part in message.parts):
+                    # Reason: the first model has called its tool before either answers
+                    await asyncio.sleep(0.2)
+                    yield "saved"
+                    return
+                await asyncio.sleep(tool_call_delay)
+                yield {0: DeltaToolCall(name="create_file", json_args='{"filename": "x.flex", "content": "etb3(1)"}')}
+            return FunctionModel(stream_function=stream)
+        
+        primary_model, fallback_model = model(0.1), model(0.0)
+        
+        async def select_model(prompt):
+            return agent.current_model_id, primary_model
+        
+        monkeypatch.setattr(agent, "_select_model", select_model)
+        monkeypatch.setattr(agent.file_manager, "execute_operation", execute_operation)
+        monkeypatch.setattr(
+            agent.provider_manager,
+            "create_fallback_chain",
+            lambda primary_id, fallbacks: [(primary_id, primary_model), ("test/fallback", fallback_model)]
+        )
+        agent.settings.app.enable_spec_retrieval = False
+        agent.settings.app.fallback_models = ["test/fallback"]
+        agent.settings.app.hedge_default_delay = 0.05
+        
+        chunks = await collect(agent.run_stream("save a program", conversation_history=[]))
+        
+        assert chunks[-1] == "saved"
+        assert writes == ["x.flex"]
+        assert agent.last_response_model_id == "test/fallback"
+    
+    def test_hedge_delay_uses_p95_ttft(self, agent):
+        """Test that the hedge deadline follows the model's measured p95 time to first token."""
+        manager = agent.model_manager
+        assert manager.get_hedge_delay("test/model", 7.0) == 7.0
+        
+        for ttft in (0.1, 0.2, 0.3, 0.4, 2.0):
+            manager.metrics_store.record("test/model", True, 3.0, ttft=ttft)
+        
+        assert manager.get_hedge_delay("test/model", 7.0) == pytest.approx(2.0, rel=0.05)
+
+
+class TestFanOut:
+    """Test best-of-N generation across several models."""
+    
+    SAFE = 'etb3("hi")'
+    ONE_ERROR = "karr i=0 l7d length(arr) {\n  etb3(arr[i])\n}"
+    TWO_ERRORS = ONE_ERROR + "\nkarr j=0 l7d length(b) {\n  etb3(b[j])\n}"
+    
+    @pytest.fixture
+    def models(self, agent, monkeypatch, tmp_path):
+        """Serve each model ID from a local function model with a set answer and delay."""
+        from pydantic_ai.messages import ModelResponse, TextPart
+        from pydantic_ai.models.function import FunctionModel
+        from tools.metrics_store import MetricsStore
+        
+        answers = {}
+        
+        def create_model(model_id, provider_config=None):
+            code, delay = answers[model_id]
+            
+            async def respond(messages, info):
+                await asyncio.sleep(delay)
+                return ModelResponse(parts=[TextPart(f"```flex\n{code}\n```\nDone.")])
+            
+            return FunctionModel(respond)
+        
+        monkeypatch.setattr(agent.provider_manager, "create_model", create_model)
+        agent.model_manager.metrics_store = MetricsStore(tmp_path / "metrics.db", persist=False)
+        agent.settings.app.enable_spec_retrieval = False
+        return answers
+    
+    @pytest.mark.asyncio
+    async def test_first_passing_candidate_stops_the_rest(self, agent, models):
+        """Test that a passing candidate cancels slower models."""
+        models.update({"fast/model": (self.SAFE, 0.0), "slow/model": (self.SAFE, 5.0)})
+        
+        result = await agent.run_fan_out("print hi", model_ids=["slow/model", "fast/model"])
+        
+        assert result.best.model_id == "fast/model"
+        assert result.best.passed
+        assert result.stopped_early
+        assert result.elapsed < 2
+        slow = result.candidates[0]
+        assert slow.model_id == "slow/model"
+        assert slow.code is None and slow.error.startswith("Cancelled")
+    
+    @pytest.mark.asyncio
+    async def test_fewest_errors_wins_without_a_pass(self, agent, models):
+        """Test that the candidate with the fewest validation errors is kept."""
+        models.update({"a/model": (self.TWO_ERRORS, 0.0), "b/model": (self.ONE_ERROR, 0.01)})
+        
+        result = await agent.run_fan_out("loop over arrays", model_ids=["a/model", "b/model"])
+        
+        assert not result.stopped_early
+        assert result.best.model_id == "b/model"
+        assert [candidate.error_count for candidate in result.candidates] == [2, 1]
+        assert all(candidate.latency > 0 for candidate in result.candidates)
+    
+    @pytest.mark.asyncio
+    async def test_timed_out_model_is_reported(self, agent, models):
+        """Test that a model over its timeout becomes a failed candidate."""
+        models.update({"slow/model": (self.SAFE, 5.0), "broken/model": (self.ONE_ERROR, 0.0)})
+        
+        result = await agent.run_fan_out("print hi", model_ids=["slow/model", "broken/model"], timeout=0.1)
+        
+        assert result.candidates[0].error == "Timed out after 0.1s"
+        assert result.best.model_id == "broken/model"
+        assert agent.model_manager.metrics_store.get_stats("slow/model").failures == 1
+    
+    def test_extract_code(self):
+        """Test that the longest fenced block is taken from a response."""
+        response = "Here:\n```flex\netb3(1)\n```\nand\n```\nkarr i=0 l7d 3 {\n  etb3(i)\n}\n```"
+        
+        assert FlexAIAgent.extract_code(response) == "karr i=0 l7d 3 {\n  etb3(i)\n}"
+        assert FlexAIAgent.extract_code("no code here") == ""
+
+
+class TestCodeGeneration:
+    """Test structured code generation with the validate-repair loop."""
+    
+    DRAFT = 'rakm x = 1\netb3("start")\netb3(x);\netb3("middle")\netb3("more")\netb3("end")'
+    
+    @pytest.fixture
+    def generator(self, agent, monkeypatch, tmp_path):
+        """Answer structured generation and repair calls from local function models."""
+        from pydantic_ai.messages import ModelResponse, ToolCallPart
+        from pydantic_ai.models.function import FunctionModel
+        from tools.metrics_store import MetricsStore
+        
+        state = {"draft": self.DRAFT, "fix": 'etb3(x)', "prompts": []}
+        
+        def respond(messages, info):
+            tool = info.output_tools[0]
+            state["prompts"].append(messages[-1].parts[-1].content)
+            if "edits" in tool.parameters_json_schema["properties"]:
+                args = {"edits": [{"line_number": 3, "replacement": state["fix"]}]}
+            else:
+                args = {"code": state["draft"], "explanation": "Prints some values."}
+            return ModelResponse(parts=[ToolCallPart(tool.name, args)])
+        
+        model = FunctionModel(respond)
+        monkeypatch.setattr(agent.provider_manager, "create_model", lambda model_id, provider_config=None: model)
+        agent.model_manager.metrics_store = MetricsStore(tmp_path / "metrics.db", persist=False)
+        agent.settings.app.enable_spec_retrieval = False
+        return state
+    
+    @pytest.mark.asyncio
+    async def test_valid_draft_needs_no_repair(self, agent, generator):
+        """Test that valid structured output is returned after one call."""
+        from agents.models import FlexCodeRequest
+        generator["draft"] = 'etb3("hi")'
+        
+        response = await agent.generate_code(FlexCodeRequest(prompt="print hi"))
+        
+        assert response.code == 'etb3("hi")'
+        assert response.explanation == "Prints some values."
+        assert response.is_valid and response.repair_rounds == 0
+        assert len(generator["prompts"]) == 1
+        assert response.tokens_used > 0
+    
+    @pytest.mark.asyncio
+    async def test_repair_sends_only_failing_lines(self, agent, generator):
+        """Test that a repair round sends the failing line with its neighbours only."""
+        from agents.models import FlexCodeRequest
+        
+        response = await agent.generate_code(FlexCodeRequest(prompt="print values"))
+        
+        assert response.is_valid
+        assert response.repair_rounds == 1
+        assert response.code.splitlines()[2] == "etb3(x)"
+        repair_prompt = generator["prompts"][1]
+        assert "Line 3: Semicolons are not allowed in Flex" in repair_prompt
+        assert "3: etb3(x);" in repair_prompt
+        assert 'etb3("end")' not in repair_prompt
+    
+    @pytest.mark.asyncio
+    async def test_repair_rounds_are_bounded(self, agent, generator):
+        """Test that unfixable code stops after CODE_REPAIR_ROUNDS and is flagged."""
+        from agents.models import FlexCodeRequest
+        generator["fix"] = "etb3(x);"
+        agent.settings.app.code_repair_rounds = 2
+        
+        response = await agent.generate_code(FlexCodeRequest(prompt="print values"))
+        
+        assert not response.is_valid
+        assert response.repair_rounds == 2
+        assert len(generator["prompts"]) == 3
+        assert any("Semicolons" in warning for warning in response.warnings)
+    
+    def test_apply_line_edits(self):
+        """Test multi-line replacements and deletions keep other lines in place."""
+        code = "a\nb\nc\nd"
+        edits = [
+            LineEdit(line_number=2, replacement="b1\nb2"),
+            LineEdit(line_number=4, replacement=""),
+            LineEdit(line_number=9, replacement="ignored")
+        ]
+        
+        assert FlexAIAgent._apply_line_edits(code, edits) == "a\nb1\nb2\nc"
+
+
+class TestStructuredRun:
+    """Test the FlexCodeResponse result mode."""
+    
+    @pytest.fixture
+    def structured_model(self, agent, monkeypatch):
+        """Answer with a final_result call carrying the structured fields; return the output schemas seen."""
+        from pydantic_ai.messages import ModelResponse, ToolCallPart
+        from pydantic_ai.models.function import FunctionModel
+        
+        schemas = []
+        
+        def respond(messages, info):
+            tool = info.output_tools[0]
+            schemas.append(tool.parameters_json_schema)
+            return ModelResponse(parts=[ToolCallPart(tool.name, {
+                "code": 'rakm x = 1\netb3(x);',
+                "syntax_style": "franco",
+                "explanation": "Prints x.",
+                "warnings": ["Remember l7d is inclusive"]
+            })])
+        
+        model = FunctionModel(respond)
+        
+        async def select_model(prompt):
+            return "routed/model", model
+        
+        monkeypatch.setattr(agent, "_select_model", select_model)
+        agent.settings.app.enable_spec_retrieval = False
+        return schemas
+    
+    @pytest.mark.asyncio
+    async def test_fields_come_back_typed(self, agent, structured_model):
+        """Test that code and explanation arrive as fields, with validator findings merged."""
+        response = await agent.run_structured("print x")
+        
+        assert response.code == 'rakm x = 1\netb3(x);'
+        assert response.explanation == "Prints x."
+        assert response.model_used == "routed/model"
+        assert not response.is_valid
+        assert response.warnings[0] == "Remember l7d is inclusive"
+        assert "Line 2: Semicolons are not allowed in Flex" in response.warnings
+        # Reason: structured runs are one-shot and leave the session alone
+        assert agent.conversation.entries == []
+    
+    @pytest.mark.asyncio
+    async def test_schema_has_only_model_written_fields(self, agent, structured_model):
+        """Test that bookkeeping fields stay out of the output schema and the routed model's agent is used."""
+        await agent.run_structured("print x")
+        
+        assert set(structured_model[0]["properties"]) == {"code", "explanation", "warnings", "syntax_style", "filename"}
+        assert any(key[0] == "routed/model" for key in agent._agents)
+    
+    def test_code_response_formatting(self, agent):
+        """Test that a structured response renders from its fields without parsing."""
+        from agents.models import FlexCodeResponse, FlexSyntaxStyle
+        from ui import formatters
+        
+        response = FlexCodeResponse(
+            code='etb3("hi")',
+            syntax_style=FlexSyntaxStyle.FRANCO,
+            explanation="Says hi.",
+            filename="hi.flex",
+            model_used="test/model",
+            generation_time=0.5,
+            warnings=["Check output"]
+        )
+        
+        panels = formatters.format_code_response(response)
+        
+        assert panels[0].title == "📝 Flex Code (franco) • hi.flex"
+        assert len(panels) == 4
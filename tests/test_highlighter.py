@@ -0,0 +1,67 @@
+"""
+Unit tests for the Flex syntax highlighter.
+
+These tests validate that tokens are mapped to style spans, that code is kept
+verbatim and that highlighting scales linearly with the size of the code.
+"""
+
+import time
+
+from ui.highlighter import CODE_BLOCK_STYLES, PREVIEW_STYLES, highlight_flex, highlight_flex_lines
+
+
+def styled_tokens(text):
+    """Return (token, style) pairs for the spans of a Text."""
+    return [(text.plain[span.start:span.end], str(span.style)) for span in text.spans]
+
+
+class TestHighlightFlex:
+    """Test suite for highlight_flex."""
+    
+    def test_token_styles(self):
+        """Test that each token kind gets its style."""
+        text = highlight_flex('karr i=0 l7d 10 { print("a // b") } // loop', PREVIEW_STYLES)
+        tokens = styled_tokens(text)
+        
+        assert ('karr', 'bold bright_magenta') in tokens
+        assert ('print', 'bold bright_blue') in tokens
+        assert ('i', 'white') in tokens
+        assert ('10', 'bright_cyan') in tokens
+        assert ('"a // b"', 'bright_yellow') in tokens
+        assert ('// loop', 'dim green') in tokens
+        assert ('{', 'bright_white') in tokens
+    
+    def test_code_is_not_markup(self):
+        """Test that brackets and escapes in code are kept verbatim."""
+        code = 'arr[i] = "[bold]x\\"y"\n    etb3(arr[0])'
+        
+        text = highlight_flex_lines(code.split("\n"))
+        
+        assert text.plain == code
+        assert ('"[bold]x\\"y"', 'yellow') in styled_tokens(text)
+    
+    def test_two_char_operators_and_unterminated_string(self):
+        """Test that operators match greedily and strings stop at the line end."""
+        text = highlight_flex('lw x >= 1 && y != "open\netb3(x)', CODE_BLOCK_STYLES)
+        tokens = styled_tokens(text)
+        
+        assert ('>=', 'red') in tokens
+        assert ('&&', 'red') in tokens
+        assert ('!=', 'red') in tokens
+        assert ('"open', 'yellow') in tokens
+        assert ('etb3', 'magenta') in tokens
+    
+    def test_linear_time(self):
+        """Test that doubling the code roughly doubles the highlighting time."""
+        line = 'karr i=0 l7d 10 { lw arr[i] >= 5 { etb3("big") } } // scan\n'
+        
+        def timed(repeats):
+            start = time.perf_counter()
+            highlight_flex(line * repeats)
+            return time.perf_counter() - start
+        
+        timed(500)
+        small = min(timed(2000) for _ in range(3))
+        large = min(timed(8000) for _ in range(3))
+        
+        assert large < small * 8
@@ -0,0 +1,151 @@
+"""
+Unit tests for the shared pooled HTTP client.
+
+These tests validate that all OpenRouter traffic shares one keep-alive
+connection pool configured from settings.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from tools.http_client import SharedHTTPClient
+from agents.providers import OpenRouterProviderManager
+from config.settings import (
+    Settings,
+    OpenRouterSettings,
+    FlexSettings,
+    ApplicationSettings,
+    HttpClientSettings
+)
+
+
+@pytest.fixture
+def settings():
+    """Create settings with a custom connection pool configuration."""
+    return Settings(
+        openrouter=OpenRouterSettings(
+            api_key="test_api_key",
+            http_referer="https://test.github.com",
+            app_title="Test App"
+        ),
+        flex=FlexSettings(),
+        app=ApplicationSettings(),
+        http=HttpClientSettings(max_connections=7, max_keepalive_connections=3)
+    )
+
+
+class TestSharedHTTPClient:
+    """Test suite for SharedHTTPClient."""
+    
+    def test_client_is_reused(self, settings):
+        """Test that repeated lookups return the same pooled client."""
+        holder = SharedHTTPClient()
+        
+        assert holder.get(settings) is holder.get(settings)
+        assert holder.is_open
+    
+    def test_client_uses_openrouter_headers(self, settings):
+        """Test that OpenRouter attribution headers are set on the pool."""
+        client = SharedHTTPClient().get(settings)
+        
+        assert client.headers["HTTP-Referer"] == "https://test.github.com"
+        assert client.headers["X-Title"] == "Test App"
+    
+    def test_http2_falls_back_without_h2(self, settings):
+        """Test that the pool falls back to HTTP/1.1 when h2 is missing."""
+        with patch('tools.http_client.http2_available', return_value=False):
+            client = SharedHTTPClient().get(settings)
+        
+        assert client is not None
+    
+    @pytest.mark.asyncio
+    async def test_client_recreated_after_close(self, settings):
+        """Test that a closed client is replaced on next use."""
+        holder = SharedHTTPClient()
+        first = holder.get(settings)
+        
+        await holder.aclose()
+        
+        assert first.is_closed
+        assert not holder.is_open
+        assert holder.get(settings) is not first
+
+
+class TestProviderConnectionSharing:
+    """Test that providers reuse the pooled client and each other."""
+    
+    def test_custom_config_provider_is_cached(self, settings):
+        """Test that the same custom config does not build a new provider."""
+        manager = OpenRouterProviderManager(settings)
+        config = {'headers': {'X-Custom': '1'}}
+        
+        first = manager._create_provider_with_config(config)
+        second = manager._create_provider_with_config(dict(config))
+        
+        assert first is second
+        assert first is not manager.current_provider
+    
+    def test_providers_share_http_client(self, settings):
+        """Test that default and custom providers share one HTTP client."""
+        manager = OpenRouterProviderManager(settings)
+        custom = manager._create_provider_with_config({'headers': {'X-Custom': '1'}})
+        
+        default_http = manager.current_provider.client._client
+        custom_http = custom.client._client
+        
+        assert default_http is custom_http
+
+
+class TestPromptCaching:
+    """Test that the static system prompt is marked cacheable."""
+    
+    @staticmethod
+    def _messages():
+        from pydantic_ai.messages import ModelRequest, SystemPromptPart, UserPromptPart
+        return [ModelRequest(parts=[SystemPromptPart(content="static prefix"), UserPromptPart(content="hi")])]
+    
+    @pytest.mark.asyncio
+    async def test_anthropic_system_prompt_has_cache_breakpoint(self, settings):
+        """Test that explicit-caching providers get a cache_control breakpoint."""
+        manager = OpenRouterProviderManager(settings)
+        model = manager.create_model("anthropic/claude-3.5-sonnet")
+        
+        messages = await model._map_messages(self._messages())
+        
+        assert messages[0]['role'] == 'system'
+        assert messages[0]['content'] == [{
+            'type': 'text',
+            'text': 'static prefix',
+            'cache_control': {'type': 'ephemeral'}
+        }]
+        assert messages[1]['content'] == 'hi'
+    
+    @pytest.mark.asyncio
+    async def test_history_gets_second_breakpoint(self, settings):
+        """Test that the last user message of the history is marked cacheable."""
+        from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+        manager = OpenRouterProviderManager(settings)
+        model = manager.create_model("anthropic/claude-3.5-sonnet")
+        history = self._messages() + [
+            ModelResponse(parts=[TextPart(content="hello")]),
+            ModelRequest(parts=[UserPromptPart(content="next")])
+        ]
+        
+        messages = await model._map_messages(history)
+        
+        assert messages[1]['content'] == [{
+            'type': 'text',
+            'text': 'hi',
+            'cache_control': {'type': 'ephemeral'}
+        }]
+        assert messages[-1]['content'] == 'next'
+    
+    @pytest.mark.asyncio
+    async def test_automatic_caching_providers_unchanged(self, settings):
+        """Test that providers with automatic prefix caching get plain messages."""
+        manager = OpenRouterProviderManager(settings)
+        model = manager.create_model("openai/gpt-4o-mini")
+        
+        messages = await model._map_messages(self._messages())
+        
+        assert messages[0]['content'] == 'static prefix'
@@ -0,0 +1,128 @@
+"""
+Unit tests for the offline --validate and --execute modes of main.py.
+
+These tests validate that local checks run without a model call, report
+machine-readable results and exit with meaningful codes.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import main
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def flex_files(tmp_path):
+    """Create a valid and an invalid Flex file."""
+    valid = tmp_path / "valid.flex"
+    valid.write_text('etb3("hi")\n', encoding='utf-8')
+    invalid = tmp_path / "invalid.flex"
+    invalid.write_text('x = 1;\netb3(x)\n', encoding='utf-8')
+    return str(valid), str(invalid)
+
+
+def run_main(*args: str) -> subprocess.CompletedProcess:
+    """Run main.py without an API key and return the finished process."""
+    env = {**os.environ, "OPENROUTER_API_KEY": ""}
+    return subprocess.run(
+        [sys.executable, "main.py", *args],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+
+
+class TestOfflineValidation:
+    """Test suite for --validate."""
+    
+    @pytest.mark.asyncio
+    async def test_ndjson_line_per_file(self, flex_files, capsys):
+        """Test that each file gets one JSON line and errors set the exit code."""
+        valid, invalid = flex_files
+        
+        exit_code = await main.validate_files([valid, invalid], settings=None, output_format='ndjson')
+        
+        lines = capsys.readouterr().out.splitlines()
+        results = [json.loads(line) for line in lines]
+        assert exit_code == main.EXIT_PROBLEMS
+        assert [result['file'] for result in results] == [valid, invalid]
+        assert results[0]['is_valid'] is True
+        assert results[1]['is_valid'] is False
+        assert results[1]['errors'][0]['line_number'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_missing_file_is_usage_error(self, flex_files, tmp_path, capsys):
+        """Test that an unreadable file is reported and outranks validation errors."""
+        _, invalid = flex_files
+        missing = str(tmp_path / "missing.flex")
+        
+        exit_code = await main.validate_files([invalid, missing], settings=None, output_format='json')
+        
+        results = json.loads(capsys.readouterr().out)
+        assert exit_code == main.EXIT_USAGE
+        assert results[1] == {'file': missing, 'error': "File not found or unreadable"}
+    
+    @pytest.mark.asyncio
+    async def test_explain_only_when_problems_found(self, flex_files, monkeypatch, capsys):
+        """Test that --explain calls the model for files with errors only."""
+        valid, invalid = flex_files
+        explained = []
+        
+        async def fake_explain(settings, code, problems):
+            explained.append(problems)
+            return "Remove the semicolon."
+        monkeypatch.setattr(main, "explain_problems", fake_explain)
+        
+        await main.validate_files([valid, invalid], settings=None, output_format='ndjson', explain=True)
+        
+        results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert len(explained) == 1
+        assert explained[0][0].startswith("line 1:")
+        assert 'explanation' not in results[0]
+        assert results[1]['explanation'] == "Remove the semicolon."
+    
+    def test_runs_without_api_key(self, flex_files):
+        """Test that validation works offline and exits non-zero on errors."""
+        valid, invalid = flex_files
+        
+        assert run_main("--validate", valid).returncode == main.EXIT_OK
+        result = run_main("--validate", invalid, "--format", "json")
+        
+        assert result.returncode == main.EXIT_PROBLEMS
+        assert json.loads(result.stdout)[0]['is_valid'] is False
+    
+    def test_runs_outside_project_directory(self, flex_files, tmp_path):
+        """Test that the spec is found when main.py is started from another directory."""
+        valid, _ = flex_files
+        env = {**os.environ, "OPENROUTER_API_KEY": ""}
+        
+        result = subprocess.run(
+            [sys.executable, str(PROJECT_ROOT / "main.py"), "--validate", valid, "--format", "json"],
+            cwd=tmp_path,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        
+        assert result.returncode == main.EXIT_OK
+        assert json.loads(result.stdout)[0]['is_valid'] is True
+    
+    def test_explain_requires_api_key(self, flex_files):
+        """Test that --explain reports the missing key as a configuration error."""
+        _, invalid = flex_files
+        
+        result = run_main("--validate", invalid, "--explain")
+        
+        assert result.returncode == main.EXIT_USAGE
+        assert "API key" in result.stderr
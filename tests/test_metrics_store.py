@@ -0,0 +1,218 @@
+"""
+Unit tests for the persistent model metrics store.
+
+These tests validate histogram accuracy, percentile queries and that
+recorded samples survive a restart through the SQLite store.
+"""
+
+import random
+import sqlite3
+import threading
+import pytest
+
+from tools.metrics_store import MetricsStore, LatencyHistogram
+
+
+class TestLatencyHistogram:
+    """Test suite for LatencyHistogram."""
+    
+    def test_empty_histogram(self):
+        """Test that an empty histogram has no percentiles."""
+        histogram = LatencyHistogram()
+        
+        assert histogram.percentile(50) is None
+        assert histogram.mean is None
+    
+    def test_small_values_are_exact(self):
+        """Test that values below the linear range are counted exactly."""
+        histogram = LatencyHistogram()
+        for value in range(1, 11):
+            histogram.record(value)
+        
+        assert histogram.percentile(50) == 5
+        assert histogram.percentile(100) == 10
+    
+    def test_percentiles_within_relative_error(self):
+        """Test percentile estimates against exact values for a wide range."""
+        rng = random.Random(42)
+        values = sorted(rng.lognormvariate(7, 1) for _ in range(5000))
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        
+        for percentile in (50, 95, 99):
+            exact = values[int(percentile / 100 * len(values)) - 1]
+            assert histogram.percentile(percentile) == pytest.approx(exact, rel=0.05)
+    
+    def test_merge(self):
+        """Test that merging two histograms combines their counts."""
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.record(100)
+        second.record(300)
+        
+        first.merge(second)
+        
+        assert first.count == 2
+        assert first.min == 100
+        assert first.max == 300
+
+
+class TestMetricsStore:
+    """Test suite for MetricsStore."""
+    
+    def test_record_and_percentiles(self, tmp_path):
+        """Test that recorded latencies are queryable per model."""
+        store = MetricsStore(tmp_path / "metrics.db")
+        for latency in (0.1, 0.2, 0.3, 0.4, 2.0):
+            store.record("test/model", True, latency, completion_tokens=100)
+        
+        latency = store.percentiles("test/model")
+        assert latency["p50"] == pytest.approx(300, rel=0.05)
+        assert latency["p99"] == pytest.approx(2000, rel=0.05)
+        
+        throughput = store.percentiles("test/model", "throughput", (50,))
+        assert throughput["p50"] == pytest.approx(333, rel=0.05)
+        store.close()
+    
+    def test_failures_excluded_from_latency(self, tmp_path):
+        """Test that failed calls count as failures but not as latencies."""
+        store = MetricsStore(tmp_path / "metrics.db")
+        store.record("test/model", True, 1.0)
+        store.record("test/model", False, 30.0)
+        
+        summary = store.summary("test/model")
+        assert summary.total_requests == 2
+        assert summary.failed_requests == 1
+        assert summary.p99_response_time == pytest.approx(1.0, rel=0.05)
+        store.close()
+    
+    def test_unknown_metric_raises(self, tmp_path):
+        """Test that unknown metrics are rejected."""
+        store = MetricsStore(tmp_path / "metrics.db", persist=False)
+        
+        with pytest.raises(ValueError):
+            store.percentiles("test/model", "bogus")
+    
+    def test_samples_persist_across_sessions(self, tmp_path):
+        """Test that flushed samples are reloaded by a new store."""
+        db_path = tmp_path / "metrics.db"
+        store = MetricsStore(db_path, flush_batch_size=2)
+        store.record("test/model", True, 0.5, prompt_tokens=10, cost=0.01)
+        store.record("test/model", True, 1.5, prompt_tokens=20, cost=0.02)
+        store.record("other/model", True, 1.0)
+        store.close()
+        
+        reloaded = MetricsStore(db_path)
+        reloaded._session_start += 1  # samples above were written "earlier"
+        
+        assert set(reloaded.model_ids()) == {"test/model", "other/model"}
+        summary = reloaded.summary("test/model")
+        assert summary.successful_requests == 2
+        assert summary.total_cost == pytest.approx(0.03)
+        reloaded.close()
+    
+    def test_persist_disabled_writes_nothing(self, tmp_path):
+        """Test that persist=False keeps metrics in memory only."""
+        db_path = tmp_path / "metrics.db"
+        store = MetricsStore(db_path, flush_batch_size=1, persist=False)
+        store.record("test/model", True, 0.5)
+        store.close()
+        
+        assert store.get_stats("test/model").successes == 1
+        assert not db_path.exists()
+    
+    def test_cached_tokens_tracked(self, tmp_path):
+        """Test that prompt-cache hits are summed and reported as a ratio."""
+        store = MetricsStore(tmp_path / "metrics.db", persist=False)
+        store.record("test/model", True, 1.0, prompt_tokens=1000, cached_tokens=800)
+        
+        summary = store.summary("test/model")
+        assert summary.total_cached_tokens == 800
+        assert summary.cache_hit_ratio == pytest.approx(0.8)
+    
+    def test_old_database_is_migrated(self, tmp_path):
+        """Test that databases without newer columns are upgraded in place."""
+        db_path = tmp_path / "metrics.db"
+        connection = sqlite3.connect(str(db_path))
+        connection.execute(
+            "CREATE TABLE samples (ts REAL NOT NULL, model_id TEXT NOT NULL, "
+            "success INTEGER NOT NULL, latency_ms REAL NOT NULL, ttft_ms REAL, "
+            "prompt_tokens INTEGER NOT NULL DEFAULT 0, "
+            "completion_tokens INTEGER NOT NULL DEFAULT 0, cost REAL NOT NULL DEFAULT 0)"
+        )
+        connection.execute("INSERT INTO samples VALUES (1.0, 'old/model', 1, 500.0, NULL, 10, 5, 0.0)")
+        connection.commit()
+        connection.close()
+        
+        store = MetricsStore(db_path, flush_batch_size=1)
+        store.record("new/model", True, 0.5, cached_tokens=3)
+        
+        assert store.get_stats("old/model").successes == 1
+        assert store.get_stats("new/model").cached_tokens == 3
+        store.close()
+    
+    def test_hedge_win_rates_persist(self, tmp_path):
+        """Test that hedged-request outcomes give per-model win rates across sessions."""
+        db_path = tmp_path / "metrics.db"
+        store = MetricsStore(db_path)
+        store.record_hedge("fast/model", True)
+        store.record_hedge("slow/model", False)
+        store.record_hedge("fast/model", False)
+        store.record_hedge("slow/model", True)
+        store.record_hedge("fast/model", True)
+        store.close()
+        
+        reloaded = MetricsStore(db_path)
+        reloaded._session_start += 1
+        
+        summary = reloaded.summary("fast/model")
+        assert summary.hedged_requests == 3
+        assert summary.hedge_win_rate == pytest.approx(2 / 3)
+        assert reloaded.summary("slow/model").hedge_win_rate == pytest.approx(0.5)
+        reloaded.close()
+    
+    def test_full_batch_is_written_off_the_caller_thread(self, tmp_path, monkeypatch):
+        """Test that a full batch is flushed by the writer thread, not inside record()."""
+        store = MetricsStore(tmp_path / "metrics.db", flush_batch_size=2)
+        written = threading.Event()
+        writers = []
+        write = store._write
+        
+        def tracking_write(samples, hedges):
+            writers.append(threading.current_thread())
+            write(samples, hedges)
+            written.set()
+        
+        monkeypatch.setattr(store, "_write", tracking_write)
+        store.record("test/model", True, 0.5)
+        store.record_hedge("test/model", True)
+        
+        assert written.wait(timeout=5)
+        assert writers == [store._writer]
+        store.close()
+        assert sqlite3.connect(str(tmp_path / "metrics.db")).execute("SELECT COUNT(*) FROM samples").fetchone() == (1,)
+    
+    @pytest.mark.asyncio
+    async def test_history_loads_in_a_worker_thread(self, tmp_path, monkeypatch):
+        """Test that load_history reads the database off the event loop thread."""
+        db_path = tmp_path / "metrics.db"
+        store = MetricsStore(db_path)
+        store.record("test/model", True, 0.5)
+        store.close()
+        
+        reloaded = MetricsStore(db_path)
+        reloaded._session_start += 1
+        readers = []
+        read_history = reloaded._read_history
+        
+        def tracking_read():
+            readers.append(threading.current_thread())
+            return read_history()
+        
+        monkeypatch.setattr(reloaded, "_read_history", tracking_read)
+        await reloaded.load_history()
+        
+        assert readers and readers[0] is not threading.main_thread()
+        assert reloaded.get_stats("test/model").successes == 1
+        assert len(readers) == 1
+        reloaded.close()
@@ -0,0 +1,110 @@
+"""
+Unit tests for the full-screen model browser.
+
+These tests validate type-ahead filtering over the search index, the cached
+sort orders and that the browser renders only the rows on screen.
+"""
+
+import pytest
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from agents.models import OpenRouterModel
+from ui.model_browser import ModelBrowser, ModelCatalogView
+
+
+def make_model(model_id: str, name: str, price: float, context: int, description: str = "") -> OpenRouterModel:
+    """Create a catalog entry."""
+    return OpenRouterModel(
+        id=model_id,
+        name=name,
+        description=description,
+        context_length=context,
+        pricing={"prompt": price, "completion": price}
+    )
+
+
+@pytest.fixture
+def view():
+    """Create an indexed catalog."""
+    return ModelCatalogView([
+        make_model("openai/gpt-4o", "GPT-4o", 0.000005, 128000, "Multimodal flagship"),
+        make_model("anthropic/claude-3.5-sonnet", "Claude 3.5 Sonnet", 0.000003, 200000, "Strong at code"),
+        make_model("meta/llama-3-8b", "Llama 3 8B", 0.0, 8000, "Small open model for code"),
+        make_model("openai/gpt-4o-mini", "GPT-4o mini", 0.0000002, 128000),
+    ])
+
+
+@pytest.fixture
+def large_view():
+    """Create a catalog larger than the screen."""
+    return ModelCatalogView([
+        make_model(f"provider/model-{i:03d}", f"Model {i:03d}", 0.0, 4000)
+        for i in range(500)
+    ])
+
+
+def names(view: ModelCatalogView, indices):
+    """Map indices to model names."""
+    return [view.models[index].name for index in indices]
+
+
+class TestModelCatalogView:
+    """Test suite for ModelCatalogView."""
+    
+    def test_sort_orders_are_cached(self, view):
+        """Test that each sort order is computed once and reused."""
+        assert names(view, view.sorted_indices('price')) == ["Llama 3 8B", "GPT-4o mini", "Claude 3.5 Sonnet", "GPT-4o"]
+        assert names(view, view.sorted_indices('context'))[0] == "Claude 3.5 Sonnet"
+        assert view.sorted_indices('name') is view.sorted_indices('name')
+    
+    def test_typing_narrows_previous_matches(self, view):
+        """Test that incremental queries give the same results as a fresh search."""
+        for query in ["g", "gp", "gpt", "gpt min"]:
+            incremental = view.filter(query)
+            fresh = ModelCatalogView(view.models).filter(query)
+            assert incremental == fresh
+        
+        assert names(view, view.filter("gpt min")) == ["GPT-4o mini"]
+        assert names(view, view.filter("code", 'price')) == ["Llama 3 8B", "Claude 3.5 Sonnet"]
+        assert len(view.filter("")) == 4
+
+
+class TestModelBrowser:
+    """Test suite for ModelBrowser."""
+    
+    def test_renders_only_visible_rows(self, large_view):
+        """Test that the list renders one screen of rows and scrolls with the cursor."""
+        with create_pipe_input() as pipe:
+            browser = ModelBrowser(large_view, input=pipe, output=DummyOutput())
+            rows = browser._visible_rows()
+            
+            fragments = browser._render_rows()
+            assert "".join(text for _, text in fragments).count("\n") == rows - 1
+            
+            browser._move(rows + 10)
+            rendered = "".join(text for _, text in browser._render_rows())
+            assert browser.top == 11
+            assert "Model 000" not in rendered
+            assert f"Model {rows + 10:03d}" in rendered
+    
+    @pytest.mark.asyncio
+    async def test_type_ahead_and_select(self, view):
+        """Test that typing filters the list and Enter returns the highlighted model."""
+        with create_pipe_input() as pipe:
+            browser = ModelBrowser(view, current_model="openai/gpt-4o", input=pipe, output=DummyOutput())
+            pipe.send_text("gpt\x1b[B\r")
+            
+            result = await browser.run()
+        
+        assert result == "openai/gpt-4o-mini"
+        assert len(browser.matches) == 2
+    
+    @pytest.mark.asyncio
+    async def test_cancel_returns_none(self, view):
+        """Test that Ctrl-C closes the browser without a selection."""
+        with create_pipe_input() as pipe:
+            browser = ModelBrowser(view, input=pipe, output=DummyOutput())
+            pipe.send_text("\x03")
+            
+            assert await browser.run() is None
@@ -13,6 +13,7 @@ from pathlib import Path
 import httpx
 
 from tools.model_manager import ModelManager, ModelManagerError
+from tools.metrics_store import MetricsStore
 from agents.models import OpenRouterModel, ModelFilter
 from config.settings import Settings, OpenRouterSettings, FlexSettings, ApplicationSettings
 
@@ -39,6 +40,14 @@ class TestModelManager:
         """Create ModelManager instance for testing."""
         return ModelManager(mock_settings)
     
+    @pytest.fixture
+    def mock_http_client(self, manager):
+        """Replace the shared pooled HTTP client with a mock."""
+        client = Mock()
+        client.get = AsyncMock()
+        with patch.object(manager, '_get_http_client', return_value=client):
+            yield client
+    
     @pytest.fixture
     def sample_models(self):
         """Sample model data for testing."""
@@ -79,49 +88,43 @@ class TestModelManager:
         ]
     
     @pytest.mark.asyncio
-    async def test_fetch_models_from_api_success(self, manager, sample_models):
+    async def test_fetch_models_from_api_success(self, manager, sample_models, mock_http_client):
         """Test successful model fetching from API."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"data": sample_models}
+        mock_http_client.get.return_value = mock_response
         
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
-            
-            models = await manager._fetch_models_from_api()
-            
-            assert len(models) == 3
-            assert models[0].id == "anthropic/claude-3-5-sonnet"
-            assert models[0].name == "Claude 3.5 Sonnet"
-            assert models[0].supports_tools == True
+        models = await manager._fetch_models_from_api()
+        
+        assert len(models) == 3
+        assert models[0].id == "anthropic/claude-3-5-sonnet"
+        assert models[0].name == "Claude 3.5 Sonnet"
+        assert models[0].supports_tools == True
     
     @pytest.mark.asyncio
-    async def test_fetch_models_from_api_auth_error(self, manager):
+    async def test_fetch_models_from_api_auth_error(self, manager, mock_http_client):
         """Test API authentication error handling."""
         mock_response = Mock()
         mock_response.status_code = 401
+        mock_http_client.get.return_value = mock_response
         
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
-            
-            with pytest.raises(ModelManagerError) as exc_info:
-                await manager._fetch_models_from_api()
-            
-            assert "Invalid OpenRouter API key" in str(exc_info.value)
+        with pytest.raises(ModelManagerError) as exc_info:
+            await manager._fetch_models_from_api()
+        
+        assert "Invalid OpenRouter API key" in str(exc_info.value)
     
     @pytest.mark.asyncio
-    async def test_fetch_models_from_api_rate_limit(self, manager):
+    async def test_fetch_models_from_api_rate_limit(self, manager, mock_http_client):
         """Test API rate limit error handling."""
         mock_response = Mock()
         mock_response.status_code = 429
+        mock_http_client.get.return_value = mock_response
         
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
-            
-            with pytest.raises(ModelManagerError) as exc_info:
-                await manager._fetch_models_from_api()
-            
-            assert "Rate limit exceeded" in str(exc_info.value)
+        with pytest.raises(ModelManagerError) as exc_info:
+            await manager._fetch_models_from_api()
+        
+        assert "Rate limit exceeded" in str(exc_info.value)
     
     @pytest.mark.asyncio
     async def test_list_models_with_cache(self, manager, sample_models):
@@ -137,20 +140,19 @@ class TestModelManager:
                 assert models[0].id == "anthropic/claude-3-5-sonnet"
     
     @pytest.mark.asyncio
-    async def test_list_models_without_cache(self, manager, sample_models):
+    async def test_list_models_without_cache(self, manager, sample_models, mock_http_client):
         """Test model listing without cache."""
         mock_response = Mock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"data": sample_models}
+        mock_http_client.get.return_value = mock_response
         
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
-            with patch.object(manager, '_save_to_cache') as mock_save:
-                
-                models = await manager.list_models(use_cache=False)
-                
-                assert len(models) == 3
-                mock_save.assert_called_once()
+        with patch.object(manager, '_save_to_cache') as mock_save:
+            
+            models = await manager.list_models(use_cache=False)
+            
+            assert len(models) == 3
+            mock_save.assert_called_once()
     
     @pytest.mark.asyncio
     async def test_filter_models_by_price(self, manager, sample_models):
@@ -266,6 +268,48 @@ class TestModelManager:
             )
             assert tool_model_suggested
     
+    @pytest.mark.asyncio
+    async def test_suggest_models_sorted_by_score(self, manager, sample_models):
+        """Test that suggestions are ranked by score before cost."""
+        models = [OpenRouterModel(**model) for model in sample_models]
+        with patch.object(manager, 'list_models', return_value=models):
+            
+            suggestions = await manager.suggest_models("complex function with tool integration")
+            
+            # Free Llama scores lower (no tools) despite being cheapest
+            assert suggestions[0].model.supports_tools
+            assert suggestions[-1].model.id == "meta-llama/llama-3-8b-instruct"
+    
+    @pytest.mark.asyncio
+    async def test_route_model_loads_catalog(self, manager, sample_models):
+        """Test that routing loads the catalog and returns a trace."""
+        models = [OpenRouterModel(**model) for model in sample_models]
+        
+        async def fake_list_models(use_cache=True):
+            manager._index_models(models)
+            return models
+        
+        with patch.object(manager, 'list_models', side_effect=fake_list_models):
+            decision = await manager.route_model("write a loop", max_cost=1.0, require_tools=True)
+        
+        assert decision.model_id in {m.id for m in models if m.supports_tools}
+        assert decision.candidates[0].model_id == decision.model_id
+    
+    @pytest.mark.asyncio
+    async def test_route_model_expects_observed_completion_length(self, manager, sample_models, tmp_path):
+        """Test that routing prices the mean completion length of recorded calls, not only the prompt."""
+        models = [OpenRouterModel(**model) for model in sample_models]
+        manager._index_models(models)
+        manager.metrics_store = MetricsStore(tmp_path / "metrics.db", persist=False)
+        manager.router.metrics_store = manager.metrics_store
+        manager.metrics_store.record("a/model", True, 1.0, completion_tokens=300)
+        manager.metrics_store.record("b/model", True, 1.0, completion_tokens=100)
+        
+        decision = await manager.route_model("write a loop", max_cost=1.0, require_tools=True)
+        
+        assert decision.completion_tokens == 200
+        assert manager.expected_completion_tokens("a/model") == 300
+    
     def test_estimate_cost(self, manager, sample_models):
         """Test cost estimation functionality."""
         model = OpenRouterModel(**sample_models[0])  # Claude model
@@ -365,33 +409,118 @@ class TestModelManager:
         assert model_id in specific_metrics
         assert specific_metrics[model_id].total_requests == 1
     
+    def test_record_call_uses_catalog_pricing(self, manager, sample_models, tmp_path):
+        """Test that recorded calls are priced and land in the metrics store."""
+        manager.metrics_store = MetricsStore(tmp_path / "metrics.db")
+        manager._index_models([OpenRouterModel(**m) for m in sample_models])
+        
+        cost = manager.record_call(
+            "anthropic/claude-3-5-sonnet", True, 2.0,
+            ttft=0.5, prompt_tokens=1000, completion_tokens=200
+        )
+        
+        assert cost == pytest.approx(1000 * 0.000015 + 200 * 0.000075)
+        assert manager.metrics["anthropic/claude-3-5-sonnet"].total_tokens_used == 1200
+        
+        percentiles = manager.get_latency_percentiles("anthropic/claude-3-5-sonnet")
+        assert percentiles["p50"] == pytest.approx(2000, rel=0.05)
+        
+        summary = manager.get_persistent_metrics("anthropic/claude-3-5-sonnet")
+        assert summary["anthropic/claude-3-5-sonnet"].total_cost == pytest.approx(cost)
+    
+    def test_record_call_prices_cached_tokens(self, manager, tmp_path):
+        """Test that prompt-cache reads are billed at the cache read rate."""
+        manager.metrics_store = MetricsStore(tmp_path / "metrics.db", persist=False)
+        manager._index_models([OpenRouterModel(
+            id="anthropic/claude-3-5-sonnet",
+            name="Claude",
+            pricing={"prompt": 0.000003, "completion": 0.000015, "input_cache_read": 0.0000003},
+            context_length=200000
+        )])
+        
+        cost = manager.record_call(
+            "anthropic/claude-3-5-sonnet", True, 1.0,
+            prompt_tokens=1000, completion_tokens=100, cached_tokens=900
+        )
+        
+        assert cost == pytest.approx(100 * 0.000003 + 900 * 0.0000003 + 100 * 0.000015)
+    
     @pytest.mark.asyncio
-    async def test_list_models_retry_logic(self, manager):
+    async def test_list_models_retry_logic(self, manager, mock_http_client):
         """Test retry logic on API failures."""
         # Mock consecutive failures then success
-        mock_responses = [
+        mock_http_client.get.side_effect = [
             httpx.HTTPError("Connection failed"),
             httpx.HTTPError("Connection failed"),
             Mock(status_code=200, json=lambda: {"data": []})
         ]
         
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.get.side_effect = mock_responses
-            
-            # Should succeed after retries
-            models = await manager.list_models(use_cache=False)
-            assert models == []
+        # Should succeed after retries
+        models = await manager.list_models(use_cache=False)
+        assert models == []
     
     @pytest.mark.asyncio
-    async def test_list_models_max_retries_exceeded(self, manager):
+    async def test_list_models_max_retries_exceeded(self, manager, mock_http_client):
         """Test behavior when max retries are exceeded."""
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.get.side_effect = httpx.HTTPError("Persistent failure")
-            
-            with pytest.raises(ModelManagerError) as exc_info:
-                await manager.list_models(use_cache=False)
-            
-            assert "Failed to fetch models after" in str(exc_info.value)
+        mock_http_client.get.side_effect = httpx.HTTPError("Persistent failure")
+        
+        with pytest.raises(ModelManagerError) as exc_info:
+            await manager.list_models(use_cache=False)
+        
+        assert "Failed to fetch models after" in str(exc_info.value)
+    
+    def test_http_client_is_shared(self, manager, mock_settings):
+        """Test that the catalog fetch uses the process-wide pooled client."""
+        other_manager = ModelManager(mock_settings)
+        
+        assert manager._get_http_client() is other_manager._get_http_client()
+    
+    @pytest.mark.asyncio
+    async def test_list_models_serves_stale_cache_and_refreshes(self, manager, sample_models, tmp_path):
+        """Test that an expired cache is served while a background refresh runs."""
+        manager.cache_file = tmp_path / "test_cache.json"
+        manager._save_to_cache([OpenRouterModel(**sample_models[0])])
+        fresh_models = [OpenRouterModel(**model) for model in sample_models]
+        
+        with patch.object(manager, '_is_cache_valid', return_value=False):
+            with patch.object(manager, '_fetch_models_from_api', AsyncMock(return_value=fresh_models)) as mock_fetch:
+                models = await manager.list_models()
+                
+                # Stale data is returned immediately
+                assert len(models) == 1
+                assert manager.get_cache_info()["refreshing"]
+                
+                await manager.wait_for_refresh()
+                mock_fetch.assert_awaited_once()
+        
+        assert len(manager._load_from_cache()) == 3
+    
+    @pytest.mark.asyncio
+    async def test_list_models_single_flight(self, manager, sample_models):
+        """Test that concurrent cold-cache callers share one in-flight fetch."""
+        models = [OpenRouterModel(**model) for model in sample_models]
+        
+        async def slow_fetch():
+            await asyncio.sleep(0.05)
+            return models
+        
+        with patch.object(manager, '_fetch_models_from_api', AsyncMock(side_effect=slow_fetch)) as mock_fetch:
+            with patch.object(manager, '_save_to_cache'):
+                results = await asyncio.gather(*[
+                    manager.list_models(use_cache=False) for _ in range(5)
+                ])
+        
+        assert mock_fetch.await_count == 1
+        assert all(len(result) == 3 for result in results)
+    
+    @pytest.mark.asyncio
+    async def test_background_refresh_failure_is_recorded(self, manager):
+        """Test that a failed background refresh is recorded, not raised."""
+        with patch.object(manager, '_fetch_with_retries', AsyncMock(side_effect=ModelManagerError("offline"))):
+            manager.refresh_in_background()
+            await manager.wait_for_refresh()
+        
+        assert manager.last_refresh_error == "offline"
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,113 @@
+"""
+Unit tests for the latency- and cost-aware model router.
+
+These tests validate that routing prefers measured-fast models, respects the
+cost ceiling and context window, and reports a decision trace.
+"""
+
+import pytest
+
+from tools.metrics_store import MetricsStore
+from tools.model_router import ModelRouter, ModelRouterError
+from agents.models import OpenRouterModel
+
+
+def make_model(model_id, prompt_price, completion_price, context_length=128000, supports_tools=True):
+    """Create a catalog model for routing tests."""
+    return OpenRouterModel(
+        id=model_id,
+        name=model_id,
+        pricing={"prompt": prompt_price, "completion": completion_price},
+        context_length=context_length,
+        supports_tools=supports_tools
+    )
+
+
+@pytest.fixture
+def store():
+    """Create an in-memory metrics store."""
+    return MetricsStore("unused.db", persist=False)
+
+
+@pytest.fixture
+def router(store):
+    """Create a router over a small catalog."""
+    router = ModelRouter(store)
+    router.set_models([
+        make_model("fast/expensive", 0.00001, 0.00003),
+        make_model("slow/cheap", 0.0000001, 0.0000002),
+        make_model("small/context", 0.0, 0.0, context_length=1000),
+        make_model("no/tools", 0.0, 0.0, supports_tools=False),
+    ])
+    return router
+
+
+class TestModelRouter:
+    """Test suite for ModelRouter."""
+    
+    def test_prefers_observed_fast_model(self, router, store):
+        """Test that measured latency drives selection."""
+        for _ in range(5):
+            store.record("fast/expensive", True, 1.0, ttft=0.2, completion_tokens=400)
+            store.record("slow/cheap", True, 6.0, ttft=2.0, completion_tokens=100)
+        router.invalidate()
+        
+        decision = router.route(1000, completion_tokens=400, max_cost=1.0, require_tools=True)
+        
+        assert decision.model_id == "fast/expensive"
+        assert decision.candidates[0].observed
+        assert decision.rejected == {"context": 1, "tools": 1}
+    
+    def test_cost_ceiling_excludes_expensive_model(self, router, store):
+        """Test that models over the ceiling are skipped."""
+        store.record("fast/expensive", True, 0.5, ttft=0.1, completion_tokens=400)
+        router.invalidate()
+        
+        decision = router.route(1000, completion_tokens=400, max_cost=0.001, require_tools=True)
+        
+        assert decision.model_id == "slow/cheap"
+        assert decision.expected_cost <= 0.001
+        assert decision.rejected["cost"] == 1
+    
+    def test_falls_back_to_cheapest_when_all_over_budget(self, router):
+        """Test the fallback when no model is under the ceiling."""
+        decision = router.route(1000, completion_tokens=400, max_cost=0.0, require_tools=True)
+        
+        assert decision.model_id == "slow/cheap"
+        assert "cheapest" in decision.reason
+    
+    def test_no_model_fits_raises(self, router):
+        """Test that an oversized request raises a routing error."""
+        with pytest.raises(ModelRouterError):
+            router.route(10_000_000)
+    
+    def test_exclude_skips_model(self, router):
+        """Test that excluded models are not selected."""
+        decision = router.route(100, exclude=["small/context", "no/tools", "slow/cheap"], max_cost=1.0)
+        
+        assert decision.model_id == "fast/expensive"
+    
+    def test_new_metrics_update_one_entry(self, router, store, monkeypatch):
+        """Test that recording a call refreshes that model without a full rebuild."""
+        router.route(1000, completion_tokens=400, max_cost=1.0, require_tools=True)
+        rebuilds = []
+        monkeypatch.setattr(router, "rebuild", lambda: rebuilds.append(1))
+        
+        for _ in range(5):
+            store.record("slow/cheap", True, 0.5, ttft=0.1, completion_tokens=400)
+        router.update_model("slow/cheap")
+        decision = router.route(1000, completion_tokens=400, max_cost=1.0, require_tools=True)
+        
+        assert rebuilds == []
+        assert decision.model_id == "slow/cheap"
+        assert decision.candidates[0].observed
+    
+    def test_selection_is_fast(self, store):
+        """Test that routing over a large catalog stays in microseconds."""
+        router = ModelRouter(store)
+        router.set_models([make_model(f"vendor/model-{i}", 0.000001 * i, 0.000002 * i) for i in range(500)])
+        router.rebuild()
+        
+        decision = router.route(2000, max_cost=0.01)
+        
+        assert decision.elapsed_us < 50_000
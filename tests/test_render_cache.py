@@ -0,0 +1,92 @@
+"""
+Unit tests for the render cache.
+
+These tests validate that repeated code panels are rendered once per width,
+that cached output matches uncached output and that the cache is bounded.
+"""
+
+import io
+
+import pytest
+from rich.cells import cell_len
+from rich.console import Console
+
+from agents.models import FlexSyntaxStyle
+from ui import formatters
+from ui.render_cache import CachedRenderable, RenderCache, get_render_cache
+
+
+CODE_LINES = ['karr i=0 l7d 3 {', '    etb3(arr[i])', '}']
+
+
+@pytest.fixture
+def render_cache():
+    """Provide an empty process-wide render cache."""
+    cache = get_render_cache()
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+def render(renderable, width: int = 60) -> str:
+    """Render to plain text at a fixed width."""
+    console = Console(file=io.StringIO(), width=width, record=True)
+    console.print(renderable)
+    return console.export_text()
+
+
+class TestRenderCache:
+    """Test suite for RenderCache and CachedRenderable."""
+    
+    def test_repeated_block_rendered_once(self, render_cache, monkeypatch):
+        """Test that the same code block is built once and then served from the cache."""
+        builds = []
+        original = formatters._build_code_block_panel
+        
+        def counting_build(code_lines, lang):
+            builds.append(lang)
+            return original(code_lines, lang)
+        monkeypatch.setattr(formatters, "_build_code_block_panel", counting_build)
+        
+        first = render(formatters.format_code_block_panel(CODE_LINES, "flex"))
+        second = render(formatters.format_code_block_panel(CODE_LINES, "flex"))
+        
+        assert first == second
+        assert len(builds) == 1
+        assert render_cache.hits == 1
+        assert first == render(formatters.format_code_block_panel(CODE_LINES, "flex", cached=False))
+    
+    def test_width_change_renders_only_new_width(self, render_cache):
+        """Test that a new width adds an entry and keeps the other width cached."""
+        panel = formatters.format_code_block_panel(CODE_LINES, "flex")
+        
+        narrow = render(panel, width=40)
+        wide = render(panel, width=80)
+        render(panel, width=40)
+        
+        assert cell_len(narrow.splitlines()[0]) == 40
+        assert cell_len(wide.splitlines()[0]) == 80
+        assert len(render_cache) == 2
+        assert render_cache.hits == 1
+    
+    def test_preview_keyed_by_syntax_style(self, render_cache):
+        """Test that previews of the same code in different styles are cached apart."""
+        code = "lw x == 1 { etb3(x) }"
+        
+        franco = render(formatters.format_flex_code(code, FlexSyntaxStyle.FRANCO))
+        english = render(formatters.format_flex_code(code, FlexSyntaxStyle.ENGLISH))
+        
+        assert "Franco Syntax" in franco
+        assert "English Syntax" in english
+        assert len(render_cache) == 2
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used rendering is evicted first."""
+        cache = RenderCache(max_entries=2)
+        
+        for code in ["a", "b", "c"]:
+            render(CachedRenderable('text', code, 'text', lambda code=code: code, cache=cache))
+        
+        assert len(cache) == 2
+        assert cache.get(('text', RenderCache.code_hash("a"), 'text', 60)) is None
+        assert cache.get(('text', RenderCache.code_hash("c"), 'text', 60)) is not None
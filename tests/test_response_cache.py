@@ -0,0 +1,90 @@
+"""
+Unit tests for the agent response cache.
+
+These tests cover exact and similarity lookups, TTL expiry, LRU eviction and
+streaming replay.
+"""
+
+import pytest
+
+from tools.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache():
+    """Create an exact-match cache."""
+    return ResponseCache(max_entries=3, ttl=60)
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache."""
+    
+    def test_exact_hit_ignores_case_and_whitespace(self, cache):
+        """Test that normalized prompts share an entry."""
+        cache.put("Show me Flex examples", "model/a", "examples")
+        
+        assert cache.get("  show me   flex EXAMPLES? ", "model/a") == "examples"
+        assert cache.hits == 1
+    
+    def test_model_and_context_are_part_of_key(self, cache):
+        """Test that other models and other conversations miss."""
+        context = cache.context_hash([{'type': 'user', 'content': 'write a game'}])
+        cache.put("yes", "model/a", "file created", context)
+        
+        assert cache.get("yes", "model/b", context) is None
+        assert cache.get("yes", "model/a") is None
+        assert cache.get("yes", "model/a", context) == "file created"
+    
+    def test_entries_expire(self, cache):
+        """Test that entries older than the TTL are dropped."""
+        cache.ttl = 0
+        cache.put("hello", "model/a", "hi")
+        
+        assert cache.get("hello", "model/a") is None
+        assert len(cache) == 0
+    
+    def test_least_recently_used_is_evicted(self, cache):
+        """Test that the size limit evicts the least recently used entry."""
+        for prompt in ("one", "two", "three"):
+            cache.put(prompt, "model/a", prompt.upper())
+        cache.get("one", "model/a")
+        cache.put("four", "model/a", "FOUR")
+        
+        assert cache.get("two", "model/a") is None
+        assert cache.get("one", "model/a") == "ONE"
+    
+    def test_similar_prompt_hits_above_threshold(self):
+        """Test that near-identical prompts match with similarity enabled."""
+        cache = ResponseCache(similarity_threshold=0.8)
+        cache.put("how do I write a for loop in Franco syntax", "model/a", "use karr")
+        
+        assert cache.get("how do i write a for loops in franco syntax", "model/a") == "use karr"
+        assert cache.get("how do I read a file", "model/a") is None
+        assert cache.similar_hits == 1
+    
+    def test_exact_only_without_threshold(self, cache):
+        """Test that similarity lookup is off by default."""
+        cache.put("how do I write a for loop in Franco syntax", "model/a", "use karr")
+        
+        assert cache.get("how do i write a for loops in franco syntax", "model/a") is None
+    
+    def test_replay_is_cumulative(self):
+        """Test that replay yields growing prefixes ending in the full text."""
+        response = "\n".join(f"line {i}: " + "x" * 50 for i in range(30))
+        
+        chunks = list(ResponseCache.replay(response))
+        
+        assert len(chunks) > 1
+        assert chunks[-1] == response
+        assert all(later.startswith(earlier) for earlier, later in zip(chunks, chunks[1:]))
+    
+    def test_replay_deltas_join_to_response(self):
+        """Test that delta replay yields the same chunks as new text only."""
+        response = "\n".join(f"line {i}: " + "x" * 50 for i in range(30))
+        
+        deltas = list(ResponseCache.replay(response, delta=True))
+        cumulative = list(ResponseCache.replay(response))
+        
+        assert "".join(deltas) == response
+        assert len(deltas) == len(cumulative)
+        assert all(delta.endswith("\n") for delta in deltas[:-1])
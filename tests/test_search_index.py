@@ -0,0 +1,158 @@
+"""
+Unit tests for the full-text search index.
+
+These tests validate that saved Flex files and journaled turns are indexed
+incrementally and that searches rank and filter them.
+"""
+
+import os
+
+import pytest
+
+from agents.models import FileOperation
+from config.settings import Settings, OpenRouterSettings, FlexSettings, ApplicationSettings
+from tools.file_manager import FileManager
+from tools.search_index import SearchIndex, SearchIndexError
+from tools.session_journal import SessionJournal
+
+
+QUICKSORT = """// quicksort in Franco
+sndo2 quicksort(list arr) {
+    karr i=0 l7d length(arr) - 1 {
+        etb3(arr[i])
+    }
+}"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Create a search index fed by a journal directory."""
+    search_index = SearchIndex(tmp_path / "search.db", journal_dir=tmp_path / "sessions")
+    yield search_index
+    search_index.close()
+
+
+def journal_turns(directory, session_id: str, turns) -> None:
+    """Journal (user, assistant) pairs and wait for them to be written."""
+    journal = SessionJournal(directory, session_id)
+    for user, assistant in turns:
+        journal.append({'model': 'test/model', 'user': user, 'assistant': assistant})
+    journal.close()
+
+
+class TestSearchIndex:
+    """Test suite for SearchIndex."""
+    
+    def test_file_versions_replace_each_other(self, index):
+        """Test that re-indexing a file keeps only its latest content."""
+        index.add_file("/work/sort.flex", "bubble sort")
+        index.add_file("/work/sort.flex", QUICKSORT)
+        
+        hits = index.search("quicksort franco")
+        
+        assert [hit.source for hit in hits] == ["/work/sort.flex"]
+        assert "«quicksort»" in hits[0].snippet
+        assert index.search("bubble") == []
+        
+        index.remove_file("/work/sort.flex")
+        assert index.search("quicksort") == []
+    
+    def test_journal_turns_are_indexed_incrementally(self, index, tmp_path):
+        """Test that each sync reads only turns journaled since the last one."""
+        sessions = tmp_path / "sessions"
+        journal_turns(sessions, "first", [("write a quicksort in franco", QUICKSORT), ("and a loop", "karr i=0 l7d 3")])
+        
+        assert index.sync_journals() == 2
+        assert index.sync_journals() == 0
+        
+        journal_turns(sessions, "second", [("binary search please", "sndo2 bsearch()")])
+        assert index.sync_journals() == 1
+        
+        hits = index.search("quicksort")
+        assert [hit.source for hit in hits] == ["first#0"]
+        assert hits[0].title == "write a quicksort in franco"
+        assert index.get_content("session", "first#0") == QUICKSORT
+    
+    def test_kind_filter_and_any_term_fallback(self, index, tmp_path):
+        """Test that hits can be limited by kind and that partial matches are a fallback."""
+        index.add_file("/work/sort.flex", QUICKSORT)
+        journal_turns(tmp_path / "sessions", "first", [("quicksort please", "sure")])
+        
+        assert {hit.kind for hit in index.search("quicksort")} == {"file", "session"}
+        assert [hit.kind for hit in index.search("quicksort", kind="file")] == ["file"]
+        assert [hit.source for hit in index.search("quicksort mergesort", kind="file")] == ["/work/sort.flex"]
+        assert index.search("!!!") == []
+
+
+@pytest.fixture
+def settings(tmp_path):
+    """Create settings whose FileManager directories live in a temp directory."""
+    return Settings(
+        openrouter=OpenRouterSettings(api_key="test_api_key"),
+        flex=FlexSettings(temp_dir=str(tmp_path / "temp"), examples_dir=str(tmp_path / "examples")),
+        app=ApplicationSettings()
+    )
+
+
+class TestFileManagerIndexing:
+    """Test suite for indexing files written by FileManager."""
+    
+    @pytest.mark.asyncio
+    async def test_written_flex_files_are_searchable(self, index, settings, tmp_path):
+        """Test that Flex files are indexed on write and other files are not."""
+        manager = FileManager(settings, search_index=index)
+        
+        result = await manager.execute_operation(FileOperation(
+            operation="write",
+            filepath=str(tmp_path / "quicksort.flex"),
+            content=QUICKSORT
+        ))
+        await manager.execute_operation(FileOperation(
+            operation="write",
+            filepath=str(tmp_path / "notes.txt"),
+            content="quicksort notes"
+        ))
+        
+        hits = index.search("quicksort")
+        assert result.success
+        assert [hit.source for hit in hits] == [str((tmp_path / "quicksort.flex").resolve())]
+    
+    @pytest.mark.asyncio
+    async def test_delete_succeeds_when_index_fails(self, index, settings, tmp_path, monkeypatch, capsys):
+        """Test that a failing index does not turn a completed delete into an error."""
+        manager = FileManager(settings, search_index=index)
+        filepath = tmp_path / "quicksort.flex"
+        filepath.write_text(QUICKSORT, encoding='utf-8')
+        
+        def broken(path):
+            raise SearchIndexError("SQLite FTS5 is not available")
+        monkeypatch.setattr(index, "remove_file", broken)
+        
+        result = await manager.execute_operation(FileOperation(operation="delete", filepath=str(filepath)))
+        
+        assert result.success
+        assert not filepath.exists()
+        assert "Could not remove" in capsys.readouterr().out
+    
+    def test_files_on_disk_are_backfilled(self, index, settings, tmp_path, monkeypatch):
+        """Test that Flex files saved outside FileManager are indexed, re-indexed when changed and dropped when deleted."""
+        monkeypatch.chdir(tmp_path)
+        manager = FileManager(settings, search_index=index)
+        nested = tmp_path / "examples" / "franco_examples" / "quicksort.flex"
+        nested.parent.mkdir(parents=True)
+        nested.write_text(QUICKSORT, encoding='utf-8')
+        top_level = tmp_path / "sorting.flex"
+        top_level.write_text("bubble sort", encoding='utf-8')
+        
+        assert manager.sync_search_index() == 2
+        assert [hit.source for hit in index.search("quicksort")] == [str(nested.resolve())]
+        assert manager.sync_search_index() == 0
+        
+        top_level.write_text("insertion sort", encoding='utf-8')
+        os.utime(top_level, (top_level.stat().st_atime, top_level.stat().st_mtime + 10))
+        nested.unlink()
+        
+        assert manager.sync_search_index() == 1
+        assert index.search("quicksort") == []
+        assert index.search("bubble") == []
+        assert [hit.source for hit in index.search("insertion")] == [str(top_level.resolve())]
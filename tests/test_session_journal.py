@@ -0,0 +1,131 @@
+"""
+Unit tests for the session journal.
+
+These tests validate that turns are appended and indexed in the background,
+that journals replay after an interrupted write and that sessions can be
+listed and resolved from the index alone.
+"""
+
+import pytest
+
+from tools.session_journal import (
+    SessionJournal,
+    SessionJournalError,
+    journal_path,
+    list_sessions,
+    read_index,
+    read_journal,
+    read_turn,
+    resolve_session_id
+)
+
+
+def write_turns(directory, session_id: str, count: int) -> SessionJournal:
+    """Journal a number of turns and wait for them to be written."""
+    journal = SessionJournal(directory, session_id)
+    for i in range(count):
+        journal.append({'model': 'test/model', 'user': f"question {i}", 'assistant': f"answer {i}", 'messages': []})
+    journal.close()
+    return journal
+
+
+class TestSessionJournal:
+    """Test suite for SessionJournal."""
+    
+    def test_turns_are_appended_and_indexed(self, tmp_path):
+        """Test that every turn reaches the journal and the index in order."""
+        journal = write_turns(tmp_path, "abc123", 50)
+        
+        records = read_journal(journal.path)
+        index = read_index(tmp_path, "abc123")
+        
+        assert [record['turn'] for record in records] == list(range(50))
+        assert [entry.turn for entry in index] == list(range(50))
+        assert read_turn(tmp_path, index[17])['user'] == "question 17"
+        assert index[-1].assistant_preview == "answer 49"
+    
+    def test_resumed_journal_continues_turn_numbers(self, tmp_path):
+        """Test that appending after a resume keeps numbering and offsets consistent."""
+        write_turns(tmp_path, "abc123", 2)
+        
+        journal = SessionJournal(tmp_path, "abc123", turns=2)
+        journal.append({'model': 'test/model', 'user': "question 2", 'assistant': "answer 2"})
+        journal.close()
+        
+        index = read_index(tmp_path, "abc123")
+        assert [entry.turn for entry in index] == [0, 1, 2]
+        assert read_turn(tmp_path, index[2])['user'] == "question 2"
+    
+    def test_incomplete_last_line_is_skipped(self, tmp_path, capsys):
+        """Test that a journal cut off mid-write still replays its complete turns."""
+        journal = write_turns(tmp_path, "abc123", 3)
+        with open(journal.path, 'ab') as f:
+            f.write(b'{"turn": 3, "user": "cut')
+        
+        records = read_journal(journal.path)
+        
+        assert len(records) == 3
+        assert "incomplete" in capsys.readouterr().out
+    
+    def test_resume_after_incomplete_line_keeps_new_turns(self, tmp_path, capsys):
+        """Test that a turn appended after a torn line is not glued onto it."""
+        journal = write_turns(tmp_path, "abc123", 1)
+        with open(journal.path, 'ab') as f:
+            f.write(b'{"turn": 1, "user": "cut')
+        
+        resumed = SessionJournal(tmp_path, "abc123", turns=len(read_journal(journal.path)))
+        resumed.append({'model': 'test/model', 'user': "question 1", 'assistant': "answer 1"})
+        resumed.close()
+        
+        records = read_journal(journal.path)
+        index = read_index(tmp_path, "abc123")
+        assert [record['user'] for record in records] == ["question 0", "question 1"]
+        assert read_turn(tmp_path, index[-1])['user'] == "question 1"
+        assert "Removing incomplete last turn" in capsys.readouterr().out
+    
+    def test_closed_journal_rejects_turns(self, tmp_path):
+        """Test that appending after close raises."""
+        journal = write_turns(tmp_path, "abc123", 1)
+        
+        with pytest.raises(SessionJournalError):
+            journal.append({'user': "late"})
+
+
+class TestSessionIndex:
+    """Test suite for listing and resolving sessions."""
+    
+    def test_list_sessions_newest_first(self, tmp_path):
+        """Test that sessions are summarized from the index, newest first."""
+        write_turns(tmp_path, "older", 2)
+        write_turns(tmp_path, "newer", 3)
+        
+        sessions = list_sessions(tmp_path)
+        
+        assert [info.session_id for info in sessions] == ["newer", "older"]
+        assert sessions[0].turns == 3
+        assert sessions[0].title == "question 0"
+    
+    def test_resolve_session_id(self, tmp_path):
+        """Test resolution by full ID, unique prefix and 'last'."""
+        write_turns(tmp_path, "abc111", 1)
+        write_turns(tmp_path, "abd222", 1)
+        
+        assert resolve_session_id(tmp_path, "abc111") == "abc111"
+        assert resolve_session_id(tmp_path, "abd") == "abd222"
+        assert resolve_session_id(tmp_path, "last") == "abd222"
+        with pytest.raises(SessionJournalError, match="ambiguous"):
+            resolve_session_id(tmp_path, "ab")
+        with pytest.raises(SessionJournalError):
+            resolve_session_id(tmp_path, "zzz")
+    
+    def test_unsafe_session_ids_are_rejected(self, tmp_path):
+        """Test that IDs that could leave the directory or act as glob patterns are refused."""
+        sessions = tmp_path / "sessions"
+        write_turns(sessions, "abc111", 1)
+        write_turns(tmp_path, "outside", 1)
+        
+        for session in ("../outside", "*", "[a]*", "ab?", ""):
+            with pytest.raises(SessionJournalError, match="Invalid session ID"):
+                resolve_session_id(sessions, session)
+        with pytest.raises(SessionJournalError, match="Invalid session ID"):
+            journal_path(sessions, "../outside")
@@ -0,0 +1,110 @@
+"""
+Unit tests for the Flex spec retriever.
+
+These tests index small specs in a temporary directory and check that
+relevant sections are found and the on-disk index is reused or rebuilt.
+"""
+
+import json
+import pytest
+
+from tools.spec_retriever import SpecRetriever, SpecRetrieverError, tokenize
+
+
+SPEC = {
+    "COMMON_ERROR_SOLUTIONS": {
+        "index_out_of_bounds": "Franco l7d loops are inclusive; use karr i=0 l7d length(list)-1",
+        "undefined_variable": "Declare variables before use with rakm, kasr or klma"
+    },
+    "built_in_functions": {
+        "input": "da5l() and scan() read a line of user input from the console and return it as a string",
+        "output": "etb3() and print() write text to the console, with {name} placeholders interpolated"
+    },
+    "code_examples": {
+        "functions": {
+            "description": "Named functions",
+            "code": [
+                "sndo2 add(rakm a, rakm b) {",
+                "  rg3 a + b",
+                "}",
+                "fun multiply(int a, int b) {",
+                "  return a * b",
+                "}"
+            ]
+        }
+    }
+}
+
+
+@pytest.fixture
+def spec_path(tmp_path):
+    """Write a small spec file."""
+    path = tmp_path / "flex_language_spec.json"
+    path.write_text(json.dumps(SPEC), encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def retriever(spec_path, tmp_path):
+    """Create a retriever that splits every section."""
+    return SpecRetriever(spec_path, tmp_path / "spec_index.json.gz", max_chunk_chars=120)
+
+
+class TestSpecRetriever:
+    """Test suite for SpecRetriever."""
+    
+    def test_tokenize_keeps_franco_keywords(self):
+        """Test that Franco keywords survive tokenization and filler is dropped."""
+        assert tokenize("How do I use karr l7d with etb3?") == ["karr", "l7d", "etb3"]
+    
+    def test_search_finds_relevant_section(self, retriever):
+        """Test that the best match is the section about the query."""
+        results = retriever.search("index out of bounds error in my l7d loop", top_k=2)
+        
+        assert results[0].title == "COMMON_ERROR_SOLUTIONS > index_out_of_bounds"
+        assert results[0].score > results[-1].score
+    
+    def test_search_without_matches(self, retriever):
+        """Test that unrelated queries return nothing."""
+        assert retriever.search("zebra") == []
+    
+    def test_split_children_keep_description(self, retriever):
+        """Test that a split example keeps its description with the code."""
+        results = retriever.search("sndo2", top_k=1)
+        
+        assert results[0].title == "code_examples > functions > code"
+        assert results[0].text.startswith("description: Named functions")
+    
+    def test_index_is_reused(self, retriever, spec_path, tmp_path):
+        """Test that a second retriever loads the saved index instead of rebuilding."""
+        retriever.load()
+        assert retriever.index_path.exists()
+        
+        reloaded = SpecRetriever(spec_path, retriever.index_path, max_chunk_chars=120)
+        reloaded._build_index = None  # would fail if called
+        
+        assert reloaded.search("scan")[0].title == "built_in_functions > input"
+    
+    def test_index_rebuilt_when_spec_changes(self, retriever, spec_path):
+        """Test that editing the spec invalidates the saved index."""
+        retriever.load()
+        spec_path.write_text(json.dumps({"new_section": "talama loops run while a condition holds"}), encoding='utf-8')
+        
+        reloaded = SpecRetriever(spec_path, retriever.index_path)
+        
+        assert reloaded.search("talama")[0].title == "flex_language_spec"
+    
+    def test_format_context_respects_budget(self, retriever):
+        """Test that formatted context stays within the token budget."""
+        context = retriever.format_context("karr l7d etb3 da5l rakm", top_k=4, max_tokens=60)
+        
+        assert context.startswith("Relevant Flex specification sections")
+        assert context.count("### ") < 4
+        assert retriever.format_context("zebra") == ""
+    
+    def test_missing_spec_raises(self, tmp_path):
+        """Test that a missing spec file raises SpecRetrieverError."""
+        retriever = SpecRetriever(tmp_path / "missing.json", tmp_path / "index.json.gz")
+        
+        with pytest.raises(SpecRetrieverError):
+            retriever.search("karr")
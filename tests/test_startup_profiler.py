@@ -0,0 +1,91 @@
+"""
+Unit tests for startup profiling and lazy imports.
+
+These tests validate that the profiler times imports, and that the one-shot
+command-line modes do not load the AI and UI stacks at import time.
+"""
+
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from tools.startup_profiler import StartupProfiler
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def loaded_modules(code: str) -> set:
+    """Run code in a fresh interpreter and return the modules it loaded."""
+    script = textwrap.dedent(code) + "\nprint('\\n'.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys\n" + script],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return set(result.stdout.split())
+
+
+class TestStartupProfiler:
+    """Test suite for StartupProfiler."""
+    
+    def test_times_imports_and_phases(self, tmp_path, monkeypatch):
+        """Test that imports get inclusive and self times and phases are kept."""
+        (tmp_path / "profiled_outer.py").write_text("import profiled_inner\n")
+        (tmp_path / "profiled_inner.py").write_text("import time\ntime.sleep(0.02)\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        
+        profiler = StartupProfiler().install()
+        try:
+            import profiled_outer  # noqa: F401
+        finally:
+            profiler.uninstall()
+            sys.modules.pop("profiled_outer", None)
+            sys.modules.pop("profiled_inner", None)
+        profiler.mark("done")
+        
+        outer_inclusive, outer_self = profiler.imports["profiled_outer"]
+        inner_inclusive, inner_self = profiler.imports["profiled_inner"]
+        assert inner_self >= 0.02
+        assert outer_inclusive >= inner_inclusive
+        assert outer_self < inner_self
+        assert profiler not in sys.meta_path
+        
+        report = profiler.report()
+        assert "done" in report
+        assert "profiled_inner" in report
+    
+    def test_package_times_group_by_top_level(self):
+        """Test that self times are summed per top-level package."""
+        profiler = StartupProfiler()
+        profiler.imports = {
+            "pkg": (0.3, 0.1),
+            "pkg.sub": (0.2, 0.2),
+            "other": (0.05, 0.05)
+        }
+        
+        assert profiler.package_times() == [("pkg", pytest.approx(0.3)), ("other", 0.05)]
+
+
+class TestLazyImports:
+    """Test suite for import-time work of the entry points."""
+    
+    def test_main_defers_heavy_imports(self):
+        """Test that importing main loads neither pydantic_ai, rich nor httpx."""
+        modules = loaded_modules("sys.argv = ['main.py']\nimport main")
+        
+        assert not {"pydantic_ai", "rich", "prompt_toolkit", "httpx", "psutil", "openai"} & modules
+    
+    def test_tools_exports_load_on_access(self):
+        """Test that one tool import does not pull in the others."""
+        modules = loaded_modules("from tools import FlexCodeValidator")
+        
+        assert "tools.code_validator" in modules
+        assert "tools.flex_executor" not in modules
+        assert "tools.model_manager" not in modules
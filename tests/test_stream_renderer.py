@@ -0,0 +1,83 @@
+"""
+Unit tests for the incremental stream renderer.
+
+These tests validate that streamed deltas are parsed into sections across
+chunk boundaries and that every finished section is rendered once.
+"""
+
+import io
+
+import pytest
+from rich.console import Console
+
+from ui.stream_renderer import StreamRenderer
+
+
+RESPONSE = (
+    "Here is a loop:\n"
+    "```flex\n"
+    "karr i=0 l7d 3 {\n"
+    "    etb3(i)\n"
+    "}\n"
+    "```\n"
+    "It prints 0 to 3.\n"
+    "```python\n"
+    "print('done')\n"
+    "```"
+)
+
+
+@pytest.fixture
+def console():
+    """Create a console that records output."""
+    return Console(file=io.StringIO(), width=80, record=True)
+
+
+def feed_in_pieces(renderer: StreamRenderer, text: str, size: int) -> None:
+    """Feed text in fixed-size deltas."""
+    for start in range(0, len(text), size):
+        renderer.feed(text[start:start + size])
+
+
+class TestStreamRenderer:
+    """Test suite for StreamRenderer."""
+    
+    @pytest.mark.parametrize("size", [1, 3, 7, 1000])
+    def test_sections_survive_chunk_boundaries(self, console, size):
+        """Test that fences split across deltas still produce the same sections."""
+        renderer = StreamRenderer(console, "test/model")
+        
+        feed_in_pieces(renderer, RESPONSE, size)
+        renderer.finish()
+        
+        output = console.export_text()
+        assert renderer.text == RESPONSE
+        assert renderer.sections_rendered == 4
+        assert output.count("etb3(i)") == 1
+        assert output.index("Here is a loop:") < output.index("Flex Code Example") < output.index("It prints 0 to 3.")
+        assert "Code Example (python)" in output
+        assert "```" not in output
+        assert "test/model" in output
+        assert "Ready for your next question" in output
+    
+    def test_unclosed_fence_is_rendered_as_code(self, console):
+        """Test that a response ending inside a code block still shows the code."""
+        renderer = StreamRenderer(console)
+        
+        feed_in_pieces(renderer, "```flex\netb3(1)", 4)
+        renderer.finish()
+        
+        output = console.export_text()
+        assert renderer.sections_rendered == 1
+        assert "Flex Code Example" in output
+        assert "etb3(1)" in output
+    
+    def test_close_without_finish_prints_no_footer(self, console):
+        """Test that a failed stream stops the live region without a footer."""
+        renderer = StreamRenderer(console)
+        
+        renderer.feed("partial answer")
+        renderer.close()
+        renderer.finish()
+        
+        assert "Ready for your next question" not in console.export_text()
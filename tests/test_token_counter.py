@@ -0,0 +1,71 @@
+"""
+Unit tests for the cached token counter.
+
+These tests run against the regex approximation so they do not depend on
+the optional tiktoken package or its downloadable encodings.
+"""
+
+import pytest
+
+from tools.token_counter import TokenCounter
+
+
+@pytest.fixture
+def counter():
+    """Create a token counter that always uses the approximation."""
+    counter = TokenCounter()
+    counter._encoding = None
+    return counter
+
+
+class TestTokenCounter:
+    """Test suite for TokenCounter."""
+    
+    def test_count_empty(self, counter):
+        """Test that empty text has no tokens."""
+        assert counter.count("") == 0
+    
+    def test_count_scales_with_text(self, counter):
+        """Test that longer text has proportionally more tokens."""
+        short = counter.count("print the numbers from one to ten")
+        long = counter.count("print the numbers from one to ten " * 20)
+        
+        assert 5 <= short <= 12
+        assert long == pytest.approx(short * 20, rel=0.1)
+    
+    def test_count_is_cached(self, counter):
+        """Test that repeated counts are served from the cache."""
+        text = "karr i=0 l7d 5 { etb3(i) }"
+        first = counter.count(text)
+        
+        assert counter._cache[text] == first
+        assert counter.count(text) == first
+    
+    def test_count_batch_matches_single_counts(self, counter):
+        """Test that batch counting matches individual counts and order."""
+        texts = ["etb3(\"hi\")", "", "rakm x = 5", "etb3(\"hi\")"]
+        
+        batch = counter.count_batch(texts)
+        
+        assert batch == [counter.count(text) for text in texts]
+        assert batch[1] == 0
+    
+    def test_cache_evicts_oldest(self):
+        """Test that the LRU cache stays within its size."""
+        counter = TokenCounter(cache_size=2)
+        counter._encoding = None
+        for text in ("a", "b", "c"):
+            counter.count(text)
+        
+        assert list(counter._cache) == ["b", "c"]
+    
+    def test_truncate_respects_limit(self, counter):
+        """Test that truncation keeps a prefix within the token limit."""
+        text = "alpha beta gamma delta epsilon zeta eta theta"
+        
+        truncated = counter.truncate(text, 3)
+        
+        assert text.startswith(truncated)
+        assert counter.count(truncated) <= 3
+        assert counter.truncate(text, 100) == text
+        assert counter.truncate(text, 0) == ""
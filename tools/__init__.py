@@ -3,12 +3,39 @@ Tools package for Flex AI Agent.
 
 This package contains all the tools and utilities used by the Flex AI Agent
 for code execution, validation, file management, and model management.
+Exports are imported on first access, so importing one tool does not load
+the dependencies of all the others.
 """
 
-from .flex_executor import FlexExecutor, FlexExecutorError
-from .file_manager import FileManager, FileManagerError
-from .code_validator import FlexCodeValidator
-from .model_manager import ModelManager, ModelManagerError
+import importlib
+from typing import Any
+
+# Exported name -> submodule that defines it
+_EXPORTS = {
+    "FlexExecutor": "flex_executor",
+    "FlexExecutorError": "flex_executor",
+    "FileManager": "file_manager",
+    "FileManagerError": "file_manager",
+    "FlexCodeValidator": "code_validator",
+    "ModelManager": "model_manager",
+    "ModelManagerError": "model_manager",
+    "MetricsStore": "metrics_store",
+    "LatencyHistogram": "metrics_store",
+    "ModelRouter": "model_router",
+    "ModelRouterError": "model_router",
+    "TokenCounter": "token_counter",
+    "get_token_counter": "token_counter",
+    "SpecRetriever": "spec_retriever",
+    "SpecRetrieverError": "spec_retriever",
+    "ResponseCache": "response_cache",
+    "StartupProfiler": "startup_profiler",
+    "SessionJournal": "session_journal",
+    "SessionJournalError": "session_journal",
+    "SearchIndex": "search_index",
+    "SearchIndexError": "search_index",
+    "BatchRunner": "batch_runner",
+    "BatchError": "batch_runner",
+}
 
 __all__ = [
     "FlexExecutor",
@@ -17,7 +44,36 @@ __all__ = [
     "FileManagerError",
     "FlexCodeValidator",
     "ModelManager",
-    "ModelManagerError"
+    "ModelManagerError",
+    "MetricsStore",
+    "LatencyHistogram",
+    "ModelRouter",
+    "ModelRouterError",
+    "TokenCounter",
+    "get_token_counter",
+    "SpecRetriever",
+    "SpecRetrieverError",
+    "ResponseCache",
+    "StartupProfiler",
+    "SessionJournal",
+    "SessionJournalError",
+    "SearchIndex",
+    "SearchIndexError",
+    "BatchRunner",
+    "BatchError"
 ]
 
-__version__ = "1.0.0"
\ No newline at end of file
+__version__ = "1.0.0"
+
+
+def __getattr__(name: str) -> Any:
+    """Import an exported name from its submodule on first access."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
\ No newline at end of file
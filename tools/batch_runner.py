@@ -0,0 +1,231 @@
+"""
+Headless Batch Runner for Flex AI Agent.
+
+This module generates code for a whole file of prompts with one agent. Prompts
+run concurrently under a semaphore, and each result is handed back as soon as
+it is ready, so it can be streamed out as NDJSON while the rest of the batch
+is still running.
+
+Rate limits and transient server errors are retried with exponential backoff
+and jitter. A rate limit also pauses the start of new calls on every worker
+until the backoff has passed, so the batch slows down as a whole instead of
+each worker running into the same limit on its own.
+"""
+
+import asyncio
+import json
+import random
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Optional, Union
+
+import httpx
+
+from agents.models import BatchItemResult, FlexCodeRequest, FlexSyntaxStyle
+
+if TYPE_CHECKING:
+    from agents.flex_agent import FlexAIAgent
+
+
+class BatchError(Exception):
+    """Custom exception for batch run errors."""
+    pass
+
+
+class BatchItem(NamedTuple):
+    """One prompt of a batch file."""
+    index: int
+    item_id: str
+    prompt: str
+    syntax_style: FlexSyntaxStyle
+    model_id: Optional[str]
+
+
+def read_batch_file(
+    path: Union[str, Path],
+    syntax_style: str = 'auto',
+    model_id: Optional[str] = None
+) -> List[BatchItem]:
+    """
+    Read a JSONL prompt file.
+    
+    Each non-blank line is either a JSON string (the prompt) or an object with
+    a "prompt" and optional "id", "syntax" and "model" keys.
+    
+    Args:
+        path: Prompt file
+        syntax_style: Syntax style of prompts that do not set one
+        model_id: Model of prompts that do not set one (current model if None)
+    
+    Returns:
+        Prompts in file order
+    
+    Raises:
+        BatchError: If the file cannot be read or a line is not a valid prompt
+    """
+    try:
+        lines = Path(path).read_text(encoding='utf-8').splitlines()
+    except (OSError, UnicodeDecodeError) as e:
+        raise BatchError(f"Cannot read batch file {path}: {e}")
+    
+    items = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {'prompt': entry}
+            if not isinstance(entry, dict) or not str(entry.get('prompt') or '').strip():
+                raise ValueError("expected a prompt string or an object with a 'prompt'")
+            style = FlexSyntaxStyle(str(entry.get('syntax') or syntax_style).lower())
+        except ValueError as e:
+            raise BatchError(f"{path}:{line_number}: invalid prompt line: {e}")
+        
+        index = len(items)
+        items.append(BatchItem(
+            index=index,
+            item_id=str(entry.get('id', index)),
+            prompt=str(entry['prompt']).strip(),
+            syntax_style=style,
+            model_id=entry.get('model') or model_id
+        ))
+    return items
+
+
+class BatchRunner:
+    """Concurrent code generation over a list of prompts."""
+    
+    # HTTP statuses worth retrying: rate limits and transient upstream failures
+    RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+    RETRY_BASE_DELAY = 2.0
+    RETRY_MAX_DELAY = 60.0
+    
+    def __init__(self, agent: 'FlexAIAgent', concurrency: int = 4, max_retries: int = 4):
+        """
+        Initialize the batch runner.
+        
+        Args:
+            agent: Agent shared by every prompt
+            concurrency: Maximum prompts in flight at once
+            max_retries: Retries per prompt after a rate limit or transient error
+        """
+        if concurrency < 1:
+            raise BatchError("Concurrency must be at least 1")
+        self.agent = agent
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        # Reason: a rate limit applies to the API key, not to one worker, so every
+        # worker waits until this loop time before starting its next call
+        self._resume_at = 0.0
+    
+    async def run(
+        self,
+        items: List[BatchItem],
+        on_result: Optional[Callable[[BatchItemResult], None]] = None
+    ) -> List[BatchItemResult]:
+        """
+        Generate code for every prompt.
+        
+        Args:
+            items: Prompts to run
+            on_result: Called with each result as soon as it is ready
+        
+        Returns:
+            Results in prompt order
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def run_item(item: BatchItem) -> BatchItemResult:
+            async with semaphore:
+                return await self._run_item(item)
+        
+        tasks = [asyncio.create_task(run_item(item)) for item in items]
+        results = []
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        return sorted(results, key=lambda result: result.index)
+    
+    async def _run_item(self, item: BatchItem) -> BatchItemResult:
+        """Generate code for one prompt, retrying rate limits and transient errors."""
+        request = FlexCodeRequest(prompt=item.prompt, syntax_style=item.syntax_style, model_id=item.model_id)
+        attempts = 0
+        while True:
+            await self._wait_for_rate_limit()
+            attempts += 1
+            try:
+                response = await self.agent.generate_code(request)
+                break
+            except Exception as e:
+                delay = self._retry_delay(e, attempts)
+                if delay is None:
+                    return BatchItemResult(
+                        index=item.index,
+                        id=item.item_id,
+                        prompt=item.prompt,
+                        status='error',
+                        model=item.model_id or self.agent.current_model_id,
+                        attempts=attempts,
+                        error=f"{type(e).__name__}: {e}"
+                    )
+                if _status_code(e) == 429:
+                    loop = asyncio.get_running_loop()
+                    self._resume_at = max(self._resume_at, loop.time() + delay)
+                await asyncio.sleep(delay)
+        
+        return BatchItemResult(
+            index=item.index,
+            id=item.item_id,
+            prompt=item.prompt,
+            status='ok' if response.is_valid else 'invalid',
+            model=response.model_used,
+            code=response.code,
+            is_valid=response.is_valid,
+            syntax_style=response.syntax_style,
+            repair_rounds=response.repair_rounds,
+            warnings=response.warnings,
+            latency=response.generation_time,
+            tokens=response.tokens_used,
+            attempts=attempts
+        )
+    
+    async def _wait_for_rate_limit(self) -> None:
+        """Sleep until a rate-limit pause set by any worker has passed."""
+        loop = asyncio.get_running_loop()
+        while self._resume_at > loop.time():
+            await asyncio.sleep(self._resume_at - loop.time())
+    
+    def _retry_delay(self, error: Exception, attempts: int) -> Optional[float]:
+        """
+        Get the backoff before retrying a failed attempt.
+        
+        Args:
+            error: Error of the attempt
+            attempts: Attempts made so far
+        
+        Returns:
+            Seconds to wait, or None if the error is not retryable or retries are used up
+        """
+        retryable = (
+            _status_code(error) in self.RETRYABLE_STATUS
+            or isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+        )
+        if not retryable or attempts > self.max_retries:
+            return None
+        delay = min(self.RETRY_MAX_DELAY, self.RETRY_BASE_DELAY * 2 ** (attempts - 1))
+        # Reason: jitter keeps workers that failed together from retrying together
+        return delay * random.uniform(0.5, 1.0)
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of a model error (ModelHTTPError and OpenAI SDK errors carry one)."""
+    status = getattr(error, 'status_code', None)
+    return status if isinstance(status, int) else None
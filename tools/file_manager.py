@@ -20,6 +20,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'config'))
 
 from agents.models import FileOperation, FileOperationResult
 from config.settings import Settings, get_settings
+from tools.search_index import SearchIndex
 
 
 class FileManagerError(Exception):
@@ -30,9 +31,16 @@ class FileManagerError(Exception):
 class FileManager:
     """Manages file operations for Flex code files."""
     
-    def __init__(self, settings: Optional[Settings] = None):
-        """Initialize file manager with settings."""
+    def __init__(self, settings: Optional[Settings] = None, search_index: Optional[SearchIndex] = None):
+        """
+        Initialize file manager with settings.
+        
+        Args:
+            settings: Application settings
+            search_index: Index that written Flex files are added to
+        """
         self.settings = settings or get_settings()
+        self.search_index = search_index
         self.flex_extensions = self.settings.flex.file_extensions
         self.temp_dir = Path(self.settings.flex.temp_dir)
         self.examples_dir = Path(self.settings.flex.examples_dir)
@@ -161,6 +169,7 @@ class FileManager:
             
             # Get file metadata after write
             stat = filepath.stat()
+            await self._index_file(filepath, operation.content or "", stat.st_mtime)
             
             return FileOperationResult(
                 success=True,
@@ -201,6 +210,7 @@ class FileManager:
         
         try:
             filepath.unlink()
+            await self._unindex_file(filepath)
             
             return FileOperationResult(
                 success=True,
@@ -286,6 +296,42 @@ class FileManager:
                 filepath=str(dirpath)
             )
     
+    async def _index_file(self, filepath: Path, content: str, modified: float) -> None:
+        """Add a written Flex file to the search index."""
+        if self.search_index is None or filepath.suffix not in self.flex_extensions:
+            return
+        try:
+            await asyncio.to_thread(self.search_index.add_file, filepath.resolve(), content, modified)
+        except Exception as e:
+            # Reason: the file is written; a stale search index must not fail the write
+            print(f"Warning: Could not index {filepath} for search: {e}")
+    
+    async def _unindex_file(self, filepath: Path) -> None:
+        """Drop a deleted Flex file from the search index."""
+        if self.search_index is None or filepath.suffix not in self.flex_extensions:
+            return
+        try:
+            await asyncio.to_thread(self.search_index.remove_file, filepath.resolve())
+        except Exception as e:
+            # Reason: the file is deleted; a stale search index must not fail the delete
+            print(f"Warning: Could not remove {filepath} from the search index: {e}")
+    
+    def sync_search_index(self) -> int:
+        """
+        Index Flex files already on disk that are new or changed since last indexed.
+        
+        Covers the examples directory (recursively) and the working directory,
+        where relative paths are written. Blocking; run it in a worker thread.
+        
+        Returns:
+            Number of files indexed
+        """
+        if self.search_index is None:
+            return 0
+        candidates = [*self.examples_dir.rglob("*"), *Path.cwd().iterdir()]
+        paths = [path for path in candidates if path.suffix in self.flex_extensions and path.is_file()]
+        return self.search_index.sync_files(paths)
+    
     async def _create_backup(self, filepath: Path) -> Path:
         """Create a backup of a file."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
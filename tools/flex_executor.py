@@ -9,7 +9,6 @@ import asyncio
 import os
 import tempfile
 import signal
-import psutil
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from datetime import datetime
@@ -236,6 +235,9 @@ class FlexExecutor:
         Args:
             pid: Process ID to monitor
         """
+        # Reason: psutil is only needed while processes run, keep it off the import path
+        import psutil
+        
         try:
             proc = psutil.Process(pid)
             
@@ -402,6 +404,8 @@ class FlexExecutor:
     
     async def get_running_processes(self) -> List[Dict[str, Any]]:
         """Get list of currently running Flex processes."""
+        import psutil
+        
         running = []
         
         for process_id, process in self.running_processes.items():
@@ -0,0 +1,96 @@
+"""
+Shared HTTP Client for Flex AI Agent.
+
+This module owns the single pooled ``httpx.AsyncClient`` used for all OpenRouter
+traffic - the model catalog fetch and every model call made through PydanticAI.
+Connections are kept alive and reused (over HTTP/2 when the ``h2`` package is
+installed), so TLS handshakes are paid once per process rather than per request.
+"""
+
+from typing import Optional
+import httpx
+
+from config.settings import Settings, get_settings
+
+
+def http2_available() -> bool:
+    """Check whether the optional ``h2`` package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class SharedHTTPClient:
+    """Lazily created, process-wide pooled HTTP client."""
+    
+    def __init__(self):
+        """Initialize an empty client holder."""
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def get(self, settings: Optional[Settings] = None) -> httpx.AsyncClient:
+        """
+        Get the shared client, creating it on first use.
+        
+        Args:
+            settings: Settings used to configure the pool on first creation
+        
+        Returns:
+            Shared pooled HTTP client
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client(settings or get_settings())
+        return self._client
+    
+    def _create_client(self, settings: Settings) -> httpx.AsyncClient:
+        """Create a pooled client configured from settings."""
+        http_settings = settings.http
+        
+        limits = httpx.Limits(
+            max_connections=http_settings.max_connections,
+            max_keepalive_connections=http_settings.max_keepalive_connections,
+            keepalive_expiry=http_settings.keepalive_expiry
+        )
+        timeout = httpx.Timeout(
+            http_settings.timeout,
+            connect=http_settings.connect_timeout
+        )
+        
+        # OpenRouter app attribution headers apply to every request
+        headers = {
+            "HTTP-Referer": settings.openrouter.http_referer,
+            "X-Title": settings.openrouter.app_title
+        }
+        
+        return httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            headers=headers,
+            http2=http_settings.enable_http2 and http2_available()
+        )
+    
+    @property
+    def is_open(self) -> bool:
+        """Whether a live client currently exists."""
+        return self._client is not None and not self._client.is_closed
+    
+    async def aclose(self) -> None:
+        """Close the shared client and release pooled connections."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+
+# Global shared client instance
+shared_http_client = SharedHTTPClient()
+
+
+def get_shared_http_client(settings: Optional[Settings] = None) -> httpx.AsyncClient:
+    """Get the process-wide pooled HTTP client."""
+    return shared_http_client.get(settings)
+
+
+async def close_shared_http_client() -> None:
+    """Close the process-wide pooled HTTP client."""
+    await shared_http_client.aclose()
@@ -0,0 +1,576 @@
+"""
+Persistent Model Metrics Store for Flex AI Agent.
+
+This module records every model call (latency, time to first token, tokens and
+cost) into per-model HDR-style latency histograms and flushes the raw samples to
+an append-only SQLite database in WAL mode. Percentiles (p50/p95/p99) can be
+queried per model so model choice can be driven by measured performance.
+Outcomes of hedged requests are stored alongside, giving per-model win rates.
+
+Recording never blocks on I/O or locks: samples are appended to an in-memory
+deque and histograms are updated in place; a full batch is written by a
+background writer thread. Persisted history can be loaded in a worker thread
+with ``load_history`` before the first query, so the event loop never scans
+the database.
+"""
+
+import asyncio
+import atexit
+import math
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from datetime import datetime
+
+from agents.models import ModelMetrics
+
+
+class MetricSample(NamedTuple):
+    """A single recorded model call."""
+    timestamp: float
+    model_id: str
+    success: bool
+    latency_ms: float
+    ttft_ms: Optional[float]
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+    cached_tokens: int = 0
+
+
+class HedgeSample(NamedTuple):
+    """One model's outcome in a hedged request."""
+    timestamp: float
+    model_id: str
+    won: bool
+
+
+class LatencyHistogram:
+    """
+    Log-linear (HDR-style) histogram with bounded relative error.
+    
+    Values below ``2 * SUB_BUCKETS`` are counted exactly; above that every
+    power-of-two range is split into ``SUB_BUCKETS`` linear buckets, giving
+    roughly 3% worst-case relative error with a handful of sparse buckets.
+    """
+    
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+    
+    @classmethod
+    def _bucket_index(cls, value: int) -> int:
+        """Map a non-negative integer value to its bucket index."""
+        if value < 2 * cls.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+        return (shift + 1) * cls.SUB_BUCKETS + (value >> shift) - cls.SUB_BUCKETS
+    
+    @classmethod
+    def _bucket_bounds(cls, index: int) -> Tuple[int, int]:
+        """Get the [low, high) value range covered by a bucket."""
+        if index < 2 * cls.SUB_BUCKETS:
+            return index, index + 1
+        shift = index // cls.SUB_BUCKETS - 1
+        mantissa = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return mantissa << shift, (mantissa + 1) << shift
+    
+    def record(self, value: float) -> None:
+        """Record a value (e.g. a latency in milliseconds)."""
+        value = max(0.0, float(value))
+        index = self._bucket_index(int(value))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Merge another histogram into this one."""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+    
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Get the value at a percentile.
+        
+        Args:
+            percentile: Percentile in the range 0-100
+        
+        Returns:
+            Estimated value at the percentile, or None if empty
+        """
+        if self.count == 0:
+            return None
+        
+        rank = max(1, math.ceil(percentile / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = self._bucket_bounds(index)
+                estimate = low if high - low == 1 else (low + high) / 2
+                # Reason: clamp the bucket midpoint to the observed range
+                return min(max(estimate, self.min), self.max)
+        return self.max
+    
+    @property
+    def mean(self) -> Optional[float]:
+        """Mean of recorded values."""
+        return self.total / self.count if self.count else None
+
+
+class ModelStats:
+    """Aggregated in-memory statistics for one model."""
+    
+    def __init__(self, model_id: str):
+        """Initialize empty stats for a model."""
+        self.model_id = model_id
+        self.latency = LatencyHistogram()
+        self.ttft = LatencyHistogram()
+        self.throughput = LatencyHistogram()  # completion tokens per second
+        self.successes = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.last_used: Optional[float] = None
+    
+    def add(self, sample: MetricSample) -> None:
+        """Fold a sample into the aggregate."""
+        if sample.success:
+            self.successes += 1
+            self.latency.record(sample.latency_ms)
+            if sample.ttft_ms is not None:
+                self.ttft.record(sample.ttft_ms)
+            if sample.completion_tokens and sample.latency_ms > 0:
+                self.throughput.record(sample.completion_tokens / (sample.latency_ms / 1000.0))
+        else:
+            self.failures += 1
+        self.prompt_tokens += sample.prompt_tokens
+        self.completion_tokens += sample.completion_tokens
+        self.cached_tokens += sample.cached_tokens
+        self.cost += sample.cost
+        self.last_used = max(self.last_used or 0.0, sample.timestamp)
+    
+    def merge(self, other: "ModelStats") -> None:
+        """Merge another aggregate of the same model into this one."""
+        self.latency.merge(other.latency)
+        self.ttft.merge(other.ttft)
+        self.throughput.merge(other.throughput)
+        self.successes += other.successes
+        self.failures += other.failures
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.cost += other.cost
+        self.hedged += other.hedged
+        self.hedge_wins += other.hedge_wins
+        if other.last_used is not None:
+            self.last_used = max(self.last_used or 0.0, other.last_used)
+    
+    def add_hedge(self, sample: HedgeSample) -> None:
+        """Fold a hedged-request outcome into the aggregate."""
+        self.hedged += 1
+        if sample.won:
+            self.hedge_wins += 1
+    
+    @property
+    def hedge_win_rate(self) -> Optional[float]:
+        """Share of hedged requests this model won."""
+        return self.hedge_wins / self.hedged if self.hedged else None
+
+
+class MetricsStore:
+    """Append-only, histogram-backed store of model call metrics."""
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS samples (
+            ts REAL NOT NULL,
+            model_id TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            latency_ms REAL NOT NULL,
+            ttft_ms REAL,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            cost REAL NOT NULL DEFAULT 0,
+            cached_tokens INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    
+    HEDGE_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS hedges (
+            ts REAL NOT NULL,
+            model_id TEXT NOT NULL,
+            won INTEGER NOT NULL
+        )
+    """
+    
+    # Columns added after the first schema, with their definitions
+    MIGRATIONS = {
+        "cached_tokens": "INTEGER NOT NULL DEFAULT 0"
+    }
+    
+    def __init__(self, db_path: Path, flush_batch_size: int = 32, persist: bool = True):
+        """
+        Initialize the metrics store.
+        
+        Args:
+            db_path: SQLite database file for persisted samples
+            flush_batch_size: Number of buffered samples that triggers a flush
+            persist: Whether samples are written to disk at all
+        """
+        self.db_path = Path(db_path)
+        self.flush_batch_size = flush_batch_size
+        self.persist = persist
+        
+        # Reason: deque.append/popleft are atomic, so recording needs no lock
+        self._pending: deque = deque()
+        self._stats: Dict[str, ModelStats] = {}
+        self._loaded = False
+        self._session_start = time.time()
+        self._connection: Optional[sqlite3.Connection] = None
+        # Reason: the connection is shared by the writer thread, history loads and close()
+        self._db_lock = threading.Lock()
+        self._flush_wanted = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        
+        if self.persist:
+            atexit.register(self.close)
+    
+    def record(
+        self,
+        model_id: str,
+        success: bool,
+        latency: float,
+        ttft: Optional[float] = None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cost: float = 0.0,
+        cached_tokens: int = 0
+    ) -> MetricSample:
+        """
+        Record one model call.
+        
+        Args:
+            model_id: Model that served the call
+            success: Whether the call succeeded
+            latency: Total call latency in seconds
+            ttft: Time to first token in seconds, if streamed
+            prompt_tokens: Prompt tokens consumed
+            completion_tokens: Completion tokens produced
+            cost: Cost of the call in USD
+            cached_tokens: Prompt tokens served from the provider's prompt cache
+        
+        Returns:
+            The recorded sample
+        """
+        sample = MetricSample(
+            timestamp=time.time(),
+            model_id=model_id,
+            success=success,
+            latency_ms=latency * 1000.0,
+            ttft_ms=ttft * 1000.0 if ttft is not None else None,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=cost,
+            cached_tokens=cached_tokens
+        )
+        
+        self._stats_for(model_id).add(sample)
+        
+        if self.persist:
+            self._pending.append(sample)
+            if len(self._pending) >= self.flush_batch_size:
+                self._request_flush()
+        
+        return sample
+    
+    def record_hedge(self, model_id: str, won: bool) -> HedgeSample:
+        """
+        Record whether a model won a hedged request it took part in.
+        
+        Args:
+            model_id: Model that raced
+            won: Whether its stream was the one kept
+        
+        Returns:
+            The recorded sample
+        """
+        sample = HedgeSample(timestamp=time.time(), model_id=model_id, won=won)
+        self._stats_for(model_id).add_hedge(sample)
+        
+        if self.persist:
+            self._pending.append(sample)
+            if len(self._pending) >= self.flush_batch_size:
+                self._request_flush()
+        
+        return sample
+    
+    def _request_flush(self) -> None:
+        """Wake the writer thread (starting it on first use) to flush the buffer."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer, name="metrics-writer", daemon=True)
+            self._writer.start()
+        self._flush_wanted.set()
+    
+    def _run_writer(self) -> None:
+        """Writer thread: flush each time a batch fills, until the store is closed."""
+        while True:
+            self._flush_wanted.wait()
+            self._flush_wanted.clear()
+            if self._closed:
+                return
+            self.flush()
+    
+    def _stats_for(self, model_id: str) -> ModelStats:
+        """Get (creating if needed) the aggregate for a model."""
+        stats = self._stats.get(model_id)
+        if stats is None:
+            stats = self._stats[model_id] = ModelStats(model_id)
+        return stats
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database in WAL mode, creating the schema if needed."""
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(self.SCHEMA)
+            connection.execute(self.HEDGE_SCHEMA)
+            self._migrate(connection)
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_samples_model ON samples (model_id, ts)"
+            )
+            self._connection = connection
+        return self._connection
+    
+    def _migrate(self, connection: sqlite3.Connection) -> None:
+        """Add columns missing from databases created by older versions."""
+        existing = {row[1] for row in connection.execute("PRAGMA table_info(samples)")}
+        for column, definition in self.MIGRATIONS.items():
+            if column not in existing:
+                connection.execute(f"ALTER TABLE samples ADD COLUMN {column} {definition}")
+    
+    def flush(self) -> int:
+        """
+        Append buffered samples to the database in a single transaction.
+        
+        Returns:
+            Number of samples written
+        """
+        batch: List[Union[MetricSample, HedgeSample]] = []
+        while self._pending:
+            try:
+                batch.append(self._pending.popleft())
+            except IndexError:
+                break
+        
+        if not batch or not self.persist:
+            return 0
+        
+        samples = [s for s in batch if isinstance(s, MetricSample)]
+        hedges = [s for s in batch if isinstance(s, HedgeSample)]
+        
+        try:
+            with self._db_lock:
+                self._write(samples, hedges)
+        except sqlite3.Error as e:
+            print(f"Warning: Failed to flush model metrics: {e}")
+            return 0
+        
+        return len(batch)
+    
+    def _write(self, samples: List[MetricSample], hedges: List[HedgeSample]) -> None:
+        """Insert samples in one transaction (caller holds the database lock)."""
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT INTO samples (ts, model_id, success, latency_ms, ttft_ms, "
+                "prompt_tokens, completion_tokens, cost, cached_tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        s.timestamp, s.model_id, int(s.success), s.latency_ms,
+                        s.ttft_ms, s.prompt_tokens, s.completion_tokens, s.cost,
+                        s.cached_tokens
+                    )
+                    for s in samples
+                ]
+            )
+            connection.executemany(
+                "INSERT INTO hedges (ts, model_id, won) VALUES (?, ?, ?)",
+                [(h.timestamp, h.model_id, int(h.won)) for h in hedges]
+            )
+    
+    def _read_history(self) -> Dict[str, ModelStats]:
+        """
+        Aggregate previously persisted samples, without touching the live stats.
+        
+        Safe to run in a worker thread.
+        
+        Returns:
+            Aggregates of earlier sessions by model
+        """
+        history: Dict[str, ModelStats] = {}
+        if not self.persist or not self.db_path.exists():
+            return history
+        
+        def stats_for(model_id: str) -> ModelStats:
+            if model_id not in history:
+                history[model_id] = ModelStats(model_id)
+            return history[model_id]
+        
+        try:
+            with self._db_lock:
+                connection = self._connect()
+                rows = connection.execute(
+                    "SELECT ts, model_id, success, latency_ms, ttft_ms, "
+                    "prompt_tokens, completion_tokens, cost, cached_tokens FROM samples WHERE ts < ?",
+                    # Reason: samples recorded in this process are already aggregated
+                    (self._session_start,)
+                ).fetchall()
+                hedge_rows = connection.execute(
+                    "SELECT ts, model_id, won FROM hedges WHERE ts < ?",
+                    (self._session_start,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Warning: Failed to load model metrics: {e}")
+            return history
+        
+        for row in rows:
+            sample = MetricSample(
+                timestamp=row[0],
+                model_id=row[1],
+                success=bool(row[2]),
+                latency_ms=row[3],
+                ttft_ms=row[4],
+                prompt_tokens=row[5],
+                completion_tokens=row[6],
+                cost=row[7],
+                cached_tokens=row[8]
+            )
+            stats_for(sample.model_id).add(sample)
+        
+        for row in hedge_rows:
+            hedge = HedgeSample(timestamp=row[0], model_id=row[1], won=bool(row[2]))
+            stats_for(hedge.model_id).add_hedge(hedge)
+        
+        return history
+    
+    def _merge_history(self, history: Dict[str, ModelStats]) -> None:
+        """Fold aggregates of earlier sessions into the in-memory stats once."""
+        if self._loaded:
+            return
+        self._loaded = True
+        for model_id, stats in history.items():
+            self._stats_for(model_id).merge(stats)
+    
+    def _load_history(self) -> None:
+        """Fold previously persisted samples into the in-memory histograms."""
+        if not self._loaded:
+            self._merge_history(self._read_history())
+    
+    async def load_history(self) -> None:
+        """Load persisted samples in a worker thread; later queries then do no I/O."""
+        if not self._loaded:
+            history = await asyncio.to_thread(self._read_history)
+            self._merge_history(history)
+    
+    def get_stats(self, model_id: str) -> Optional[ModelStats]:
+        """Get aggregated statistics for a model, including persisted history."""
+        self._load_history()
+        return self._stats.get(model_id)
+    
+    def model_ids(self) -> List[str]:
+        """List all models with recorded metrics."""
+        self._load_history()
+        return list(self._stats)
+    
+    def percentiles(
+        self,
+        model_id: str,
+        metric: str = "latency",
+        percentiles: Iterable[float] = (50, 95, 99)
+    ) -> Dict[str, Optional[float]]:
+        """
+        Query percentiles of a metric for a model.
+        
+        Args:
+            model_id: Model identifier
+            metric: One of 'latency', 'ttft' or 'throughput'
+            percentiles: Percentiles to compute (0-100)
+        
+        Returns:
+            Mapping like {'p50': 812.0, 'p95': 2100.0, 'p99': 3900.0}; latency
+            values are in milliseconds, throughput in tokens per second
+        """
+        if metric not in ("latency", "ttft", "throughput"):
+            raise ValueError(f"Unknown metric: {metric}")
+        
+        stats = self.get_stats(model_id)
+        histogram = getattr(stats, metric) if stats else LatencyHistogram()
+        return {f"p{p:g}": histogram.percentile(p) for p in percentiles}
+    
+    def summary(self, model_id: str) -> Optional[ModelMetrics]:
+        """Summarize a model's recorded calls as ModelMetrics."""
+        stats = self.get_stats(model_id)
+        if stats is None:
+            return None
+        
+        latency = stats.latency
+        
+        def to_seconds(value: Optional[float]) -> Optional[float]:
+            return value / 1000.0 if value is not None else None
+        
+        return ModelMetrics(
+            model_id=model_id,
+            total_requests=stats.successes + stats.failures,
+            successful_requests=stats.successes,
+            failed_requests=stats.failures,
+            average_response_time=to_seconds(latency.mean) or 0.0,
+            p50_response_time=to_seconds(latency.percentile(50)),
+            p95_response_time=to_seconds(latency.percentile(95)),
+            p99_response_time=to_seconds(latency.percentile(99)),
+            total_tokens_used=stats.prompt_tokens + stats.completion_tokens,
+            total_cached_tokens=stats.cached_tokens,
+            cache_hit_ratio=stats.cached_tokens / stats.prompt_tokens if stats.prompt_tokens else None,
+            total_cost=stats.cost,
+            hedged_requests=stats.hedged,
+            hedge_win_rate=stats.hedge_win_rate,
+            last_used=datetime.fromtimestamp(stats.last_used) if stats.last_used else None
+        )
+    
+    def close(self) -> None:
+        """Stop the writer thread, flush pending samples and close the database."""
+        self._closed = True
+        if self._writer is not None:
+            self._flush_wanted.set()
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        with self._db_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -24,9 +24,14 @@ from agents.models import (
     OpenRouterModel,
     ModelFilter,
     ModelSelection,
-    ModelMetrics
+    ModelMetrics,
+    RoutingDecision
 )
 from config.settings import Settings
+from tools.http_client import get_shared_http_client
+from tools.metrics_store import MetricsStore
+from tools.model_router import ModelRouter
+from tools.token_counter import get_token_counter
 
 
 class ModelManagerError(Exception):
@@ -37,32 +42,64 @@ class ModelManagerError(Exception):
 class ModelManager:
     """Manages OpenRouter models with caching and filtering capabilities."""
     
-    def __init__(self, settings: Settings):
-        """Initialize ModelManager with configuration."""
+    # First-token samples needed before a model's p95 sets its hedge deadline
+    HEDGE_MIN_SAMPLES = 5
+    # Catalog cache, metrics, journals and search index (relative to the working directory)
+    DEFAULT_CACHE_DIR = Path("cache")
+    
+    def __init__(self, settings: Settings, cache_dir: Optional[Path] = None):
+        """
+        Initialize ModelManager with configuration.
+        
+        Args:
+            settings: Application settings
+            cache_dir: Directory for cached and persisted data (defaults to DEFAULT_CACHE_DIR)
+        """
         self.settings = settings
         self.api_key = settings.openrouter.api_key
         self.base_url = settings.openrouter.base_url
         self.http_referer = settings.openrouter.http_referer
         self.app_title = settings.openrouter.app_title
         self.cache_duration = timedelta(seconds=settings.app.model_cache_duration)
+        self.stale_while_revalidate = settings.app.model_cache_stale_while_revalidate
         
         # Cache configuration
-        self.cache_dir = Path("cache")
-        self.cache_dir.mkdir(exist_ok=True)
+        # Reason: resolved once, so writes at exit still land here after a chdir
+        self.cache_dir = Path(cache_dir or self.DEFAULT_CACHE_DIR).resolve()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.cache_file = self.cache_dir / "models_cache.json"
         
         # Performance metrics
         self.metrics: Dict[str, ModelMetrics] = {}
+        self.metrics_store = MetricsStore(
+            self.cache_dir / "metrics.db",
+            persist=settings.app.enable_metrics
+        )
+        
+        # Catalog index for pricing lookups when recording calls
+        self._models_by_id: Dict[str, OpenRouterModel] = {}
+        self.router = ModelRouter(
+            self.metrics_store,
+            max_request_cost=settings.app.routing_max_request_cost
+        )
         
         # HTTP client configuration
         self.timeout = httpx.Timeout(30.0)
         self.retry_attempts = 3
         self.retry_delay = 1.0
+        
+        # Single in-flight catalog fetch shared by all concurrent callers
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.last_refresh_error: Optional[str] = None
     
     async def list_models(self, use_cache: bool = True) -> List[OpenRouterModel]:
         """
         List all available OpenRouter models.
         
+        An expired cache is served immediately while a background task
+        refreshes it (stale-while-revalidate). Only a cold cache or
+        ``use_cache=False`` waits on the network.
+        
         Args:
             use_cache: Whether to use cached results
             
@@ -73,18 +110,66 @@ class ModelManager:
             ModelManagerError: If API request fails
         """
         # Check cache first
-        if use_cache and self._is_cache_valid():
-            cached_models = self._load_from_cache()
-            if cached_models:
-                return cached_models
+        if use_cache:
+            if self._is_cache_valid():
+                cached_models = self._load_from_cache()
+                if cached_models:
+                    return cached_models
+            elif self.stale_while_revalidate and self.cache_file.exists():
+                stale_models = self._load_from_cache()
+                if stale_models:
+                    self.refresh_in_background()
+                    return stale_models
+        
+        return await self._refresh_models()
+    
+    async def _refresh_models(self) -> List[OpenRouterModel]:
+        """Fetch models, joining an in-flight fetch instead of starting another."""
+        task = self._get_or_start_refresh()
+        # Reason: shield so one cancelled caller does not cancel the shared fetch
+        return await asyncio.shield(task)
+    
+    def refresh_in_background(self) -> asyncio.Task:
+        """
+        Start (or join) a background catalog refresh without waiting for it.
         
-        # Fetch from API with retry logic
+        Returns:
+            The shared refresh task
+        """
+        return self._get_or_start_refresh()
+    
+    async def wait_for_refresh(self) -> None:
+        """Wait for an in-flight background refresh, if any, to finish."""
+        task = self._refresh_task
+        if task is not None and not task.done():
+            await asyncio.wait([task])
+    
+    def _get_or_start_refresh(self) -> asyncio.Task:
+        """Return the in-flight refresh task, starting one if needed."""
+        task = self._refresh_task
+        loop = asyncio.get_running_loop()
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._fetch_with_retries())
+            task.add_done_callback(self._on_refresh_done)
+            self._refresh_task = task
+        return task
+    
+    def _on_refresh_done(self, task: asyncio.Task) -> None:
+        """Record the outcome of a refresh so background failures are not lost."""
+        if task.cancelled():
+            return
+        error = task.exception()
+        self.last_refresh_error = str(error) if error else None
+    
+    async def _fetch_with_retries(self) -> List[OpenRouterModel]:
+        """Fetch models from the API with retries and refresh the cache."""
         for attempt in range(self.retry_attempts):
             try:
                 models = await self._fetch_models_from_api()
                 
                 # Cache the results
                 self._save_to_cache(models)
+                self._index_models(models)
                 
                 return models
                 
@@ -98,6 +183,10 @@ class ModelManager:
         # This should never be reached, but just in case
         raise ModelManagerError("Unexpected error in model fetching")
     
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Get the shared pooled HTTP client."""
+        return get_shared_http_client(self.settings)
+    
     async def _fetch_models_from_api(self) -> List[OpenRouterModel]:
         """Fetch models from OpenRouter API."""
         headers = {
@@ -107,56 +196,61 @@ class ModelManager:
             "Content-Type": "application/json"
         }
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(
-                f"{self.base_url}/models",
-                headers=headers
-            )
-            
-            # Reason: Check status code explicitly for better error handling
-            if response.status_code == 401:
-                raise ModelManagerError("Invalid OpenRouter API key")
-            elif response.status_code == 429:
-                raise ModelManagerError("Rate limit exceeded")
-            elif response.status_code != 200:
-                raise ModelManagerError(f"API request failed with status {response.status_code}")
-            
+        client = self._get_http_client()
+        response = await client.get(
+            f"{self.base_url}/models",
+            headers=headers,
+            timeout=self.timeout
+        )
+        
+        # Reason: Check status code explicitly for better error handling
+        if response.status_code == 401:
+            raise ModelManagerError("Invalid OpenRouter API key")
+        elif response.status_code == 429:
+            raise ModelManagerError("Rate limit exceeded")
+        elif response.status_code != 200:
+            raise ModelManagerError(f"API request failed with status {response.status_code}")
+        
+        try:
+            data = response.json()
+        except json.JSONDecodeError:
+            raise ModelManagerError("Invalid JSON response from API")
+        
+        # Parse and validate models
+        models = []
+        for model_data in data.get("data", []):
             try:
-                data = response.json()
-            except json.JSONDecodeError:
-                raise ModelManagerError("Invalid JSON response from API")
-            
-            # Parse and validate models
-            models = []
-            for model_data in data.get("data", []):
-                try:
-                    # Ensure required fields exist with defaults
-                    model_info = {
-                        "id": model_data.get("id", ""),
-                        "name": model_data.get("name", "Unknown"),
-                        "description": model_data.get("description"),
-                        "pricing": model_data.get("pricing", {"prompt": 0, "completion": 0}),
-                        "context_length": model_data.get("context_length", 0),
-                        "architecture": model_data.get("architecture"),
-                        "top_provider": model_data.get("top_provider"),
-                        "per_request_limits": model_data.get("per_request_limits"),
-                        "supports_tools": model_data.get("supports_tools", False),
-                        "supports_streaming": model_data.get("supports_streaming", False)
-                    }
-                    
-                    # Skip invalid models
-                    if not model_info["id"] or "/" not in model_info["id"]:
-                        continue
-                    
-                    model = OpenRouterModel(**model_info)
-                    models.append(model)
-                    
-                except Exception as e:
-                    # Log but don't fail - skip invalid models
-                    print(f"Warning: Skipping invalid model {model_data.get('id', 'unknown')}: {e}")
+                # Ensure required fields exist with defaults
+                model_info = {
+                    "id": model_data.get("id", ""),
+                    "name": model_data.get("name", "Unknown"),
+                    "description": model_data.get("description"),
+                    "pricing": model_data.get("pricing", {"prompt": 0, "completion": 0}),
+                    "context_length": model_data.get("context_length", 0),
+                    "architecture": model_data.get("architecture"),
+                    "top_provider": model_data.get("top_provider"),
+                    "per_request_limits": model_data.get("per_request_limits"),
+                    # Reason: the catalog advertises tool calling via supported_parameters
+                    "supports_tools": model_data.get(
+                        "supports_tools",
+                        "tools" in (model_data.get("supported_parameters") or [])
+                    ),
+                    "supports_streaming": model_data.get("supports_streaming", False)
+                }
+                
+                # Skip invalid models
+                if not model_info["id"] or "/" not in model_info["id"]:
                     continue
-            
-            return models
+                
+                model = OpenRouterModel(**model_info)
+                models.append(model)
+                
+            except Exception as e:
+                # Log but don't fail - skip invalid models
+                print(f"Warning: Skipping invalid model {model_data.get('id', 'unknown')}: {e}")
+                continue
+        
+        return models
     
     async def filter_models(self, filters: ModelFilter) -> List[OpenRouterModel]:
         """
@@ -265,7 +359,7 @@ class ModelManager:
             List of model selections with reasons
         """
         models = await self.list_models()
-        suggestions = []
+        scored = []
         
         # Reason: Simple heuristic-based model suggestion
         # Could be enhanced with ML-based recommendations
@@ -309,22 +403,92 @@ class ModelManager:
             
             if score > 0:
                 reason = "Recommended because: " + ", ".join(reason_parts)
-                suggestions.append(ModelSelection(
+                cost_estimate = self._estimate_cost(model, task_description)
+                scored.append((score, cost_estimate, ModelSelection(
                     model=model,
                     reason=reason,
-                    cost_estimate=self._estimate_cost(model, task_description)
-                ))
+                    cost_estimate=cost_estimate
+                )))
+        
+        # Sort by score (highest first), then by cost, and return top suggestions
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [selection for _, _, selection in scored[:max_suggestions]]
+    
+    async def route_model(
+        self,
+        prompt: str,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        max_cost: Optional[float] = None,
+        require_tools: bool = False,
+        exclude: Optional[List[str]] = None
+    ) -> RoutingDecision:
+        """
+        Route a request to the fastest model within the cost ceiling.
+        
+        Args:
+            prompt: Request text, used to estimate prompt tokens
+            prompt_tokens: Prompt token count, if already known
+            completion_tokens: Expected completion tokens (defaults to the
+                mean completion length of recorded calls)
+            max_cost: Cost ceiling in USD (defaults to ROUTING_MAX_REQUEST_COST)
+            require_tools: Only consider models that support tool calling
+            exclude: Model IDs to skip
+            
+        Returns:
+            Routing decision including the candidates considered
+            
+        Raises:
+            ModelRouterError: If no model can fit the request
+        """
+        if not self._models_by_id:
+            await self.list_models()
+        await self.load_metrics()
+        
+        if prompt_tokens is None:
+            prompt_tokens = self.estimate_tokens(prompt)
+        if completion_tokens is None:
+            completion_tokens = self.expected_completion_tokens()
+        
+        return self.router.route(
+            prompt_tokens,
+            completion_tokens=completion_tokens,
+            max_cost=max_cost,
+            require_tools=require_tools,
+            exclude=exclude or ()
+        )
+    
+    def estimate_tokens(self, text: str) -> int:
+        """Count the tokens of text with the shared cached token counter."""
+        return get_token_counter().count(text)
+    
+    def get_cached_model(self, model_id: str) -> Optional[OpenRouterModel]:
+        """Get a model from the already loaded catalog without any I/O."""
+        return self._models_by_id.get(model_id)
+    
+    def expected_completion_tokens(self, model_id: Optional[str] = None) -> int:
+        """
+        Expected completion length for a model.
         
-        # Sort by score and return top suggestions
-        suggestions.sort(key=lambda x: x.cost_estimate or float('inf'))
-        return suggestions[:max_suggestions]
+        Args:
+            model_id: Model identifier, or None for calls on any model
+            
+        Returns:
+            Mean completion tokens of recorded calls, or a default when unmeasured
+        """
+        model_ids = [model_id] if model_id else self.metrics_store.model_ids()
+        all_stats = [stats for stats in map(self.metrics_store.get_stats, model_ids) if stats is not None]
+        successes = sum(stats.successes for stats in all_stats)
+        completion_tokens = sum(stats.completion_tokens for stats in all_stats)
+        if successes and completion_tokens:
+            return int(completion_tokens / successes)
+        return ModelRouter.DEFAULT_COMPLETION_TOKENS
     
     def _estimate_cost(self, model: OpenRouterModel, task_description: str) -> float:
         """Estimate cost for a task with given model."""
-        # Simple cost estimation based on task description length
-        # This is a rough approximation - actual cost depends on model response
-        estimated_prompt_tokens = len(task_description.split()) * 1.3  # ~1.3 tokens per word
-        estimated_completion_tokens = estimated_prompt_tokens * 0.5  # Assume 50% of prompt length
+        # Prompt size is counted; completion size comes from recorded calls
+        estimated_prompt_tokens = self.estimate_tokens(task_description)
+        estimated_completion_tokens = self.expected_completion_tokens(model.id)
         
         prompt_price = model.pricing.get("prompt", 0)
         completion_price = model.pricing.get("completion", 0)
@@ -349,11 +513,18 @@ class ModelManager:
         try:
             with open(self.cache_file, 'r') as f:
                 data = json.load(f)
-                return [OpenRouterModel(**model_data) for model_data in data]
+                models = [OpenRouterModel(**model_data) for model_data in data]
+            self._index_models(models)
+            return models
         except Exception as e:
             print(f"Warning: Failed to load cache: {e}")
             return []
     
+    def _index_models(self, models: List[OpenRouterModel]) -> None:
+        """Index catalog models by ID for constant-time lookups."""
+        self._models_by_id = {model.id: model for model in models}
+        self.router.set_models(models)
+    
     def _save_to_cache(self, models: List[OpenRouterModel]) -> None:
         """Save models to cache."""
         try:
@@ -382,7 +553,9 @@ class ModelManager:
             "exists": True,
             "size": stat.st_size,
             "created": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            "is_valid": self._is_cache_valid()
+            "is_valid": self._is_cache_valid(),
+            "refreshing": self._refresh_task is not None and not self._refresh_task.done(),
+            "last_refresh_error": self.last_refresh_error
         }
     
     def update_metrics(self, model_id: str, success: bool, response_time: float, tokens_used: int = 0, cost: float = 0.0) -> None:
@@ -406,8 +579,129 @@ class ModelManager:
         metrics.total_cost += cost
         metrics.last_used = datetime.now()
     
+    def record_call(
+        self,
+        model_id: str,
+        success: bool,
+        response_time: float,
+        ttft: Optional[float] = None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cached_tokens: int = 0
+    ) -> float:
+        """
+        Record one agent call in the running metrics and the persistent store.
+        
+        Args:
+            model_id: Model that served the call
+            success: Whether the call succeeded
+            response_time: Total call latency in seconds
+            ttft: Time to first token in seconds, if streamed
+            prompt_tokens: Prompt tokens consumed (including cached ones)
+            completion_tokens: Completion tokens produced
+            cached_tokens: Prompt tokens served from the provider's prompt cache
+            
+        Returns:
+            Cost of the call in USD, from catalog pricing when known
+        """
+        cost = 0.0
+        model = self._models_by_id.get(model_id)
+        if model is not None:
+            prompt_price = model.pricing.get("prompt", 0)
+            # Reason: cache reads are billed at the discounted input_cache_read rate
+            cache_read_price = model.pricing.get("input_cache_read", prompt_price)
+            cached_tokens = min(cached_tokens, prompt_tokens)
+            cost = (
+                (prompt_tokens - cached_tokens) * prompt_price +
+                cached_tokens * cache_read_price +
+                completion_tokens * model.pricing.get("completion", 0)
+            )
+        
+        self.update_metrics(
+            model_id,
+            success,
+            response_time,
+            tokens_used=prompt_tokens + completion_tokens,
+            cost=cost
+        )
+        self.metrics_store.record(
+            model_id,
+            success,
+            response_time,
+            ttft=ttft,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=cost,
+            cached_tokens=cached_tokens
+        )
+        # Reason: new latency samples change this model's routing prediction
+        self.router.update_model(model_id)
+        return cost
+    
+    def get_latency_percentiles(self, model_id: str, metric: str = "latency") -> Dict[str, Optional[float]]:
+        """
+        Get observed p50/p95/p99 for a model across sessions.
+        
+        Args:
+            model_id: Model identifier
+            metric: One of 'latency', 'ttft' (milliseconds) or 'throughput' (tokens/s)
+            
+        Returns:
+            Mapping of percentile name to value, None where no data exists
+        """
+        return self.metrics_store.percentiles(model_id, metric)
+    
+    async def load_metrics(self) -> None:
+        """Load persisted metrics in a worker thread, so routing and hedging queries do no I/O."""
+        await self.metrics_store.load_history()
+    
+    def get_hedge_delay(self, model_id: str, default: float) -> float:
+        """
+        Seconds to wait for a model's first token before hedging the request.
+        
+        Args:
+            model_id: Model serving the request
+            default: Delay used until enough first-token samples exist
+            
+        Returns:
+            The model's p95 time to first token in seconds, or ``default``
+        """
+        stats = self.metrics_store.get_stats(model_id)
+        if stats is None or stats.ttft.count < self.HEDGE_MIN_SAMPLES:
+            return default
+        return stats.ttft.percentile(95) / 1000.0
+    
+    def record_hedge(self, winner: str, model_ids: List[str]) -> None:
+        """
+        Record the outcome of a hedged request for every model that raced.
+        
+        Args:
+            winner: Model whose stream was kept
+            model_ids: All models the request was started on
+        """
+        for model_id in model_ids:
+            self.metrics_store.record_hedge(model_id, model_id == winner)
+    
     def get_metrics(self, model_id: Optional[str] = None) -> Dict[str, ModelMetrics]:
         """Get performance metrics."""
         if model_id:
             return {model_id: self.metrics.get(model_id)}
-        return self.metrics.copy()
\ No newline at end of file
+        return self.metrics.copy()
+    
+    def get_persistent_metrics(self, model_id: Optional[str] = None) -> Dict[str, ModelMetrics]:
+        """
+        Get metrics aggregated from every recorded session, with percentiles.
+        
+        Args:
+            model_id: Restrict to one model, or None for all recorded models
+            
+        Returns:
+            Mapping of model ID to summarized metrics
+        """
+        model_ids = [model_id] if model_id else self.metrics_store.model_ids()
+        summaries = {}
+        for current_id in model_ids:
+            summary = self.metrics_store.summary(current_id)
+            if summary is not None:
+                summaries[current_id] = summary
+        return summaries
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+Latency- and Cost-Aware Model Router for Flex AI Agent.
+
+This module picks, per request, the fastest model that is cheap enough and
+large enough for the prompt. Latency predictions come from the observed
+per-model histograms in the metrics store (time to first token plus
+completion tokens over measured throughput); models without measurements
+fall back to a conservative prior. Prices and context windows come from the
+OpenRouter catalog.
+
+All catalog and histogram work happens in ``rebuild``; ``route`` is a single
+pass over precomputed tuples so selection costs microseconds.
+"""
+
+import heapq
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from agents.models import OpenRouterModel, RoutingCandidate, RoutingDecision
+from tools.metrics_store import MetricsStore
+
+
+class ModelRouterError(Exception):
+    """Custom exception for model routing errors."""
+    pass
+
+
+class RouteEntry(NamedTuple):
+    """Precomputed routing inputs for one model."""
+    model_id: str
+    prompt_price: float
+    completion_price: float
+    context_length: int
+    supports_tools: bool
+    base_latency: float  # seconds before the first token (or whole call)
+    seconds_per_token: float  # 0.0 when throughput is unknown
+    observed: bool
+
+
+class ModelRouter:
+    """Selects the fastest affordable model using observed metrics."""
+    
+    # Reason: unmeasured models must not look faster than measured ones
+    DEFAULT_LATENCY = 8.0
+    DEFAULT_COMPLETION_TOKENS = 800
+    TRACE_SIZE = 5
+    
+    def __init__(self, metrics_store: MetricsStore, max_request_cost: Optional[float] = None):
+        """
+        Initialize the router.
+        
+        Args:
+            metrics_store: Store providing observed per-model histograms
+            max_request_cost: Default cost ceiling per request in USD
+        """
+        self.metrics_store = metrics_store
+        self.max_request_cost = max_request_cost
+        self._models: List[OpenRouterModel] = []
+        self._entries: List[RouteEntry] = []
+        self._positions: Dict[str, int] = {}
+        self._dirty = True
+    
+    def set_models(self, models: Iterable[OpenRouterModel]) -> None:
+        """Replace the catalog the router selects from."""
+        self._models = list(models)
+        self._dirty = True
+    
+    def invalidate(self) -> None:
+        """Mark all precomputed routing data stale."""
+        self._dirty = True
+    
+    def update_model(self, model_id: str) -> None:
+        """
+        Refresh the latency prediction of one model after new metrics.
+        
+        Only that model's entry is recomputed, so recording a call does not
+        cost a full rebuild on the next route.
+        
+        Args:
+            model_id: Model whose metrics changed
+        """
+        if self._dirty:
+            return
+        position = self._positions.get(model_id)
+        if position is None:
+            return
+        base_latency, seconds_per_token, observed = self._predict(model_id)
+        self._entries[position] = self._entries[position]._replace(
+            base_latency=base_latency,
+            seconds_per_token=seconds_per_token,
+            observed=observed
+        )
+    
+    def rebuild(self) -> None:
+        """Precompute per-model latency predictions, prices and limits."""
+        entries = []
+        for model in self._models:
+            prompt_price = float(model.pricing.get("prompt", 0) or 0)
+            completion_price = float(model.pricing.get("completion", 0) or 0)
+            # Reason: OpenRouter marks dynamically priced routers with negative prices
+            if prompt_price < 0 or completion_price < 0:
+                continue
+            
+            base_latency, seconds_per_token, observed = self._predict(model.id)
+            entries.append(RouteEntry(
+                model_id=model.id,
+                prompt_price=prompt_price,
+                completion_price=completion_price,
+                context_length=model.context_length,
+                supports_tools=model.supports_tools,
+                base_latency=base_latency,
+                seconds_per_token=seconds_per_token,
+                observed=observed
+            ))
+        
+        self._entries = entries
+        self._positions = {entry.model_id: position for position, entry in enumerate(entries)}
+        self._dirty = False
+    
+    def _predict(self, model_id: str) -> Tuple[float, float, bool]:
+        """Derive latency model parameters from a model's histograms."""
+        stats = self.metrics_store.get_stats(model_id)
+        if stats is None or stats.latency.count == 0:
+            return self.DEFAULT_LATENCY, 0.0, False
+        
+        ttft_ms = stats.ttft.percentile(50)
+        throughput = stats.throughput.percentile(50)
+        if ttft_ms is not None and throughput:
+            return ttft_ms / 1000.0, 1.0 / throughput, True
+        
+        # Reason: without a TTFT/throughput split, whole-call latency is the estimate
+        return stats.latency.percentile(50) / 1000.0, 0.0, True
+    
+    def route(
+        self,
+        prompt_tokens: int,
+        completion_tokens: Optional[int] = None,
+        max_cost: Optional[float] = None,
+        require_tools: bool = False,
+        exclude: Iterable[str] = ()
+    ) -> RoutingDecision:
+        """
+        Pick the fastest eligible model for a request.
+        
+        A model is eligible when the request fits its context window, it
+        supports tools if required, and its predicted cost is within the
+        ceiling. If the ceiling rules out every model, the cheapest model that
+        otherwise fits is chosen instead.
+        
+        Args:
+            prompt_tokens: Estimated prompt tokens
+            completion_tokens: Expected completion tokens
+            max_cost: Cost ceiling in USD (defaults to the router's ceiling)
+            require_tools: Only consider models that support tool calling
+            exclude: Model IDs to skip (e.g. ones that just failed)
+        
+        Returns:
+            Routing decision with the candidates considered
+        
+        Raises:
+            ModelRouterError: If no model can fit the request at all
+        """
+        if self._dirty:
+            self.rebuild()
+        # Reason: the trace reports selection time only, not an occasional rebuild
+        start = time.perf_counter()
+        
+        if completion_tokens is None:
+            completion_tokens = self.DEFAULT_COMPLETION_TOKENS
+        if max_cost is None:
+            max_cost = self.max_request_cost
+        ceiling = max_cost if max_cost is not None else float("inf")
+        total_tokens = prompt_tokens + completion_tokens
+        excluded = frozenset(exclude)
+        
+        eligible: List[Tuple[float, float, int]] = []
+        over_budget: List[Tuple[float, float, int]] = []
+        rejected = {"context": 0, "tools": 0, "cost": 0, "excluded": 0}
+        
+        for index, entry in enumerate(self._entries):
+            if entry.model_id in excluded:
+                rejected["excluded"] += 1
+                continue
+            if entry.context_length and total_tokens > entry.context_length:
+                rejected["context"] += 1
+                continue
+            if require_tools and not entry.supports_tools:
+                rejected["tools"] += 1
+                continue
+            
+            cost = prompt_tokens * entry.prompt_price + completion_tokens * entry.completion_price
+            latency = entry.base_latency + completion_tokens * entry.seconds_per_token
+            if cost > ceiling:
+                rejected["cost"] += 1
+                over_budget.append((cost, latency, index))
+                continue
+            eligible.append((latency, cost, index))
+        
+        if eligible:
+            ranked = heapq.nsmallest(self.TRACE_SIZE, eligible)
+            latency, cost, index = ranked[0]
+            entry = self._entries[index]
+            reason = (
+                f"fastest of {len(eligible)} eligible models"
+                f" ({'observed' if entry.observed else 'prior'} latency {latency:.2f}s)"
+            )
+            if max_cost is not None:
+                reason += f" within ${max_cost:.4f} per request"
+        elif over_budget:
+            cheapest = heapq.nsmallest(self.TRACE_SIZE, over_budget)
+            ranked = [(latency, cost, index) for cost, latency, index in cheapest]
+            latency, cost, index = ranked[0]
+            reason = f"no model under ${max_cost:.4f} per request; picked the cheapest that fits"
+        else:
+            raise ModelRouterError(
+                f"No model fits a {total_tokens}-token request (rejected: {rejected})"
+            )
+        
+        candidates = [
+            RoutingCandidate(
+                model_id=self._entries[i].model_id,
+                expected_latency=lat,
+                expected_cost=c,
+                observed=self._entries[i].observed
+            )
+            for lat, c, i in ranked
+        ]
+        
+        return RoutingDecision(
+            model_id=self._entries[index].model_id,
+            expected_latency=latency,
+            expected_cost=cost,
+            reason=reason,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            max_cost=max_cost,
+            candidates=candidates,
+            rejected={key: count for key, count in rejected.items() if count},
+            elapsed_us=(time.perf_counter() - start) * 1_000_000
+        )
+
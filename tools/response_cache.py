@@ -0,0 +1,242 @@
+"""
+Response Cache for Flex AI Agent.
+
+This module caches agent responses so repeated questions (and fixed prompts
+such as the ``examples`` command) skip the model round trip. Entries are keyed
+by the normalized prompt, the model and a hash of the recent conversation.
+Lookups are exact by default; with a similarity threshold, near-identical
+prompts also match using local hashed bag-of-words embeddings (words plus
+character trigrams) compared by cosine similarity. Entries expire after a TTL
+and the least recently used ones are evicted beyond the size limit.
+"""
+
+import hashlib
+import json
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+
+_WHITESPACE = re.compile(r"\s+")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class CacheEntry(NamedTuple):
+    """A cached agent response."""
+    response: str
+    model_id: str
+    context_hash: str
+    created_at: float
+    vector: Dict[int, float]
+
+
+class ResponseCache:
+    """TTL/LRU cache of agent responses with optional similarity lookup."""
+    
+    # Size of the hashed feature space for prompt embeddings
+    EMBEDDING_DIMENSIONS = 1 << 18
+    # Approximate size of each replayed streaming chunk
+    REPLAY_CHUNK_CHARS = 256
+    
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: float = 3600.0,
+        similarity_threshold: Optional[float] = None
+    ):
+        """
+        Initialize the response cache.
+        
+        Args:
+            max_entries: Maximum number of cached responses
+            ttl: Seconds a response stays valid
+            similarity_threshold: Minimum cosine similarity for a near match,
+                or None for exact matches only
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Normalize case, whitespace and trailing punctuation of a prompt."""
+        return _WHITESPACE.sub(" ", prompt.lower()).strip().rstrip("?!. ")
+    
+    @staticmethod
+    def context_hash(entries: Optional[List[Dict[str, Any]]]) -> str:
+        """
+        Hash conversation entries that affect a response.
+        
+        Args:
+            entries: Conversation entries with 'type' and 'content'
+        
+        Returns:
+            Hex digest, or an empty string when there is no context
+        """
+        if not entries:
+            return ""
+        payload = json.dumps(
+            [(entry.get('type', ''), entry.get('content', '')) for entry in entries],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def _key(cls, normalized_prompt: str, model_id: str, context_hash: str) -> str:
+        """Build the exact-match key."""
+        return hashlib.sha256(f"{model_id}\0{context_hash}\0{normalized_prompt}".encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def embed(cls, normalized_prompt: str) -> Dict[int, float]:
+        """
+        Embed a prompt as a sparse, L2-normalized hashed feature vector.
+        
+        Args:
+            normalized_prompt: Prompt after ``normalize``
+        
+        Returns:
+            Mapping of feature index to weight
+        """
+        features = _WORD_PATTERN.findall(normalized_prompt)
+        # Reason: character trigrams make typos and inflections ("loop"/"loops") overlap
+        compact = f" {' '.join(features)} "
+        features.extend(compact[i:i + 3] for i in range(len(compact) - 2))
+        
+        vector: Dict[int, float] = {}
+        for feature in features:
+            index = zlib.crc32(feature.encode('utf-8')) % cls.EMBEDDING_DIMENSIONS
+            vector[index] = vector.get(index, 0.0) + 1.0
+        
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        if norm:
+            for index in vector:
+                vector[index] /= norm
+        return vector
+    
+    @staticmethod
+    def _cosine(first: Dict[int, float], second: Dict[int, float]) -> float:
+        """Cosine similarity of two normalized sparse vectors."""
+        if len(first) > len(second):
+            first, second = second, first
+        return sum(weight * second.get(index, 0.0) for index, weight in first.items())
+    
+    def get(self, prompt: str, model_id: str, context_hash: str = "") -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            prompt: User prompt
+            model_id: Model that would serve the request
+            context_hash: Hash of the relevant conversation context
+        
+        Returns:
+            Cached response, or None on a miss
+        """
+        normalized = self.normalize(prompt)
+        key = self._key(normalized, model_id, context_hash)
+        now = time.time()
+        
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now - entry.created_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response
+            del self._entries[key]
+        
+        if self.similarity_threshold is not None:
+            match = self._find_similar(normalized, model_id, context_hash, now)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.hits += 1
+                self.similar_hits += 1
+                return self._entries[match].response
+        
+        self.misses += 1
+        return None
+    
+    def _find_similar(self, normalized: str, model_id: str, context_hash: str, now: float) -> Optional[str]:
+        """Find the most similar live entry above the threshold."""
+        vector = self.embed(normalized)
+        best_key, best_score = None, self.similarity_threshold
+        expired = []
+        
+        for key, entry in self._entries.items():
+            if now - entry.created_at > self.ttl:
+                expired.append(key)
+                continue
+            if entry.model_id != model_id or entry.context_hash != context_hash:
+                continue
+            score = self._cosine(vector, entry.vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        
+        for key in expired:
+            del self._entries[key]
+        return best_key
+    
+    def put(self, prompt: str, model_id: str, response: str, context_hash: str = "") -> None:
+        """
+        Cache a response.
+        
+        Args:
+            prompt: User prompt
+            model_id: Model that served the request
+            response: Response text
+            context_hash: Hash of the relevant conversation context
+        """
+        if not response:
+            return
+        
+        normalized = self.normalize(prompt)
+        key = self._key(normalized, model_id, context_hash)
+        vector = self.embed(normalized) if self.similarity_threshold is not None else {}
+        
+        self._entries[key] = CacheEntry(response, model_id, context_hash, time.time(), vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    @classmethod
+    def replay(cls, response: str, delta: bool = False) -> Iterator[str]:
+        """
+        Replay a cached response in the agent's streaming format.
+        
+        Yields text split at line boundaries, like a live stream.
+        
+        Args:
+            response: Cached response text
+            delta: Yield only the new text of each chunk instead of the text so far
+        """
+        start = end = 0
+        while end < len(response):
+            newline = response.find("\n", end + cls.REPLAY_CHUNK_CHARS)
+            end = len(response) if newline == -1 else newline + 1
+            yield response[start:end] if delta else response[:end]
+            if delta:
+                start = end
+    
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,292 @@
+"""
+Full-Text Search Index for Flex AI Agent.
+
+This module keeps a local SQLite FTS5 index over past conversation turns and
+saved Flex programs, so earlier work ("that quicksort in Franco") can be found
+and reused instead of regenerated. The index is fed incrementally: Flex files
+are indexed as ``FileManager`` writes them (files already on disk are picked up
+by comparing modification times), and journaled turns are picked up from the
+session journal index, resuming at the byte position reached by the previous
+sync, so only new turns are ever read.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Union
+
+from tools.session_journal import INDEX_FILE, SessionJournalError, TurnIndexEntry, journal_path
+
+
+_TERM_PATTERN = re.compile(r"\w+")
+
+# Snippet markers around matched terms
+MATCH_START = "«"
+MATCH_END = "»"
+
+
+class SearchIndexError(Exception):
+    """Custom exception for search index errors."""
+    pass
+
+
+class SearchHit(NamedTuple):
+    """A search result."""
+    kind: str
+    source: str
+    title: str
+    snippet: str
+    timestamp: float
+    score: float
+
+
+class SearchIndex:
+    """SQLite FTS5 index of session turns and Flex files."""
+    
+    KIND_SESSION = "session"
+    KIND_FILE = "file"
+    
+    def __init__(self, db_path: Union[str, Path], journal_dir: Optional[Union[str, Path]] = None):
+        """
+        Initialize the search index.
+        
+        The database is opened on first use.
+        
+        Args:
+            db_path: SQLite database file
+            journal_dir: Session journal directory to index turns from
+        """
+        self.db_path = Path(db_path)
+        self.journal_dir = Path(journal_dir) if journal_dir is not None else None
+        self._connection: Optional[sqlite3.Connection] = None
+        # Reason: files are indexed from worker threads while searches run on the event loop
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the schema if needed."""
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5("
+                    "title, content, kind UNINDEXED, source UNINDEXED, timestamp UNINDEXED)"
+                )
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, position INTEGER NOT NULL)"
+                )
+                connection.commit()
+            except sqlite3.OperationalError as e:
+                connection.close()
+                raise SearchIndexError(f"SQLite FTS5 is not available: {e}")
+            self._connection = connection
+        return self._connection
+    
+    def add_file(self, path: Union[str, Path], content: str, timestamp: Optional[float] = None) -> None:
+        """
+        Index a Flex file, replacing an earlier version of it.
+        
+        Args:
+            path: File path, used as the source of hits
+            content: File content
+            timestamp: Modification time (now by default)
+        """
+        source = str(path)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "DELETE FROM documents WHERE kind = ? AND source = ?",
+                    (self.KIND_FILE, source)
+                )
+                connection.execute(
+                    "INSERT INTO documents (title, content, kind, source, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    (Path(source).name, content, self.KIND_FILE, source, timestamp or time.time())
+                )
+    
+    def remove_file(self, path: Union[str, Path]) -> None:
+        """Drop a deleted file from the index."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "DELETE FROM documents WHERE kind = ? AND source = ?",
+                    (self.KIND_FILE, str(path))
+                )
+    
+    def sync_files(self, paths: Iterable[Union[str, Path]]) -> int:
+        """
+        Index Flex files that are new or changed since they were last indexed.
+        
+        Picks up files that were not saved through ``FileManager``, such as
+        those written before indexing existed. Indexed files that no longer
+        exist are dropped.
+        
+        Args:
+            paths: Flex files currently on disk
+        
+        Returns:
+            Number of files indexed
+        """
+        with self._lock:
+            indexed = dict(self._connect().execute(
+                "SELECT source, timestamp FROM documents WHERE kind = ?", (self.KIND_FILE,)
+            ).fetchall())
+        
+        count = 0
+        seen = set()
+        for path in paths:
+            path = Path(path).resolve()
+            source = str(path)
+            seen.add(source)
+            try:
+                modified = path.stat().st_mtime
+                if source in indexed and indexed[source] >= modified:
+                    continue
+                content = path.read_text(encoding='utf-8')
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Warning: Skipping unreadable file in search index: {e}")
+                continue
+            self.add_file(source, content, modified)
+            count += 1
+        
+        for source in indexed:
+            if source not in seen and not Path(source).exists():
+                self.remove_file(source)
+        return count
+    
+    def sync_journals(self) -> int:
+        """
+        Index turns journaled since the previous sync.
+        
+        Returns:
+            Number of turns indexed
+        """
+        if self.journal_dir is None:
+            return 0
+        index_path = self.journal_dir / INDEX_FILE
+        if not index_path.exists():
+            return 0
+        
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT position FROM sync_state WHERE name = ?", (INDEX_FILE,)
+            ).fetchone()
+            position = row[0] if row else 0
+            if index_path.stat().st_size <= position:
+                return 0
+            
+            rows = []
+            journals: Dict[str, BinaryIO] = {}
+            try:
+                with open(index_path, 'rb') as index:
+                    index.seek(position)
+                    for line in index:
+                        # Reason: a line still being written is picked up by the next sync
+                        if not line.endswith(b"\n"):
+                            break
+                        position += len(line)
+                        try:
+                            entry = TurnIndexEntry(**json.loads(line))
+                            journal = journals.get(entry.session_id)
+                            if journal is None:
+                                journal = journals[entry.session_id] = open(journal_path(self.journal_dir, entry.session_id), 'rb')
+                            journal.seek(entry.offset)
+                            record = json.loads(journal.read(entry.length))
+                        except (OSError, ValueError, TypeError, SessionJournalError) as e:
+                            print(f"Warning: Skipping unreadable journal entry in search index: {e}")
+                            continue
+                        rows.append((
+                            record.get('user', ''),
+                            record.get('assistant', ''),
+                            self.KIND_SESSION,
+                            f"{entry.session_id}#{entry.turn}",
+                            entry.timestamp
+                        ))
+            finally:
+                for journal in journals.values():
+                    journal.close()
+            
+            with connection:
+                connection.executemany(
+                    "INSERT INTO documents (title, content, kind, source, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO sync_state (name, position) VALUES (?, ?)",
+                    (INDEX_FILE, position)
+                )
+            return len(rows)
+    
+    def search(self, query: str, kind: Optional[str] = None, limit: int = 10) -> List[SearchHit]:
+        """
+        Search indexed turns and files.
+        
+        Every term must match (as a word prefix); if nothing matches all
+        terms, documents matching any of them are returned instead.
+        
+        Args:
+            query: Free-text query
+            kind: Only return 'session' or 'file' hits
+            limit: Maximum number of hits
+        
+        Returns:
+            Hits, best match first
+        """
+        terms = _TERM_PATTERN.findall(query.lower())
+        if not terms:
+            return []
+        self.sync_journals()
+        
+        phrases = [f'"{term}"*' for term in terms]
+        hits = self._query(" AND ".join(phrases), kind, limit)
+        if not hits and len(phrases) > 1:
+            hits = self._query(" OR ".join(phrases), kind, limit)
+        return hits
+    
+    def _query(self, match: str, kind: Optional[str], limit: int) -> List[SearchHit]:
+        """Run an FTS5 match expression."""
+        sql = (
+            "SELECT kind, source, title, snippet(documents, -1, ?, ?, '…', 16), timestamp, "
+            "bm25(documents, 4.0, 1.0) AS score FROM documents WHERE documents MATCH ?"
+        )
+        params: list = [MATCH_START, MATCH_END, match]
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        # Reason: bm25() is lower for better matches; hits report higher-is-better scores
+        return [SearchHit(kind, source, title, snippet, timestamp, -score) for kind, source, title, snippet, timestamp, score in rows]
+    
+    def get_content(self, kind: str, source: str) -> Optional[str]:
+        """
+        Get the full indexed text of a hit.
+        
+        Args:
+            kind: Hit kind
+            source: Hit source
+        
+        Returns:
+            File content, or the response of a session turn; None if not indexed
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT content FROM documents WHERE kind = ? AND source = ? LIMIT 1", (kind, source)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
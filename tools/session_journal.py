@@ -0,0 +1,392 @@
+"""
+Session Journal for Flex AI Agent.
+
+This module persists conversation sessions as append-only JSONL journals, one
+file per session and one line per completed turn. Turns are handed to a
+background writer thread, which appends everything queued since its last
+write and fsyncs once per batch, so recording a turn never waits on the disk.
+
+Each written turn also gets a short line in a shared index file (byte offset,
+length and previews), so sessions can be listed and browsed without loading
+their transcripts. Resuming memory-maps a journal and replays it line by line,
+in time linear in the number of turns.
+"""
+
+import atexit
+import json
+import mmap
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+
+# Index of all journals in a directory, one line per written turn
+INDEX_FILE = "index.jsonl"
+
+# Characters of user input and response kept in the index
+PREVIEW_CHARS = 100
+
+# Session IDs (and prefixes of them) become file names and glob patterns
+_SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+# Reason: journals of different sessions share the index file
+_index_lock = threading.Lock()
+
+
+class SessionJournalError(Exception):
+    """Custom exception for session journal errors."""
+    pass
+
+
+class TurnIndexEntry(NamedTuple):
+    """Index line of one journaled turn."""
+    session_id: str
+    turn: int
+    offset: int
+    length: int
+    timestamp: float
+    model: str
+    user_preview: str
+    assistant_preview: str
+
+
+class SessionInfo(NamedTuple):
+    """Summary of a journaled session, built from the index."""
+    session_id: str
+    turns: int
+    started: float
+    updated: float
+    model: str
+    title: str
+
+
+def _preview(text: str) -> str:
+    """Shorten text for the index."""
+    text = " ".join(text.split())
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "..."
+
+
+class SessionJournal:
+    """Append-only JSONL journal of one conversation session."""
+    
+    def __init__(self, directory: Union[str, Path], session_id: str, turns: int = 0):
+        """
+        Initialize the journal.
+        
+        Nothing is written until the first turn is appended.
+        
+        Args:
+            directory: Directory holding the journals and their index
+            session_id: Session identifier, used as the file name
+            turns: Turns already in the journal (when resuming)
+        """
+        self.directory = Path(directory)
+        self.session_id = session_id
+        self.path = journal_path(self.directory, session_id)
+        self.index_path = self.directory / INDEX_FILE
+        self.turns = turns
+        
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._tail_checked = False
+    
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Queue a completed turn for writing.
+        
+        Args:
+            record: Turn data; expects 'user', 'assistant' and 'model' keys.
+                The turn number and a timestamp are added.
+        """
+        if self._closed:
+            raise SessionJournalError(f"Journal of session {self.session_id} is closed")
+        
+        record = {'turn': self.turns, 'time': time.time(), **record}
+        self.turns += 1
+        
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"journal-{self.session_id}", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        self._queue.put(record)
+    
+    def flush(self) -> None:
+        """Wait until every queued turn is on disk."""
+        if self._thread is not None:
+            self._queue.join()
+    
+    def close(self) -> None:
+        """Write the queued turns and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            atexit.unregister(self.close)
+    
+    def _run(self) -> None:
+        """Writer thread: append queued turns in batches."""
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            records = [record for record in batch if record is not None]
+            try:
+                if records:
+                    self._write_batch(records)
+            except Exception as e:
+                # Reason: the writer must keep draining, or flush() would wait forever
+                print(f"Warning: Could not write session journal {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            
+            if len(records) < len(batch):
+                return
+    
+    def _write_batch(self, records: List[Dict[str, Any]]) -> None:
+        """Append records to the journal and the index, one fsync per file."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        
+        lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8') for record in records]
+        if not self._tail_checked:
+            self._truncate_torn_tail()
+            self._tail_checked = True
+        with open(self.path, 'ab') as journal:
+            offset = journal.tell()
+            journal.write(b"".join(lines))
+            journal.flush()
+            os.fsync(journal.fileno())
+        
+        index_lines = []
+        for record, line in zip(records, lines):
+            entry = TurnIndexEntry(
+                session_id=self.session_id,
+                turn=record['turn'],
+                offset=offset,
+                length=len(line),
+                timestamp=record['time'],
+                model=record.get('model', ''),
+                user_preview=_preview(record.get('user', '')),
+                assistant_preview=_preview(record.get('assistant', ''))
+            )
+            index_lines.append(json.dumps(entry._asdict(), ensure_ascii=False) + "\n")
+            offset += len(line)
+        
+        with _index_lock:
+            with open(self.index_path, 'a', encoding='utf-8') as index:
+                index.write("".join(index_lines))
+                index.flush()
+                os.fsync(index.fileno())
+    
+    def _truncate_torn_tail(self) -> None:
+        """
+        Cut off an unterminated last line left by an interrupted write.
+        
+        Reading skips such a line; without cutting it off, the next turn
+        would be appended onto it and be lost as well.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, 'r+b') as journal:
+            end = journal.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                journal.seek(start)
+                newline = journal.read(position - start).rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                print(f"Warning: Removing incomplete last turn from session journal {self.path}")
+                journal.truncate(position)
+
+
+def validate_session_id(session_id: str) -> str:
+    """
+    Check that a session ID is safe to use in a file name.
+    
+    Args:
+        session_id: Session ID or prefix
+    
+    Returns:
+        The session ID
+    
+    Raises:
+        SessionJournalError: If it holds anything but letters, digits, '_' and '-'
+    """
+    if not _SESSION_ID_PATTERN.fullmatch(session_id):
+        raise SessionJournalError(f"Invalid session ID '{session_id}': use letters, digits, '_' and '-' only")
+    return session_id
+
+
+def journal_path(directory: Union[str, Path], session_id: str) -> Path:
+    """
+    Path of a session's journal.
+    
+    Raises:
+        SessionJournalError: If the session ID is not a safe file name
+    """
+    return Path(directory) / f"{validate_session_id(session_id)}.jsonl"
+
+
+def read_journal(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    """
+    Read all turns of a journal.
+    
+    The file is memory-mapped and split on newlines, so reading is linear in
+    its size. An unterminated last line (an interrupted write) is skipped.
+    
+    Args:
+        path: Journal file
+    
+    Returns:
+        Turn records in order
+    
+    Raises:
+        SessionJournalError: If the journal does not exist
+    """
+    path = Path(path)
+    if not path.exists():
+        raise SessionJournalError(f"No journal found at {path}")
+    if path.stat().st_size == 0:
+        return []
+    
+    records = []
+    with open(path, 'rb') as journal:
+        with mmap.mmap(journal.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while True:
+                end = data.find(b"\n", start)
+                if end < 0:
+                    break
+                try:
+                    records.append(json.loads(data[start:end]))
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping corrupt line in session journal {path}")
+                start = end + 1
+            
+            if start < len(data):
+                print(f"Warning: Ignoring incomplete last turn in session journal {path}")
+    return records
+
+
+def read_index(directory: Union[str, Path], session_id: Optional[str] = None) -> List[TurnIndexEntry]:
+    """
+    Read the turn index of a journal directory.
+    
+    Args:
+        directory: Journal directory
+        session_id: Only return turns of this session
+    
+    Returns:
+        Index entries in write order
+    """
+    index_path = Path(directory) / INDEX_FILE
+    if not index_path.exists():
+        return []
+    
+    entries = []
+    with open(index_path, 'r', encoding='utf-8') as index:
+        for line in index:
+            try:
+                entry = TurnIndexEntry(**json.loads(line))
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if session_id is None or entry.session_id == session_id:
+                entries.append(entry)
+    return entries
+
+
+def list_sessions(directory: Union[str, Path]) -> List[SessionInfo]:
+    """
+    List journaled sessions from the index alone.
+    
+    Args:
+        directory: Journal directory
+    
+    Returns:
+        Sessions, most recently updated first
+    """
+    sessions: Dict[str, SessionInfo] = {}
+    for entry in read_index(directory):
+        info = sessions.get(entry.session_id)
+        if info is None:
+            sessions[entry.session_id] = SessionInfo(
+                session_id=entry.session_id,
+                turns=1,
+                started=entry.timestamp,
+                updated=entry.timestamp,
+                model=entry.model,
+                title=entry.user_preview
+            )
+        else:
+            sessions[entry.session_id] = info._replace(
+                turns=info.turns + 1,
+                updated=max(info.updated, entry.timestamp),
+                model=entry.model or info.model
+            )
+    return sorted(sessions.values(), key=lambda info: info.updated, reverse=True)
+
+
+def read_turn(directory: Union[str, Path], entry: TurnIndexEntry) -> Dict[str, Any]:
+    """
+    Read one turn of a journal by its index entry, without loading the rest.
+    
+    Args:
+        directory: Journal directory
+        entry: Index entry of the turn
+    
+    Returns:
+        Turn record
+    """
+    with open(journal_path(directory, entry.session_id), 'rb') as journal:
+        journal.seek(entry.offset)
+        return json.loads(journal.read(entry.length))
+
+
+def resolve_session_id(directory: Union[str, Path], session: str) -> str:
+    """
+    Resolve a session argument to a journaled session ID.
+    
+    Args:
+        directory: Journal directory
+        session: Full session ID, a unique prefix of one, or 'last'
+    
+    Returns:
+        Session ID
+    
+    Raises:
+        SessionJournalError: If the argument is not a valid session ID or no
+            single journal matches
+    """
+    directory = Path(directory)
+    if session == 'last':
+        sessions = list_sessions(directory)
+        if not sessions:
+            raise SessionJournalError("No saved sessions to resume")
+        return sessions[0].session_id
+    
+    # Reason: the argument comes from the user and ends up in a path and a glob pattern
+    validate_session_id(session)
+    if journal_path(directory, session).exists():
+        return session
+    
+    matches = [path.stem for path in directory.glob(f"{session}*.jsonl") if path.name != INDEX_FILE]
+    if len(matches) == 1:
+        return matches[0]
+    if not matches:
+        raise SessionJournalError(f"No saved session matches '{session}'")
+    raise SessionJournalError(f"Session '{session}' is ambiguous: {', '.join(sorted(matches))}")
@@ -0,0 +1,278 @@
+"""
+Flex Language Spec Retriever for Flex AI Agent.
+
+This module splits ``flex_language_spec.json`` into small, titled sections
+(e.g. ``COMMON_ERROR_SOLUTIONS``, ``built_in_functions > core_functions``),
+indexes them with BM25 and returns only the sections relevant to a request.
+The index is built offline and stored as a compact gzipped JSON artifact next
+to the model cache; it is rebuilt automatically when the spec file changes.
+"""
+
+import gzip
+import hashlib
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from tools.token_counter import get_token_counter
+
+
+class SpecRetrieverError(Exception):
+    """Custom exception for spec retrieval errors."""
+    pass
+
+
+class SpecChunk(NamedTuple):
+    """A retrieved section of the spec."""
+    title: str
+    text: str
+    score: float
+
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Reason: keeps Franco keywords like "lw", "l7d" and "etb3" - only English filler is dropped
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i in is it me my of on or so "
+    "the this to use what when with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase index terms."""
+    return [term for term in _TERM_PATTERN.findall(text.lower()) if term not in _STOPWORDS]
+
+
+class SpecRetriever:
+    """BM25 retriever over sections of the Flex language specification."""
+    
+    INDEX_VERSION = 1
+    K1 = 1.5
+    B = 0.75
+    
+    def __init__(
+        self,
+        spec_path: Path,
+        index_path: Path,
+        max_chunk_chars: int = 1200
+    ):
+        """
+        Initialize the retriever.
+        
+        Args:
+            spec_path: Path to flex_language_spec.json
+            index_path: Where the compact index artifact is stored
+            max_chunk_chars: Sections longer than this are split into subsections
+        """
+        self.spec_path = Path(spec_path)
+        self.index_path = Path(index_path)
+        self.max_chunk_chars = max_chunk_chars
+        
+        self._titles: List[str] = []
+        self._texts: List[str] = []
+        self._doc_lengths: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_length = 0.0
+        self._loaded = False
+    
+    def load(self) -> None:
+        """Load the on-disk index, rebuilding it if missing or stale."""
+        if self._loaded:
+            return
+        
+        try:
+            spec_bytes = self.spec_path.read_bytes()
+        except OSError as e:
+            raise SpecRetrieverError(f"Cannot read Flex spec: {e}")
+        spec_hash = hashlib.sha256(spec_bytes).hexdigest()
+        
+        index = self._read_index(spec_hash)
+        if index is None:
+            try:
+                spec = json.loads(spec_bytes)
+            except json.JSONDecodeError as e:
+                raise SpecRetrieverError(f"Invalid JSON in Flex spec: {e}")
+            index = self._build_index(spec, spec_hash)
+            self._write_index(index)
+        
+        self._apply_index(index)
+        self._loaded = True
+    
+    def _read_index(self, spec_hash: str) -> Optional[Dict[str, Any]]:
+        """Read the index artifact if it matches the current spec."""
+        if not self.index_path.exists():
+            return None
+        try:
+            with gzip.open(self.index_path, 'rt', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Failed to load spec index, rebuilding: {e}")
+            return None
+        
+        if index.get("version") != self.INDEX_VERSION or index.get("spec_hash") != spec_hash:
+            return None
+        return index
+    
+    def _write_index(self, index: Dict[str, Any]) -> None:
+        """Write the index artifact."""
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(self.index_path, 'wt', encoding='utf-8') as f:
+                json.dump(index, f, separators=(',', ':'))
+        except OSError as e:
+            print(f"Warning: Failed to save spec index: {e}")
+    
+    def _build_index(self, spec: Dict[str, Any], spec_hash: str) -> Dict[str, Any]:
+        """Chunk the spec and build BM25 postings."""
+        titles, texts = [], []
+        for path, text in self._chunk(spec):
+            titles.append(" > ".join(path) or self.spec_path.stem)
+            texts.append(text)
+        
+        doc_lengths = []
+        postings: Dict[str, List[int]] = {}
+        for doc_id, (title, text) in enumerate(zip(titles, texts)):
+            terms = tokenize(f"{title} {text}")
+            doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                # Reason: flat [doc, tf, doc, tf, ...] lists keep the artifact compact
+                postings.setdefault(term, []).extend((doc_id, frequency))
+        
+        return {
+            "version": self.INDEX_VERSION,
+            "spec_hash": spec_hash,
+            "titles": titles,
+            "texts": texts,
+            "doc_lengths": doc_lengths,
+            "postings": postings
+        }
+    
+    def _apply_index(self, index: Dict[str, Any]) -> None:
+        """Load index data and precompute IDF values."""
+        self._titles = index["titles"]
+        self._texts = index["texts"]
+        self._doc_lengths = index["doc_lengths"]
+        self._postings = index["postings"]
+        
+        document_count = len(self._doc_lengths)
+        self._avg_length = sum(self._doc_lengths) / document_count if document_count else 0.0
+        self._idf = {
+            term: math.log(1 + (document_count - len(flat) // 2 + 0.5) / (len(flat) // 2 + 0.5))
+            for term, flat in self._postings.items()
+        }
+    
+    def _chunk(self, value: Any, path: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], str]]:
+        """Yield (path, text) sections no longer than max_chunk_chars where possible."""
+        text = self._render(value)
+        if len(text) <= self.max_chunk_chars or not isinstance(value, (dict, list)):
+            if text.strip():
+                yield path, text
+            return
+        
+        if isinstance(value, dict):
+            # Reason: short fields like "description" give split children their context
+            scalars = {key: child for key, child in value.items() if not isinstance(child, (dict, list))}
+            preamble = self._render(scalars) if scalars else ""
+            if len(preamble) > self.max_chunk_chars // 4:
+                preamble = ""
+            
+            for key, child in value.items():
+                if preamble and key in scalars:
+                    continue
+                for child_path, child_text in self._chunk(child, path + (str(key),)):
+                    yield child_path, f"{preamble}\n{child_text}" if preamble else child_text
+            return
+        
+        # Reason: long lists (token tables, code lines) are split into consecutive groups
+        group: List[Any] = []
+        group_chars = 0
+        part = 1
+        for item in value:
+            item_chars = len(self._render(item))
+            if group and group_chars + item_chars > self.max_chunk_chars:
+                yield path + (f"part {part}",), self._render(group)
+                group, group_chars, part = [], 0, part + 1
+            group.append(item)
+            group_chars += item_chars
+        if group:
+            yield path + (f"part {part}",) if part > 1 else path, self._render(group)
+    
+    def _render(self, value: Any, indent: int = 0) -> str:
+        """Render a spec value as compact readable text."""
+        pad = "  " * indent
+        if isinstance(value, dict):
+            lines = []
+            for key, child in value.items():
+                if isinstance(child, (dict, list)):
+                    lines.append(f"{pad}{key}:")
+                    lines.append(self._render(child, indent + 1))
+                else:
+                    lines.append(f"{pad}{key}: {child}")
+            return "\n".join(lines)
+        if isinstance(value, list):
+            if all(isinstance(item, str) for item in value):
+                return "\n".join(f"{pad}{item}" for item in value)
+            return "\n".join(self._render(item, indent) for item in value)
+        return f"{pad}{value}"
+    
+    def search(self, query: str, top_k: int = 4) -> List[SpecChunk]:
+        """
+        Find the spec sections most relevant to a query.
+        
+        Args:
+            query: Request text
+            top_k: Maximum number of sections to return
+        
+        Returns:
+            Matching sections, best first
+        """
+        self.load()
+        
+        scores: Dict[int, float] = {}
+        k1, b, avg_length = self.K1, self.B, self._avg_length or 1.0
+        for term in set(tokenize(query)):
+            flat = self._postings.get(term)
+            if not flat:
+                continue
+            idf = self._idf[term]
+            for i in range(0, len(flat), 2):
+                doc_id, frequency = flat[i], flat[i + 1]
+                norm = k1 * (1 - b + b * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+        
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [SpecChunk(self._titles[doc_id], self._texts[doc_id], score) for doc_id, score in best]
+    
+    def format_context(self, query: str, top_k: int = 4, max_tokens: int = 1200) -> str:
+        """
+        Format the relevant spec sections for injection into a prompt.
+        
+        Args:
+            query: Request text
+            top_k: Maximum number of sections
+            max_tokens: Token budget for the whole block
+        
+        Returns:
+            Formatted sections, or an empty string if nothing matched
+        """
+        header = "Relevant Flex specification sections (from flex_language_spec.json):"
+        token_counter = get_token_counter()
+        remaining = max_tokens - token_counter.count(header)
+        
+        sections = []
+        for chunk in self.search(query, top_k):
+            section = f"### {chunk.title}\n{chunk.text}"
+            tokens = token_counter.count(section)
+            if tokens > remaining:
+                continue
+            sections.append(section)
+            remaining -= tokens
+        
+        if not sections:
+            return ""
+        return "\n\n".join([header] + sections)
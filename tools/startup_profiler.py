@@ -0,0 +1,139 @@
+"""
+Startup Profiler for Flex AI Agent.
+
+This module measures where CLI startup time goes. Once installed, it times
+every module import (inclusive and self time) through a meta path hook, and
+records named phases such as loading settings. The report groups self time by
+top-level package, so heavy dependencies stand out. It only uses the standard
+library, so it can be installed before anything else is imported.
+"""
+
+import sys
+import time
+from importlib.machinery import ModuleSpec
+from typing import Any, Dict, List, Optional, Tuple, TextIO
+
+
+class StartupProfiler:
+    """Import and phase timer for process startup."""
+    
+    def __init__(self, start: Optional[float] = None):
+        """
+        Initialize the profiler.
+        
+        Args:
+            start: perf_counter() value the process started at, defaults to now
+        """
+        self.start = start if start is not None else time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        # Module name -> (inclusive seconds, self seconds)
+        self.imports: Dict[str, Tuple[float, float]] = {}
+        self._stack: List[float] = []
+        self._finding = False
+    
+    def install(self) -> "StartupProfiler":
+        """Start timing imports."""
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+        return self
+    
+    def uninstall(self) -> None:
+        """Stop timing imports."""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+    
+    def find_spec(self, name: str, path: Any = None, target: Any = None) -> Optional[ModuleSpec]:
+        """Find a module with the other finders and time its loader."""
+        if self._finding:
+            return None
+        
+        self._finding = True
+        try:
+            spec = None
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+        finally:
+            self._finding = False
+        
+        # Reason: builtin and frozen importers are shared classes, only wrap per-module loaders
+        loader = spec.loader if spec is not None else None
+        if loader is None or isinstance(loader, type) or not hasattr(loader, 'exec_module'):
+            return spec
+        
+        exec_module = loader.exec_module
+        
+        def timed_exec_module(module: Any) -> None:
+            self._stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = self._stack.pop()
+                self.imports[name] = (elapsed, elapsed - children)
+                if self._stack:
+                    self._stack[-1] += elapsed
+        
+        loader.exec_module = timed_exec_module
+        return spec
+    
+    def mark(self, phase: str) -> None:
+        """
+        Record that a startup phase finished.
+        
+        Args:
+            phase: Phase name, e.g. 'settings loaded'
+        """
+        self.phases.append((phase, time.perf_counter()))
+    
+    def package_times(self) -> List[Tuple[str, float]]:
+        """
+        Sum import self time by top-level package.
+        
+        Returns:
+            (package, seconds) pairs, slowest first
+        """
+        totals: Dict[str, float] = {}
+        for name, (_, self_time) in self.imports.items():
+            package = name.split('.', 1)[0]
+            totals[package] = totals.get(package, 0.0) + self_time
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    
+    def report(self, top: int = 15) -> str:
+        """
+        Format the startup breakdown.
+        
+        Args:
+            top: Number of packages and modules to list
+        
+        Returns:
+            Multi-line report with phases, packages and slowest modules
+        """
+        lines = ["Startup profile (ms since start)"]
+        for phase, at in self.phases:
+            lines.append(f"  {(at - self.start) * 1000:8.1f}  {phase}")
+        
+        total_imports = sum(self_time for _, self_time in self.imports.values())
+        lines.append(f"Imports: {len(self.imports)} modules, {total_imports * 1000:.1f} ms")
+        for package, seconds in self.package_times()[:top]:
+            lines.append(f"  {seconds * 1000:8.1f}  {package}")
+        
+        lines.append("Slowest modules (self / inclusive ms)")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (inclusive, self_time) in slowest[:top]:
+            lines.append(f"  {self_time * 1000:8.1f} / {inclusive * 1000:8.1f}  {name}")
+        return "\n".join(lines)
+    
+    def print_report(self, stream: Optional[TextIO] = None, top: int = 15) -> None:
+        """
+        Print the report, to stderr by default so command output stays clean.
+        
+        Args:
+            stream: Output stream
+            top: Number of packages and modules to list
+        """
+        print(self.report(top), file=stream or sys.stderr)
@@ -0,0 +1,183 @@
+"""
+Token Counter for Flex AI Agent.
+
+This module provides a local, cached token-counting service used for prompt
+size and cost estimation and for packing conversation history into a model's
+context window. When the optional ``tiktoken`` package is installed, counts
+come from a real BPE tokenizer and batches are encoded in parallel; otherwise
+a regex pre-tokenizer approximates BPE counts (words, digit runs and
+punctuation, with long runs split every few characters).
+"""
+
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+
+# Reason: mirrors the shape of BPE pre-tokenization - letter runs, short
+# digit groups, punctuation clusters - so counts track real tokenizers closely
+_PRETOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]+|_+")
+
+# Characters covered by one token within a pre-token for the fallback counter
+_CHARS_PER_TOKEN = 6
+
+
+def _load_encoding(encoding_name: str):
+    """Load a tiktoken encoding, or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(encoding_name)
+    except Exception:
+        # Reason: missing package or offline first use (encodings are downloaded)
+        return None
+
+
+class TokenCounter:
+    """Counts tokens with an LRU cache and batched encoding."""
+    
+    def __init__(self, encoding_name: str = "o200k_base", cache_size: int = 4096):
+        """
+        Initialize the token counter.
+        
+        Args:
+            encoding_name: tiktoken encoding to use when tiktoken is installed
+            cache_size: Maximum number of cached string counts
+        """
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._encoding = _load_encoding(encoding_name)
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+    
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from a real tokenizer rather than the approximation."""
+        return self._encoding is not None
+    
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a string.
+        
+        Args:
+            text: Text to count
+        
+        Returns:
+            Number of tokens
+        """
+        if not text:
+            return 0
+        
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+        
+        tokens = self._count_uncached(text)
+        self._remember(text, tokens)
+        return tokens
+    
+    def count_batch(self, texts: Iterable[str]) -> List[int]:
+        """
+        Count tokens for many strings at once.
+        
+        Cache hits are answered directly and the distinct misses are encoded
+        in one batch call.
+        
+        Args:
+            texts: Strings to count
+        
+        Returns:
+            Token counts in the same order as the input
+        """
+        texts = list(texts)
+        counts: Dict[str, int] = {}
+        misses: List[str] = []
+        
+        for text in texts:
+            if not text or text in counts:
+                continue
+            cached = self._cache.get(text)
+            if cached is None:
+                counts[text] = -1
+                misses.append(text)
+            else:
+                self._cache.move_to_end(text)
+                counts[text] = cached
+        
+        if misses:
+            if self._encoding is not None:
+                encoded = self._encoding.encode_ordinary_batch(misses)
+                miss_counts = [len(tokens) for tokens in encoded]
+            else:
+                miss_counts = [self._approximate(text) for text in misses]
+            
+            for text, tokens in zip(misses, miss_counts):
+                counts[text] = tokens
+                self._remember(text, tokens)
+        
+        return [counts[text] if text else 0 for text in texts]
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """
+        Truncate text to at most ``max_tokens`` tokens.
+        
+        Args:
+            text: Text to truncate
+            max_tokens: Token limit
+        
+        Returns:
+            The longest prefix of the text within the limit
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode_ordinary(text)[:max_tokens])
+        
+        used = 0
+        for match in _PRETOKEN_PATTERN.finditer(text):
+            piece = match.end() - match.start()
+            tokens = -(-piece // _CHARS_PER_TOKEN)
+            if used + tokens > max_tokens:
+                remaining_chars = (max_tokens - used) * _CHARS_PER_TOKEN
+                return text[:match.start() + remaining_chars]
+            used += tokens
+        return text
+    
+    def _count_uncached(self, text: str) -> int:
+        """Count tokens without consulting the cache."""
+        if self._encoding is not None:
+            return len(self._encoding.encode_ordinary(text))
+        return self._approximate(text)
+    
+    @staticmethod
+    def _approximate(text: str) -> int:
+        """Approximate a BPE token count from regex pre-tokens."""
+        tokens = 0
+        for piece in _PRETOKEN_PATTERN.findall(text):
+            tokens += -(-len(piece) // _CHARS_PER_TOKEN)
+        # Reason: runs of whitespace (indentation, blank lines) also cost tokens
+        return tokens + text.count("\n")
+    
+    def _remember(self, text: str, tokens: int) -> None:
+        """Insert a count into the LRU cache, evicting the oldest entry."""
+        self._cache[text] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    def clear_cache(self) -> None:
+        """Drop all cached counts."""
+        self._cache.clear()
+
+
+# Global token counter instance
+_token_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """Get the process-wide token counter."""
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter()
+    return _token_counter
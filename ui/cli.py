@@ -8,7 +8,8 @@ with streaming responses, model selection, and comprehensive Flex programming su
 import asyncio
 import sys
 import os
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from typing import List, Optional
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt, Confirm
@@ -22,19 +23,32 @@ from prompt_toolkit import PromptSession
 from prompt_toolkit.styles import Style
 
 from agents.flex_agent import FlexAIAgent
-from tools.model_manager import ModelManager
+from agents.context_manager import ConversationContextManager
+from agents.models import OpenRouterModel
+from tools.model_manager import ModelManager, ModelManagerError
+from tools.session_journal import SessionJournalError, list_sessions, read_index, resolve_session_id
+from tools.search_index import SearchIndexError
 from ui.model_selector import ModelSelector
-from config.settings import get_settings, validate_settings
+from ui.stream_renderer import StreamRenderer
+from config.settings import Settings, get_settings, validate_settings
+from tools.http_client import close_shared_http_client
 from ui import formatters
 
 
 class FlexCLI:
     """Main CLI interface for Flex AI Agent."""
     
-    def __init__(self):
-        """Initialize CLI interface."""
+    def __init__(self, settings: Optional[Settings] = None, resume: Optional[str] = None):
+        """
+        Initialize CLI interface.
+        
+        Args:
+            settings: Application settings, loaded from the environment if omitted
+            resume: Journaled session to continue (ID, unique ID prefix or 'last')
+        """
         self.console = Console()
-        self.settings = get_settings()
+        self.settings = settings or get_settings()
+        self.resume = resume
         
         # Initialize components
         self.agent: Optional[FlexAIAgent] = None
@@ -42,7 +56,6 @@ class FlexCLI:
         self.model_selector: Optional[ModelSelector] = None
         
         # Session state
-        self.conversation_history: List[Dict[str, Any]] = []
         self.is_running = False
         self.in_multiline = False
         self.prompt_session = PromptSession(
@@ -50,9 +63,16 @@ class FlexCLI:
                 "flex-agent": "bold cyan",
                 "model": "#888888",  # Dim gray
                 "arrow": "bold",
+                "status": "#888888 italic",
+                "status-error": "#d75f5f",
             })
         )
         
+        # Model catalog load started in the background at startup; it also
+        # serves as the OpenRouter connection check
+        self._catalog_task: Optional[asyncio.Task] = None
+        self._catalog_error_reported = False
+        
         # Commands
         self.commands = {
             'help': self._show_help,
@@ -63,8 +83,14 @@ class FlexCLI:
             'multiline': self._toggle_multiline_mode,
             'examples': self._show_examples_command,
             'settings': self._show_settings,
+            'metrics': self._show_metrics,
+            'route': self._route_command,
+            'fanout': self._fan_out_command,
+            'generate': self._generate_command,
             'clear': self._clear_conversation,
             'history': self._show_history,
+            'sessions': self._show_sessions,
+            'search': self._search_command,
             'save': self._save_conversation,
             'exit': self._exit_command,
             'quit': self._exit_command
@@ -81,6 +107,8 @@ class FlexCLI:
             
             # Show welcome message
             self._show_welcome()
+            if self.resume:
+                await self._resume_session(self.resume)
             
             # Start main loop
             self.is_running = True
@@ -90,15 +118,31 @@ class FlexCLI:
             self.is_running = False
             # Clean exit message
             self.console.print("\n👋 Goodbye!")
+            # Reason: os._exit skips atexit handlers, so queued journal writes are flushed first
+            self._close_journal()
             os._exit(0)
         except Exception as e:
             formatters.display_error(f"Fatal error: {e}")
             sys.exit(1)
         finally:
             self.is_running = False
+            if self._catalog_task is not None and not self._catalog_task.done():
+                self._catalog_task.cancel()
+            self._close_journal()
+    
+    def _close_journal(self) -> None:
+        """Write pending journal entries of the current session."""
+        if self.agent is not None and self.agent.journal is not None:
+            self.agent.journal.close()
     
     async def _initialize_components(self) -> None:
-        """Initialize all components."""
+        """
+        Initialize all components.
+        
+        Only local setup is awaited. The model catalog (and with it the
+        OpenRouter connection test) loads in the background, so the prompt is
+        usable right away; commands that need the catalog wait for it.
+        """
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -106,26 +150,72 @@ class FlexCLI:
             transient=True
         ) as progress:
             
-            # Initialize model manager
-            progress.add_task(description="Initializing model manager...", total=None)
-            self.model_manager = ModelManager(self.settings)
-            
-            # Initialize model selector
-            progress.add_task(description="Setting up model selection...", total=None)
-            self.model_selector = ModelSelector(self.model_manager, self.settings)
-            
             # Initialize agent
             progress.add_task(description="Loading Flex AI Agent...", total=None)
             self.agent = FlexAIAgent(self.settings)
             
-            # Test OpenRouter connection
-            progress.add_task(description="Testing OpenRouter connection...", total=None)
-            try:
-                models = await self.model_manager.list_models()
-                if not models:
-                    raise Exception("No models available")
-            except Exception as e:
-                raise Exception(f"OpenRouter connection failed: {e}")
+            # Reason: share the agent's manager so routing, metrics and the model
+            # browser all use one catalog and one in-flight fetch
+            self.model_manager = self.agent.model_manager
+            self.model_selector = ModelSelector(self.model_manager, self.settings)
+        
+        self._catalog_task = asyncio.create_task(self._load_catalog())
+    
+    async def _load_catalog(self) -> List[OpenRouterModel]:
+        """Load the model catalog, which also tests the OpenRouter connection."""
+        models = await self.model_manager.list_models()
+        if not models:
+            raise ModelManagerError("No models available")
+        return models
+    
+    @property
+    def catalog_status(self) -> str:
+        """State of the background catalog load: 'loading', 'ready' or 'failed'."""
+        task = self._catalog_task
+        if task is None or task.cancelled():
+            return 'failed'
+        if not task.done():
+            return 'loading'
+        return 'failed' if task.exception() else 'ready'
+    
+    async def _wait_for_catalog(self) -> bool:
+        """
+        Wait for the background catalog load, for commands that need it.
+        
+        A failed load is reported and retried on the next call.
+        
+        Returns:
+            True if the catalog is available
+        """
+        if self.catalog_status == 'failed':
+            self._catalog_task = asyncio.create_task(self._load_catalog())
+            self._catalog_error_reported = False
+        
+        if not self._catalog_task.done():
+            with self.console.status("Loading model catalog...", spinner="dots"):
+                # Reason: wait() leaves the shared load running if this command is interrupted
+                await asyncio.wait([self._catalog_task])
+        
+        return not self._report_catalog_failure()
+    
+    def _report_catalog_failure(self) -> bool:
+        """
+        Show a failed background catalog load once.
+        
+        Returns:
+            True if the catalog load failed
+        """
+        if self.catalog_status != 'failed':
+            return False
+        
+        if not self._catalog_error_reported:
+            self._catalog_error_reported = True
+            error = None if self._catalog_task is None or self._catalog_task.cancelled() else self._catalog_task.exception()
+            formatters.display_error(
+                f"OpenRouter connection failed: {error or 'catalog load was cancelled'}\n"
+                "Local commands still work; model commands will retry."
+            )
+        return True
     
     def _show_welcome(self) -> None:
         """Show welcome message and current status."""
@@ -133,7 +223,7 @@ class FlexCLI:
             "Welcome to the Flex programming language AI assistant!\n"
             "Type 'help' for commands, 'models' for model selection, or ask me anything about Flex programming.\n\n"
             f"Current model: [bold]{self.agent.current_model_id}[/bold]\n"
-            "💡 This agent uses #file:flex_language_spec.json as its comprehensive knowledge base for accurate Flex programming assistance."
+            "💡 Relevant sections of flex_language_spec.json are retrieved and sent with each request for accurate Flex programming assistance."
         )
         formatters.display_message(welcome_message, title="Flex AI Agent")
     
@@ -186,18 +276,12 @@ class FlexCLI:
             return user_input
 
         # Single-line input with prompt_toolkit for full editing support
-        prompt_parts = [("class:flex-agent", "flex-agent")]
-        if self.agent and self.agent.current_model_id:
-            model_name = self.agent.current_model_id.split("/")[-1]
-            prompt_parts.extend([
-                ("", " "),
-                ("class:model", f"({model_name})")
-            ])
-        prompt_parts.append(("", " "))
-        prompt_parts.append(("class:arrow", "❯ "))
-
         try:
-            user_input = await self.prompt_session.prompt_async(prompt_parts)
+            # Reason: redraw while the catalog loads so its status updates in place
+            user_input = await self.prompt_session.prompt_async(
+                self._get_prompt_parts,
+                refresh_interval=0.5 if self.catalog_status == 'loading' else 0
+            )
         except (EOFError, KeyboardInterrupt):
             self.console.print("\n👋 Goodbye!")
             os._exit(0)
@@ -217,6 +301,26 @@ class FlexCLI:
         
         return user_input.strip()
 
+    def _get_prompt_parts(self) -> List[tuple]:
+        """Build the prompt_toolkit prompt, with the catalog status while it matters."""
+        prompt_parts = [("class:flex-agent", "flex-agent")]
+        if self.agent and self.agent.current_model_id:
+            model_name = self.agent.current_model_id.split("/")[-1]
+            prompt_parts.extend([
+                ("", " "),
+                ("class:model", f"({model_name})")
+            ])
+        
+        status = self.catalog_status if self._catalog_task is not None else None
+        if status == 'loading':
+            prompt_parts.append(("class:status", " [loading models…]"))
+        elif status == 'failed':
+            prompt_parts.append(("class:status-error", " [offline]"))
+        
+        prompt_parts.append(("", " "))
+        prompt_parts.append(("class:arrow", "❯ "))
+        return prompt_parts
+    
     async def _toggle_multiline_mode(self):
         """Toggle multi-line input mode."""
         self.in_multiline = not self.in_multiline
@@ -243,6 +347,9 @@ class FlexCLI:
                 if not user_input:
                     continue
                 
+                # Surface a background catalog failure before running the input
+                self._report_catalog_failure()
+                
                 # Check for commands
                 if user_input.startswith('/'):
                     await self._handle_command(user_input[1:])
@@ -285,8 +392,8 @@ class FlexCLI:
         
         handler = self.commands.get(command)
         if handler:
-            if command in ['switch'] and args:
-                await self._switch_model_command(' '.join(args))
+            if command in ['switch', 'route', 'fanout', 'generate', 'history', 'search'] and args:
+                await handler(' '.join(args))
             elif command in ['validate', 'execute'] and args:
                 # Allow inline code with validate/execute commands
                 await handler(' '.join(args))
@@ -297,13 +404,7 @@ class FlexCLI:
     
     async def _process_ai_request(self, user_input: str) -> None:
         """Process user request with the AI agent."""
-        # Add to conversation history
-        self.conversation_history.append({
-            'type': 'user',
-            'content': user_input,
-            'timestamp': asyncio.get_event_loop().time()
-        })
-        
+        # Reason: the agent records the turn in its session once it succeeds
         try:
             # Add timeout wrapper for AI requests with more reasonable timeout
             timeout_seconds = 120  # Increased to 120 seconds for complex requests
@@ -311,63 +412,43 @@ class FlexCLI:
             # Show loading indicator while waiting
             self.console.print("🤖 Assistant: thinking...", style="cyan dim")
             
-            response_content = ""
+            renderer: Optional[StreamRenderer] = None
             
             # Create timeout task for streaming
-            async def process_stream():
-                nonlocal response_content
+            async def process_stream() -> None:
+                nonlocal renderer
                 
-                try:
-                    chunk_count = 0
-                    has_content = False
-                    async for chunk in self.agent.run_stream(user_input, conversation_history=self.conversation_history):
-                        chunk_count += 1
-                        
-                        # PydanticAI returns cumulative strings
-                        current_content = str(chunk)
-                        
-                        # Check if we're getting actual content
-                        if current_content.strip():
-                            has_content = True
-                            
-                        # Check if we're getting empty chunks (streaming issue)
-                        if chunk_count > 5 and not has_content:
-                            # Streaming is returning empty chunks, fall back to non-streaming
-                            raise ValueError("Streaming returned empty chunks")
-                        
-                        response_content = current_content
+                chunk_count = 0
+                async for delta in self.agent.run_stream(user_input, delta=True):
+                    chunk_count += 1
                     
-                    # If we got no meaningful content from streaming, try non-streaming
-                    if not response_content.strip():
-                        raise ValueError("Streaming produced no content")
-                        
-                except Exception as e:
-                    raise e
+                    # Reason: the header goes out with the first real content, when the
+                    # serving model is known and an empty stream can still fall back
+                    if renderer is None:
+                        if not delta.strip():
+                            # Check if we're getting empty chunks (streaming issue)
+                            if chunk_count > 5:
+                                raise ValueError("Streaming returned empty chunks")
+                            continue
+                        self.console.print("\r", end="")  # Clear the line
+                        renderer = StreamRenderer(
+                            self.console,
+                            self.agent.last_response_model_id or self.agent.current_model_id
+                        )
+                    
+                    renderer.feed(delta)
                 
-                return response_content
+                # If we got no meaningful content from streaming, try non-streaming
+                if renderer is None:
+                    raise ValueError("Streaming produced no content")
+                renderer.finish()
             
             # Execute with timeout
             try:
-                response_content = await asyncio.wait_for(
-                    process_stream(), 
-                    timeout=timeout_seconds
-                )
-            except asyncio.TimeoutError:
-                raise
-            
-            # Clear the thinking indicator and display the formatted response
-            self.console.print("\r", end="")  # Clear the line
-            
-            # Use the enhanced formatter to display the response
-            formatters.display_enhanced_ai_response(response_content, self.agent.current_model_id)
-            
-            # Add response to history
-            self.conversation_history.append({
-                'type': 'assistant',
-                'content': response_content,
-                'model': self.agent.current_model_id,
-                'timestamp': asyncio.get_event_loop().time()
-            })
+                await asyncio.wait_for(process_stream(), timeout=timeout_seconds)
+            finally:
+                if renderer is not None:
+                    renderer.close()
             
         except asyncio.TimeoutError:
             self.console.print("\r", end="")  # Clear the line
@@ -381,21 +462,13 @@ class FlexCLI:
             try:
                 self.console.print("Trying fallback method...", style="dim")
                 fallback_response = await asyncio.wait_for(
-                    self.agent.run(user_input, conversation_history=self.conversation_history), 
+                    self.agent.run(user_input),
                     timeout=30
                 )
                 self.console.print("\r", end="")  # Clear the line
                 
                 # Use enhanced formatting for fallback response too
-                formatters.display_enhanced_ai_response(fallback_response, self.agent.current_model_id)
-                
-                # Add to history
-                self.conversation_history.append({
-                    'type': 'assistant',
-                    'content': fallback_response,
-                    'model': self.agent.current_model_id,
-                    'timestamp': asyncio.get_event_loop().time()
-                })
+                formatters.display_enhanced_ai_response(fallback_response, self.agent.last_response_model_id or self.agent.current_model_id)
                 
             except asyncio.CancelledError:
                 # Handle cancellation gracefully
@@ -420,21 +493,14 @@ class FlexCLI:
                 try:
                     self.console.print("Streaming failed, trying direct method...", style="dim")
                     fallback_response = await asyncio.wait_for(
-                        self.agent.run(user_input, conversation_history=self.conversation_history), 
+                        self.agent.run(user_input),
                         timeout=60
                     )
                     self.console.print("\r", end="")  # Clear the line
                     
                     # Use enhanced formatting for fallback response
-                    formatters.display_enhanced_ai_response(fallback_response, self.agent.current_model_id)
+                    formatters.display_enhanced_ai_response(fallback_response, self.agent.last_response_model_id or self.agent.current_model_id)
                     
-                    # Add to history
-                    self.conversation_history.append({
-                        'type': 'assistant',
-                        'content': fallback_response,
-                        'model': self.agent.current_model_id,
-                        'timestamp': asyncio.get_event_loop().time()
-                    })
                     return  # Success, don't show error
                     
                 except asyncio.CancelledError:
@@ -496,6 +562,7 @@ class FlexCLI:
 - `models` - Open interactive model selection
 - `switch <model_id>` - Switch to specific model
 - `examples` - Show Flex code examples
+- `generate <prompt>` - Generate a Flex program as structured code, explanation and warnings
 - `clear` - Clear conversation history
 - `exit` / `quit` - Exit the application
 
@@ -508,7 +575,12 @@ class FlexCLI:
 
 ## Utility Commands
 - `settings` - Show current settings
-- `history` - Show conversation history
+- `metrics` - Show latency percentiles, tokens and cost for the current model
+- `route <prompt>` - Show which model the router would pick for a prompt and why
+- `fanout <prompt>` - Generate code on several models at once and keep the best candidate
+- `history [session]` - Show conversation history (of the current or a saved session)
+- `sessions` - List saved sessions (continue one with `--resume <session>`)
+- `search <query>` - Search past sessions and saved Flex files
 - `save` - Save conversation to file
 
 ## Usage Tips
@@ -533,6 +605,9 @@ Type any question or request to get started!
             formatters.display_error("Model selector not available.")
             return
         
+        if not await self._wait_for_catalog():
+            return
+        
         try:
             selected_model = await self.model_selector.select_model_interactive(
                 current_model=self.agent.current_model_id
@@ -562,6 +637,8 @@ Type any question or request to get started!
             
             # Suggest similar models
             try:
+                if not await self._wait_for_catalog():
+                    return
                 models = await self.model_manager.list_models()
                 suggestions = [m.id for m in models if model_id.lower() in m.id.lower()][:3]
                 if suggestions:
@@ -614,7 +691,11 @@ Type any question or request to get started!
     
     async def _show_examples_command(self) -> None:
         """Show Flex code examples."""
-        result = await self.agent.run("show me Flex code examples for both Franco and English syntax")
+        # Reason: an explicit empty history keeps this fixed prompt out of the session (and cacheable)
+        result = await self.agent.run(
+            "show me Flex code examples for both Franco and English syntax",
+            conversation_history=[]
+        )
         formatters.display_enhanced_ai_response(result, self.agent.current_model_id)
     
     async def _show_settings(self) -> None:
@@ -633,44 +714,199 @@ Type any question or request to get started!
         cache_info = self.model_manager.get_cache_info()
         settings_text += f"\nModel Cache: {'Valid' if cache_info.get('is_valid') else 'Invalid/Empty'}"
         
+        response_cache = agent_info['response_cache']
+        settings_text += (
+            f"\nResponse Cache: {response_cache['entries']} entries, "
+            f"{response_cache['hits']} hits / {response_cache['misses']} misses"
+        )
+        
         formatters.display_message(settings_text, title="Settings")
     
+    async def _show_metrics(self) -> None:
+        """Show recorded performance metrics for the current model."""
+        model_id = self.agent.current_model_id
+        await self.agent.model_manager.load_metrics()
+        metrics = self.agent.model_manager.get_persistent_metrics(model_id).get(model_id)
+        
+        if metrics is None:
+            formatters.display_message(f"No calls recorded for {model_id} yet.", title="Info")
+            return
+        
+        formatters.display_model_metrics(metrics)
+    
+    async def _route_command(self, prompt: Optional[str] = None) -> None:
+        """Show the routing decision for a prompt."""
+        if not prompt:
+            prompt = Prompt.ask("Enter a prompt to route")
+        
+        if not prompt:
+            return
+        
+        if not await self._wait_for_catalog():
+            return
+        
+        try:
+            decision = await self.agent.model_manager.route_model(prompt, require_tools=True)
+        except Exception as e:
+            formatters.display_error(f"Routing failed: {e}")
+            return
+        
+        formatters.display_routing_decision(decision)
+    
+    async def _generate_command(self, prompt: Optional[str] = None) -> None:
+        """Generate code in structured mode and show its typed fields."""
+        if not prompt:
+            prompt = Prompt.ask("Describe the code to generate")
+        
+        if not prompt:
+            return
+        
+        self.console.print("🤖 Generating...", style="cyan dim")
+        try:
+            response = await self.agent.run_structured(prompt)
+        except Exception as e:
+            formatters.display_error(f"Code generation failed: {e}")
+            return
+        
+        formatters.display_code_response(response)
+    
+    async def _fan_out_command(self, prompt: Optional[str] = None) -> None:
+        """Generate code on several models in parallel and show the best candidate."""
+        if not prompt:
+            prompt = Prompt.ask("Describe the code to generate")
+        
+        if not prompt:
+            return
+        
+        self.console.print("🤖 Generating on several models...", style="cyan dim")
+        try:
+            result = await self.agent.run_fan_out(prompt)
+        except Exception as e:
+            formatters.display_error(f"Fan-out generation failed: {e}")
+            return
+        
+        formatters.display_fan_out_result(result)
+        if result.best is not None:
+            self.console.print(formatters.format_flex_code(result.best.code, result.best.validation.syntax_style))
+    
+    @property
+    def conversation(self) -> ConversationContextManager:
+        """Conversation of the agent's current session."""
+        return self.agent.conversation
+    
     async def _clear_conversation(self) -> None:
         """Clear conversation history."""
         if Confirm.ask("🗑️ Clear conversation history?", default=False):
-            self.conversation_history.clear()
+            self.agent.start_session()
             formatters.display_message("Conversation history cleared.", title="Success")
     
-    async def _show_history(self) -> None:
+    async def _resume_session(self, session: str) -> None:
+        """Continue a journaled session."""
+        try:
+            session_id = resolve_session_id(self.agent.sessions_dir, session)
+            resumed = await self.agent.resume_session(session_id)
+        except Exception as e:
+            formatters.display_error(f"Could not resume session '{session}': {e}")
+            return
+        
+        formatters.display_message(
+            f"Resumed session {session_id} ({len(resumed.conversation_history) // 2} turns).",
+            title="Session"
+        )
+    
+    async def _show_history(self, session: Optional[str] = None) -> None:
         """Show conversation history."""
-        if not self.conversation_history:
+        if session:
+            await self._show_saved_history(session)
+            return
+        
+        if not self.conversation.entries and not self.conversation.summary:
             formatters.display_message("No conversation history.", title="Info")
             return
         
-        history_text = ""
-        for i, entry in enumerate(self.conversation_history[-10:], 1):  # Show last 10
+        history_lines = []
+        if self.conversation.summary:
+            history_lines.append(f"({self.conversation.summarized_entries} earlier messages summarized)")
+        for i, entry in enumerate(self.conversation.entries[-10:], 1):  # Show last 10
             role = "You" if entry['type'] == 'user' else "Assistant"
             content = entry['content'][:100] + "..." if len(entry['content']) > 100 else entry['content']
-            history_text += f"{i}. {role}: {content}\n"
+            history_lines.append(f"{i}. {role}: {content}")
             
-        formatters.display_message(history_text, title="Conversation History")
+        formatters.display_message("\n".join(history_lines), title="Conversation History")
+    
+    async def _show_saved_history(self, session: str) -> None:
+        """Show the last turns of a saved session from the journal index."""
+        try:
+            session_id = resolve_session_id(self.agent.sessions_dir, session)
+        except SessionJournalError as e:
+            formatters.display_error(str(e))
+            return
+        
+        # Reason: the index holds previews, so the transcript itself is not read
+        turns = read_index(self.agent.sessions_dir, session_id)[-10:]
+        if not turns:
+            formatters.display_message("No conversation history.", title="Info")
+            return
+        
+        history_lines = []
+        for turn in turns:
+            history_lines.append(f"{turn.turn + 1}. You: {turn.user_preview}")
+            history_lines.append(f"   Assistant: {turn.assistant_preview}")
+        formatters.display_message("\n".join(history_lines), title=f"Session {session_id}")
+    
+    async def _show_sessions(self) -> None:
+        """List journaled sessions."""
+        sessions = list_sessions(self.agent.sessions_dir)
+        if not sessions:
+            formatters.display_message("No saved sessions.", title="Info")
+            return
+        
+        lines = []
+        for info in sessions[:20]:
+            updated = datetime.fromtimestamp(info.updated).strftime("%Y-%m-%d %H:%M")
+            current = " (current)" if info.session_id == self.agent.current_session.session_id else ""
+            lines.append(f"{info.session_id[:12]}  {updated}  {info.turns} turns  {info.model}{current}")
+            lines.append(f"    {info.title}")
+        lines.append("\nContinue one with: python main.py --resume <session>")
+        formatters.display_message("\n".join(lines), title="Saved Sessions")
+    
+    async def _search_command(self, query: Optional[str] = None) -> None:
+        """Search past sessions and saved Flex files."""
+        if self.agent.search_index is None:
+            formatters.display_message("Search is disabled (ENABLE_SEARCH_INDEX=false).", title="Info")
+            return
+        if not query:
+            query = Prompt.ask("Search past work for")
+        
+        # Reason: flushing waits on the journal's fsync and SQLite queries block
+        try:
+            hits = await asyncio.to_thread(self.agent.search_history, query, 10)
+        except SearchIndexError as e:
+            formatters.display_error(f"Search failed: {e}")
+            return
+        
+        if not hits:
+            formatters.display_message(f"No past work matches '{query}'.", title="Search")
+            return
+        formatters.display_search_results(hits, query)
     
     async def _save_conversation(self) -> None:
         """Save conversation to file."""
-        if not self.conversation_history:
+        if not self.conversation.transcript:
             formatters.display_message("No conversation to save.", title="Info")
             return
         
         filename = Prompt.ask("Enter filename", default="flex_conversation.md")
         
         try:
-            content = "# Flex AI Agent Conversation\n\n"
-            for entry in self.conversation_history:
+            # Reason: the rolling summary is for the prompt; the export keeps every turn in full
+            parts = ["# Flex AI Agent Conversation\n"]
+            for entry in self.conversation.transcript:
                 role = "User" if entry['type'] == 'user' else "Assistant"
-                content += f"## {role}\n\n{entry['content']}\n\n"
+                parts.append(f"## {role}\n\n{entry['content']}\n")
             
-            with open(filename, 'w') as f:
-                f.write(content)
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write("\n".join(parts))
             
             formatters.display_message(f"Conversation saved to {filename}", title="Success")
             
@@ -679,14 +915,27 @@ Type any question or request to get started!
     
     async def _exit_command(self) -> None:
         """Exit the application."""
+        journal = self.agent.journal if self.agent is not None else None
+        if journal is not None and journal.turns:
+            self.console.print(f"💾 Session saved. Continue it with: python main.py --resume {journal.session_id}", style="dim")
         self.console.print("👋 Goodbye!")
         self.is_running = False
 
 
-async def main() -> None:
-    """Main entry point for CLI."""
-    cli = FlexCLI()
-    await cli.start()
+async def main(settings: Optional[Settings] = None, resume: Optional[str] = None) -> None:
+    """
+    Main entry point for CLI.
+    
+    Args:
+        settings: Application settings, loaded from the environment if omitted
+        resume: Journaled session to continue
+    """
+    cli = FlexCLI(settings, resume=resume)
+    try:
+        await cli.start()
+    finally:
+        # Release pooled OpenRouter connections
+        await close_shared_http_client()
 
 
 if __name__ == "__main__":
@@ -11,7 +11,7 @@ import shutil
 import textwrap
 from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
-from rich.console import Console
+from rich.console import Console, RenderableType
 from rich.syntax import Syntax
 from rich.table import Table
 from rich.panel import Panel
@@ -28,8 +28,14 @@ from agents.models import (
     CodeValidationResult, 
     FlexExecutionResult,
     FlexSyntaxStyle,
-    ModelMetrics
+    ModelMetrics,
+    RoutingDecision,
+    FanOutResult,
+    FlexCodeResponse
 )
+from ui.highlighter import CODE_BLOCK_STYLES, PREVIEW_STYLES, highlight_flex, highlight_flex_lines
+from ui.render_cache import CachedRenderable
+from tools.search_index import MATCH_END, MATCH_START, SearchHit
 
 console = Console()
 
@@ -276,7 +282,22 @@ class FlexFormatter:
         content.append(f"Success rate: {success_rate:.1f}%\n", 
                       style=self.STYLES['success'] if success_rate > 90 else self.STYLES['warning'])
         content.append(f"Avg response time: {metrics.average_response_time:.2f}s\n")
+        if metrics.p50_response_time is not None:
+            content.append(
+                f"Latency p50/p95/p99: {metrics.p50_response_time:.2f}s / "
+                f"{metrics.p95_response_time:.2f}s / {metrics.p99_response_time:.2f}s\n"
+            )
         content.append(f"Total tokens: {metrics.total_tokens_used:,}\n")
+        if metrics.cache_hit_ratio is not None:
+            content.append(
+                f"Prompt cache: {metrics.total_cached_tokens:,} tokens "
+                f"({metrics.cache_hit_ratio:.0%} of prompt)\n"
+            )
+        if metrics.hedge_win_rate is not None:
+            content.append(
+                f"Hedged requests: {metrics.hedged_requests} "
+                f"(won {metrics.hedge_win_rate:.0%})\n"
+            )
         content.append(f"Total cost: ${metrics.total_cost:.4f}\n", style=self.STYLES['warning'])
         
         if metrics.last_used:
@@ -284,6 +305,92 @@ class FlexFormatter:
         
         return Panel(content, title="Model Metrics", border_style="blue")
     
+    def format_routing_decision(self, decision: RoutingDecision) -> Table:
+        """Format a model routing decision and its candidate trace."""
+        table = Table(title=f"Routed to {decision.model_id}")
+        
+        table.add_column("Model", style="cyan", min_width=20)
+        table.add_column("Latency", style="yellow", justify="right")
+        table.add_column("Cost", style="red", justify="right")
+        table.add_column("Source", style="blue", justify="center")
+        
+        for candidate in decision.candidates:
+            table.add_row(
+                candidate.model_id,
+                f"{candidate.expected_latency:.2f}s",
+                f"${candidate.expected_cost:.6f}",
+                "observed" if candidate.observed else "prior"
+            )
+        
+        rejected = ", ".join(f"{reason}: {count}" for reason, count in decision.rejected.items())
+        table.caption = (
+            f"{decision.reason}\n"
+            f"{decision.prompt_tokens} prompt + {decision.completion_tokens} completion tokens"
+            f"{' | rejected ' + rejected if rejected else ''}"
+            f" | selected in {decision.elapsed_us:.0f}µs"
+        )
+        
+        return table
+    
+    def format_fan_out_result(self, result: FanOutResult) -> Table:
+        """Format best-of-N candidates with their validation, latency and cost."""
+        best_id = result.best.model_id if result.best else None
+        table = Table(title=f"Best of {len(result.candidates)}: {best_id or 'no usable candidate'}")
+        
+        table.add_column("Model", style="cyan", min_width=20)
+        table.add_column("Result", justify="center")
+        table.add_column("Errors", style="red", justify="right")
+        table.add_column("Latency", style="yellow", justify="right")
+        table.add_column("Cost", style="red", justify="right")
+        
+        for candidate in result.candidates:
+            if candidate.passed:
+                status = Text("passed", style=self.STYLES['success'])
+            elif candidate.code:
+                status = Text("failed", style=self.STYLES['warning'])
+            else:
+                status = Text(candidate.error or "no code", style="dim")
+            table.add_row(
+                f"{'★ ' if candidate.model_id == best_id else ''}{candidate.model_id}",
+                status,
+                str(candidate.error_count) if candidate.validation else "-",
+                f"{candidate.latency:.2f}s",
+                f"${candidate.cost:.6f}"
+            )
+        
+        table.caption = (
+            f"{result.elapsed:.2f}s total | ${result.total_cost:.6f}"
+            f"{' | stopped early' if result.stopped_early else ''}"
+        )
+        
+        return table
+    
+    def format_search_results(self, hits: List[SearchHit], query: str) -> Table:
+        """Format search hits over past sessions and saved files."""
+        table = Table(title=f"🔎 Past work matching '{query}'", show_lines=True)
+        
+        table.add_column("Source", style="cyan", max_width=40)
+        table.add_column("Match", ratio=1)
+        table.add_column("When", style="dim", justify="right")
+        
+        for hit in hits:
+            if hit.kind == 'file':
+                source = Text(f"{self.ICONS['flex']} {hit.source}")
+            else:
+                session_id, _, turn = hit.source.partition('#')
+                question = hit.title if len(hit.title) <= 60 else hit.title[:57] + "..."
+                source = Text(f"💬 {session_id[:12]} turn {int(turn) + 1}\n", style="cyan")
+                source.append(question, style="white")
+            
+            snippet = Text()
+            for i, piece in enumerate(re.split(f"{MATCH_START}|{MATCH_END}", hit.snippet)):
+                # Reason: pieces alternate between context and matched terms
+                snippet.append(piece, style=self.STYLES['highlight'] if i % 2 else None)
+            
+            table.add_row(source, snippet, datetime.fromtimestamp(hit.timestamp).strftime("%Y-%m-%d %H:%M"))
+        
+        return table
+    
     def format_help_section(self, title: str, items: Dict[str, str]) -> Panel:
         """Format help sections with commands and descriptions."""
         content = Text()
@@ -304,7 +411,7 @@ class FlexFormatter:
             transient=True
         )
     
-    def format_flex_code_preview(self, code: str, syntax_style: FlexSyntaxStyle) -> Panel:
+    def format_flex_code_preview(self, code: str, syntax_style: FlexSyntaxStyle) -> RenderableType:
         """Format Flex code with syntax highlighting and style indicator."""
         # Determine language for syntax highlighting
         if syntax_style == FlexSyntaxStyle.FRANCO:
@@ -320,138 +427,28 @@ class FlexFormatter:
             title = f"{self.ICONS['flex']} Flex Code"
             border_style = "cyan"
         
-        # Apply custom Flex highlighting
-        highlighted_code = self.highlight_flex_syntax(code)
-        
-        return Panel(
-            Text.from_markup(highlighted_code),
-            title=title,
-            border_style=border_style,
-            padding=(1, 2)
+        return CachedRenderable(
+            'flex_preview',
+            code,
+            syntax_style.value,
+            lambda: Panel(
+                self.highlight_flex_syntax(code),
+                title=title,
+                border_style=border_style,
+                padding=(1, 2)
+            )
         )
     
-    def highlight_flex_syntax(self, code: str) -> str:
+    def highlight_flex_syntax(self, code: str) -> Text:
         """Enhanced Flex syntax highlighting with better color scheme."""
-        if not code:
-            return code
-        
-        lines = code.split('\n')
-        highlighted_lines = []
-        
-        for line in lines:
-            highlighted_line = self._highlight_line(line)
-            highlighted_lines.append(highlighted_line)
-        
-        return '\n'.join(highlighted_lines)
-    
-    def _highlight_line(self, line: str) -> str:
-        """Highlight a single line of Flex code."""
-        if not line:
-            return line
-        
-        # Preserve leading whitespace
-        leading_whitespace = line[:len(line) - len(line.lstrip())]
-        content = line[len(leading_whitespace):]
-        
-        if not content.strip():
-            return line
-        
-        # Define keyword patterns
-        franco_keywords = [
-            'rakm', 'kasr', 'so2al', 'klma', 'dorg', 'sndo2', 'etb3', 'da5l', 
-            'lw', 'aw', 'gher', 'karr', 'l7d', 'talama', 'rg3', 'w2f', 'yalla', 'safi'
-        ]
-        english_keywords = [
-            'int', 'float', 'bool', 'string', 'list', 'fun', 'print', 'scan', 
-            'if', 'elif', 'else', 'for', 'while', 'return', 'break', 'continue',
-            'true', 'false', 'var', 'func', 'main'
-        ]
-        
-        result = ""
-        i = 0
-        
-        while i < len(content):
-            char = content[i]
-            
-            # Handle comments
-            if char == '/' and i + 1 < len(content) and content[i + 1] == '/':
-                result += f"[dim green]{content[i:]}[/dim green]"
-                break
-            
-            # Handle strings
-            elif char in ['"', "'"]:
-                quote_char = char
-                string_content = char
-                i += 1
-                while i < len(content) and content[i] != quote_char:
-                    if content[i] == '\\' and i + 1 < len(content):
-                        string_content += content[i:i+2]
-                        i += 2
-                    else:
-                        string_content += content[i]
-                        i += 1
-                if i < len(content):
-                    string_content += content[i]
-                result += f"[bright_yellow]{string_content}[/bright_yellow]"
-                i += 1
-                continue
-            
-            # Handle numbers
-            elif char.isdigit():
-                number = ""
-                while i < len(content) and (content[i].isdigit() or content[i] == '.'):
-                    number += content[i]
-                    i += 1
-                result += f"[bright_cyan]{number}[/bright_cyan]"
-                continue
-            
-            # Handle operators
-            elif char in "=+-*/%<>!&|":
-                # Check for multi-character operators
-                if i + 1 < len(content):
-                    two_char = content[i:i+2]
-                    if two_char in ["==", "!=", "<=", ">=", "++", "--", "+=", "-=", "*=", "/=", "%=", "->", "&&", "||"]:
-                        result += f"[bright_red]{two_char}[/bright_red]"
-                        i += 2
-                        continue
-                result += f"[bright_red]{char}[/bright_red]"
-                i += 1
-                continue
-            
-            # Handle keywords and identifiers
-            elif char.isalpha() or char == '_':
-                word = ""
-                while i < len(content) and (content[i].isalnum() or content[i] == '_'):
-                    word += content[i]
-                    i += 1
-                
-                if word in franco_keywords:
-                    result += f"[bold bright_magenta]{word}[/bold bright_magenta]"
-                elif word in english_keywords:
-                    result += f"[bold bright_blue]{word}[/bold bright_blue]"
-                else:
-                    result += f"[white]{word}[/white]"
-                continue
-            
-            # Handle braces and brackets
-            elif char in "{}[]()":
-                result += f"[bright_white]{char}[/bright_white]"
-                i += 1
-                continue
-            
-            # Everything else
-            else:
-                result += char
-                i += 1
-        
-        return leading_whitespace + result
+        return highlight_flex(code, PREVIEW_STYLES)
 
 
 # Global formatter instance
 flex_formatter = FlexFormatter()
 
 # Convenience functions for backwards compatibility
-def format_flex_code(code: str, syntax_style: FlexSyntaxStyle = FlexSyntaxStyle.AUTO) -> Panel:
+def format_flex_code(code: str, syntax_style: FlexSyntaxStyle = FlexSyntaxStyle.AUTO) -> RenderableType:
     """Format Flex code with syntax highlighting."""
     return flex_formatter.format_flex_code_preview(code, syntax_style)
 
@@ -459,6 +456,22 @@ def format_model_info(model: OpenRouterModel, detailed: bool = False) -> Panel:
     """Format model information display."""
     return flex_formatter.format_model_info(model, detailed)
 
+def display_model_metrics(metrics: ModelMetrics):
+    """Displays performance metrics for a model."""
+    console.print(flex_formatter.format_model_metrics(metrics))
+
+def display_routing_decision(decision: RoutingDecision):
+    """Displays a model routing decision with its trace."""
+    console.print(flex_formatter.format_routing_decision(decision))
+
+def display_fan_out_result(result: FanOutResult):
+    """Displays best-of-N generation candidates and the selected one."""
+    console.print(flex_formatter.format_fan_out_result(result))
+
+def display_search_results(hits: List[SearchHit], query: str):
+    """Displays full-text search hits over past work."""
+    console.print(flex_formatter.format_search_results(hits, query))
+
 def display_code(code: str, language: str = "python"):
     """Displays syntax-highlighted code."""
     syntax = Syntax(code, language, theme="solarized-dark", line_numbers=True)
@@ -614,96 +627,52 @@ def wrap_text_responsive(text, width, indent=0):
     return wrapped_lines
 
 
-def highlight_flex_syntax(code_line):
+def highlight_flex_syntax(code_line: str) -> Text:
     """Apply syntax highlighting to Flex code while preserving indentation and spacing."""
-    if not code_line:
-        return code_line
-    
-    # Preserve leading whitespace
-    leading_whitespace = code_line[:len(code_line) - len(code_line.lstrip())]
-    content = code_line[len(leading_whitespace):]
-    
-    if not content.strip():  # If line is only whitespace
-        return code_line
-    
-    # Create a list of tokens with their positions and types
-    tokens = []
-    i = 0
-    line = content
-    
-    # Define token types and patterns
-    franco_keywords = ['rakm', 'kasr', 'so2al', 'klma', 'dorg', 'sndo2', 'etb3', 'da5l', 'lw', 'aw', 'gher', 'karr', 'l7d', 'talama', 'rg3', 'w2f']
-    english_keywords = ['int', 'float', 'bool', 'string', 'list', 'fun', 'print', 'scan', 'if', 'elif', 'else', 'for', 'while', 'return', 'break', 'func', 'main', 'println', 'readline', 'true', 'false', 'continue', 'to', 'var']
-    all_keywords = franco_keywords + english_keywords
-    
-    # Process the line character by character
-    result = ""
-    i = 0
-    while i < len(line):
-        char = line[i]
-        
-        # Handle comments
-        if char == '/' and i + 1 < len(line) and line[i + 1] == '/':
-            # Everything from here to end of line is a comment
-            result += f"[dim]{line[i:]}[/dim]"
-            break
-        
-        # Handle strings
-        elif char in ['"', "'"]:
-            quote_char = char
-            string_content = char
-            i += 1
-            while i < len(line) and line[i] != quote_char:
-                string_content += line[i]
-                i += 1
-            if i < len(line):
-                string_content += line[i]  # Add closing quote
-            result += f"[yellow]{string_content}[/yellow]"
-            i += 1
-            continue
-        
-        # Handle numbers
-        elif char.isdigit():
-            number = ""
-            while i < len(line) and (line[i].isdigit() or line[i] == '.'):
-                number += line[i]
-                i += 1
-            result += f"[cyan]{number}[/cyan]"
-            continue
-        
-        # Handle operators
-        elif char in "=+-*/%<>!&|":
-            # Check for multi-character operators
-            if i + 1 < len(line):
-                two_char = line[i:i+2]
-                if two_char in ["==", "!=", "<=", ">=", "++", "--", "+=", "-=", "*=", "/=", "%=", "->", "&&", "||"]:
-                    result += f"[red]{two_char}[/red]"
-                    i += 2
-                    continue
-            result += f"[red]{char}[/red]"
-            i += 1
-            continue
-        
-        # Handle keywords
-        elif char.isalpha() or char == '_':
-            word = ""
-            while i < len(line) and (line[i].isalnum() or line[i] == '_'):
-                word += line[i]
-                i += 1
-            
-            if word in all_keywords:
-                result += f"[magenta]{word}[/magenta]"
-            else:
-                result += word
-            continue
+    return highlight_flex(code_line, CODE_BLOCK_STYLES)
+
+
+def format_flex_code_panel(code_lines, title="📝 Flex Code Example"):
+    """Render Flex code lines in a panel with Flex keyword highlighting."""
+    # Reason: styles are applied as spans, so brackets in code are never parsed as markup
+    return Panel(
+        highlight_flex_lines(code_lines, CODE_BLOCK_STYLES),
+        title=title,
+        border_style="blue",
+        padding=(1, 2)
+    )
+
+
+def format_code_response(response: FlexCodeResponse):
+    """
+    Format a structured code response from its typed fields.
+    
+    Args:
+        response: Structured response from ``FlexAIAgent.run_structured``
         
-        # Handle everything else (whitespace, punctuation, etc.)
-        else:
-            result += char
-            i += 1
+    Returns:
+        list: Panels for the code, explanation and warnings
+    """
+    title = f"📝 Flex Code ({response.syntax_style.value})"
+    if response.filename:
+        title += f" • {response.filename}"
+    panels = [format_flex_code_panel(response.code.split('\n'), title=title)]
+    
+    if response.explanation.strip():
+        panels.append(format_text_section_rich(response.explanation))
     
-    # Restore leading whitespace
-    return leading_whitespace + result
+    if response.warnings:
+        warning_text = Text()
+        for warning in response.warnings:
+            warning_text.append(f"⚠️ {warning}\n", style="yellow")
+        panels.append(Panel(warning_text, title="Warnings", border_style="yellow"))
+    
+    status = "✅ Valid" if response.is_valid else "❌ Has validation errors"
+    panels.append(Text(
+        f"{status} • {response.model_used} • {response.generation_time:.2f}s",
+        style="green" if response.is_valid else "red"
+    ))
+    return panels
 
 
 def format_enhanced_ai_response(response, model_name=None):
@@ -734,20 +703,7 @@ def format_enhanced_ai_response(response, model_name=None):
     WARNING_ICON = "⚠️"
     FLEX_ICON = "🚀"
     
-    formatted_output = []
-    
-    # Create responsive header
-    header_text = f"{AI_ICON} FLEX AI ASSISTANT"
-    if model_name:
-        header_text += f" • {model_name}"
-    
-    # Use Rich Panel for the header
-    header_panel = Panel(
-        Text(header_text, justify="center", style="bold cyan"),
-        border_style="cyan",
-        padding=(0, 1)
-    )
-    formatted_output.append(header_panel)
+    formatted_output = [format_response_header(model_name)]
     
     # Process response content
     lines = response.split('\n')
@@ -760,35 +716,8 @@ def format_enhanced_ai_response(response, model_name=None):
         if line.strip().startswith('```'):
             if in_code_block:
                 # End of code block - display the collected code
-                code_content = '\n'.join(current_section)
-                if code_content.strip():
-                    # Use Rich Syntax for code highlighting
-                    lang = code_language if code_language else "text"
-                    if lang.lower() in ["flex", "franco"]:
-                        # Apply custom Flex syntax highlighting
-                        highlighted_lines = []
-                        for code_line in current_section:
-                            highlighted_lines.append(highlight_flex_syntax(code_line))
-                        code_content = '\n'.join(highlighted_lines)
-                        
-                        # Use Text.from_markup to properly render Rich markup
-                        code_panel = Panel(
-                            Text.from_markup(code_content),
-                            title=f"{CODE_ICON} Flex Code Example",
-                            border_style="blue",
-                            padding=(1, 2)
-                        )
-                    else:
-                        # Use Rich syntax highlighting for other languages
-                        syntax = Syntax(code_content, lang, theme="monokai", line_numbers=True)
-                        code_panel = Panel(
-                            syntax,
-                            title=f"{CODE_ICON} Code Example ({lang})",
-                            border_style="blue",
-                            padding=(0, 1)
-                        )
-                    
-                    formatted_output.append(code_panel)
+                if '\n'.join(current_section).strip():
+                    formatted_output.append(format_code_block_panel(current_section, code_language))
                 
                 current_section = []
                 in_code_block = False
@@ -815,49 +744,77 @@ def format_enhanced_ai_response(response, model_name=None):
     if current_section:
         if in_code_block:
             # Handle unclosed code block
-            code_content = '\n'.join(current_section)
-            if code_content.strip():
-                lang = code_language if code_language else "text"
-                if lang.lower() in ["flex", "franco"]:
-                    # Apply custom Flex syntax highlighting
-                    highlighted_lines = []
-                    for code_line in current_section:
-                        highlighted_lines.append(highlight_flex_syntax(code_line))
-                    code_content = '\n'.join(highlighted_lines)
-                    
-                    # Use Text.from_markup to properly render Rich markup
-                    code_panel = Panel(
-                        Text.from_markup(code_content),
-                        title=f"{CODE_ICON} Flex Code Example",
-                        border_style="blue",
-                        padding=(1, 2)
-                    )
-                else:
-                    syntax = Syntax(code_content, lang, theme="monokai", line_numbers=True)
-                    code_panel = Panel(
-                        syntax,
-                        title=f"{CODE_ICON} Code Example",
-                        border_style="blue",
-                        padding=(0, 1)
-                    )
-                
-                formatted_output.append(code_panel)
+            if '\n'.join(current_section).strip():
+                formatted_output.append(format_code_block_panel(current_section, code_language))
         else:
             # Handle remaining text
             text_content = '\n'.join(current_section)
             if text_content.strip():
                 formatted_output.append(format_text_section_rich(text_content))
     
-    # Create responsive footer
-    footer_text = f"{FLEX_ICON} Ready for your next question!"
-    footer_panel = Panel(
-        Text(footer_text, justify="center", style="bold green"),
+    formatted_output.append(format_response_footer())
+    
+    return formatted_output
+
+
+def format_response_header(model_name: Optional[str] = None) -> Panel:
+    """Create the header panel of an AI response."""
+    header_text = "🤖 FLEX AI ASSISTANT"
+    if model_name:
+        header_text += f" • {model_name}"
+    
+    return Panel(
+        Text(header_text, justify="center", style="bold cyan"),
+        border_style="cyan",
+        padding=(0, 1)
+    )
+
+
+def format_response_footer() -> Panel:
+    """Create the footer panel of an AI response."""
+    return Panel(
+        Text("🚀 Ready for your next question!", justify="center", style="bold green"),
         border_style="green",
         padding=(0, 1)
     )
-    formatted_output.append(footer_panel)
+
+
+def format_code_block_panel(code_lines: List[str], language: str = "", cached: bool = True) -> RenderableType:
+    """
+    Create the panel for a fenced code block of an AI response.
     
-    return formatted_output
+    Args:
+        code_lines: Lines inside the fence
+        language: Fence language tag
+        cached: Render through the render cache; disable for code that is still changing
+    
+    Returns:
+        Flex-highlighted panel for Flex code, Rich syntax panel otherwise
+    """
+    lang = language or "text"
+    code_lines = list(code_lines)
+    if not cached:
+        return _build_code_block_panel(code_lines, lang)
+    return CachedRenderable(
+        'code_block',
+        '\n'.join(code_lines),
+        lang,
+        lambda: _build_code_block_panel(code_lines, lang)
+    )
+
+
+def _build_code_block_panel(code_lines: List[str], lang: str) -> Panel:
+    """Create the uncached panel for a fenced code block."""
+    if lang.lower() in ["flex", "franco"]:
+        return format_flex_code_panel(code_lines)
+    
+    syntax = Syntax('\n'.join(code_lines), lang, theme="monokai", line_numbers=True)
+    return Panel(
+        syntax,
+        title=f"📝 Code Example ({lang})",
+        border_style="blue",
+        padding=(0, 1)
+    )
 
 
 def format_text_section_rich(text):
@@ -926,6 +883,13 @@ def format_text_section_rich(text):
     )
 
 
+def display_code_response(response: FlexCodeResponse):
+    """Display a structured code response."""
+    for panel in format_code_response(response):
+        console.print(panel)
+        console.print()
+
+
 def display_enhanced_ai_response(response, model_name=None):
     """Display an AI response with enhanced formatting."""
     formatted_panels = format_enhanced_ai_response(response, model_name)
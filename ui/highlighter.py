@@ -0,0 +1,102 @@
+"""
+Flex Syntax Highlighter for Flex AI Agent.
+
+This module highlights Flex code (Franco and English syntax) for the terminal.
+A single precompiled regex scans the whole program once; each token becomes a
+style span on a Rich ``Text``, so highlighting is linear in the size of the
+code and code containing brackets is never mistaken for Rich markup.
+"""
+
+import re
+from typing import Iterable, Mapping
+
+from rich.text import Text
+
+
+FRANCO_KEYWORDS = frozenset({
+    'rakm', 'kasr', 'so2al', 'klma', 'dorg', 'sndo2', 'etb3', 'da5l',
+    'lw', 'aw', 'gher', 'karr', 'l7d', 'talama', 'rg3', 'w2f', 'yalla', 'safi'
+})
+
+ENGLISH_KEYWORDS = frozenset({
+    'int', 'float', 'bool', 'string', 'list', 'fun', 'print', 'println', 'scan',
+    'readline', 'if', 'elif', 'else', 'for', 'to', 'while', 'return', 'break',
+    'continue', 'true', 'false', 'var', 'func', 'main'
+})
+
+# Token kinds in priority order; strings and comments stop at the end of the line
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>//[^\n]*)
+  | (?P<string>"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?)
+  | (?P<number>\d[\d.]*)
+  | (?P<operator>==|!=|<=|>=|\+\+|--|\+=|-=|\*=|/=|%=|->|&&|\|\||[=+\-*/%<>!&|])
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<bracket>[{}\[\]()])
+""", re.VERBOSE)
+
+# Styles of code blocks in AI responses
+CODE_BLOCK_STYLES = {
+    'comment': 'dim',
+    'string': 'yellow',
+    'number': 'cyan',
+    'operator': 'red',
+    'franco_keyword': 'magenta',
+    'english_keyword': 'magenta',
+}
+
+# Styles of code previews, which tell the two keyword sets apart
+PREVIEW_STYLES = {
+    'comment': 'dim green',
+    'string': 'bright_yellow',
+    'number': 'bright_cyan',
+    'operator': 'bright_red',
+    'franco_keyword': 'bold bright_magenta',
+    'english_keyword': 'bold bright_blue',
+    'identifier': 'white',
+    'bracket': 'bright_white',
+}
+
+
+def highlight_flex(code: str, styles: Mapping[str, str] = CODE_BLOCK_STYLES) -> Text:
+    """
+    Highlight Flex code.
+    
+    Args:
+        code: Flex source, one or more lines
+        styles: Style per token kind ('comment', 'string', 'number', 'operator',
+            'franco_keyword', 'english_keyword', 'identifier', 'bracket');
+            kinds without a style stay plain
+    
+    Returns:
+        Text with the code and one style span per highlighted token
+    """
+    text = Text(code)
+    for match in TOKEN_PATTERN.finditer(code):
+        kind = match.lastgroup
+        if kind == 'word':
+            word = match.group()
+            if word in FRANCO_KEYWORDS:
+                kind = 'franco_keyword'
+            elif word in ENGLISH_KEYWORDS:
+                kind = 'english_keyword'
+            else:
+                kind = 'identifier'
+        
+        style = styles.get(kind)
+        if style:
+            text.stylize(style, match.start(), match.end())
+    return text
+
+
+def highlight_flex_lines(lines: Iterable[str], styles: Mapping[str, str] = CODE_BLOCK_STYLES) -> Text:
+    """
+    Highlight Flex code given as lines.
+    
+    Args:
+        lines: Lines of Flex source
+        styles: Style per token kind, as in ``highlight_flex``
+    
+    Returns:
+        Highlighted text of the joined lines
+    """
+    return highlight_flex("\n".join(lines), styles)
@@ -0,0 +1,333 @@
+"""
+Full-Screen Model Browser for Flex AI Agent.
+
+This module provides a prompt_toolkit full-screen browser for the model
+catalog. Search text, sort orders and filter results are indexed once per
+catalog, and the list only renders the rows that fit on screen, so typing a
+filter or scrolling stays instant regardless of the catalog size.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+from prompt_toolkit.application import Application
+from prompt_toolkit.formatted_text import StyleAndTextTuples
+from prompt_toolkit.key_binding import KeyBindings
+from prompt_toolkit.layout import HSplit, Layout, Window
+from prompt_toolkit.layout.controls import FormattedTextControl
+from prompt_toolkit.styles import Style
+from prompt_toolkit.widgets import TextArea
+
+from agents.models import OpenRouterModel
+
+
+def model_price(model: OpenRouterModel) -> float:
+    """Combined prompt and completion price per token."""
+    return model.pricing.get('prompt', 0) + model.pricing.get('completion', 0)
+
+
+class ModelCatalogView:
+    """Search index and presorted views over a model catalog."""
+    
+    # Sort orders, cycled with Tab in the browser
+    SORT_KEYS: Dict[str, Callable[[OpenRouterModel], object]] = {
+        'name': lambda model: model.name.lower(),
+        'price': lambda model: (model_price(model), model.name.lower()),
+        'context': lambda model: (-model.context_length, model.name.lower()),
+    }
+    
+    def __init__(self, models: Sequence[OpenRouterModel]):
+        """
+        Build the search index for a catalog.
+        
+        Args:
+            models: Catalog to browse
+        """
+        self.models = list(models)
+        self._search_text = [
+            f"{model.name}\n{model.id}\n{model.description or ''}".lower()
+            for model in self.models
+        ]
+        self._sorted: Dict[str, List[int]] = {}
+        
+        # Last filter, narrowed further while the query only grows
+        self._last_sort: Optional[str] = None
+        self._last_query = ""
+        self._last_matches: List[int] = []
+    
+    def __len__(self) -> int:
+        return len(self.models)
+    
+    def sorted_indices(self, sort: str) -> List[int]:
+        """
+        Get the catalog order for a sort key, sorting once per key.
+        
+        Args:
+            sort: One of SORT_KEYS
+        
+        Returns:
+            Model indices in sort order
+        """
+        if sort not in self._sorted:
+            key = self.SORT_KEYS[sort]
+            self._sorted[sort] = sorted(range(len(self.models)), key=lambda index: key(self.models[index]))
+        return self._sorted[sort]
+    
+    def filter(self, query: str, sort: str = 'name') -> List[int]:
+        """
+        Find models whose name, ID or description contains every query term.
+        
+        Args:
+            query: Whitespace-separated search terms
+            sort: One of SORT_KEYS
+        
+        Returns:
+            Matching model indices in sort order
+        """
+        query = query.lower().lstrip()
+        terms = query.split()
+        
+        # Reason: a query that extends the previous one can only match a subset
+        # of its results, so typing narrows the last result instead of rescanning
+        if sort == self._last_sort and query.startswith(self._last_query):
+            candidates = self._last_matches
+        else:
+            candidates = self.sorted_indices(sort)
+        
+        if terms:
+            search_text = self._search_text
+            matches = [index for index in candidates if all(term in search_text[index] for term in terms)]
+        else:
+            matches = list(candidates)
+        
+        self._last_sort = sort
+        self._last_query = query
+        self._last_matches = matches
+        return matches
+
+
+class ModelBrowser:
+    """Full-screen model browser with type-ahead filtering."""
+    
+    # Rows used by the search field, separator, details and status lines
+    CHROME_ROWS = 5
+    
+    STYLE = Style.from_dict({
+        "search": "bold",
+        "row": "",
+        "row.selected": "reverse",
+        "row.current": "ansicyan",
+        "price": "ansimagenta",
+        "context": "ansiyellow",
+        "separator": "#888888",
+        "details": "#888888 italic",
+        "status": "reverse",
+    })
+    
+    def __init__(
+        self,
+        view: ModelCatalogView,
+        current_model: Optional[str] = None,
+        query: str = "",
+        sort: str = 'name',
+        **app_kwargs
+    ):
+        """
+        Initialize the browser.
+        
+        Args:
+            view: Indexed catalog to browse
+            current_model: Currently selected model ID, marked in the list
+            query: Initial search text
+            sort: Initial sort key
+            **app_kwargs: Extra Application arguments, such as input and output
+        """
+        self.view = view
+        self.current_model = current_model
+        self.sort = sort
+        self.matches = view.filter(query, sort)
+        self.selected = 0
+        self.top = 0
+        
+        self.search_field = TextArea(
+            text=query,
+            multiline=False,
+            prompt="🔍 ",
+            height=1,
+            style="class:search"
+        )
+        self.search_field.buffer.on_text_changed += self._on_query_changed
+        
+        self.list_window = Window(
+            FormattedTextControl(self._render_rows),
+            always_hide_cursor=True
+        )
+        
+        layout = Layout(
+            HSplit([
+                self.search_field,
+                Window(height=1, char="─", style="class:separator"),
+                self.list_window,
+                Window(FormattedTextControl(self._render_details), height=2, style="class:details"),
+                Window(FormattedTextControl(self._render_status), height=1, style="class:status"),
+            ]),
+            focused_element=self.search_field
+        )
+        self.app = Application(
+            layout=layout,
+            key_bindings=self._create_key_bindings(),
+            style=self.STYLE,
+            full_screen=True,
+            **app_kwargs
+        )
+    
+    async def run(self) -> Optional[str]:
+        """
+        Show the browser until a model is chosen or the browser is closed.
+        
+        Returns:
+            Selected model ID or None if cancelled
+        """
+        return await self.app.run_async()
+    
+    @property
+    def selected_model(self) -> Optional[OpenRouterModel]:
+        """Model under the cursor."""
+        if not self.matches:
+            return None
+        return self.view.models[self.matches[self.selected]]
+    
+    def _create_key_bindings(self) -> KeyBindings:
+        """Create the navigation and selection key bindings."""
+        kb = KeyBindings()
+        
+        @kb.add("up")
+        def _(event):
+            self._move(-1)
+        
+        @kb.add("down")
+        def _(event):
+            self._move(1)
+        
+        @kb.add("pageup")
+        def _(event):
+            self._move(-self._visible_rows())
+        
+        @kb.add("pagedown")
+        def _(event):
+            self._move(self._visible_rows())
+        
+        @kb.add("c-home")
+        def _(event):
+            self._move(-len(self.matches))
+        
+        @kb.add("c-end")
+        def _(event):
+            self._move(len(self.matches))
+        
+        @kb.add("tab")
+        def _(event):
+            sorts = list(ModelCatalogView.SORT_KEYS)
+            self.sort = sorts[(sorts.index(self.sort) + 1) % len(sorts)]
+            self._refilter()
+        
+        @kb.add("enter")
+        def _(event):
+            model = self.selected_model
+            if model is not None:
+                event.app.exit(result=model.id)
+        
+        @kb.add("escape", eager=True)
+        @kb.add("c-c")
+        def _(event):
+            event.app.exit(result=None)
+        
+        return kb
+    
+    def _on_query_changed(self, _buffer) -> None:
+        """Refilter on every keystroke."""
+        self._refilter()
+    
+    def _refilter(self) -> None:
+        """Apply the current query and sort and move the cursor to the top."""
+        self.matches = self.view.filter(self.search_field.text, self.sort)
+        self.selected = 0
+        self.top = 0
+    
+    def _visible_rows(self) -> int:
+        """Number of list rows that fit on screen."""
+        info = self.list_window.render_info
+        if info is not None:
+            return max(1, info.window_height)
+        return max(1, self.app.output.get_size().rows - self.CHROME_ROWS)
+    
+    def _move(self, offset: int) -> None:
+        """Move the cursor and scroll it into view."""
+        if not self.matches:
+            return
+        self.selected = max(0, min(len(self.matches) - 1, self.selected + offset))
+        self._scroll_to_selection()
+    
+    def _scroll_to_selection(self) -> None:
+        """Adjust the first visible row so the cursor is on screen."""
+        rows = self._visible_rows()
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + rows:
+            self.top = self.selected - rows + 1
+    
+    def _render_rows(self) -> StyleAndTextTuples:
+        """Render the visible window of the result list."""
+        if not self.matches:
+            return [("class:details", "  No models match the search.")]
+        
+        self._scroll_to_selection()
+        width = self.app.output.get_size().columns
+        visible = self.matches[self.top:self.top + self._visible_rows()]
+        
+        fragments: StyleAndTextTuples = []
+        for offset, index in enumerate(visible):
+            row = self.top + offset
+            fragments.extend(self._format_row(self.view.models[index], width, row == self.selected))
+            fragments.append(("", "\n"))
+        if fragments:
+            fragments.pop()
+        return fragments
+    
+    def _format_row(self, model: OpenRouterModel, width: int, selected: bool) -> StyleAndTextTuples:
+        """Format one list row."""
+        style = "class:row.selected" if selected else "class:row"
+        marker = "● " if model.id == self.current_model else "  "
+        
+        prompt_price = model.pricing.get('prompt', 0) * 1000
+        completion_price = model.pricing.get('completion', 0) * 1000
+        price = f"${prompt_price:.3f}/${completion_price:.3f}" if prompt_price or completion_price else "Free"
+        context = f"{model.context_length // 1000}K ctx"
+        
+        name_width = max(10, width - len(marker) - 32)
+        name = model.name if len(model.name) <= name_width else model.name[:name_width - 3] + "..."
+        
+        name_style = style + (" class:row.current" if model.id == self.current_model else "")
+        return [
+            (name_style, f"{marker}{name:<{name_width}}"),
+            (style + " class:price", f"{price:>18}"),
+            (style + " class:context", f"{context:>12} "),
+        ]
+    
+    def _render_details(self) -> StyleAndTextTuples:
+        """Render the ID and description of the model under the cursor."""
+        model = self.selected_model
+        if model is None:
+            return []
+        description = " ".join((model.description or "").split())
+        width = self.app.output.get_size().columns
+        if len(description) > width - 2:
+            description = description[:width - 5] + "..."
+        return [("", f" {model.id}\n {description}")]
+    
+    def _render_status(self) -> StyleAndTextTuples:
+        """Render the result count and key help."""
+        return [(
+            "",
+            f" {len(self.matches)}/{len(self.view)} models • sort: {self.sort} (Tab)"
+            f" • ↑↓ PgUp PgDn • Enter select • Esc cancel"
+        )]
@@ -2,20 +2,21 @@
 Interactive Model Selection UI for Flex AI Agent.
 
 This module provides an interactive CLI interface for browsing, filtering,
-and selecting OpenRouter models using the inquirer library.
+and selecting OpenRouter models using the inquirer library, with a
+full-screen browser for the catalog itself.
 """
 
 import asyncio
 from typing import List, Optional, Dict, Any, Tuple
 import inquirer
 from rich.console import Console
-from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
 
 from agents.models import OpenRouterModel, ModelFilter
 from tools.model_manager import ModelManager
 from config.settings import Settings, get_settings
+from ui.model_browser import ModelBrowser, ModelCatalogView
 
 
 class ModelSelector:
@@ -30,9 +31,8 @@ class ModelSelector:
         # Cache for models to avoid repeated API calls
         self._model_cache: Optional[List[OpenRouterModel]] = None
         
-        # Display settings
-        self.models_per_page = 20
-        self.max_description_length = 80
+        # Search index and sorted views of the cached catalog
+        self._catalog_view: Optional[ModelCatalogView] = None
     
     async def select_model_interactive(
         self, 
@@ -59,11 +59,6 @@ class ModelSelector:
                     if result:
                         return result
                 
-                elif action == "search":
-                    result = await self._search_models(current_model)
-                    if result:
-                        return result
-                
                 elif action == "filter":
                     filter_criteria = await self._setup_filters()
                     # Continue to show filtered results
@@ -103,8 +98,7 @@ class ModelSelector:
         
         # Menu options
         choices = [
-            ("Browse all models", "browse"),
-            ("Search models", "search"),
+            ("Browse and search models", "browse"),
             ("Filter models", "filter"),
             ("Show favorite models", "favorites"),
             ("Show current model details", "details") if current_model else None,
@@ -132,102 +126,20 @@ class ModelSelector:
         current_model: Optional[str],
         filter_criteria: Optional[ModelFilter] = None
     ) -> Optional[str]:
-        """Browse models with pagination."""
+        """Browse models in the full-screen browser with type-ahead search."""
         # Get models
         if filter_criteria:
             models = await self.model_manager.filter_models(filter_criteria)
+            view = ModelCatalogView(models)
         else:
-            models = await self._get_cached_models()
+            view = await self._get_catalog_view()
         
-        if not models:
+        if not len(view):
             self.console.print("❌ No models found.", style="red")
             input("\nPress Enter to continue...")
             return None
         
-        # Sort models by name
-        models.sort(key=lambda m: m.name)
-        
-        # Paginate models
-        page = 0
-        total_pages = (len(models) - 1) // self.models_per_page + 1
-        
-        while True:
-            start_idx = page * self.models_per_page
-            end_idx = min(start_idx + self.models_per_page, len(models))
-            page_models = models[start_idx:end_idx]
-            
-            # Display page
-            self.console.clear()
-            self._display_models_table(page_models, current_model, page + 1, total_pages)
-            
-            # Create choices for this page
-            choices = []
-            for i, model in enumerate(page_models):
-                label = self._format_model_choice(model, current_model)
-                choices.append((label, model.id))
-            
-            # Add navigation options
-            choices.append(("──────────────────", None))
-            
-            if page > 0:
-                choices.append(("◀ Previous page", "prev"))
-            if page < total_pages - 1:
-                choices.append(("Next page ▶", "next"))
-            
-            choices.extend([
-                ("🔍 Show model details", "details"),
-                ("↩ Back to main menu", "back")
-            ])
-            
-            questions = [
-                inquirer.List(
-                    'choice',
-                    message=f"Select a model (Page {page + 1}/{total_pages})",
-                    choices=choices,
-                    carousel=True
-                )
-            ]
-            
-            answers = inquirer.prompt(questions)
-            if not answers:
-                return None
-            
-            choice = answers['choice']
-            
-            if choice == "prev":
-                page = max(0, page - 1)
-            elif choice == "next":
-                page = min(total_pages - 1, page + 1)
-            elif choice == "details":
-                model_id = await self._select_model_for_details(page_models)
-                if model_id:
-                    await self._show_model_details(model_id)
-            elif choice == "back":
-                return None
-            elif choice and choice != "separator":
-                # Model selected
-                return choice
-    
-    async def _search_models(self, current_model: Optional[str]) -> Optional[str]:
-        """Search models by name or description."""
-        questions = [
-            inquirer.Text(
-                'search_term',
-                message="Enter search term (name, provider, or description)"
-            )
-        ]
-        
-        answers = inquirer.prompt(questions)
-        if not answers or not answers['search_term']:
-            return None
-        
-        search_term = answers['search_term'].strip()
-        
-        # Create filter with search term
-        filter_criteria = ModelFilter(search_term=search_term)
-        
-        # Browse filtered results
-        return await self._browse_models(current_model, filter_criteria)
+        return await ModelBrowser(view, current_model).run()
     
     async def _setup_filters(self) -> ModelFilter:
         """Set up model filtering criteria."""
@@ -393,97 +305,6 @@ class ModelSelector:
         
         input("\nPress Enter to continue...")
     
-    async def _select_model_for_details(self, models: List[OpenRouterModel]) -> Optional[str]:
-        """Select a model to show details for."""
-        choices = [(self._format_model_choice(model, None), model.id) for model in models]
-        choices.append(("Cancel", None))
-        
-        questions = [
-            inquirer.List(
-                'model_id',
-                message="Select model to view details",
-                choices=choices,
-                carousel=True
-            )
-        ]
-        
-        answers = inquirer.prompt(questions)
-        return answers.get('model_id') if answers else None
-    
-    def _display_models_table(
-        self, 
-        models: List[OpenRouterModel], 
-        current_model: Optional[str],
-        page: int,
-        total_pages: int
-    ) -> None:
-        """Display models in a formatted table."""
-        table = Table(title=f"Available Models (Page {page}/{total_pages})")
-        
-        table.add_column("Name", style="cyan")
-        table.add_column("Provider", style="green")
-        table.add_column("Context", justify="right", style="yellow")
-        table.add_column("Price/1K", justify="right", style="magenta")
-        table.add_column("Features", style="blue")
-        table.add_column("Current", justify="center", style="red")
-        
-        for model in models:
-            # Calculate price per 1K tokens
-            prompt_price_1k = model.pricing.get('prompt', 0) * 1000
-            completion_price_1k = model.pricing.get('completion', 0) * 1000
-            price_str = f"${prompt_price_1k:.3f}/${completion_price_1k:.3f}"
-            
-            # Features
-            features = []
-            if model.supports_tools:
-                features.append("🔧")
-            if model.supports_streaming:
-                features.append("📡")
-            feature_str = "".join(features) or "—"
-            
-            # Current indicator
-            current_indicator = "●" if model.id == current_model else ""
-            
-            # Provider (extract from ID)
-            provider = model.id.split('/')[0] if '/' in model.id else "Unknown"
-            
-            table.add_row(
-                model.name[:30] + ("..." if len(model.name) > 30 else ""),
-                provider,
-                f"{model.context_length // 1000}K",
-                price_str,
-                feature_str,
-                current_indicator
-            )
-        
-        self.console.print(table)
-    
-    def _format_model_choice(self, model: OpenRouterModel, current_model: Optional[str]) -> str:
-        """Format a model for display in choice list."""
-        name = model.name
-        if len(name) > 40:
-            name = name[:37] + "..."
-        
-        # Add pricing info
-        prompt_price = model.pricing.get('prompt', 0) * 1000  # Per 1K tokens
-        completion_price = model.pricing.get('completion', 0) * 1000
-        
-        choice = f"{name}"
-        
-        if prompt_price > 0 or completion_price > 0:
-            choice += f" (${prompt_price:.2f}/${completion_price:.2f} per 1K)"
-        else:
-            choice += " (Free)"
-        
-        # Add context length
-        choice += f" [{model.context_length // 1000}K ctx]"
-        
-        # Mark current model
-        if model.id == current_model:
-            choice = "● " + choice + " (CURRENT)"
-        
-        return choice
-    
     async def _get_cached_models(self) -> List[OpenRouterModel]:
         """Get models from cache or fetch if not cached."""
         if self._model_cache is None:
@@ -492,10 +313,17 @@ class ModelSelector:
         
         return self._model_cache
     
+    async def _get_catalog_view(self) -> ModelCatalogView:
+        """Get the indexed catalog, building it once per loaded catalog."""
+        if self._catalog_view is None:
+            self._catalog_view = ModelCatalogView(await self._get_cached_models())
+        return self._catalog_view
+    
     async def _refresh_model_cache(self) -> None:
         """Refresh the model cache."""
         self.console.print("🔄 Refreshing model cache...", style="yellow")
         self._model_cache = await self.model_manager.list_models(use_cache=False)
+        self._catalog_view = None
     
     def quick_select(self, models: List[str], current_model: Optional[str] = None) -> Optional[str]:
         """Quick model selection from a predefined list."""
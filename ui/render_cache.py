@@ -0,0 +1,128 @@
+"""
+Render Cache for Flex AI Agent.
+
+This module memoizes the rendering of code panels. The same code block is
+often shown several times - in the final response, in tool results, in
+validation output and when history is replayed - and highlighting plus panel
+layout is the expensive part. Rendered lines of segments are kept in an LRU
+cache keyed by (kind, code hash, language, width), so a repeated block is
+printed straight from its segments, and a terminal resize only re-renders the
+blocks that are drawn at the new width.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Tuple
+
+from rich.console import Console, ConsoleOptions, RenderableType, RenderResult
+from rich.segment import Segment
+
+
+RenderKey = Tuple[Hashable, str, str, int]
+
+
+class RenderCache:
+    """LRU cache of rendered segment lines."""
+    
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize the render cache.
+        
+        Args:
+            max_entries: Maximum number of cached renderings
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[RenderKey, List[List[Segment]]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def code_hash(code: str) -> str:
+        """Hash code text for use in a cache key."""
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+    
+    def get(self, key: RenderKey) -> Optional[List[List[Segment]]]:
+        """
+        Look up a rendering.
+        
+        Args:
+            key: Cache key
+        
+        Returns:
+            Cached lines of segments, or None on a miss
+        """
+        lines = self._entries.get(key)
+        if lines is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return lines
+    
+    def put(self, key: RenderKey, lines: List[List[Segment]]) -> None:
+        """Insert a rendering, evicting the least recently used entry."""
+        self._entries[key] = lines
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop all cached renderings."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class CachedRenderable:
+    """Renderable that renders through the cache at the width it is drawn at."""
+    
+    def __init__(
+        self,
+        kind: Hashable,
+        code: str,
+        language: str,
+        build: Callable[[], RenderableType],
+        cache: Optional[RenderCache] = None
+    ):
+        """
+        Initialize the renderable.
+        
+        Args:
+            kind: What is rendered, e.g. the formatter and its variant
+            code: Code shown by the renderable
+            language: Language of the code
+            build: Creates the uncached renderable on a miss
+            cache: Cache to use, the process-wide one by default
+        """
+        self.kind = kind
+        self.code_hash = RenderCache.code_hash(code)
+        self.language = language
+        self.build = build
+        self.cache = cache
+    
+    def __rich_console__(self, console: Console, options: ConsoleOptions) -> RenderResult:
+        cache = self.cache if self.cache is not None else get_render_cache()
+        key = (self.kind, self.code_hash, self.language, options.max_width)
+        
+        lines = cache.get(key)
+        if lines is None:
+            lines = console.render_lines(self.build(), options, pad=False, new_lines=True)
+            cache.put(key, lines)
+        
+        for line in lines:
+            yield from line
+
+
+# Global render cache instance
+_render_cache: Optional[RenderCache] = None
+
+
+def get_render_cache() -> RenderCache:
+    """Get the process-wide render cache."""
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache()
+    return _render_cache
@@ -0,0 +1,151 @@
+"""
+Incremental Stream Renderer for Flex AI Agent.
+
+This module renders a streamed AI response as it arrives. Text deltas are
+split into lines and fed through a small persistent parser that tracks code
+fences, so each markdown section or code block is formatted exactly once, when
+it is complete, and printed permanently. Only the section still being written
+is shown in a Rich ``Live`` region, redrawn at a fixed rate, so rendering cost
+does not grow with the length of the response.
+"""
+
+from typing import List, Optional
+
+from rich.console import Console, RenderableType
+from rich.live import Live
+from rich.text import Text
+
+from ui.formatters import (
+    format_code_block_panel,
+    format_response_footer,
+    format_response_header,
+    format_text_section_rich
+)
+
+
+class StreamRenderer:
+    """Renders streamed response deltas section by section."""
+    
+    # Redraws per second of the section being written
+    REFRESH_PER_SECOND = 8
+    
+    def __init__(self, console: Console, model_name: Optional[str] = None):
+        """
+        Initialize the renderer.
+        
+        Args:
+            console: Console to render to
+            model_name: Model shown in the response header
+        """
+        self.console = console
+        self.model_name = model_name
+        
+        # Parser state, kept across deltas
+        self.in_code_block = False
+        self.code_language = ""
+        self.section: List[str] = []
+        self.partial_line = ""
+        
+        self.parts: List[str] = []
+        self.sections_rendered = 0
+        self._live: Optional[Live] = None
+        self._finished = False
+    
+    @property
+    def text(self) -> str:
+        """Full response text received so far."""
+        return "".join(self.parts)
+    
+    def start(self) -> None:
+        """Print the header and start the live region."""
+        if self._live is not None:
+            return
+        self.console.print(format_response_header(self.model_name))
+        self.console.print()
+        self._live = Live(
+            get_renderable=self._render_current,
+            console=self.console,
+            refresh_per_second=self.REFRESH_PER_SECOND,
+            transient=True
+        )
+        self._live.start()
+    
+    def feed(self, delta: str) -> None:
+        """
+        Add a chunk of response text.
+        
+        Args:
+            delta: New text since the previous chunk
+        """
+        if not delta:
+            return
+        if self._live is None:
+            self.start()
+        
+        self.parts.append(delta)
+        if "\n" not in delta:
+            self.partial_line += delta
+            return
+        
+        lines = (self.partial_line + delta).split("\n")
+        self.partial_line = lines.pop()
+        for line in lines:
+            self._process_line(line)
+    
+    def _process_line(self, line: str) -> None:
+        """Advance the parser by one complete line."""
+        if line.strip().startswith("```"):
+            self._flush_section()
+            if self.in_code_block:
+                self.in_code_block = False
+                self.code_language = ""
+            else:
+                self.in_code_block = True
+                self.code_language = line.strip()[3:] or "text"
+            return
+        self.section.append(line)
+    
+    def _render_section(self, lines: List[str], cached: bool = True) -> Optional[RenderableType]:
+        """Format the lines of a section in the current parser state."""
+        if not "\n".join(lines).strip():
+            return None
+        if self.in_code_block:
+            return format_code_block_panel(lines, self.code_language, cached=cached)
+        return format_text_section_rich("\n".join(lines))
+    
+    def _flush_section(self) -> None:
+        """Print the finished section permanently and start a new one."""
+        renderable = self._render_section(self.section)
+        if renderable is not None:
+            # Reason: while Live runs, console output is printed above the live region
+            self.console.print(renderable)
+            self.console.print()
+            self.sections_rendered += 1
+        self.section = []
+    
+    def _render_current(self) -> RenderableType:
+        """Render the section being written, including its partial line."""
+        lines = self.section + [self.partial_line] if self.partial_line else self.section
+        # Reason: the section still grows, so caching each redraw would only evict finished blocks
+        renderable = self._render_section(lines, cached=False)
+        return renderable if renderable is not None else Text("")
+    
+    def finish(self) -> None:
+        """Render the rest of the response and the footer."""
+        if self._finished or self._live is None:
+            return
+        self._finished = True
+        
+        if self.partial_line:
+            self._process_line(self.partial_line)
+            self.partial_line = ""
+        self._flush_section()
+        self.close()
+        self.console.print(format_response_footer())
+        self.console.print()
+    
+    def close(self) -> None:
+        """Stop the live region, e.g. when the stream fails."""
+        if self._live is not None:
+            self._live.stop()
+            self._live = None